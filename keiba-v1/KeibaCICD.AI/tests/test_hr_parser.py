@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""tools/hr_parser (HRレコード位置インデックス・一括払戻取得) のテスト
+
+検証:
+  - インデックスはツール側のキャッシュに保存され、SE_DATA には書き込まない
+  - get_payouts_for_races は小さな SH*.DAT から単勝/3連単を正しく読む
+  - ファイル更新 (size/mtime 変化) で再走査、SE_DATA ディレクトリが変われば作り直す
+"""
+
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "tools"))
+
+import hr_parser as hp
+
+R1, R2, R3 = "2026013105010110", "2026013105010111", "2026020106010101"
+
+
+def _hr_line(race_id, tan_umaban, tan_payout, tan_pop=1, sanrentan="010203", sanrentan_payout=12340):
+    line = list("HR1" + race_id[:8] + race_id + " " * 700)
+    line = line[:720]
+
+    def put(pos, text):
+        line[pos:pos + len(text)] = list(text)
+
+    put(102, f"{tan_umaban:02d}{tan_payout:09d}{tan_pop:02d}")
+    put(603, f"{sanrentan}{sanrentan_payout:09d}{1:04d}")
+    return "".join(line)
+
+
+def _write_dat(path: Path, lines):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    body = "".join(l + "\r\n" for l in ["SE" + "x" * 40] + lines)
+    path.write_bytes(body.encode("cp932"))
+
+
+@pytest.fixture()
+def jv(tmp_path, monkeypatch):
+    se_data = tmp_path / "SE_DATA"
+    cache = tmp_path / "cache" / "hr_index.json"
+    monkeypatch.setattr(hp, "SE_DATA_DIR", str(se_data))
+    monkeypatch.setattr(hp, "HR_INDEX_PATH", str(cache))
+    monkeypatch.setattr(hp, "_index", None)
+    _write_dat(se_data / "2026" / "SH20260131.DAT", [_hr_line(R1, 3, 450), _hr_line(R2, 7, 1230, 4)])
+    _write_dat(se_data / "2026" / "SH20260201.DAT", [_hr_line(R3, 1, 180)])
+    return se_data, cache
+
+
+def test_default_index_path_is_tool_cache():
+    if "HR_INDEX_PATH" not in os.environ:
+        assert Path(hp.HR_INDEX_PATH).parent == hp.CACHE_DIR
+    assert not Path(hp.HR_INDEX_PATH).is_relative_to(Path(hp.SE_DATA_DIR))
+
+
+def test_build_index_and_bulk_lookup(jv):
+    se_data, cache = jv
+    got = hp.get_payouts_for_races([R1, R2, R3, "2026013105010199", R1])
+    assert set(got) == {R1, R2, R3}
+    assert [(p.selection, p.payout, p.popularity) for p in got[R2]["単勝"]] == [("07", 1230, 4)]
+    assert got[R1]["3連単"][0].selection == "01-02-03" and got[R1]["3連単"][0].payout == 12340
+    assert hp.check_bet_hit(0, "3", got[R1]).payout == 450
+
+    # インデックスはキャッシュ側だけに保存される
+    assert cache.exists()
+    assert sorted(p.name for p in (se_data / "2026").iterdir()) == ["SH20260131.DAT", "SH20260201.DAT"]
+    raw = json.loads(cache.read_text(encoding="utf-8"))
+    assert raw["data_dir"] == str(se_data)
+    assert set(raw["files"]) == {"2026/SH20260131.DAT", "2026/SH20260201.DAT"}
+    assert hp.get_payout_for_race(R3)["単勝"][0].payout == 180
+
+
+def test_stale_file_rescanned_and_other_data_dir_rebuilt(jv, tmp_path, monkeypatch):
+    se_data, cache = jv
+    hp.get_payouts_for_races([R1])
+    index = hp.HrIndex()                       # 保存済みインデックスを読む
+    assert index.refresh_year("2026") == 0
+
+    # 追記 → size/mtime が変わったファイルだけ再走査
+    dat = se_data / "2026" / "SH20260131.DAT"
+    R4 = "2026013105010112"
+    _write_dat(dat, [_hr_line(R1, 5, 990), _hr_line(R2, 7, 1230, 4), _hr_line(R4, 2, 300)])
+    st = dat.stat()
+    os.utime(dat, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert index.refresh_year("2026") == 1
+    got = hp.get_payouts_for_races([R1, R4])
+    assert got[R1]["単勝"][0].payout == 990 and got[R4]["単勝"][0].payout == 300
+
+    # 削除されたファイルはインデックスからも消える
+    (se_data / "2026" / "SH20260201.DAT").unlink()
+    assert hp.get_payouts_for_races([R3]) == {}
+
+    # 別の SE_DATA を指すと既存インデックスは使わない
+    other = tmp_path / "OTHER"
+    _write_dat(other / "2026" / "SH20260131.DAT", [_hr_line(R1, 8, 5000)])
+    monkeypatch.setattr(hp, "SE_DATA_DIR", str(other))
+    assert hp.get_payouts_for_races([R1])[R1]["単勝"][0].payout == 5000
+    assert json.loads(cache.read_text(encoding="utf-8"))["data_dir"] == str(other)
@@ -20,14 +20,27 @@ HRレコード構造（JV-Data仕様推定）:
 - 馬単 (447-): 組数 + [馬番(4) + 払戻(8) + 人気(2)] × 1
 - 3連複 (547-): 組数 + [馬番(6) + 払戻(8) + 人気(3)] × 1
 - 3連単 (600-): 組数 + [馬番(6) + 払戻(9) + 人気(3)] × 1
+
+払戻の検索はインデックス経由:
+- SH*.DAT ごとに「レースID → バイトオフセット」を1回だけ走査して保存
+  (既定: KeibaCICD.AI/data/cache/hr_index.json、環境変数 HR_INDEX_PATH で変更可。
+  JV-Link のデータディレクトリには書き込まない)
+- インデックスは走査元の SE_DATA ディレクトリを記録し、別ディレクトリなら作り直す
+- ファイルの (size, mtime) が変わったものだけ再走査
+- get_payouts_for_races(ids) は各ファイルを高々1回開いて seek で読む
 """
 
+import json
 import os
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
 import re
 
 SE_DATA_DIR = os.environ.get("JV_DATA_ROOT_DIR", r"C:\TFJV") + r"\SE_DATA"
+CACHE_DIR = Path(__file__).resolve().parent.parent / "data" / "cache"
+HR_INDEX_PATH = os.environ.get("HR_INDEX_PATH", str(CACHE_DIR / "hr_index.json"))
+HR_INDEX_VERSION = 2
 
 
 @dataclass
@@ -236,6 +249,152 @@ def parse_hr_record(line: str) -> Dict[str, List[PayoutInfo]]:
     return result
 
 
+class HrIndex:
+    """SH*.DAT の HRレコード位置インデックス（年ディレクトリ単位で差分更新）"""
+
+    def __init__(self, path: str = None, data_dir: str = None):
+        self.path = path or HR_INDEX_PATH
+        self.data_dir = data_dir or SE_DATA_DIR
+        self.files: Dict[str, dict] = {}
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                raw = json.load(f)
+        except (OSError, ValueError):
+            return
+        if raw.get("version") == HR_INDEX_VERSION and raw.get("data_dir") == self.data_dir:
+            self.files = raw.get("files", {})
+
+    def save(self):
+        if not self._dirty:
+            return
+        tmp = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({"version": HR_INDEX_VERSION, "data_dir": self.data_dir,
+                           "files": self.files}, f, separators=(',', ':'))
+            os.replace(tmp, self.path)
+            self._dirty = False
+        except OSError:
+            pass  # 保存できなくても今回の検索には使える
+
+    @staticmethod
+    def _scan(filepath: str) -> Dict[str, int]:
+        """1ファイルを走査して {レースID: 行頭バイトオフセット}"""
+        offsets = {}
+        offset = 0
+        with open(filepath, 'rb') as f:
+            for line in f:
+                if line.startswith(b"HR") and len(line) >= 27:
+                    race_id = line[11:27].decode('ascii', errors='replace')
+                    offsets[race_id] = offset
+                offset += len(line)
+        return offsets
+
+    def refresh_year(self, year: str) -> int:
+        """年ディレクトリの新規・更新ファイルを取り込む。再走査したファイル数を返す"""
+        year_dir = os.path.join(self.data_dir, year)
+        prefix = year + "/"
+        current = set()
+        rescanned = 0
+        if os.path.isdir(year_dir):
+            for filename in sorted(os.listdir(year_dir)):
+                if not (filename.startswith("SH") and filename.endswith(".DAT")):
+                    continue
+                filepath = os.path.join(year_dir, filename)
+                try:
+                    st = os.stat(filepath)
+                    key = prefix + filename
+                    current.add(key)
+                    entry = self.files.get(key)
+                    if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+                        continue
+                    self.files[key] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                                       "races": self._scan(filepath)}
+                except OSError:
+                    continue
+                rescanned += 1
+                self._dirty = True
+        for key in [k for k in self.files if k.startswith(prefix) and k not in current]:
+            del self.files[key]
+            self._dirty = True
+        return rescanned
+
+    def locate(self, race_ids: Iterable[str]) -> Dict[str, Tuple[str, int]]:
+        """{レースID: (ファイルパス, オフセット)}。複数ファイルにある場合は後のファイルを優先"""
+        wanted = set(race_ids)
+        found = {}
+        for key in sorted(self.files):
+            races = self.files[key]["races"]
+            for race_id in wanted.intersection(races):
+                found[race_id] = (os.path.join(self.data_dir, *key.split("/")), races[race_id])
+        return found
+
+
+_index: Optional[HrIndex] = None
+
+
+def get_hr_index() -> HrIndex:
+    """プロセス内で共有するインデックス（初回のみJSONを読む）"""
+    global _index
+    if _index is None or _index.path != HR_INDEX_PATH or _index.data_dir != SE_DATA_DIR:
+        _index = HrIndex()
+    return _index
+
+
+def _read_hr_line(f, offset: int) -> str:
+    f.seek(offset)
+    line = f.readline().decode('cp932', errors='replace')
+    # テキストモード読み込みと同じ改行に揃える
+    if line.endswith("\r\n"):
+        line = line[:-2] + "\n"
+    return line
+
+
+def get_payouts_for_races(race_ids: Iterable[str]) -> Dict[str, Dict[str, List[PayoutInfo]]]:
+    """
+    複数レースの払戻情報をまとめて取得
+
+    対象年のインデックスを差分更新したうえで、ファイルごとに1回だけ開いて読む。
+
+    Args:
+        race_ids: レースIDのリスト（JV-VAN形式 16桁）
+
+    Returns:
+        {レースID: 払戻情報辞書}（見つからないレースは含まない）
+    """
+    race_ids = [r for r in dict.fromkeys(race_ids) if r and len(r) >= 8]
+    if not race_ids:
+        return {}
+
+    index = get_hr_index()
+    for year in sorted({r[:4] for r in race_ids}):
+        index.refresh_year(year)
+    index.save()
+
+    by_file: Dict[str, List[Tuple[int, str]]] = {}
+    for race_id, (filepath, offset) in index.locate(race_ids).items():
+        by_file.setdefault(filepath, []).append((offset, race_id))
+
+    results = {}
+    for filepath, entries in by_file.items():
+        try:
+            with open(filepath, 'rb') as f:
+                for offset, race_id in sorted(entries):
+                    line = _read_hr_line(f, offset)
+                    if line.startswith("HR") and race_id in line:
+                        results[race_id] = parse_hr_record(line)
+        except OSError:
+            continue
+    return results
+
+
 def get_payout_for_race(race_id: str) -> Optional[Dict[str, List[PayoutInfo]]]:
     """
     レースIDから払戻情報を取得
@@ -249,28 +408,7 @@ def get_payout_for_race(race_id: str) -> Optional[Dict[str, List[PayoutInfo]]]:
     # レースIDをJV-VAN形式に変換（必要に応じて）
     # TARGET: 2026013105010210 (東京1回2日10R)
     # JV-VAN: 2026013105010110 (東京1回1日10R) -- 日目の数え方が違う可能性
-    
-    date_str = race_id[:8]  # YYYYMMDD
-    venue = race_id[8:10]   # 場コード
-    
-    # 該当する年月のSHファイルを検索
-    year = date_str[:4]
-    se_year_dir = os.path.join(SE_DATA_DIR, year)
-    
-    if not os.path.exists(se_year_dir):
-        return None
-    
-    # SHファイルを検索
-    for filename in os.listdir(se_year_dir):
-        if filename.startswith("SH") and filename.endswith(".DAT"):
-            filepath = os.path.join(se_year_dir, filename)
-            
-            with open(filepath, 'r', encoding='cp932') as f:
-                for line in f:
-                    if line.startswith("HR") and race_id in line:
-                        return parse_hr_record(line)
-    
-    return None
+    return get_payouts_for_races([race_id]).get(race_id)
 
 
 def check_bet_hit(bet_type: int, selection: str, payouts: Dict[str, List[PayoutInfo]]) -> Optional[PayoutInfo]:
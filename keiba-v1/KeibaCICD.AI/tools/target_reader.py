@@ -33,7 +33,7 @@ from dataclasses import dataclass, asdict
 
 # hr_parser は同じディレクトリにある前提
 try:
-    from hr_parser import get_payout_for_race, check_bet_hit, PayoutInfo
+    from hr_parser import get_payout_for_race, get_payouts_for_races, check_bet_hit, PayoutInfo
     HR_PARSER_AVAILABLE = True
 except ImportError:
     HR_PARSER_AVAILABLE = False
@@ -281,13 +281,17 @@ class TargetDataReader:
         
         return candidates
 
-    def _verify_bets_with_jvvan(self, bets: List[BetRecord], race_id: str) -> Tuple[List[BetRecord], int, bool]:
+    def _verify_bets_with_jvvan(
+        self, bets: List[BetRecord], race_id: str,
+        payout_cache: Optional[Dict[str, Dict]] = None,
+    ) -> Tuple[List[BetRecord], int, bool]:
         """
         JV-VAN HRレコードと照合して的中判定と払戻金額を修正
         
         Args:
             bets: TARGET CSVからパースした買い目リスト
             race_id: レースID
+            payout_cache: get_payouts_for_races() の結果（一括取得済みの場合）
             
         Returns:
             (修正後の買い目リスト, 合計払戻金額, 結果確定フラグ)
@@ -301,7 +305,10 @@ class TargetDataReader:
         
         payouts = None
         for candidate_id in race_id_candidates:
-            payouts = get_payout_for_race(candidate_id)
+            if payout_cache is not None:
+                payouts = payout_cache.get(candidate_id)
+            else:
+                payouts = get_payout_for_race(candidate_id)
             if payouts and any(payouts.values()):
                 break
         
@@ -369,6 +376,16 @@ class TargetDataReader:
         rows = self._read_csv_file(file_path)
         summaries = []
 
+        # 月内全レースの払戻を一括取得（SHファイルは各1回だけ読む）
+        payout_cache = None
+        if verify_with_jvvan and HR_PARSER_AVAILABLE:
+            candidates = []
+            for row in rows:
+                race_id = row[0].strip() if len(row) >= 20 else ''
+                if len(race_id) == 16:
+                    candidates.extend(self._convert_race_id_for_jvvan(race_id))
+            payout_cache = get_payouts_for_races(candidates)
+
         for row in rows:
             if len(row) < 20:
                 continue
@@ -385,7 +402,8 @@ class TargetDataReader:
             confirmed = False  # 結果確定フラグ
             if verify_with_jvvan and HR_PARSER_AVAILABLE:
                 # JV-VAN HRレコードと照合
-                bets, total_payout, confirmed = self._verify_bets_with_jvvan(bets, race_id)
+                bets, total_payout, confirmed = self._verify_bets_with_jvvan(
+                    bets, race_id, payout_cache)
             else:
                 # CSVのフィールド17: 的中払戻金額（円単位）
                 total_payout = int(float(row[17])) if len(row) > 17 and row[17].strip() else 0
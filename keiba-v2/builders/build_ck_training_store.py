@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+CK_DATA 調教ストア構築
+
+JV_DATA_ROOT/CK_DATA の坂路 (HC) / ウッド (WC) 固定長ファイルを core/jravan/ck_parser で
+列配列にパースし、 data3/indexes/ck_training.npz (core/store/training_store.py) を作る。
+(size, mtime) が変わったファイルを含む月だけ再パースする。
+
+Usage:
+    python -m builders.build_ck_training_store
+    python -m builders.build_ck_training_store --years 2025-2026     # 当年分だけ走査
+    python -m builders.build_ck_training_store --rebuild
+    python -m builders.build_ck_training_store --horse 2019105283 --date 2025-01-05
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core.store.training_store import build_training_store, load_training_store
+
+
+def _parse_years(s: str):
+    if not s:
+        return None
+    if '-' in s:
+        start, end = s.split('-')
+        return list(range(int(start), int(end) + 1))
+    return [int(s)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CK_DATA Training Store Builder")
+    parser.add_argument("--years", default="", help="走査する年度範囲 (例: 2025-2026, 省略時は全年)")
+    parser.add_argument("--rebuild", action="store_true", help="manifest を無視して全月を再パース")
+    parser.add_argument("--horse", type=str, help="ketto_num の窓内調教を表示")
+    parser.add_argument("--date", type=str, help="--horse のレース日 (YYYY-MM-DD)")
+    parser.add_argument("--days", type=int, default=30, help="--horse の窓日数")
+    args = parser.parse_args()
+
+    if args.horse:
+        store = load_training_store()
+        if store is None:
+            print("[ERROR] ck_training.npz not found. Run: python -m builders.build_ck_training_store")
+            return 1
+        for w in store.workouts(args.horse, args.date, days=args.days):
+            print(f"  {w['date']} {w['hhmm']} {w['location']}{w['kind']:>5} "
+                  f"4F={w['time4f']} L1={w['lap1']} {w['lapRank']} Lv{w['timeLevel']}")
+        print(f"  {store.window_features(args.horse, args.date, days=args.days)}")
+        return 0
+
+    t0 = time.time()
+    print("[CK] Building training store...")
+    build_training_store(years=_parse_years(args.years), rebuild=args.rebuild)
+    print(f"[CK] done ({time.time() - t0:.1f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,18 +6,37 @@
 UM_DATA（馬マスタ）をスキャンして
 data3/masters/horses/{ketto_num}.json を生成。
 
-同時に data3/masters/horse_name_index.json（馬名→ketto_num逆引き）も構築。
+同時に data3/masters/horse_name_index.json（馬名→ketto_num逆引き）と
+data3/indexes/horse_name_index.json（build_horse_name_index と同形式）と
+data3/indexes/horse_name_search.bin（core/name_search.py）を
+メモリ上のレコードから構築する (出力を読み直さない)。
+UM が 0 件、 または名前数が既存 indexes/horse_name_index.json より減る場合は
+インデックスを上書きしない (UM_DATA の欠損で空インデックスにしないため。 --force で上書き)。
+
+差分書き込み:
+  内容ハッシュを data3/masters/horse_master_manifest.json に保存し、
+  前回と同じ内容のファイルは書かない (夜間更新で触るのは変化した馬だけ)。
+  manifest に無いファイルは既存内容と比較して一致すれば書かない (初回移行用)。
+
+出力形式 (--format):
+  files — 1馬1JSON (従来。 Web の horse-data-reader が直接読む)
+  pack  — data3/masters/horses_pack/ に生年シャード + オフセット索引 (core/store/horse_pack.py)
+  both  — 両方
 
 Usage:
     python -m builders.build_horse_master [--dry-run]
+    python -m builders.build_horse_master --format both
+    python -m builders.build_horse_master --force      # manifest を無視して全件書き込み
 """
 
 import argparse
 import json
+import os
 import sys
 import time
+from collections import defaultdict
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Tuple
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
@@ -25,13 +44,144 @@ from core import config
 from core.jravan import um_parser
 from core.jravan.um_parser import UM_RECORD_LEN
 from core.models.horse import HorseMaster
+from core.store import horse_pack
+from builders.build_horse_name_index import (
+    name_index_from_records, save_index, save_search_index,
+)
+
+FORMATS = ('files', 'pack', 'both')
+
+
+# =====================================================================
+# 差分書き込み
+# =====================================================================
+
+def manifest_path() -> Path:
+    return config.masters_dir() / "horse_master_manifest.json"
+
+
+def load_manifest() -> dict:
+    p = manifest_path()
+    if p.exists():
+        try:
+            m = json.loads(p.read_text(encoding='utf-8'))
+            if isinstance(m, dict):
+                return {'files': m.get('files', {}), 'shards': m.get('shards', {})}
+        except (json.JSONDecodeError, OSError):
+            pass
+    return {'files': {}, 'shards': {}}
+
+
+def save_manifest(manifest: dict) -> None:
+    p = manifest_path()
+    config.ensure_dir(p.parent)
+    tmp = p.with_name(p.name + '.tmp')
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, separators=(',', ':')),
+                   encoding='utf-8')
+    os.replace(tmp, p)
+
+
+def write_horse_files(horses: Dict[str, HorseMaster], horses_dir: Path,
+                      manifest: dict, force: bool = False) -> Tuple[int, int]:
+    """1馬1JSON を内容が変わった馬だけ書く → (書いた数, スキップ数)"""
+    config.ensure_dir(horses_dir)
+    existing = {e.name for e in os.scandir(horses_dir)}
+    hashes = manifest['files']
+    written = skipped = 0
+    for ketto_num, horse in horses.items():
+        content = json.dumps(horse.to_dict(), ensure_ascii=False, indent=2)
+        h = horse_pack.content_hash(content.encode('utf-8'))
+        fname = f"{ketto_num}.json"
+        filepath = horses_dir / fname
+        if not force and fname in existing:
+            prev = hashes.get(ketto_num)
+            if prev == h:
+                skipped += 1
+                continue
+            if prev is None:
+                try:
+                    same = filepath.read_text(encoding='utf-8') == content
+                except (OSError, UnicodeDecodeError):
+                    same = False
+                if same:
+                    hashes[ketto_num] = h
+                    skipped += 1
+                    continue
+        filepath.write_text(content, encoding='utf-8')
+        hashes[ketto_num] = h
+        written += 1
+        if written % 10_000 == 0:
+            print(f"  ... {written:,} horse JSONs written")
+    return written, skipped
 
 
-def build_horse_masters(dry_run: bool = False):
+def write_horse_pack(horses: Dict[str, HorseMaster], out_dir: Path,
+                     manifest: dict, force: bool = False) -> Tuple[int, int]:
+    """生年シャードを内容が変わったものだけ書き直す → (書いたシャード数, スキップ数)"""
+    shards: Dict[str, Dict[str, bytes]] = defaultdict(dict)
+    for ketto_num, horse in horses.items():
+        shards[horse_pack.shard_key(ketto_num)][ketto_num] = \
+            horse_pack.encode_record(horse.to_dict())
+    hashes = manifest['shards']
+    written = skipped = 0
+    for key in sorted(shards):
+        lines = shards[key]
+        h = horse_pack.content_hash(b'\n'.join(lines[k] for k in sorted(lines)))
+        pack_file = out_dir / f"{key}{horse_pack.PACK_SUFFIX}"
+        idx_file = out_dir / f"{key}{horse_pack.IDX_SUFFIX}"
+        if not force and hashes.get(key) == h and pack_file.exists() and idx_file.exists():
+            skipped += 1
+            continue
+        horse_pack.write_shard(out_dir, key, lines)
+        hashes[key] = h
+        written += 1
+    return written, skipped
+
+
+# =====================================================================
+# 馬名インデックス
+# =====================================================================
+
+def existing_index_size() -> int:
+    """既存 indexes/horse_name_index.json の名前数 (無い・壊れていれば 0)"""
+    path = config.indexes_dir() / "horse_name_index.json"
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    return len(data.get('name_to_id') or {})
+
+
+def write_name_indexes(horses: Dict[str, HorseMaster], name_index: Dict[str, str],
+                       name_to_id: Dict[str, str], fmt: str) -> None:
+    """masters/horse_name_index.json, indexes/horse_name_index.json, horse_name_search.bin"""
+    # 馬名インデックス (旧: masters 直下の単純辞書)
+    index_path = config.masters_dir() / "horse_name_index.json"
+    tmp = index_path.with_name(index_path.name + '.tmp')
+    tmp.write_text(json.dumps(name_index, ensure_ascii=False, indent=0), encoding='utf-8')
+    os.replace(tmp, index_path)
+    print(f"[Index] horse_name_index.json: {len(name_index):,} entries")
+
+    # indexes/horse_name_index.json (build_horse_name_index 相当をメモリ上で)
+    out = save_index(name_to_id, source=f"data3/masters/horses ({fmt})")
+    print(f"[Index] {out}: {len(name_to_id):,} names")
+    # 同名馬も全頭含めた検索インデックス (表記揺れ・前方一致・fuzzy)
+    out = save_search_index((h.name, k) for k, h in horses.items())
+    print(f"[Index] {out.name}: {len(horses):,} horses")
+
+
+# =====================================================================
+# メイン
+# =====================================================================
+
+def build_horse_masters(dry_run: bool = False, fmt: str = 'files', force: bool = False):
     """全UM_DATAをスキャンして馬マスタJSONを生成"""
+    if fmt not in FORMATS:
+        raise ValueError(f"fmt must be one of {FORMATS}: {fmt!r}")
     print(f"\n{'='*60}")
     print(f"  KeibaCICD v4 - Horse Master Builder")
-    print(f"  Output: {config.horses_dir()}")
+    print(f"  Output: {config.horses_dir()} (format={fmt})")
     print(f"  Dry run: {dry_run}")
     print(f"{'='*60}\n")
 
@@ -92,27 +242,34 @@ def build_horse_masters(dry_run: bool = False):
 
     print(f"[UM] Total: {len(horses):,} unique horses from {file_count} files")
 
-    # 書き込み
-    written = 0
+    # 書き込み (内容が変わった馬/シャードのみ)
+    written = skipped = 0
+    shards_written = shards_skipped = 0
     if not dry_run:
-        horses_dir = config.ensure_dir(config.horses_dir())
-        for ketto_num, horse in horses.items():
-            filepath = horses_dir / f"{ketto_num}.json"
-            filepath.write_text(
-                json.dumps(horse.to_dict(), ensure_ascii=False, indent=2),
-                encoding='utf-8',
-            )
-            written += 1
-            if written % 10_000 == 0:
-                print(f"  ... {written:,} horse JSONs written")
-
-        # 馬名インデックス
-        index_path = config.masters_dir() / "horse_name_index.json"
-        index_path.write_text(
-            json.dumps(name_index, ensure_ascii=False, indent=0),
-            encoding='utf-8',
-        )
-        print(f"[Index] horse_name_index.json: {len(name_index):,} entries")
+        manifest = load_manifest()
+        try:
+            if fmt in ('files', 'both'):
+                written, skipped = write_horse_files(
+                    horses, config.horses_dir(), manifest, force=force)
+                print(f"[Files] {written:,} written, {skipped:,} unchanged")
+            if fmt in ('pack', 'both'):
+                shards_written, shards_skipped = write_horse_pack(
+                    horses, horse_pack.pack_dir(), manifest, force=force)
+                print(f"[Pack] {shards_written:,} shards written, {shards_skipped:,} unchanged")
+        finally:
+            # 途中で落ちても書いた分のハッシュは残す
+            save_manifest(manifest)
+
+        # 馬名インデックス: UM が読めなかった (0 件) / 既存より縮む場合は上書きしない
+        name_to_id = name_index_from_records(h.to_dict() for h in horses.values())
+        prev = existing_index_size()
+        if not horses:
+            print("  [WARN] 馬が 0 件: 馬名インデックスは更新しない")
+        elif len(name_to_id) < prev and not force:
+            print(f"  [WARN] 馬名インデックスが縮む ({prev:,} → {len(name_to_id):,} names): "
+                  f"更新しない (--force で上書き)")
+        else:
+            write_name_indexes(horses, name_index, name_to_id, fmt)
 
     elapsed = time.time() - t0
 
@@ -120,7 +277,9 @@ def build_horse_masters(dry_run: bool = False):
     print(f"  Results")
     print(f"{'='*60}")
     print(f"  Horses:     {len(horses):,}")
-    print(f"  Written:    {written:,} JSON files")
+    print(f"  Written:    {written:,} JSON files ({skipped:,} unchanged)")
+    if fmt in ('pack', 'both'):
+        print(f"  Shards:     {shards_written:,} written ({shards_skipped:,} unchanged)")
     print(f"  Name index: {len(name_index):,} entries")
     print(f"  Elapsed:    {elapsed:.1f}s")
     print(f"{'='*60}\n")
@@ -129,9 +288,13 @@ def build_horse_masters(dry_run: bool = False):
 def main():
     parser = argparse.ArgumentParser(description='Build horse master JSONs from UM_DATA')
     parser.add_argument('--dry-run', action='store_true', help='Count only, do not write files')
+    parser.add_argument('--format', choices=FORMATS, default='files',
+                        help='files=1馬1JSON (既定), pack=生年シャード, both=両方')
+    parser.add_argument('--force', action='store_true',
+                        help='内容ハッシュを無視して全件書き込み (馬名インデックスの縮小ガードも無効)')
     args = parser.parse_args()
 
-    build_horse_masters(dry_run=args.dry_run)
+    build_horse_masters(dry_run=args.dry_run, fmt=args.format, force=args.force)
 
 
 if __name__ == '__main__':
@@ -6,14 +6,19 @@
 data3/masters/horses/ の全馬JSONを走査し、
 馬名→ketto_numの辞書を構築します。
 
+通常は build_horse_master が同じパスでメモリ上のレコードから直接書き出すので
+(name_index_from_records / save_index を共有)、 単体実行は再生成用。
+
 Usage:
     python -m builders.build_horse_name_index
+    python -m builders.build_horse_name_index --from-pack   # horses_pack から
     python -m builders.build_horse_name_index --info
     python -m builders.build_horse_name_index --name "ディープインパクト"
 """
 
 import argparse
 import json
+import os
 import re
 import sys
 from pathlib import Path
@@ -21,6 +26,68 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
 from core import config
+from core.name_search import NameIndex, index_path
+
+
+def add_name(name_to_id: dict, name: str, ketto_num: str) -> bool:
+    """1件追加 (同名は ketto_num が大きい方 = 若い馬を採用)。 重複なら True。"""
+    cur = name_to_id.get(name)
+    if cur is None:
+        name_to_id[name] = ketto_num
+        return False
+    if ketto_num > cur:
+        name_to_id[name] = ketto_num
+    return True
+
+
+def name_index_from_records(records) -> dict:
+    """馬マスタ dict 列 (HorseMaster.to_dict() 形式) → 馬名→ketto_num"""
+    name_to_id = {}
+    for rec in records:
+        name = (rec.get('name') or '').strip()
+        ketto_num = rec.get('ketto_num') or ''
+        if name and ketto_num:
+            add_name(name_to_id, name, ketto_num)
+    return name_to_id
+
+
+def save_index(name_to_id: dict, output_path: Path = None,
+               source: str = "data3/masters/horses") -> Path:
+    """indexes/horse_name_index.json ({metadata, name_to_id}) を書き出す"""
+    from datetime import datetime
+    output_path = output_path or config.indexes_dir() / "horse_name_index.json"
+    index_data = {
+        "metadata": {
+            "created_at": datetime.now().isoformat(),
+            "source": source,
+            "total_names": len(name_to_id),
+        },
+        "name_to_id": name_to_id,
+    }
+    config.ensure_dir(output_path.parent)
+    tmp = output_path.with_name(output_path.name + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(index_data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, output_path)
+    return output_path
+
+
+def save_search_index(pairs) -> Path:
+    """(馬名, ketto_num) 列 → indexes/horse_name_search.bin (表記揺れ・前方一致・fuzzy 検索用)"""
+    return NameIndex.build(pairs, meta={'kind': 'horse'}).save(index_path('horse'))
+
+
+def build_index_from_pack() -> dict:
+    """data3/masters/horses_pack から馬名インデックスを構築"""
+    from core.store.horse_pack import HorsePack
+    pack = HorsePack()
+    if not pack.shard_keys():
+        print(f"[ERROR] horse pack not found: {pack.root}")
+        return {}
+    print(f"  Scanning: {pack.root}")
+    name_to_id = name_index_from_records(pack.iter_records())
+    print(f"  Unique names: {len(name_to_id):,}")
+    return name_to_id
 
 
 def build_index() -> dict:
@@ -63,12 +130,8 @@ def build_index() -> dict:
                 skipped_no_match += 1
                 continue
 
-            if name in name_to_id:
-                if ketto_num > name_to_id[name]:
-                    name_to_id[name] = ketto_num
+            if add_name(name_to_id, name, ketto_num):
                 duplicates += 1
-            else:
-                name_to_id[name] = ketto_num
 
         except Exception as e:
             errors += 1
@@ -101,6 +164,8 @@ def main():
     parser.add_argument("--info", action="store_true", help="Show index info")
     parser.add_argument("--name", type=str, help="Look up horse name")
     parser.add_argument("--build-index", action="store_true", help="Build index (default action)")
+    parser.add_argument("--from-pack", action="store_true",
+                        help="Scan data3/masters/horses_pack instead of per-horse JSONs")
     args = parser.parse_args()
 
     output_path = config.indexes_dir() / "horse_name_index.json"
@@ -136,28 +201,23 @@ def main():
     print("Horse Name Index Builder (v2)")
     print("=" * 60)
 
-    name_to_id = build_index()
+    if args.from_pack:
+        name_to_id = build_index_from_pack()
+        source = "data3/masters/horses_pack"
+    else:
+        name_to_id = build_index()
+        source = "data3/masters/horses"
     if not name_to_id:
         return 1
 
-    from datetime import datetime
-    index_data = {
-        "metadata": {
-            "created_at": datetime.now().isoformat(),
-            "source": "data3/masters/horses",
-            "total_names": len(name_to_id),
-        },
-        "name_to_id": name_to_id,
-    }
-
-    config.ensure_dir(output_path.parent)
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(index_data, f, ensure_ascii=False, indent=2)
+    save_index(name_to_id, output_path, source=source)
+    search_path = save_search_index(name_to_id.items())
 
     print(f"\n[OK] Index saved: {output_path}")
     print(f"  Total names: {len(name_to_id):,}")
     size_mb = output_path.stat().st_size / 1024 / 1024
     print(f"  Size: {size_mb:.1f} MB")
+    print(f"  Search index: {search_path}")
     return 0
 
 
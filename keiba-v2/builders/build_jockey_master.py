@@ -20,6 +20,7 @@ from typing import Dict, List
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
 from core import config
+from core.name_search import NameIndex, index_path
 from core.jravan import se_parser
 
 
@@ -324,6 +325,9 @@ def main():
         json.dumps(result, ensure_ascii=False, indent=2),
         encoding='utf-8',
     )
+    # 騎手名検索インデックス (省略名・表記揺れ対応)
+    NameIndex.build(((j['name'], j['code']) for j in result if j.get('code')),
+                    meta={'kind': 'jockey'}).save(index_path('jockey'))
 
     elapsed = time.time() - t0
 
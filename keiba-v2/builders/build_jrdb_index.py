@@ -3,25 +3,38 @@
 """
 JRDBインデックス構築
 
-SED（事後IDM）とKYI（事前IDM）をパースし、
-KeibaCICDのketto_num(10桁)+race_dateで引けるインデックスを構築する。
+SED（事後IDM）とKYI（事前IDM）ほか JRDB 各種ファイルをパースし、
+KeibaCICDのketto_num(10桁)+race_date 等で引けるインデックスを構築する。
 
-出力:
-  data3/indexes/jrdb_sed_index.json  — 事後IDM・指数（過去成績用）
-  data3/indexes/jrdb_kyi_index.json  — 事前IDM・予測値（出走表用）
+ファイル単位で並列パースし、結果を data3/indexes/jrdb_parts/{type}/ に
+ファイルごとの列指向キャッシュ (.npz) として保存する。 再実行時は
+(size, mtime) が変わったファイル (= 新しく落としたJRDBデータ) だけを
+パースし、キャッシュと重ねて最終インデックスを作る。
+
+出力 (列指向, jrdb/index_store.py):
+  data3/indexes/jrdb_sed_index.npz  — 事後IDM・指数（過去成績用）
+  data3/indexes/jrdb_kyi_index.npz  — 事前IDM・予測値（出走表用）
+  ... (srb/cyb/cha/kka/ukc/joa/kaa も同様)
+  data3/indexes/jrdb_kaa_index.json — KAA は Web からも読むため JSON も出力
+  --json 指定時は全種別で旧形式 JSON も出力
 
 Usage:
     python -m builders.build_jrdb_index
     python -m builders.build_jrdb_index --years 2024-2025
     python -m builders.build_jrdb_index --type sed
-    python -m builders.build_jrdb_index --type kyi
+    python -m builders.build_jrdb_index --type kyi --workers 4
+    python -m builders.build_jrdb_index --rebuild   # ファイルキャッシュを無視
 """
 
 import argparse
 import json
+import os
 import sys
 import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 from jrdb.parser import (
@@ -29,635 +42,467 @@ from jrdb.parser import (
     parse_cyb_line, parse_cha_line, parse_kka_line,
     parse_ukc_line, parse_joa_line, parse_kaa_line,
 )
+from jrdb.index_store import ColumnarIndex
 
 RAW_DIR = Path('C:/KEIBA-CICD/data3/jrdb/raw')
 INDEX_DIR = Path('C:/KEIBA-CICD/data3/indexes')
+PARTS_DIRNAME = 'jrdb_parts'
+
+
+def _file_year(f: Path) -> Optional[int]:
+    yy = f.stem[3:5]
+    try:
+        return 2000 + int(yy) if int(yy) < 80 else 1900 + int(yy)
+    except ValueError:
+        return None
+
+
+# =============================================================================
+# レコード → (key, 値) 変換
+# =============================================================================
+
+def _sed_entry(r: dict, stem: str) -> Optional[Tuple[str, dict]]:
+    """SED → {ketto_num_10}_{race_date} → 事後IDMデータ"""
+    kn10 = '20' + r['ketto_num_jrdb']
+    race_date = r['race_date']
+    if not race_date:
+        return None
+
+    key = f"{kn10}_{race_date}"
+
+    # 事後IDMデータ + レース分析用フィールド
+    # race_key info for race-level grouping
+    rk = r['jrdb_race_key']
+    venue_code = rk[0:2]
+    race_num = int(rk[6:8]) if len(rk) >= 8 else 0
+
+    return key, {
+        'idm': r['idm'],
+        'soten': r['soten'],
+        'baba_sa': r['baba_sa'],
+        'pace_adj': r['pace_adj'],
+        'deokure_adj': r['deokure_adj'],
+        'ichi_tori_adj': r['ichi_tori_adj'],
+        'furi_adj': r['furi_adj'],
+        'mae_furi_adj': r['mae_furi_adj'],
+        'naka_furi_adj': r['naka_furi_adj'],
+        'ato_furi_adj': r['ato_furi_adj'],
+        'race_adj': r['race_adj'],
+        'ten_idx': r['ten_idx'],
+        'agari_idx': r['agari_idx'],
+        'pace_idx': r['pace_idx'],
+        'race_pace_idx': r['race_pace_idx'],
+        'course_tori': r['course_tori'],
+        'joushou_code': r['joushou_code'],
+        'race_pace': r['race_pace'],
+        'horse_pace': r['horse_pace'],
+        'front_3f': r['front_3f'],
+        'rear_3f': r['rear_3f'],
+        # 前崩れ / レース質分析用
+        'corner1': r['corner1'],
+        'corner2': r['corner2'],
+        'corner3': r['corner3'],
+        'corner4': r['corner4'],
+        'finish_position': r['finish_position'],
+        'num_runners': r['num_runners'],
+        'distance': r['distance'],
+        'track_code': r['track_code'],
+        'venue_code': venue_code,
+        'race_num': race_num,
+        'race_date': race_date,
+    }
+
+
+def _kyi_entry(r: dict, stem: str) -> Optional[Tuple[str, dict]]:
+    """KYI → {ketto_num_10}_{race_date} → 事前IDMデータ
+
+    KYIには日付フィールドがないのでファイル名から推定
+    (KYI250301.txt → 2025-03-01)
+    """
+    year = _file_year(Path(stem))
+    mmdd = stem[5:9]
+    race_date = f"{year}-{mmdd[:2]}-{mmdd[2:]}" if len(mmdd) == 4 else ''
+
+    kn10 = '20' + r['ketto_num_jrdb']
+    key = f"{kn10}_{race_date}"
+
+    return key, {
+        # === 既存フィールド ===
+        'pre_idm': r['pre_idm'],
+        'jockey_idx': r['jockey_idx'],
+        'info_idx': r['info_idx'],
+        'sogo_idx': r['sogo_idx'],
+        'training_idx': r['training_idx'],
+        'stable_idx': r['stable_idx'],
+        'gekisou_idx': r['gekisou_idx'],
+        'pred_ten_idx': r['pred_ten_idx'],
+        'pred_pace_idx': r['pred_pace_idx'],
+        'pred_agari_idx': r['pred_agari_idx'],
+        'pred_position_idx': r['pred_position_idx'],
+        'pred_pace': r['pred_pace'],
+        'kyakushitsu': r['kyakushitsu'],
+        'distance_aptitude': r['distance_aptitude'],
+        'base_odds': r['base_odds'],
+        'base_popularity': r['base_popularity'],
+        'start_idx': r['start_idx'],
+        'deokure_rate': r['deokure_rate'],
+        # === 新規フィールド (Session 114) ===
+        'ninki_idx': r['ninki_idx'],
+        'rotation': r['rotation'],
+        'base_place_odds': r['base_place_odds'],
+        'base_place_popularity': r['base_place_popularity'],
+        # 調教・厩舎詳細
+        'training_arrow': r['training_arrow'],
+        'stable_eval': r['stable_eval'],
+        'jockey_rentairitsu': r['jockey_rentairitsu'],
+        # 適性
+        'distance_aptitude2': r['distance_aptitude2'],
+        'turf_aptitude': r['turf_aptitude'],
+        'dirt_aptitude': r['dirt_aptitude'],
+        'omo_tekisei': r['omo_tekisei'],
+        'hizume_code': r['hizume_code'],
+        # 馬具
+        'blinker': r['blinker'],
+        # JRDB印コード
+        'mark_sogo': r['mark_sogo'],
+        'mark_idm': r['mark_idm'],
+        'mark_info': r['mark_info'],
+        'mark_jockey': r['mark_jockey'],
+        'mark_stable': r['mark_stable'],
+        'mark_training': r['mark_training'],
+        'mark_gekisou': r['mark_gekisou'],
+        # 専門紙印（特定情報）
+        'tokutei_honmei': r['tokutei_honmei'],
+        'tokutei_taikou': r['tokutei_taikou'],
+        'tokutei_tanana': r['tokutei_tanana'],
+        'tokutei_renka': r['tokutei_renka'],
+        'tokutei_hoshi': r['tokutei_hoshi'],
+        # 専門紙印（総合情報）
+        'sogo_honmei': r['sogo_honmei'],
+        'sogo_taikou': r['sogo_taikou'],
+        'sogo_tanana': r['sogo_tanana'],
+        'sogo_renka': r['sogo_renka'],
+        'sogo_hoshi': r['sogo_hoshi'],
+        # 展開予想詳細
+        'pred_dochu_order': r['pred_dochu_order'],
+        'pred_dochu_diff': r['pred_dochu_diff'],
+        'pred_dochu_uchi_soto': r['pred_dochu_uchi_soto'],
+        'pred_3f_order': r['pred_3f_order'],
+        'pred_3f_diff': r['pred_3f_diff'],
+        'pred_3f_uchi_soto': r['pred_3f_uchi_soto'],
+        'pred_goal_order': r['pred_goal_order'],
+        'pred_goal_diff': r['pred_goal_diff'],
+        'pred_goal_uchi_soto': r['pred_goal_uchi_soto'],
+        'tenkai_kigou': r['tenkai_kigou'],
+        # 各指数順位
+        'gekisou_rank': r['gekisou_rank'],
+        'ls_idx_rank': r['ls_idx_rank'],
+        'ten_idx_rank': r['ten_idx_rank'],
+        'pace_idx_rank': r['pace_idx_rank'],
+        'agari_idx_rank': r['agari_idx_rank'],
+        'position_idx_rank': r['position_idx_rank'],
+        # 騎手期待値
+        'jockey_expected_win_rate': r['jockey_expected_win_rate'],
+        'jockey_expected_place_rate': r['jockey_expected_place_rate'],
+        'yusou_kubun': r['yusou_kubun'],
+        # 万券指数
+        'manken_idx': r['manken_idx'],
+        'manken_mark': r['manken_mark'],
+        # 降級・激走
+        'koukyu_flag': r['koukyu_flag'],
+        'gekisou_type': r['gekisou_type'],
+        'kyuuyou_reason': r['kyuuyou_reason'],
+        # 入厩情報
+        'nyuukyuu_num_runs': r['nyuukyuu_num_runs'],
+        'nyuukyuu_date': r['nyuukyuu_date'],
+        'nyuukyuu_days_before': r['nyuukyuu_days_before'],
+        # 放牧先・厩舎
+        'houboku_rank': r['houboku_rank'],
+        'kyuusha_rank': r['kyuusha_rank'],
+        # 馬体重
+        'wakutei_weight': r['wakutei_weight'],
+        'wakutei_weight_diff': r['wakutei_weight_diff'],
+        # フラグ
+        'flags': r['flags'],
+    }
+
+
+def _cyb_entry(r: dict, stem: str) -> Optional[Tuple[str, dict]]:
+    """CYB → {jrdb_race_key}_{umaban:02d} → 調教分析データ"""
+    key = f"{r['jrdb_race_key']}_{r['umaban']:02d}"
+    return key, {
+        'training_type': r['training_type'],
+        'course_type': r['course_type'],
+        'turf_count': r['turf_count'],
+        'wood_count': r['wood_count'],
+        'dirt_count': r['dirt_count'],
+        'polytrack_count': r['polytrack_count'],
+        'training_volume': r['training_volume'],
+        'training_emphasis': r['training_emphasis'],
+        'oikiri_idx': r['oikiri_idx'],
+        'shiage_idx': r['shiage_idx'],
+        'training_eval_class': r['training_eval_class'],
+        'shiage_change': r['shiage_change'],
+        'training_eval': r['training_eval'],
+        'oikiri_idx_prev_week': r['oikiri_idx_prev_week'],
+        'training_comment': r['training_comment'],
+    }
+
+
+def _cha_entry(r: dict, stem: str) -> Optional[Tuple[str, dict]]:
+    """CHA → {jrdb_race_key}_{umaban:02d} → 本追切データ"""
+    key = f"{r['jrdb_race_key']}_{r['umaban']:02d}"
+    return key, {
+        'training_date': r['training_date'],
+        'oikiri_course': r['oikiri_course'],
+        'oikiri_type': r['oikiri_type'],
+        'nori': r['nori'],
+        'ten_e': r['ten_e'],
+        'chukan_e': r['chukan_e'],
+        'shimai_e': r['shimai_e'],
+        'ten_e_idx': r['ten_e_idx'],
+        'chukan_e_idx': r['chukan_e_idx'],
+        'shimai_e_idx': r['shimai_e_idx'],
+        'oikiri_idx': r['oikiri_idx'],
+    }
+
+
+def _kka_entry(r: dict, stem: str) -> Optional[Tuple[str, dict]]:
+    """KKA → {jrdb_race_key}_{umaban:02d} → 競走馬拡張データ"""
+    key = f"{r['jrdb_race_key']}_{r['umaban']:02d}"
+    return key, {
+        'jrdb_results': r['jrdb_results'],
+        'exchange_results': r['exchange_results'],
+        'other_results': r['other_results'],
+        'dam_best_rentai': r['dam_best_rentai'],
+        'dam_place_rentai': r['dam_place_rentai'],
+        'dam_avg_distance': r['dam_avg_distance'],
+        'bms_best_rentai': r['bms_best_rentai'],
+        'bms_place_rentai': r['bms_place_rentai'],
+        'bms_avg_distance': r['bms_avg_distance'],
+        # 産地成績レベル (配列)
+        's_pace_level': r['s_pace_level'],
+        'n_pace_level': r['n_pace_level'],
+        'h_pace_level': r['h_pace_level'],
+        'season_results': r['season_results'],
+    }
+
+
+def _ukc_entry(r: dict, stem: str) -> Optional[Tuple[str, dict]]:
+    """UKC → {ketto_num_jrdb} → 馬基本データ
+
+    UKCはマスタデータ。同一馬が複数ファイルに出現するため、最新を採用 (後勝ち)。
+    """
+    key = r['ketto_num_jrdb']
+    return key, {
+        'horse_name': r['horse_name'],
+        'sex_code': r['sex_code'],
+        'coat_color': r['coat_color'],
+        'sire_name': r['sire_name'],
+        'dam_name': r['dam_name'],
+        'broodmare_sire': r['broodmare_sire'],
+        'birth_date': r['birth_date'],
+        'owner_name': r['owner_name'],
+        'breeder_name': r['breeder_name'],
+        'origin': r['origin'],
+        'retired_flag': r['retired_flag'],
+    }
+
+
+def _joa_entry(r: dict, stem: str) -> Optional[Tuple[str, dict]]:
+    """JOA → {jrdb_race_key}_{umaban:02d} → CID/LS/BB情報"""
+    key = f"{r['jrdb_race_key']}_{r['umaban']:02d}"
+    return key, {
+        'cid_choushi': r['cid_choushi'],
+        'cid_sani': r['cid_sani'],
+        'cid_score': r['cid_score'],
+        'cid': r['cid'],
+        'ls_idx': r['ls_idx'],
+        'ls_eval': r['ls_eval'],
+        'em': r['em'],
+        'bb_turf_dirt': r['bb_turf_dirt'],
+        'bb_turf_dirt_win': r['bb_turf_dirt_win'],
+        'bb_turf_dirt_place': r['bb_turf_dirt_place'],
+        'bb_turf': r['bb_turf'],
+        'bb_turf_win': r['bb_turf_win'],
+        'bb_turf_place': r['bb_turf_place'],
+    }
+
+
+def _srb_entry(r: dict, stem: str) -> Optional[Tuple[str, dict]]:
+    """SRB → {jrdb_race_key} → レースレベル分析データ
 
+    SRBファイルはSED.lzhに同梱されてraw/SED/に展開される。
+    キー: JRDBレースキー(8桁)
+    """
+    key = r['jrdb_race_key']
+    return key, {
+        'furlong_times': r['furlong_times'],
+        'pace_up_position': r['pace_up_position'],
+        'bias_1corner': r['bias_1corner'],
+        'bias_2corner': r['bias_2corner'],
+        'bias_mukousei': r['bias_mukousei'],
+        'bias_3corner': r['bias_3corner'],
+        'bias_4corner': r['bias_4corner'],
+        'bias_straight': r['bias_straight'],
+        'race_comment': r['race_comment'],
+    }
+
+
+def _kaa_entry(r: dict, stem: str) -> Optional[Tuple[str, dict]]:
+    """KAA → {venue_code}_{race_date} → 開催データ（馬場・天候）"""
+    return f"{r['venue_code']}_{r['race_date']}", r
+
+
+@dataclass(frozen=True)
+class JrdbSpec:
+    """JRDBファイル種別ごとの読み方"""
+    subdir: str           # RAW_DIR 配下のディレクトリ
+    prefix: str           # ファイル名プレフィックス (SED250105.txt → 'SED')
+    min_len: int          # これ未満の行はスキップ
+    parse: Callable[[bytes], Optional[dict]]
+    entry: Callable[[dict, str], Optional[Tuple[str, dict]]]
+
+
+SPECS: Dict[str, JrdbSpec] = {
+    'sed': JrdbSpec('SED', 'SED', 370, parse_sed_line, _sed_entry),
+    'kyi': JrdbSpec('KYI', 'KYI', 620, parse_kyi_line, _kyi_entry),
+    'srb': JrdbSpec('SED', 'SRB', 340, parse_srb_line, _srb_entry),
+    'cyb': JrdbSpec('CYB', 'CYB', 90, parse_cyb_line, _cyb_entry),
+    'cha': JrdbSpec('CHA', 'CHA', 55, parse_cha_line, _cha_entry),
+    'kka': JrdbSpec('KKA', 'KKA', 300, parse_kka_line, _kka_entry),
+    'ukc': JrdbSpec('UKC', 'UKC', 270, parse_ukc_line, _ukc_entry),
+    'joa': JrdbSpec('JOA', 'JOA', 100, parse_joa_line, _joa_entry),
+    'kaa': JrdbSpec('KAA', 'KAA', 49, parse_kaa_line, _kaa_entry),
+}
 
-def build_sed_index(year_range: range) -> dict:
-    """SED全ファイル → {ketto_num_10}_{race_date} → 事後IDMデータ"""
-    sed_dir = RAW_DIR / 'SED'
-    if not sed_dir.exists():
-        print(f"ERROR: {sed_dir} not found")
-        return {}
+ALL_TYPES = ['sed', 'kyi', 'srb', 'cyb', 'cha', 'kka', 'ukc', 'joa', 'kaa']
 
-    index = {}
-    file_count = 0
-    error_count = 0
 
-    for f in sorted(sed_dir.glob('SED*.txt')):
-        yy = f.stem[3:5]
-        try:
-            year = 2000 + int(yy) if int(yy) < 80 else 1900 + int(yy)
-        except ValueError:
-            continue
+# =============================================================================
+# ファイル単位パース (並列ワーカー)
+# =============================================================================
 
-        if year not in year_range:
+def parse_file(name: str, path: Path) -> Tuple[List[str], List[dict], int]:
+    """1ファイル → (keys, rows, error_count)"""
+    spec = SPECS[name]
+    keys: List[str] = []
+    rows: List[dict] = []
+    errors = 0
+    for line in path.read_bytes().split(b'\r\n'):
+        if len(line) < spec.min_len:
             continue
-
-        data = f.read_bytes()
-        for line in data.split(b'\r\n'):
-            if len(line) < 370:
-                continue
-            try:
-                r = parse_sed_line(line)
-                if not r:
-                    continue
-            except Exception:
-                error_count += 1
-                continue
-
-            kn10 = '20' + r['ketto_num_jrdb']
-            race_date = r['race_date']
-            if not race_date:
-                continue
-
-            key = f"{kn10}_{race_date}"
-
-            # 事後IDMデータ + レース分析用フィールド
-            # race_key info for race-level grouping
-            rk = r['jrdb_race_key']
-            venue_code = rk[0:2]
-            race_num = int(rk[6:8]) if len(rk) >= 8 else 0
-
-            index[key] = {
-                'idm': r['idm'],
-                'soten': r['soten'],
-                'baba_sa': r['baba_sa'],
-                'pace_adj': r['pace_adj'],
-                'deokure_adj': r['deokure_adj'],
-                'ichi_tori_adj': r['ichi_tori_adj'],
-                'furi_adj': r['furi_adj'],
-                'mae_furi_adj': r['mae_furi_adj'],
-                'naka_furi_adj': r['naka_furi_adj'],
-                'ato_furi_adj': r['ato_furi_adj'],
-                'race_adj': r['race_adj'],
-                'ten_idx': r['ten_idx'],
-                'agari_idx': r['agari_idx'],
-                'pace_idx': r['pace_idx'],
-                'race_pace_idx': r['race_pace_idx'],
-                'course_tori': r['course_tori'],
-                'joushou_code': r['joushou_code'],
-                'race_pace': r['race_pace'],
-                'horse_pace': r['horse_pace'],
-                'front_3f': r['front_3f'],
-                'rear_3f': r['rear_3f'],
-                # 前崩れ / レース質分析用
-                'corner1': r['corner1'],
-                'corner2': r['corner2'],
-                'corner3': r['corner3'],
-                'corner4': r['corner4'],
-                'finish_position': r['finish_position'],
-                'num_runners': r['num_runners'],
-                'distance': r['distance'],
-                'track_code': r['track_code'],
-                'venue_code': venue_code,
-                'race_num': race_num,
-                'race_date': race_date,
-            }
-
-        file_count += 1
-
-    print(f"[SED Index] {file_count} files, {len(index):,} entries, {error_count} errors")
-    return index
-
-
-def build_kyi_index(year_range: range) -> dict:
-    """KYI全ファイル → {ketto_num_10}_{race_date} → 事前IDMデータ"""
-    kyi_dir = RAW_DIR / 'KYI'
-    if not kyi_dir.exists():
-        print(f"ERROR: {kyi_dir} not found")
-        return {}
-
-    index = {}
-    file_count = 0
-    error_count = 0
-
-    # KYIはレースキーから日付を推定する必要がある
-    # KYIファイル名: KYI250301.txt → 2025-03-01
-    for f in sorted(kyi_dir.glob('KYI*.txt')):
-        fname = f.stem  # KYI250301
-        yy = fname[3:5]
         try:
-            year = 2000 + int(yy) if int(yy) < 80 else 1900 + int(yy)
-        except ValueError:
-            continue
-
-        if year not in year_range:
-            continue
-
-        # ファイル名から日付推定
-        mmdd = fname[5:9]
-        if len(mmdd) == 4:
-            race_date = f"{year}-{mmdd[:2]}-{mmdd[2:]}"
-        else:
-            race_date = ''
-
-        data = f.read_bytes()
-        for line in data.split(b'\r\n'):
-            if len(line) < 620:
+            r = spec.parse(line)
+            if not r:
                 continue
-            try:
-                r = parse_kyi_line(line)
-                if not r:
-                    continue
-            except Exception:
-                error_count += 1
-                continue
-
-            kn10 = '20' + r['ketto_num_jrdb']
-
-            # KYIには日付フィールドがないのでファイル名から
-            key = f"{kn10}_{race_date}"
-
-            index[key] = {
-                # === 既存フィールド ===
-                'pre_idm': r['pre_idm'],
-                'jockey_idx': r['jockey_idx'],
-                'info_idx': r['info_idx'],
-                'sogo_idx': r['sogo_idx'],
-                'training_idx': r['training_idx'],
-                'stable_idx': r['stable_idx'],
-                'gekisou_idx': r['gekisou_idx'],
-                'pred_ten_idx': r['pred_ten_idx'],
-                'pred_pace_idx': r['pred_pace_idx'],
-                'pred_agari_idx': r['pred_agari_idx'],
-                'pred_position_idx': r['pred_position_idx'],
-                'pred_pace': r['pred_pace'],
-                'kyakushitsu': r['kyakushitsu'],
-                'distance_aptitude': r['distance_aptitude'],
-                'base_odds': r['base_odds'],
-                'base_popularity': r['base_popularity'],
-                'start_idx': r['start_idx'],
-                'deokure_rate': r['deokure_rate'],
-                # === 新規フィールド (Session 114) ===
-                'ninki_idx': r['ninki_idx'],
-                'rotation': r['rotation'],
-                'base_place_odds': r['base_place_odds'],
-                'base_place_popularity': r['base_place_popularity'],
-                # 調教・厩舎詳細
-                'training_arrow': r['training_arrow'],
-                'stable_eval': r['stable_eval'],
-                'jockey_rentairitsu': r['jockey_rentairitsu'],
-                # 適性
-                'distance_aptitude2': r['distance_aptitude2'],
-                'turf_aptitude': r['turf_aptitude'],
-                'dirt_aptitude': r['dirt_aptitude'],
-                'omo_tekisei': r['omo_tekisei'],
-                'hizume_code': r['hizume_code'],
-                # 馬具
-                'blinker': r['blinker'],
-                # JRDB印コード
-                'mark_sogo': r['mark_sogo'],
-                'mark_idm': r['mark_idm'],
-                'mark_info': r['mark_info'],
-                'mark_jockey': r['mark_jockey'],
-                'mark_stable': r['mark_stable'],
-                'mark_training': r['mark_training'],
-                'mark_gekisou': r['mark_gekisou'],
-                # 専門紙印（特定情報）
-                'tokutei_honmei': r['tokutei_honmei'],
-                'tokutei_taikou': r['tokutei_taikou'],
-                'tokutei_tanana': r['tokutei_tanana'],
-                'tokutei_renka': r['tokutei_renka'],
-                'tokutei_hoshi': r['tokutei_hoshi'],
-                # 専門紙印（総合情報）
-                'sogo_honmei': r['sogo_honmei'],
-                'sogo_taikou': r['sogo_taikou'],
-                'sogo_tanana': r['sogo_tanana'],
-                'sogo_renka': r['sogo_renka'],
-                'sogo_hoshi': r['sogo_hoshi'],
-                # 展開予想詳細
-                'pred_dochu_order': r['pred_dochu_order'],
-                'pred_dochu_diff': r['pred_dochu_diff'],
-                'pred_dochu_uchi_soto': r['pred_dochu_uchi_soto'],
-                'pred_3f_order': r['pred_3f_order'],
-                'pred_3f_diff': r['pred_3f_diff'],
-                'pred_3f_uchi_soto': r['pred_3f_uchi_soto'],
-                'pred_goal_order': r['pred_goal_order'],
-                'pred_goal_diff': r['pred_goal_diff'],
-                'pred_goal_uchi_soto': r['pred_goal_uchi_soto'],
-                'tenkai_kigou': r['tenkai_kigou'],
-                # 各指数順位
-                'gekisou_rank': r['gekisou_rank'],
-                'ls_idx_rank': r['ls_idx_rank'],
-                'ten_idx_rank': r['ten_idx_rank'],
-                'pace_idx_rank': r['pace_idx_rank'],
-                'agari_idx_rank': r['agari_idx_rank'],
-                'position_idx_rank': r['position_idx_rank'],
-                # 騎手期待値
-                'jockey_expected_win_rate': r['jockey_expected_win_rate'],
-                'jockey_expected_place_rate': r['jockey_expected_place_rate'],
-                'yusou_kubun': r['yusou_kubun'],
-                # 万券指数
-                'manken_idx': r['manken_idx'],
-                'manken_mark': r['manken_mark'],
-                # 降級・激走
-                'koukyu_flag': r['koukyu_flag'],
-                'gekisou_type': r['gekisou_type'],
-                'kyuuyou_reason': r['kyuuyou_reason'],
-                # 入厩情報
-                'nyuukyuu_num_runs': r['nyuukyuu_num_runs'],
-                'nyuukyuu_date': r['nyuukyuu_date'],
-                'nyuukyuu_days_before': r['nyuukyuu_days_before'],
-                # 放牧先・厩舎
-                'houboku_rank': r['houboku_rank'],
-                'kyuusha_rank': r['kyuusha_rank'],
-                # 馬体重
-                'wakutei_weight': r['wakutei_weight'],
-                'wakutei_weight_diff': r['wakutei_weight_diff'],
-                # フラグ
-                'flags': r['flags'],
-            }
-
-        file_count += 1
-
-    print(f"[KYI Index] {file_count} files, {len(index):,} entries, {error_count} errors")
-    return index
-
-
-def build_cyb_index(year_range: range) -> dict:
-    """CYB全ファイル → {jrdb_race_key}_{umaban:02d} → 調教分析データ"""
-    cyb_dir = RAW_DIR / 'CYB'
-    if not cyb_dir.exists():
-        print(f"ERROR: {cyb_dir} not found")
-        return {}
-
-    index = {}
-    file_count = 0
-    error_count = 0
-
-    for f in sorted(cyb_dir.glob('CYB*.txt')):
-        yy = f.stem[3:5]
-        try:
-            year = 2000 + int(yy) if int(yy) < 80 else 1900 + int(yy)
-        except ValueError:
-            continue
-        if year not in year_range:
-            continue
-
-        data = f.read_bytes()
-        for line in data.split(b'\r\n'):
-            if len(line) < 90:
-                continue
-            try:
-                r = parse_cyb_line(line)
-                if not r:
-                    continue
-            except Exception:
-                error_count += 1
-                continue
-
-            key = f"{r['jrdb_race_key']}_{r['umaban']:02d}"
-            index[key] = {
-                'training_type': r['training_type'],
-                'course_type': r['course_type'],
-                'turf_count': r['turf_count'],
-                'wood_count': r['wood_count'],
-                'dirt_count': r['dirt_count'],
-                'polytrack_count': r['polytrack_count'],
-                'training_volume': r['training_volume'],
-                'training_emphasis': r['training_emphasis'],
-                'oikiri_idx': r['oikiri_idx'],
-                'shiage_idx': r['shiage_idx'],
-                'training_eval_class': r['training_eval_class'],
-                'shiage_change': r['shiage_change'],
-                'training_eval': r['training_eval'],
-                'oikiri_idx_prev_week': r['oikiri_idx_prev_week'],
-                'training_comment': r['training_comment'],
-            }
-
-        file_count += 1
-
-    print(f"[CYB Index] {file_count} files, {len(index):,} entries, {error_count} errors")
-    return index
-
-
-def build_cha_index(year_range: range) -> dict:
-    """CHA全ファイル → {jrdb_race_key}_{umaban:02d} → 本追切データ"""
-    cha_dir = RAW_DIR / 'CHA'
-    if not cha_dir.exists():
-        print(f"ERROR: {cha_dir} not found")
-        return {}
-
-    index = {}
-    file_count = 0
-    error_count = 0
-
-    for f in sorted(cha_dir.glob('CHA*.txt')):
-        yy = f.stem[3:5]
-        try:
-            year = 2000 + int(yy) if int(yy) < 80 else 1900 + int(yy)
-        except ValueError:
+        except Exception:
+            errors += 1
             continue
-        if year not in year_range:
+        kv = spec.entry(r, path.stem)
+        if kv is None:
             continue
+        keys.append(kv[0])
+        rows.append(kv[1])
+    return keys, rows, errors
 
-        data = f.read_bytes()
-        for line in data.split(b'\r\n'):
-            if len(line) < 55:
-                continue
-            try:
-                r = parse_cha_line(line)
-                if not r:
-                    continue
-            except Exception:
-                error_count += 1
-                continue
 
-            key = f"{r['jrdb_race_key']}_{r['umaban']:02d}"
-            index[key] = {
-                'training_date': r['training_date'],
-                'oikiri_course': r['oikiri_course'],
-                'oikiri_type': r['oikiri_type'],
-                'nori': r['nori'],
-                'ten_e': r['ten_e'],
-                'chukan_e': r['chukan_e'],
-                'shimai_e': r['shimai_e'],
-                'ten_e_idx': r['ten_e_idx'],
-                'chukan_e_idx': r['chukan_e_idx'],
-                'shimai_e_idx': r['shimai_e_idx'],
-                'oikiri_idx': r['oikiri_idx'],
-            }
-
-        file_count += 1
-
-    print(f"[CHA Index] {file_count} files, {len(index):,} entries, {error_count} errors")
-    return index
+def _build_part(name: str, path: str, part_path: str) -> Tuple[int, int]:
+    """ワーカー: 1ファイルをパースして列指向キャッシュに保存 → (件数, エラー数)"""
+    keys, rows, errors = parse_file(name, Path(path))
+    part = ColumnarIndex.from_records(keys, rows)
+    part.save(Path(part_path))
+    return len(part), errors
 
 
-def build_kka_index(year_range: range) -> dict:
-    """KKA全ファイル → {jrdb_race_key}_{umaban:02d} → 競走馬拡張データ"""
-    kka_dir = RAW_DIR / 'KKA'
-    if not kka_dir.exists():
-        print(f"ERROR: {kka_dir} not found")
-        return {}
+def _parts_dir(name: str) -> Path:
+    return INDEX_DIR / PARTS_DIRNAME / name
 
-    index = {}
-    file_count = 0
-    error_count = 0
 
-    for f in sorted(kka_dir.glob('KKA*.txt')):
-        yy = f.stem[3:5]
+def _load_manifest(name: str) -> dict:
+    p = _parts_dir(name) / '_manifest.json'
+    if p.exists():
         try:
-            year = 2000 + int(yy) if int(yy) < 80 else 1900 + int(yy)
-        except ValueError:
-            continue
-        if year not in year_range:
-            continue
+            return json.loads(p.read_text(encoding='utf-8'))
+        except (json.JSONDecodeError, OSError):
+            pass
+    return {}
 
-        data = f.read_bytes()
-        for line in data.split(b'\r\n'):
-            if len(line) < 300:
-                continue
-            try:
-                r = parse_kka_line(line)
-                if not r:
-                    continue
-            except Exception:
-                error_count += 1
-                continue
 
-            key = f"{r['jrdb_race_key']}_{r['umaban']:02d}"
-            index[key] = {
-                'jrdb_results': r['jrdb_results'],
-                'exchange_results': r['exchange_results'],
-                'other_results': r['other_results'],
-                'dam_best_rentai': r['dam_best_rentai'],
-                'dam_place_rentai': r['dam_place_rentai'],
-                'dam_avg_distance': r['dam_avg_distance'],
-                'bms_best_rentai': r['bms_best_rentai'],
-                'bms_place_rentai': r['bms_place_rentai'],
-                'bms_avg_distance': r['bms_avg_distance'],
-                # 産地成績レベル (配列)
-                's_pace_level': r['s_pace_level'],
-                'n_pace_level': r['n_pace_level'],
-                'h_pace_level': r['h_pace_level'],
-                'season_results': r['season_results'],
-            }
-
-        file_count += 1
-
-    print(f"[KKA Index] {file_count} files, {len(index):,} entries, {error_count} errors")
-    return index
+def _save_manifest(name: str, manifest: dict) -> None:
+    p = _parts_dir(name) / '_manifest.json'
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_suffix('.json.tmp')
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=1), encoding='utf-8')
+    os.replace(tmp, p)
 
 
-def build_ukc_index(year_range: range) -> dict:
-    """UKC全ファイル → {ketto_num_jrdb} → 馬基本データ
+def build_index(
+    name: str,
+    year_range: range,
+    workers: int = 1,
+    rebuild: bool = False,
+) -> ColumnarIndex:
+    """指定種別の全ファイル → ColumnarIndex (新規/更新ファイルのみパース)
 
-    UKCはマスタデータ。同一馬が複数ファイルに出現するため、最新を採用。
+    同一キーはファイル名順で後勝ち (従来の dict 上書きと同じ)。
     """
-    ukc_dir = RAW_DIR / 'UKC'
-    if not ukc_dir.exists():
-        print(f"ERROR: {ukc_dir} not found")
-        return {}
-
-    index = {}
-    file_count = 0
-    error_count = 0
-
-    for f in sorted(ukc_dir.glob('UKC*.txt')):
-        yy = f.stem[3:5]
-        try:
-            year = 2000 + int(yy) if int(yy) < 80 else 1900 + int(yy)
-        except ValueError:
-            continue
-        if year not in year_range:
+    spec = SPECS[name]
+    src_dir = RAW_DIR / spec.subdir
+    label = name.upper()
+    if not src_dir.exists():
+        print(f"ERROR: {src_dir} not found")
+        return ColumnarIndex.merge([])
+
+    files = [f for f in sorted(src_dir.glob(f'{spec.prefix}*.txt'))
+             if _file_year(f) in year_range]
+
+    parts_dir = _parts_dir(name)
+    manifest = {} if rebuild else _load_manifest(name)
+    stale: List[Path] = []
+    for f in files:
+        st = f.stat()
+        m = manifest.get(f.name)
+        if (m and m.get('size') == st.st_size and m.get('mtime_ns') == st.st_mtime_ns
+                and (parts_dir / f'{f.stem}.npz').exists()):
             continue
+        stale.append(f)
 
-        data = f.read_bytes()
-        for line in data.split(b'\r\n'):
-            if len(line) < 270:
-                continue
-            try:
-                r = parse_ukc_line(line)
-                if not r:
-                    continue
-            except Exception:
-                error_count += 1
-                continue
-
-            key = r['ketto_num_jrdb']
-            index[key] = {
-                'horse_name': r['horse_name'],
-                'sex_code': r['sex_code'],
-                'coat_color': r['coat_color'],
-                'sire_name': r['sire_name'],
-                'dam_name': r['dam_name'],
-                'broodmare_sire': r['broodmare_sire'],
-                'birth_date': r['birth_date'],
-                'owner_name': r['owner_name'],
-                'breeder_name': r['breeder_name'],
-                'origin': r['origin'],
-                'retired_flag': r['retired_flag'],
-            }
-
-        file_count += 1
-
-    print(f"[UKC Index] {file_count} files, {len(index):,} entries, {error_count} errors")
-    return index
-
-
-def build_joa_index(year_range: range) -> dict:
-    """JOA全ファイル → {jrdb_race_key}_{umaban:02d} → CID/LS/BB情報"""
-    joa_dir = RAW_DIR / 'JOA'
-    if not joa_dir.exists():
-        print(f"ERROR: {joa_dir} not found")
-        return {}
-
-    index = {}
-    file_count = 0
-    error_count = 0
-
-    for f in sorted(joa_dir.glob('JOA*.txt')):
-        yy = f.stem[3:5]
-        try:
-            year = 2000 + int(yy) if int(yy) < 80 else 1900 + int(yy)
-        except ValueError:
-            continue
-        if year not in year_range:
-            continue
-
-        data = f.read_bytes()
-        for line in data.split(b'\r\n'):
-            if len(line) < 100:
-                continue
-            try:
-                r = parse_joa_line(line)
-                if not r:
-                    continue
-            except Exception:
-                error_count += 1
-                continue
-
-            key = f"{r['jrdb_race_key']}_{r['umaban']:02d}"
-            index[key] = {
-                'cid_choushi': r['cid_choushi'],
-                'cid_sani': r['cid_sani'],
-                'cid_score': r['cid_score'],
-                'cid': r['cid'],
-                'ls_idx': r['ls_idx'],
-                'ls_eval': r['ls_eval'],
-                'em': r['em'],
-                'bb_turf_dirt': r['bb_turf_dirt'],
-                'bb_turf_dirt_win': r['bb_turf_dirt_win'],
-                'bb_turf_dirt_place': r['bb_turf_dirt_place'],
-                'bb_turf': r['bb_turf'],
-                'bb_turf_win': r['bb_turf_win'],
-                'bb_turf_place': r['bb_turf_place'],
-            }
-
-        file_count += 1
-
-    print(f"[JOA Index] {file_count} files, {len(index):,} entries, {error_count} errors")
-    return index
-
-
-def build_srb_index(year_range: range) -> dict:
-    """SRB全ファイル → {jrdb_race_key} → レースレベル分析データ
-
-    SRBファイルはSED.lzhに同梱されてraw/SED/に展開される。
-    キー: JRDBレースキー(8桁)
-    """
-    sed_dir = RAW_DIR / 'SED'
-    if not sed_dir.exists():
-        print(f"ERROR: {sed_dir} not found")
-        return {}
-
-    index = {}
-    file_count = 0
     error_count = 0
-
-    for f in sorted(sed_dir.glob('SRB*.txt')):
-        yy = f.stem[3:5]
-        try:
-            year = 2000 + int(yy) if int(yy) < 80 else 1900 + int(yy)
-        except ValueError:
-            continue
-
-        if year not in year_range:
-            continue
-
-        data = f.read_bytes()
-        for line in data.split(b'\r\n'):
-            if len(line) < 340:
-                continue
-            try:
-                r = parse_srb_line(line)
-                if not r:
-                    continue
-            except Exception:
-                error_count += 1
-                continue
-
-            key = r['jrdb_race_key']
-            index[key] = {
-                'furlong_times': r['furlong_times'],
-                'pace_up_position': r['pace_up_position'],
-                'bias_1corner': r['bias_1corner'],
-                'bias_2corner': r['bias_2corner'],
-                'bias_mukousei': r['bias_mukousei'],
-                'bias_3corner': r['bias_3corner'],
-                'bias_4corner': r['bias_4corner'],
-                'bias_straight': r['bias_straight'],
-                'race_comment': r['race_comment'],
-            }
-
-        file_count += 1
-
-    print(f"[SRB Index] {file_count} files, {len(index):,} entries, {error_count} errors")
+    if stale:
+        jobs = [(name, str(f), str(parts_dir / f'{f.stem}.npz')) for f in stale]
+        if workers > 1 and len(stale) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(stale))) as ex:
+                results = list(ex.map(_build_part, *zip(*jobs)))
+        else:
+            results = [_build_part(*job) for job in jobs]
+        for f, (n, errors) in zip(stale, results):
+            st = f.stat()
+            manifest[f.name] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+                                'entries': n, 'errors': errors}
+            error_count += errors
+        _save_manifest(name, manifest)
+
+    index = ColumnarIndex.merge(
+        [ColumnarIndex.load(parts_dir / f'{f.stem}.npz') for f in files])
+    print(f"[{label} Index] {len(files)} files ({len(stale)} parsed), "
+          f"{len(index):,} entries, {error_count} errors")
     return index
 
 
-def _save_index(index: dict, name: str, t0: float):
-    """インデックスをJSONに保存"""
-    if not index:
+def _save_index(index: ColumnarIndex, name: str, t0: float, write_json: bool = False):
+    """インデックスを列指向 .npz (+ 任意で旧形式 JSON) に保存"""
+    if not len(index):
         return
     INDEX_DIR.mkdir(parents=True, exist_ok=True)
-    out = INDEX_DIR / f'jrdb_{name}_index.json'
-    out.write_text(json.dumps(index, ensure_ascii=False), encoding='utf-8')
+    out = INDEX_DIR / f'jrdb_{name}_index.npz'
+    index.save(out)
     size_mb = out.stat().st_size / 1024 / 1024
     print(f"  Saved: {out} ({size_mb:.1f} MB, {time.time()-t0:.1f}s)")
-
-
-def build_kaa_index(year_range: range) -> dict:
-    """KAA全ファイル → {venue_code}_{race_date} → 開催データ（馬場・天候）"""
-    kaa_dir = RAW_DIR / 'KAA'
-    if not kaa_dir.exists():
-        print(f"ERROR: {kaa_dir} not found")
-        return {}
-
-    index = {}
-    errors = 0
-    file_count = 0
-
-    for f in sorted(kaa_dir.glob('KAA*.txt')):
-        yy = f.stem[3:5]
-        try:
-            year = 2000 + int(yy) if int(yy) < 80 else 1900 + int(yy)
-        except ValueError:
-            continue
-        if year not in year_range:
-            continue
-
-        data = f.read_bytes()
-        for line in data.split(b'\r\n'):
-            if len(line) < 49:
-                continue
-            try:
-                rec = parse_kaa_line(line)
-                if rec:
-                    key = f"{rec['venue_code']}_{rec['race_date']}"
-                    index[key] = rec
-            except Exception:
-                errors += 1
-        file_count += 1
-
-    print(f"[KAA] {file_count} files → {len(index):,} entries, {errors} errors")
-    return index
-
-
-ALL_TYPES = ['sed', 'kyi', 'srb', 'cyb', 'cha', 'kka', 'ukc', 'joa', 'kaa']
+    if write_json:
+        out_json = out.with_suffix('.json')
+        out_json.write_text(json.dumps(index.to_dict(), ensure_ascii=False), encoding='utf-8')
+        print(f"  Saved: {out_json}")
 
 
 def main():
@@ -666,6 +511,12 @@ def main():
                         help='年度範囲 (例: 2020-2025)')
     parser.add_argument('--type', choices=ALL_TYPES + ['all'], default='all',
                         help='構築対象')
+    parser.add_argument('--workers', type=int, default=min(8, os.cpu_count() or 1),
+                        help='並列パースのプロセス数 (1=逐次)')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='ファイル単位キャッシュを無視して全ファイル再パース')
+    parser.add_argument('--json', action='store_true',
+                        help='旧形式 jrdb_*_index.json も出力')
     args = parser.parse_args()
 
     # 年度範囲パース
@@ -678,41 +529,11 @@ def main():
     INDEX_DIR.mkdir(parents=True, exist_ok=True)
     targets = ALL_TYPES if args.type == 'all' else [args.type]
 
-    if 'sed' in targets:
-        t0 = time.time()
-        _save_index(build_sed_index(year_range), 'sed', t0)
-
-    if 'kyi' in targets:
-        t0 = time.time()
-        _save_index(build_kyi_index(year_range), 'kyi', t0)
-
-    if 'srb' in targets:
-        t0 = time.time()
-        _save_index(build_srb_index(year_range), 'srb', t0)
-
-    if 'cyb' in targets:
-        t0 = time.time()
-        _save_index(build_cyb_index(year_range), 'cyb', t0)
-
-    if 'cha' in targets:
-        t0 = time.time()
-        _save_index(build_cha_index(year_range), 'cha', t0)
-
-    if 'kka' in targets:
-        t0 = time.time()
-        _save_index(build_kka_index(year_range), 'kka', t0)
-
-    if 'ukc' in targets:
-        t0 = time.time()
-        _save_index(build_ukc_index(year_range), 'ukc', t0)
-
-    if 'joa' in targets:
-        t0 = time.time()
-        _save_index(build_joa_index(year_range), 'joa', t0)
-
-    if 'kaa' in targets:
+    for name in targets:
         t0 = time.time()
-        _save_index(build_kaa_index(year_range), 'kaa', t0)
+        index = build_index(name, year_range, workers=args.workers, rebuild=args.rebuild)
+        # KAA は Web (jrdb-kaa-reader.ts) が JSON を直接読む
+        _save_index(index, name, t0, write_json=args.json or name == 'kaa')
 
 
 if __name__ == '__main__':
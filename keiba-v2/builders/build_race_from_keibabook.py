@@ -26,8 +26,10 @@ sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
 from core import config
 from core.constants import VENUE_NAMES_TO_CODES
+from core.name_search import KINDS as NAME_SEARCH_KINDS, load_name_index
 from keibabook.scraper import KeibabookScraper
 from keibabook.parsers.syutuba_parser import parse_syutuba_html
+from jrdb.index_store import load_jrdb_index
 
 
 # ── JRDB インデックスキャッシュ ──
@@ -41,25 +43,22 @@ def _load_jrdb_indexes() -> tuple:
     if _jrdb_kyi_index is not None:
         return _jrdb_kyi_index, _jrdb_sed_index
 
-    kyi_path = config.indexes_dir() / 'jrdb_kyi_index.json'
-    sed_path = config.indexes_dir() / 'jrdb_sed_index.json'
-
     _jrdb_kyi_index = {}
     _jrdb_sed_index = {}
 
-    if kyi_path.exists():
-        try:
-            _jrdb_kyi_index = json.loads(kyi_path.read_text(encoding='utf-8'))
+    try:
+        _jrdb_kyi_index = load_jrdb_index('kyi') or {}
+        if _jrdb_kyi_index:
             print(f"[JRDB] KYI index loaded: {len(_jrdb_kyi_index):,} entries")
-        except Exception as e:
-            print(f"[JRDB] KYI index load error: {e}")
+    except Exception as e:
+        print(f"[JRDB] KYI index load error: {e}")
 
-    if sed_path.exists():
-        try:
-            _jrdb_sed_index = json.loads(sed_path.read_text(encoding='utf-8'))
+    try:
+        _jrdb_sed_index = load_jrdb_index('sed') or {}
+        if _jrdb_sed_index:
             print(f"[JRDB] SED index loaded: {len(_jrdb_sed_index):,} entries")
-        except Exception as e:
-            print(f"[JRDB] SED index load error: {e}")
+    except Exception as e:
+        print(f"[JRDB] SED index load error: {e}")
 
     return _jrdb_kyi_index, _jrdb_sed_index
 
@@ -139,20 +138,56 @@ def load_jockey_name_to_code() -> dict:
     return index
 
 
-def resolve_trainer_code(kb_trainer_name: str, trainer_name_to_code: dict) -> str:
+def _unique_value(hits: list, name_to_value: dict) -> str:
+    """検索ヒット [(名前, 値)] が 1 つの値に絞れればそれを返す (同名は既存 dict の採用値)"""
+    values = {name_to_value.get(name) or value for name, value in hits}
+    return values.pop() if len(values) == 1 else ""
+
+
+def load_name_search() -> dict:
+    """indexes/{horse,trainer,jockey}_name_search.bin のうち存在するものを読み込む"""
+    out = {}
+    for kind in NAME_SEARCH_KINDS:
+        index = load_name_index(kind)
+        if index is not None:
+            out[kind] = index
+    return out
+
+
+def resolve_trainer_code(kb_trainer_name: str, trainer_name_to_code: dict,
+                         trainer_search=None) -> str:
     """keibabookの調教師名（栗/美プレフィックス+省略名）からJRA-VANコードを解決
 
     keibabook形式: "栗矢作芳" = 栗東所属の矢作芳人
     JRA-VAN形式: "矢作芳人" = フルネーム
+
+    trainer_search (core.name_search.NameIndex) があれば前方一致は二分探索で引き、
+    全角/半角などの表記揺れも正規化キーで吸収する。 無ければ従来の線形走査。
+    取り違えを避けるため完全一致は strict (一字違いは採らない)、 前方一致は騎手と同じく
+    2 件まで引いてちょうど 1 件のときだけ採用する。
     """
     if not kb_trainer_name:
         return ""
     # 直接マッチ
     if kb_trainer_name in trainer_name_to_code:
         return trainer_name_to_code[kb_trainer_name]
+    if trainer_search is not None:
+        code = _unique_value(trainer_search.exact(kb_trainer_name, strict=True),
+                             trainer_name_to_code)
+        if code:
+            return code
     # 栗/美プレフィックスを除去して前方一致
     if kb_trainer_name[0] in ("栗", "美") and len(kb_trainer_name) > 1:
         stripped = kb_trainer_name[1:]
+        if trainer_search is not None:
+            hits = trainer_search.prefix(stripped, limit=2)
+            if len(hits) == 1:
+                return trainer_name_to_code.get(hits[0][0]) or hits[0][1]
+            # 複数マッチ: 省略なしの完全一致だけ採用
+            if len(hits) > 1:
+                return _unique_value(trainer_search.exact(stripped, strict=True),
+                                     trainer_name_to_code)
+            return ""
         matches = [(name, code) for name, code in trainer_name_to_code.items()
                    if name.startswith(stripped)]
         if len(matches) == 1:
@@ -206,6 +241,7 @@ def build_race_json_from_syutuba(
     horse_name_to_id: dict = None,
     trainer_name_to_code: dict = None,
     jockey_name_to_code: dict = None,
+    name_search: dict = None,
 ) -> dict:
     """syutubaパース結果からrace JSON構造を構築
 
@@ -213,6 +249,8 @@ def build_race_json_from_syutuba(
         horse_name_to_id: 馬名→10桁ketto_numマッピング
         trainer_name_to_code: 調教師名→5桁コードマッピング
         jockey_name_to_code: 騎手名→5桁コードマッピング
+        name_search: {'horse'|'trainer'|'jockey': NameIndex}。 dict で引けないときの
+            表記揺れフォールバック (load_name_search())
     """
 
     venue_code = VENUE_NAMES_TO_CODES.get(venue_name, "")
@@ -228,6 +266,9 @@ def build_race_json_from_syutuba(
     horse_name_to_id = horse_name_to_id or {}
     trainer_name_to_code = trainer_name_to_code or {}
     jockey_name_to_code = jockey_name_to_code or {}
+    name_search = name_search or {}
+    horse_search = name_search.get("horse")
+    jockey_search = name_search.get("jockey")
 
     # 出走馬エントリ構築
     entries = []
@@ -248,6 +289,14 @@ def build_race_json_from_syutuba(
         # 騎手名・コード
         jockey_name = horse.get("騎手", "")
         jockey_code = jockey_name_to_code.get(jockey_name, "")
+        if not jockey_code and jockey_name and jockey_search is not None:
+            jockey_code = _unique_value(jockey_search.exact(jockey_name, strict=True), {})
+            if not jockey_code:
+                # 略記 (「Ｍデム」等) は前方一致がちょうど 1 件のときだけ採用
+                hits = jockey_search.prefix(jockey_name, limit=2)
+                if len(hits) == 1:
+                    jockey_code = hits[0][1]
+                    print(f"  WARN: 騎手名を前方一致で解決: {jockey_name} → {hits[0][0]} ({jockey_code})")
 
         # 調教師名・コード（栗/美プレフィックス+省略名をfuzzy matching）
         trainer_name = ""
@@ -255,7 +304,8 @@ def build_race_json_from_syutuba(
             if k in horse and horse[k]:
                 trainer_name = horse[k]
                 break
-        trainer_code = resolve_trainer_code(trainer_name, trainer_name_to_code)
+        trainer_code = resolve_trainer_code(trainer_name, trainer_name_to_code,
+                                            name_search.get("trainer"))
 
         # 馬名 → 10桁ketto_num変換（7桁keibabookコードではなくJRA-VAN IDを使用）
         horse_name = horse.get("馬名_clean", horse.get("馬名", ""))
@@ -269,6 +319,12 @@ def build_race_json_from_syutuba(
                 ketto_num = horse_name_to_id.get(clean_name, "")
                 if ketto_num:
                     horse_name = clean_name  # JSON内の馬名もクリーン化
+        # 全角/半角・ひらがなの表記揺れ (正規化キーで一意に引ける場合のみ。 loose 一致は使わない)
+        if not ketto_num and horse_name and horse_search is not None:
+            hits = horse_search.exact(horse_name, strict=True)
+            ketto_num = _unique_value(hits, horse_name_to_id)
+            if ketto_num:
+                horse_name = hits[0][0]
         if ketto_num:
             resolved_count += 1
 
@@ -388,6 +444,8 @@ def main():
     print(f"  Horse names: {len(horse_name_to_id):,}")
     print(f"  Trainers:    {len(trainer_name_to_code):,}")
     print(f"  Jockeys:     {len(jockey_name_to_code):,}")
+    name_search = load_name_search()
+    print(f"  Name search: {', '.join(name_search) or '(none)'}")
 
     # 既存race JSONの確認（forceでない場合はスキップ）
     parts = date.split("-")
@@ -455,6 +513,7 @@ def main():
                 horse_name_to_id=horse_name_to_id,
                 trainer_name_to_code=trainer_name_to_code,
                 jockey_name_to_code=jockey_name_to_code,
+                name_search=name_search,
             )
 
             # 障害レース検出: race_nameまたはtrack_typeから判定
@@ -9,6 +9,7 @@ data3/races/YYYY/MM/DD/race_{race_id}.json を生成。
 Usage:
     python -m builders.build_race_master [--years 2020-2026] [--dry-run]
     python -m builders.build_race_master --date 2026-02-08 [--dry-run]
+    python -m builders.build_race_master --date 2026-02-01 --to-date 2026-02-08
 """
 
 import argparse
@@ -16,7 +17,7 @@ import json
 import sys
 import time
 from collections import defaultdict
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, List, Optional
 
@@ -28,6 +29,7 @@ from core.constants import VENUE_CODES, SEX_CODES, BABA_CODES
 from core.jravan import se_parser, sr_parser, race_id as rid
 from core.models.race import RaceMaster, RaceEntry, RacePace
 from analysis.race_classifier import classify_race_v2, compute_lap33
+from jrdb.index_store import load_jrdb_index
 
 
 # ── JRDB インデックスキャッシュ ──
@@ -41,25 +43,22 @@ def _load_jrdb_indexes() -> tuple:
     if _jrdb_kyi_index is not None:
         return _jrdb_kyi_index, _jrdb_sed_index
 
-    kyi_path = config.indexes_dir() / 'jrdb_kyi_index.json'
-    sed_path = config.indexes_dir() / 'jrdb_sed_index.json'
-
     _jrdb_kyi_index = {}
     _jrdb_sed_index = {}
 
-    if kyi_path.exists():
-        try:
-            _jrdb_kyi_index = json.loads(kyi_path.read_text(encoding='utf-8'))
+    try:
+        _jrdb_kyi_index = load_jrdb_index('kyi') or {}
+        if _jrdb_kyi_index:
             print(f"[JRDB] KYI index loaded: {len(_jrdb_kyi_index):,} entries")
-        except Exception as e:
-            print(f"[JRDB] KYI index load error: {e}")
+    except Exception as e:
+        print(f"[JRDB] KYI index load error: {e}")
 
-    if sed_path.exists():
-        try:
-            _jrdb_sed_index = json.loads(sed_path.read_text(encoding='utf-8'))
+    try:
+        _jrdb_sed_index = load_jrdb_index('sed') or {}
+        if _jrdb_sed_index:
             print(f"[JRDB] SED index loaded: {len(_jrdb_sed_index):,} entries")
-        except Exception as e:
-            print(f"[JRDB] SED index load error: {e}")
+    except Exception as e:
+        print(f"[JRDB] SED index load error: {e}")
 
     return _jrdb_kyi_index, _jrdb_sed_index
 
@@ -148,33 +147,53 @@ def build_se_groups(years: List[int]) -> Dict[str, List[Dict]]:
     return groups
 
 
-def build_sr_index_for_date(years: List[int], target_date: str) -> Dict[str, 'sr_parser.SrRecord']:
-    """指定日のみのSR_DATAインデックスを構築"""
-    print(f"[SR] Scanning SR_DATA for date {target_date}...")
-    sr_records = sr_parser.scan(years)
+def build_sr_index_for_dates(dates: List[str]) -> Dict[str, 'sr_parser.SrRecord']:
+    """指定日 (複数可) のSR_DATAインデックスを構築
+
+    年単位の全スキャンではなく、オフセットインデックス経由で該当日の
+    レコードだけを読む (core/jravan/record_index.py)。
+    """
+    label = dates[0] if len(dates) == 1 else f"{dates[0]}..{dates[-1]}"
+    print(f"[SR] Reading SR_DATA for date {label} (indexed)...")
     index = {}
-    for sr in sr_records:
-        if sr.date == target_date:
-            index[sr.race_id] = sr
-    print(f"[SR] {len(index):,} races found for {target_date}")
+    for sr in sr_parser.scan_dates(dates):
+        index[sr.race_id] = sr
+    print(f"[SR] {len(index):,} races found for {label}")
     return index
 
 
-def build_se_groups_for_date(years: List[int], target_date: str) -> Dict[str, List[Dict]]:
-    """指定日のみのSE_DATAグループを構築"""
-    print(f"[SE] Scanning SE_DATA for date {target_date}...")
+def build_se_groups_for_dates(dates: List[str]) -> Dict[str, List[Dict]]:
+    """指定日 (複数可) のSE_DATAグループを構築 (オフセットインデックス経由)"""
+    label = dates[0] if len(dates) == 1 else f"{dates[0]}..{dates[-1]}"
+    print(f"[SE] Reading SE_DATA for date {label} (indexed)...")
     groups = defaultdict(list)
     count = 0
-    for record in se_parser.scan(years):
-        # race_idからdateを導出してフィルタ
-        info = rid.parse(record['race_id'])
-        if info and info['date'] == target_date:
-            groups[record['race_id']].append(record)
-            count += 1
-    print(f"[SE] {count:,} records -> {len(groups):,} races for {target_date}")
+    for record in se_parser.scan_dates(dates):
+        groups[record['race_id']].append(record)
+        count += 1
+    print(f"[SE] {count:,} records -> {len(groups):,} races for {label}")
     return groups
 
 
+def build_sr_index_for_date(years: List[int], target_date: str) -> Dict[str, 'sr_parser.SrRecord']:
+    """指定日のみのSR_DATAインデックスを構築 (years は互換のため残置)"""
+    return build_sr_index_for_dates([target_date])
+
+
+def build_se_groups_for_date(years: List[int], target_date: str) -> Dict[str, List[Dict]]:
+    """指定日のみのSE_DATAグループを構築 (years は互換のため残置)"""
+    return build_se_groups_for_dates([target_date])
+
+
+def date_range(start: str, end: str) -> List[str]:
+    """'2026-02-01', '2026-02-08' → 両端を含む YYYY-MM-DD のリスト"""
+    d0 = datetime.strptime(start, '%Y-%m-%d').date()
+    d1 = datetime.strptime(end, '%Y-%m-%d').date()
+    if d1 < d0:
+        d0, d1 = d1, d0
+    return [(d0 + timedelta(days=i)).isoformat() for i in range((d1 - d0).days + 1)]
+
+
 def create_race_master(
     race_id: str,
     entries_raw: List[Dict],
@@ -342,6 +361,8 @@ def main():
     parser = argparse.ArgumentParser(description='Build race master JSONs from JRA-VAN data')
     parser.add_argument('--years', default=None, help='Year range (e.g. 2020-2026)')
     parser.add_argument('--date', default=None, help='Single date (YYYY-MM-DD) for incremental build')
+    parser.add_argument('--to-date', default=None,
+                        help='End date (YYYY-MM-DD) with --date: incremental build for the date range')
     parser.add_argument('--dry-run', action='store_true', help='Count only, do not write files')
     parser.add_argument('--obstacle-only', action='store_true', help='Build only obstacle races')
     args = parser.parse_args()
@@ -349,22 +370,24 @@ def main():
     if args.date and args.years:
         print("ERROR: --date and --years are mutually exclusive")
         sys.exit(1)
+    if args.to_date and not args.date:
+        print("ERROR: --to-date requires --date")
+        sys.exit(1)
 
     t0 = time.time()
 
     if args.date:
-        # インクリメンタルモード: 指定日のみ
-        year = int(args.date[:4])
-        years = [year]
+        # インクリメンタルモード: 指定日 (--to-date で期間) のみ
+        dates = date_range(args.date, args.to_date) if args.to_date else [args.date]
         print(f"\n{'='*60}")
         print(f"  KeibaCICD v4 - Race Master Builder (incremental)")
-        print(f"  Date: {args.date}")
+        print(f"  Date: {dates[0]}" + (f" .. {dates[-1]}" if len(dates) > 1 else ""))
         print(f"  Output: {config.races_dir()}")
         print(f"  Dry run: {args.dry_run}")
         print(f"{'='*60}\n")
 
-        sr_index = build_sr_index_for_date(years, args.date)
-        se_groups = build_se_groups_for_date(years, args.date)
+        sr_index = build_sr_index_for_dates(dates)
+        se_groups = build_se_groups_for_dates(dates)
         allow_no_sr = True
     else:
         # 全年モード（デフォルト: 2020-2026）
@@ -16,6 +16,10 @@ race JSONsとpedigree_index.jsonから、sire/dam/bms別の集計統計を構築
 Usage:
     python -m builders.build_sire_stats             # ビルドのみ
     python -m builders.build_sire_stats --analyze    # ビルド + 全仮説分析
+    python -m builders.build_sire_stats --timeline   # 累積タイムライン (任意カットオフ用)
+
+--timeline は indexes/sire_stats_timeline.npz を出力する。 load_data(sire_cutoff=...)
+はこれがあればカットオフ別JSONの代わりに SireStatsStore.stats_as_of() を使う。
 """
 
 import json
@@ -24,9 +28,12 @@ import time
 import statistics
 from collections import defaultdict
 from datetime import datetime
+from itertools import groupby
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
+import numpy as np
+
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
 from core import config
@@ -183,6 +190,27 @@ def load_pedigree_index() -> Dict[str, dict]:
         return json.load(f)
 
 
+def _new_accum() -> dict:
+    """sire/dam/bms 1件分の集計カウンタ"""
+    return {
+        'total_runs': 0, 'wins': 0, 'top3': 0,
+        # H3/H4: 休み明け・間隔詰め
+        'fresh_runs': 0, 'fresh_wins': 0, 'fresh_top3': 0,
+        'tight_runs': 0, 'tight_wins': 0, 'tight_top3': 0,
+        'normal_runs': 0, 'normal_wins': 0, 'normal_top3': 0,
+        # H5: 瞬発vs持続 (RPCIベース)
+        'sprint_runs': 0, 'sprint_wins': 0, 'sprint_top3': 0,
+        'sustained_runs': 0, 'sustained_wins': 0, 'sustained_top3': 0,
+        # H5b: レースタイプ3カテゴリ (race_trend_v2ベース)
+        'cat_sprint_runs': 0, 'cat_sprint_wins': 0, 'cat_sprint_top3': 0,
+        'cat_balance_runs': 0, 'cat_balance_wins': 0, 'cat_balance_top3': 0,
+        'cat_sustained_runs': 0, 'cat_sustained_wins': 0, 'cat_sustained_top3': 0,
+        # H6: 成長曲線
+        'young_runs': 0, 'young_wins': 0, 'young_top3': 0,
+        'mature_runs': 0, 'mature_wins': 0, 'mature_top3': 0,
+    }
+
+
 def build_sire_stats(races: List[dict], pedigree_index: Dict[str, dict]) -> dict:
     """sire/dam/bms別統計を構築
 
@@ -194,25 +222,6 @@ def build_sire_stats(races: List[dict], pedigree_index: Dict[str, dict]) -> dict
     horse_last_date: Dict[str, str] = {}  # ketto_num → date string
 
     # sire/dam/bms別集計
-    def _new_accum():
-        return {
-            'total_runs': 0, 'wins': 0, 'top3': 0,
-            # H3/H4: 休み明け・間隔詰め
-            'fresh_runs': 0, 'fresh_wins': 0, 'fresh_top3': 0,
-            'tight_runs': 0, 'tight_wins': 0, 'tight_top3': 0,
-            'normal_runs': 0, 'normal_wins': 0, 'normal_top3': 0,
-            # H5: 瞬発vs持続 (RPCIベース)
-            'sprint_runs': 0, 'sprint_wins': 0, 'sprint_top3': 0,
-            'sustained_runs': 0, 'sustained_wins': 0, 'sustained_top3': 0,
-            # H5b: レースタイプ3カテゴリ (race_trend_v2ベース)
-            'cat_sprint_runs': 0, 'cat_sprint_wins': 0, 'cat_sprint_top3': 0,
-            'cat_balance_runs': 0, 'cat_balance_wins': 0, 'cat_balance_top3': 0,
-            'cat_sustained_runs': 0, 'cat_sustained_wins': 0, 'cat_sustained_top3': 0,
-            # H6: 成長曲線
-            'young_runs': 0, 'young_wins': 0, 'young_top3': 0,
-            'mature_runs': 0, 'mature_wins': 0, 'mature_top3': 0,
-        }
-
     sire_stats = defaultdict(_new_accum)
     dam_stats = defaultdict(_new_accum)
     bms_stats = defaultdict(_new_accum)
@@ -525,6 +534,359 @@ def _finalize_stats(raw_stats: dict) -> dict:
     return result
 
 
+# ============================================================
+# 累積タイムラインストア (point-in-time / 任意カットオフ)
+# ============================================================
+# 1回のコーパス走査で sire/dam/bms × 開催日 の日次増分を保存し、
+# 「D日時点の統計」を bisect で任意の D について再構成する。
+# --cutoff ごとに sire_stats_index_cutoff_YYYYMMDD.json を作り直す必要がなくなる。
+
+STORE_FILENAME = "sire_stats_timeline.npz"
+
+# 条件バケット (_accumulate と同じ分類)
+_STORE_BUCKETS = (
+    'fresh', 'tight', 'normal',
+    'sprint', 'sustained',
+    'cat_sprint', 'cat_balance', 'cat_sustained',
+    'young', 'mature',
+)
+
+# top3 = 3着以内 (build_sire_stats と同じ)
+# place = JRA複勝圏 (8頭以上=3着以内, 7頭以下=2着以内; build_pit_sire_timeline と同じ)
+STORE_COLUMNS = (
+    ('total_runs', 'wins', 'top3', 'place')
+    + tuple(f'{b}_{k}' for b in _STORE_BUCKETS for k in ('runs', 'top3', 'place'))
+)
+_STORE_COL_IDX = {c: i for i, c in enumerate(STORE_COLUMNS)}
+
+# build_pit_sire_timeline() 形式のキー → ストア列
+_PIT_KEY_MAP = [('total', 'total_runs'), ('top3', 'place')] + [
+    (f'{b}_{k}', f'{b}_runs' if k == 'runs' else f'{b}_place')
+    for b in ('fresh', 'normal', 'tight', 'sprint', 'sustained', 'young', 'mature')
+    for k in ('runs', 'top3')
+]
+
+_STORE_KINDS = ('sire', 'dam', 'bms')
+
+
+def _date_to_int(date_str: str) -> int:
+    """'YYYY-MM-DD' → YYYYMMDD (int)"""
+    return int(date_str.replace('-', ''))
+
+
+def _int_to_date(d: int) -> str:
+    s = str(int(d))
+    return f"{s[:4]}-{s[4:6]}-{s[6:8]}"
+
+
+class SireStatsStore:
+    """sire/dam/bms 別の日次増分カウンタ (列指向)
+
+    kind ごとに行を (entity, date) 順で保持する:
+        ids[i]                       — entity i の繁殖登録番号
+        offsets[i]:offsets[i+1]      — entity i の行範囲
+        dates[row]                   — YYYYMMDD (int32)
+        deltas[row, col]             — その日の増分 (uint16, 列は STORE_COLUMNS)
+    day_dates / day_counts は日ごとの (races, total_entries, matched_entries)。
+    """
+
+    def __init__(self, kinds: Dict[str, dict], day_dates, day_counts, meta: dict):
+        self.kinds = kinds
+        self.day_dates = np.asarray(day_dates, dtype=np.int32)
+        self.day_counts = np.asarray(day_counts, dtype=np.int64).reshape(-1, 3)
+        self.meta = meta
+        self._id_pos = {k: None for k in kinds}
+
+    # --- 永続化 ---
+
+    def save(self, path: Path) -> None:
+        arrays = {
+            'columns': np.array(STORE_COLUMNS),
+            'day_dates': self.day_dates,
+            'day_counts': self.day_counts,
+            'meta': np.array(json.dumps(self.meta, ensure_ascii=False)),
+        }
+        for kind, part in self.kinds.items():
+            arrays[f'{kind}_ids'] = np.array(part['ids'], dtype='U16')
+            arrays[f'{kind}_offsets'] = part['offsets']
+            arrays[f'{kind}_dates'] = part['dates']
+            arrays[f'{kind}_deltas'] = part['deltas']
+        with open(path, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+
+    @classmethod
+    def load(cls, path: Path) -> 'SireStatsStore':
+        with np.load(path, allow_pickle=False) as z:
+            columns = tuple(str(c) for c in z['columns'])
+            if columns != STORE_COLUMNS:
+                raise ValueError(f"column mismatch in {path}: rebuild with --timeline")
+            kinds = {}
+            for kind in _STORE_KINDS:
+                kinds[kind] = {
+                    'ids': [str(x) for x in z[f'{kind}_ids']],
+                    'offsets': z[f'{kind}_offsets'],
+                    'dates': z[f'{kind}_dates'],
+                    'deltas': z[f'{kind}_deltas'],
+                }
+            meta = json.loads(str(z['meta']))
+            return cls(kinds, z['day_dates'], z['day_counts'], meta)
+
+    # --- 問い合わせ ---
+
+    def _end_positions(self, kind: str, date_int: int, inclusive: bool):
+        """各 entity について date_int 以前 (inclusive=False なら未満) の行末位置"""
+        part = self.kinds[kind]
+        offsets = part['offsets']
+        n = len(part['ids'])
+        if n == 0:
+            return offsets[:-1], offsets[:-1]
+        entity = np.repeat(np.arange(n, dtype=np.int64), np.diff(offsets))
+        keys = entity * 100_000_000 + part['dates']
+        probe = np.arange(n, dtype=np.int64) * 100_000_000 + date_int
+        side = 'right' if inclusive else 'left'
+        return offsets[:-1], np.searchsorted(keys, probe, side=side)
+
+    def counts_as_of(self, kind: str, entity_id: str, date: str,
+                     inclusive: bool = True) -> Optional[dict]:
+        """1 entity の date 時点の累積カウンタ。
+
+        inclusive=True: date 当日を含む (--cutoff と同じ)
+        inclusive=False: date 前日まで (PIT特徴量と同じ)
+        """
+        part = self.kinds[kind]
+        if self._id_pos[kind] is None:
+            self._id_pos[kind] = {sid: i for i, sid in enumerate(part['ids'])}
+        i = self._id_pos[kind].get(entity_id)
+        if i is None:
+            return None
+        lo, hi = part['offsets'][i], part['offsets'][i + 1]
+        side = 'right' if inclusive else 'left'
+        end = lo + np.searchsorted(part['dates'][lo:hi], _date_to_int(date), side=side)
+        if end == lo:
+            return None
+        total = part['deltas'][lo:end].sum(axis=0, dtype=np.int64)
+        return {c: int(total[j]) for j, c in enumerate(STORE_COLUMNS)}
+
+    def stale_days(self, cutoff: str) -> int:
+        """cutoff がストアの最終日 (last_date) を何日過ぎているか (範囲内なら 0)"""
+        last = self.meta.get('last_date')
+        if not last:
+            return 0
+        days = (datetime.strptime(cutoff, '%Y-%m-%d')
+                - datetime.strptime(last, '%Y-%m-%d')).days
+        return max(days, 0)
+
+    def raw_stats_as_of(self, kind: str, cutoff: str) -> Dict[str, dict]:
+        """kind 全 entity の cutoff 当日までの累積カウンタ {id: {col: count}}"""
+        part = self.kinds[kind]
+        starts, ends = self._end_positions(kind, _date_to_int(cutoff), inclusive=True)
+        n = len(part['ids'])
+        if n == 0:
+            return {}
+        rows = np.arange(len(part['dates']), dtype=np.int64)
+        entity = np.repeat(np.arange(n, dtype=np.int64), np.diff(part['offsets']))
+        selected = rows < ends[entity]
+        masked = np.where(selected[:, None], part['deltas'], 0)
+        sums = np.add.reduceat(masked, starts, axis=0, dtype=np.int64)
+        result = {}
+        for i in np.flatnonzero(sums[:, _STORE_COL_IDX['total_runs']] > 0):
+            row = sums[i]
+            result[part['ids'][i]] = {c: int(row[j]) for j, c in enumerate(STORE_COLUMNS)}
+        return result
+
+    def stats_as_of(self, cutoff: str, strict: bool = False) -> dict:
+        """cutoff (YYYY-MM-DD, 当日含む) 時点の sire_stats_index と同形式の dict。
+
+        build_sire_stats(load_race_jsons(cutoff=cutoff), ...) と同じ値を返す
+        (name は付与しない)。
+
+        cutoff がストアの last_date より後の場合、 返るのは last_date 時点の
+        統計でしかない。 meta['stale_days'] (cutoff - last_date の日数、 範囲内なら 0)
+        に記録して警告を出す。 strict=True なら ValueError。
+        """
+        stale_days = self.stale_days(cutoff)
+        if stale_days > 0:
+            msg = (f"sire stats store ends at {self.meta.get('last_date')} "
+                   f"({stale_days} days before cutoff {cutoff}); "
+                   f"rebuild with --timeline")
+            if strict:
+                raise ValueError(msg)
+            print(f"  [WARN] {msg}")
+        raws = {kind: self.raw_stats_as_of(kind, cutoff) for kind in _STORE_KINDS}
+        n_days = int(np.searchsorted(self.day_dates, _date_to_int(cutoff), side='right'))
+        races, total_entries, matched = (
+            self.day_counts[:n_days].sum(axis=0) if n_days else (0, 0, 0))
+        meta = {
+            'total_races': int(races),
+            'total_entries': int(total_entries),
+            'matched_entries': int(matched),
+            'unique_sires': len(raws['sire']),
+            'unique_dams': len(raws['dam']),
+            'unique_bms': len(raws['bms']),
+            'fresh_days_threshold': FRESH_DAYS,
+            'tight_days_threshold': TIGHT_DAYS,
+            'rpci_sprint_threshold': RPCI_SPRINT_THRESHOLD,
+            'rpci_sustained_threshold': RPCI_SUSTAINED_THRESHOLD,
+            'young_age_max': YOUNG_AGE_MAX,
+            'mature_age_min': MATURE_AGE_MIN,
+            'min_runs_conditional': MIN_RUNS_CONDITIONAL,
+            'built_at': self.meta.get('built_at'),
+            'cutoff': cutoff,
+            'source': STORE_FILENAME,
+            'store_last_date': self.meta.get('last_date'),
+            'stale_days': stale_days,
+        }
+        return {
+            'sire': _finalize_stats(raws['sire']),
+            'dam': _finalize_stats(raws['dam']),
+            'bms': _finalize_stats(raws['bms']),
+            'meta': meta,
+        }
+
+    def pit_timelines(self) -> Tuple[dict, dict, dict]:
+        """experiment.build_pit_sire_timeline() と同形式の (sire_tl, dam_tl, bms_tl)。
+
+        各日の終了時点の累積値 (複勝圏は JRA ルール)。
+        ml.features.pedigree_features._pit_sire_lookup でそのまま使える。
+        """
+        col_idx = [_STORE_COL_IDX[c] for _, c in _PIT_KEY_MAP]
+        out = []
+        for kind in _STORE_KINDS:
+            part = self.kinds[kind]
+            offsets = part['offsets']
+            tl = {}
+            for i, sid in enumerate(part['ids']):
+                lo, hi = offsets[i], offsets[i + 1]
+                cum = np.cumsum(part['deltas'][lo:hi][:, col_idx], axis=0, dtype=np.int64)
+                entry = {'dates': [_int_to_date(d) for d in part['dates'][lo:hi]]}
+                for j, (key, _) in enumerate(_PIT_KEY_MAP):
+                    entry[key] = cum[:, j].tolist()
+                tl[sid] = entry
+            out.append(tl)
+        return out[0], out[1], out[2]
+
+
+def build_sire_stats_store(races: List[dict], pedigree_index: Dict[str, dict]) -> SireStatsStore:
+    """全レースを1回走査して SireStatsStore を構築
+
+    分類ロジック (休養日数/RPCI/race_trend_v2/年齢) は build_sire_stats と同じ。
+    races は日付順であること (load_race_jsons() の出力)。
+    """
+
+    n_cols = len(STORE_COLUMNS)
+    horse_last_date: Dict[str, str] = {}
+    rows = {kind: [] for kind in _STORE_KINDS}  # (id, date_int, delta_vec)
+    day_dates: List[int] = []
+    day_counts: List[Tuple[int, int, int]] = []
+
+    dated = [r for r in races if r.get('date')]
+    for race_date, day_races in groupby(dated, key=lambda r: r['date']):
+        date_int = _date_to_int(race_date)
+        today = {kind: {} for kind in _STORE_KINDS}
+        n_races = n_entries = n_matched = 0
+
+        for race in day_races:
+            n_races += 1
+            pace = race.get('pace') or {}
+            pace_cond = _classify_pace(pace.get('rpci'))
+            race_type_cat = _classify_race_type(pace.get('race_trend_v2'))
+            entries = race.get('entries', [])
+            num_runners = race.get('num_runners', 0) or len(entries)
+            place_cutoff = 3 if num_runners >= 8 else 2
+
+            for entry in entries:
+                ketto_num = entry.get('ketto_num', '')
+                if not ketto_num:
+                    continue
+                finish = entry.get('finish_position')
+                if finish is None or finish == 0:
+                    continue
+                n_entries += 1
+
+                ped = pedigree_index.get(ketto_num)
+                if not ped:
+                    continue
+                ids = (ped.get('sire'), ped.get('dam'), ped.get('bms'))
+                if not any(ids):
+                    continue
+                n_matched += 1
+
+                prev_date = horse_last_date.get(ketto_num)
+                days = None
+                if prev_date:
+                    try:
+                        days = (datetime.strptime(race_date, '%Y-%m-%d')
+                                - datetime.strptime(prev_date, '%Y-%m-%d')).days
+                    except ValueError:
+                        pass
+                horse_last_date[ketto_num] = race_date
+
+                rest_cond = _classify_rest(days)
+                conds = [c for c in (
+                    rest_cond if rest_cond != 'debut' else None,
+                    pace_cond, race_type_cat, _classify_age(entry.get('age')),
+                ) if c]
+                flags = (finish == 1, finish <= 3, finish <= place_cutoff)
+
+                for kind, eid in zip(_STORE_KINDS, ids):
+                    if not eid:
+                        continue
+                    vec = today[kind].get(eid)
+                    if vec is None:
+                        vec = today[kind][eid] = [0] * n_cols
+                    vec[_STORE_COL_IDX['total_runs']] += 1
+                    vec[_STORE_COL_IDX['wins']] += flags[0]
+                    vec[_STORE_COL_IDX['top3']] += flags[1]
+                    vec[_STORE_COL_IDX['place']] += flags[2]
+                    for c in conds:
+                        vec[_STORE_COL_IDX[f'{c}_runs']] += 1
+                        vec[_STORE_COL_IDX[f'{c}_top3']] += flags[1]
+                        vec[_STORE_COL_IDX[f'{c}_place']] += flags[2]
+
+        day_dates.append(date_int)
+        day_counts.append((n_races, n_entries, n_matched))
+        for kind in _STORE_KINDS:
+            for eid, vec in today[kind].items():
+                rows[kind].append((eid, date_int, vec))
+
+    kinds = {}
+    for kind in _STORE_KINDS:
+        kind_rows = sorted(rows[kind], key=lambda r: r[0])  # 安定ソート: 日付順を保持
+        ids: List[str] = []
+        offsets = [0]
+        for i, (eid, _, _) in enumerate(kind_rows):
+            if not ids or ids[-1] != eid:
+                if ids:
+                    offsets.append(i)
+                ids.append(eid)
+        offsets.append(len(kind_rows))
+        deltas = np.array([r[2] for r in kind_rows], dtype=np.int64).reshape(-1, n_cols)
+        if deltas.size and deltas.max() > np.iinfo(np.uint16).max:
+            raise ValueError(f"daily count overflow in {kind} timeline")
+        kinds[kind] = {
+            'ids': ids,
+            'offsets': np.array(offsets if ids else [0], dtype=np.int64),
+            'dates': np.array([r[1] for r in kind_rows], dtype=np.int32),
+            'deltas': deltas.astype(np.uint16),
+        }
+        print(f"  {kind}: {len(ids):,} entities, {len(kind_rows):,} day-rows")
+
+    meta = {
+        'built_at': datetime.now().isoformat(timespec='seconds'),
+        'first_date': _int_to_date(day_dates[0]) if day_dates else None,
+        'last_date': _int_to_date(day_dates[-1]) if day_dates else None,
+    }
+    return SireStatsStore(kinds, day_dates, day_counts, meta)
+
+
+def load_sire_stats_store(path: Optional[Path] = None) -> Optional[SireStatsStore]:
+    """indexes/sire_stats_timeline.npz をロード (無ければ None)"""
+    path = path or (config.indexes_dir() / STORE_FILENAME)
+    if not path.exists():
+        return None
+    return SireStatsStore.load(path)
+
+
 # ============================================================
 # 分析モード
 # ============================================================
@@ -661,8 +1023,14 @@ def main():
     parser.add_argument('--analyze', action='store_true', help='ビルド後に全仮説分析を実行')
     parser.add_argument('--cutoff', type=str, default=None,
                         help='カットオフ日 (YYYY-MM-DD)。この日以前のレースのみ使用')
+    parser.add_argument('--timeline', action='store_true',
+                        help='全期間の累積タイムライン (sire_stats_timeline.npz) を構築')
     args = parser.parse_args()
 
+    if args.timeline:
+        main_timeline()
+        return
+
     print(f"\n{'='*60}")
     print(f"  KeibaCICD v4 - Sire/Dam/BMS Stats Builder")
     if args.cutoff:
@@ -735,5 +1103,40 @@ def main():
     print()
 
 
+def main_timeline():
+    """--timeline: 全レースから SireStatsStore を構築して保存"""
+    print(f"\n{'='*60}")
+    print("  KeibaCICD v4 - Sire/Dam/BMS Timeline Store Builder")
+    print(f"{'='*60}\n")
+
+    t0 = time.time()
+
+    print("[1/3] Loading pedigree index...")
+    pedigree_index = load_pedigree_index()
+    if not pedigree_index:
+        print("  Cannot proceed without pedigree_index.json")
+        return
+    print(f"  Loaded {len(pedigree_index):,} horses")
+
+    print("\n[2/3] Loading race JSONs...")
+    races = load_race_jsons()
+
+    print("\n[3/3] Building timeline store...")
+    store = build_sire_stats_store(races, pedigree_index)
+
+    out_path = config.indexes_dir() / STORE_FILENAME
+    config.ensure_dir(config.indexes_dir())
+    print(f"\n[Save] Writing {out_path}...")
+    store.save(out_path)
+
+    file_size = out_path.stat().st_size / 1024 / 1024
+    print(f"\n{'='*60}")
+    print(f"  Range:     {store.meta['first_date']} ~ {store.meta['last_date']}")
+    print(f"  File size: {file_size:.1f} MB")
+    print(f"  Output:    {out_path}")
+    print(f"  Elapsed:   {time.time() - t0:.1f}s")
+    print(f"{'='*60}\n")
+
+
 if __name__ == '__main__':
     main()
@@ -7,6 +7,7 @@ data3/keibabook/ の kb_ext と data3/races/ のレースJSONを結合し、
 keibabook の stable_comment に含まれる厩舎名と JRA-VAN trainer_code の対応を構築します。
 
 簡易版: trainer_nameでの名寄せ（data3/masters/trainers.json + data3/races のtrainer_name）
+同時に data3/indexes/trainer_name_search.bin（core/name_search.py）も出力。
 
 Usage:
     python -m builders.build_trainer_kb_index
@@ -20,6 +21,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
 from core import config
+from core.name_search import NameIndex, index_path
 
 
 def build_index() -> dict:
@@ -78,6 +80,13 @@ def main():
         json.dump(index_data, f, ensure_ascii=False, indent=2)
 
     print(f"\n[OK] Index saved: {output_path}")
+
+    # 調教師名検索インデックス (resolve_trainer_code の前方一致用)
+    search_path = NameIndex.build(
+        ((name, code) for code, name in index["code_to_name"].items()),
+        meta={'kind': 'trainer'},
+    ).save(index_path('trainer'))
+    print(f"[OK] Search index saved: {search_path}")
     return 0
 
 
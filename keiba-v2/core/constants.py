@@ -64,6 +64,10 @@ SR_RECORD_LEN = 1272
 # UM_DATA レコード長
 UM_RECORD_LEN = 1609
 
+# CK_DATA 調教レコード長 (CRLF 除く)
+HC_RECORD_LEN = 47   # 坂路 HC{0|1}YYYYMMDD.DAT
+WC_RECORD_LEN = 92   # ウッドチップ WC{0|1}YYYYMMDD.DAT
+
 # グレード序列（数値が小さいほど上位クラス）
 GRADE_LEVEL = {
     "G1": 1, "G2": 2, "G3": 3, "Listed": 4,
@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+JRA-VAN CK_DATA（調教）パーサー
+
+  CK_DATA/{YYYY}/{YYYYMM}/HC{0|1}{YYYYMMDD}.DAT — 坂路   47バイト固定長 + CRLF
+  CK_DATA/{YYYY}/{YYYYMM}/WC{0|1}{YYYYMMDD}.DAT — ウッド 92バイト固定長 + CRLF
+  (ファイル名 3 文字目 / レコード先頭 1 バイト: '0'=美浦, '1'=栗東)
+
+1 ファイルを (レコード数, レコード長) の uint8 行列として読み、 各フィールドを
+列スライスの数字演算でまとめて整数配列にする (1 レコードずつ decode しない)。
+タイム・ラップは 0.1 秒単位の整数、 0 = 欠損 (空欄・非数字を含む)。
+
+バイトオフセット (docs/training-data-spec.md, web target-training-reader.ts と同じ):
+  共通: 0 場所コード / 1-8 日付 YYYYMMDD / 9-12 時刻 HHMM / 13-22 KettoNum
+  HC:   23-26 4F / 30-33 3F / 37-40 2F / 41-43 Lap2 / 44-46 Lap1
+  WC:   68-71 4F / 72-74 Lap4 / 75-78 3F / 79-81 Lap3 / 82-85 2F / 86-88 Lap2 / 89-91 Lap1
+
+lapRank / タイムレベルは web 版 (calculateLapRank / calculateTimeLevel) と同じ閾値を
+配列で判定する。
+
+提供:
+    KIND_HILL / KIND_WOOD / COLUMNS
+    parse_ck_bytes(data, kind)     — {列名: ndarray} (無効レコードは除外)
+    parse_ck_file(path)            — ファイル名から種別を判定して parse_ck_bytes
+    get_ck_files(years=None)       — CK_DATA 配下の HC/WC ファイル一覧 (パス順)
+    time_levels(time4f, loc, kind) — 5段階タイムレベル (0=タイム無効)
+    lap_ranks(lap2, lap1, time4f, loc, kind) — 'SS' / 'S+' ... 'D-' ('' = ラップ欠損)
+
+Usage:
+    from core.jravan import ck_parser
+    for path in ck_parser.get_ck_files([2025]):
+        cols = ck_parser.parse_ck_file(path)
+        cols['ketto'], cols['date'], cols['time4f'] ...
+"""
+
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from ..config import jv_ck_data_path
+from ..constants import HC_RECORD_LEN, WC_RECORD_LEN
+
+KIND_HILL = 0   # 坂路 (web: 'sakamichi')
+KIND_WOOD = 1   # ウッドチップ (web: 'course')
+
+LOCATION_NAMES = {0: '美浦', 1: '栗東'}
+
+_RECORD_LEN = {KIND_HILL: HC_RECORD_LEN, KIND_WOOD: WC_RECORD_LEN}
+_FILE_PREFIX = {'HC': KIND_HILL, 'WC': KIND_WOOD}
+
+# 種別ごとのタイム・ラップ位置 (start, length)。 無いフィールドは 0 埋め
+_TIME_FIELDS = {
+    KIND_HILL: {'time4f': (23, 4), 'time3f': (30, 4), 'time2f': (37, 4),
+                'lap2': (41, 3), 'lap1': (44, 3)},
+    KIND_WOOD: {'time4f': (68, 4), 'lap4': (72, 3), 'time3f': (75, 4), 'lap3': (79, 3),
+                'time2f': (82, 4), 'lap2': (86, 3), 'lap1': (89, 3)},
+}
+TIME_COLUMNS = ('time4f', 'time3f', 'time2f', 'lap4', 'lap3', 'lap2', 'lap1')
+
+# parse_ck_bytes が返す列と dtype
+COLUMNS = {
+    'ketto': np.int64, 'date': np.int32, 'hhmm': np.int16,
+    'loc': np.uint8, 'kind': np.uint8,
+    **{c: np.uint16 for c in TIME_COLUMNS},
+}
+
+# 4F タイムレベル閾値 (秒, 以下なら上位レベル) — web TIME_LEVEL_THRESHOLDS と同値
+TIME_LEVEL_THRESHOLDS = {
+    (0, KIND_HILL): (53.0, 54.5, 56.0, 58.0),   # 美浦坂路 (2023-10 改修後)
+    (1, KIND_HILL): (52.0, 53.5, 55.5, 58.0),   # 栗東坂路
+    (0, KIND_WOOD): (51.0, 52.2, 53.5, 55.5),   # 美浦コース
+    (1, KIND_WOOD): (51.0, 52.2, 53.5, 55.5),   # 栗東コース
+}
+
+
+# =============================================================================
+# バイト行列
+# =============================================================================
+
+def _record_matrix(data: bytes, record_len: int) -> np.ndarray:
+    """ファイル内容 → (n, record_len) uint8 行列
+
+    全行が record_len + CRLF ならそのまま reshape (コピーなし)。 末尾改行欠け・
+    空行などが混じるファイルは行分割して長さの合う行だけを使う。
+    """
+    stride = record_len + 2
+    buf = np.frombuffer(data, dtype=np.uint8)
+    if len(data) % stride == 0:
+        mat = buf.reshape(-1, stride)
+        if (mat[:, record_len] == 0x0D).all() and (mat[:, record_len + 1] == 0x0A).all():
+            return mat[:, :record_len]
+    lines = [ln for ln in data.splitlines() if len(ln) == record_len]
+    if not lines:
+        return np.zeros((0, record_len), dtype=np.uint8)
+    return np.frombuffer(b''.join(lines), dtype=np.uint8).reshape(-1, record_len)
+
+
+def _digits(mat: np.ndarray, start: int, length: int) -> tuple:
+    """数字フィールド → (値 int64, 有効フラグ)。 空白は 0 扱い、 全空白・非数字は無効。"""
+    block = mat[:, start:start + length].astype(np.int64)
+    space = block == 0x20
+    digit = (block >= 0x30) & (block <= 0x39)
+    valid = (digit | space).all(axis=1) & digit.any(axis=1)
+    vals = np.where(digit, block - 0x30, 0)
+    weights = 10 ** np.arange(length - 1, -1, -1, dtype=np.int64)
+    return vals @ weights, valid
+
+
+# =============================================================================
+# パース
+# =============================================================================
+
+def parse_ck_bytes(data: bytes, kind: int) -> Dict[str, np.ndarray]:
+    """CK_DATA ファイル内容 → {列名: ndarray}
+
+    場所コードが '0'/'1' 以外、 日付・時刻・KettoNum が数字でないレコードは除外。
+    タイム・ラップが読めない場合は 0 (= 欠損)。
+    """
+    mat = _record_matrix(data, _RECORD_LEN[kind])
+    loc_byte = mat[:, 0]
+    date, date_ok = _digits(mat, 1, 8)
+    hhmm, hhmm_ok = _digits(mat, 9, 4)
+    ketto, ketto_ok = _digits(mat, 13, 10)
+    keep = ((loc_byte == 0x30) | (loc_byte == 0x31)) & date_ok & hhmm_ok & ketto_ok
+    keep &= (date >= 19000101) & (ketto > 0)
+
+    out = {
+        'ketto': ketto[keep].astype(np.int64),
+        'date': date[keep].astype(np.int32),
+        'hhmm': hhmm[keep].astype(np.int16),
+        'loc': (loc_byte[keep] - 0x30).astype(np.uint8),
+        'kind': np.full(int(keep.sum()), kind, dtype=np.uint8),
+    }
+    fields = _TIME_FIELDS[kind]
+    for col in TIME_COLUMNS:
+        if col in fields:
+            vals, ok = _digits(mat, *fields[col])
+            out[col] = np.where(ok, vals, 0)[keep].astype(np.uint16)
+        else:
+            out[col] = np.zeros(len(out['ketto']), dtype=np.uint16)
+    return out
+
+
+def file_kind(path: Path) -> Optional[int]:
+    """HC*/WC* → KIND_HILL / KIND_WOOD (それ以外は None)"""
+    return _FILE_PREFIX.get(Path(path).name[:2].upper())
+
+
+def parse_ck_file(path: Path) -> Dict[str, np.ndarray]:
+    kind = file_kind(path)
+    if kind is None:
+        raise ValueError(f"not a CK_DATA file: {path}")
+    return parse_ck_bytes(Path(path).read_bytes(), kind)
+
+
+def empty_columns() -> Dict[str, np.ndarray]:
+    return {c: np.zeros(0, dtype=dt) for c, dt in COLUMNS.items()}
+
+
+def concat_columns(parts: Iterable[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    parts = list(parts)
+    if not parts:
+        return empty_columns()
+    return {c: np.concatenate([p[c] for p in parts]).astype(dt, copy=False)
+            for c, dt in COLUMNS.items()}
+
+
+# =============================================================================
+# 判定 (web calculateTimeLevel / calculateLapRank の配列版)
+# =============================================================================
+
+def time_levels(time4f: np.ndarray, loc: np.ndarray, kind: np.ndarray) -> np.ndarray:
+    """4F タイム (0.1秒単位) → 5(最高)〜1(軽め), 0 = タイム無効"""
+    time4f = np.asarray(time4f)
+    out = np.zeros(time4f.shape, dtype=np.int8)
+    for (lc, kd), th in TIME_LEVEL_THRESHOLDS.items():
+        m = (np.asarray(loc) == lc) & (np.asarray(kind) == kd) & (time4f > 0)
+        if not m.any():
+            continue
+        # 閾値は「以下」判定なので 0.1 秒単位の整数に直して比較
+        edges = np.array([round(t * 10) for t in th])
+        out[m] = 5 - np.searchsorted(edges, time4f[m], side='left')
+    return out
+
+
+def lap_ranks(lap2: np.ndarray, lap1: np.ndarray, time4f: np.ndarray,
+              loc: np.ndarray, kind: np.ndarray) -> np.ndarray:
+    """ラップ (0.1秒単位) → lapRank 文字列配列 ('' = Lap1/Lap2 欠損)
+
+    S: 2F 連続 11 秒台以下 / A: 終い 11 秒台以下 / B: 12 秒台キープ /
+    C: 終い 12 秒台 / D: それ以外。 SS = S + 好タイム (レベル4以上) + 減速なし。
+    末尾は Lap2 と Lap1 の比較 ('+' 加速, '=' 同タイム, '-' 減速)。
+    """
+    l2 = np.asarray(lap2, dtype=np.int32)
+    l1 = np.asarray(lap1, dtype=np.int32)
+    base = np.select(
+        [(l2 < 120) & (l1 < 120), l1 < 120, (l2 < 130) & (l1 < 130), l1 < 130],
+        ['S', 'A', 'B', 'C'], default='D')
+    accel = np.select([l2 > l1, l2 < l1], ['+', '-'], default='=')
+    ranks = np.char.add(base, accel)
+    good = time_levels(time4f, loc, kind) >= 4
+    ranks = np.where((base == 'S') & good & (accel != '-'), 'SS', ranks)
+    return np.where((l2 > 0) & (l1 > 0), ranks, '')
+
+
+# =============================================================================
+# スキャン
+# =============================================================================
+
+def get_ck_files(years: Optional[List[int]] = None) -> List[Path]:
+    """CK_DATA/{YYYY}/{YYYYMM}/{HC,WC}*.DAT (パス順)"""
+    root = jv_ck_data_path()
+    if not root.exists():
+        return []
+    files: List[Path] = []
+    for year_dir in sorted(root.iterdir()):
+        if not (year_dir.is_dir() and year_dir.name.isdigit()):
+            continue
+        if years and int(year_dir.name) not in years:
+            continue
+        for f in sorted(year_dir.glob('*/*.DAT')):
+            if file_kind(f) is not None:
+                files.append(f)
+    return files
@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+JRA-VAN 固定長レコードのバイトオフセットインデックス
+
+SU*.DAT (SE) / SR*.DAT (RA) / UM*.DAT (UM) の各ファイルについて
+「キー → レコード番号」を永続化し、1日分・期間分のレコードだけを
+seek して読めるようにする。
+
+  SE / SR: キー = 16桁 race_id (先頭8桁が開催日)
+  UM:      キー = ketto_num
+
+インデックスはファイルの (size, mtime) で無効化され、新規・更新された
+DATファイルだけヘッダ部 (数十バイト) を走査して再構築する。
+
+保存先: data3/indexes/jv_{se,sr,um}_record_index.json
+
+Usage:
+    from core.jravan import record_index
+    for data in record_index.read_records('SE', dates=['2026-02-08']):
+        rec = se_parser.parse_record(data)
+"""
+
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ..config import indexes_dir, jv_se_data_path, jv_sr_data_path, jv_um_data_path
+from ..constants import SE_RECORD_LEN, SR_RECORD_LEN, UM_RECORD_LEN
+
+
+INDEX_VERSION = 1
+
+
+def _ascii(data: bytes, start: int, length: int) -> str:
+    return data[start:start + length].decode('ascii', errors='replace').strip()
+
+
+def _se_key(record: bytes) -> Optional[str]:
+    """SE/RA 共通: Year@11 MonthDay@15 Venue@19 Kai@21 Nichi@23 R@25 → race_id"""
+    head = _ascii(record, 11, 16)
+    if len(head) != 16 or not head.isdigit():
+        return None
+    return head
+
+
+def _um_key(record: bytes) -> Optional[str]:
+    ketto = _ascii(record, 11, 10)
+    return ketto or None
+
+
+@dataclass(frozen=True)
+class RecordKind:
+    """インデックス対象のレコード種別"""
+    name: str
+    record_len: int
+    record_type: bytes
+    pattern: str
+    root: Callable[[], Path]
+    key_fn: Callable[[bytes], Optional[str]]
+    by_year: bool = True  # root/{year}/ 配下に分かれているか
+
+
+KINDS: Dict[str, RecordKind] = {
+    'SE': RecordKind('SE', SE_RECORD_LEN, b'SE', 'SU*.DAT', jv_se_data_path, _se_key),
+    'SR': RecordKind('SR', SR_RECORD_LEN, b'RA', 'SR*.DAT', jv_sr_data_path, _se_key),
+    'UM': RecordKind('UM', UM_RECORD_LEN, b'UM', 'UM*.DAT', jv_um_data_path, _um_key),
+}
+
+
+def _index_path(kind: RecordKind) -> Path:
+    return indexes_dir() / f"jv_{kind.name.lower()}_record_index.json"
+
+
+def _to_runs(nums: List[int]) -> List[int]:
+    """[3,4,5,9] → [3,3, 9,1] (start, count の平坦リスト)"""
+    runs: List[int] = []
+    for n in nums:
+        if runs and runs[-2] + runs[-1] == n:
+            runs[-1] += 1
+        else:
+            runs.extend((n, 1))
+    return runs
+
+
+def _from_runs(runs: List[int]) -> Iterator[int]:
+    for i in range(0, len(runs), 2):
+        yield from range(runs[i], runs[i] + runs[i + 1])
+
+
+def _scan_file_keys(path: Path, kind: RecordKind) -> Dict[str, List[int]]:
+    """1ファイルのヘッダだけ読んでキー → ランレングス化レコード番号"""
+    keys: Dict[str, List[int]] = {}
+    data = path.read_bytes()
+    rl = kind.record_len
+    for i in range(len(data) // rl):
+        off = i * rl
+        if data[off:off + 2] != kind.record_type:
+            continue
+        key = kind.key_fn(data[off:off + 64])
+        if key is None:
+            continue
+        keys.setdefault(key, []).append(i)
+    return {k: _to_runs(v) for k, v in keys.items()}
+
+
+class RecordIndex:
+    """1種別分のオフセットインデックス (遅延ロード・差分更新)"""
+
+    def __init__(self, kind: str, path: Optional[Path] = None):
+        self.kind = KINDS[kind]
+        self.path = path or _index_path(self.kind)
+        self._files: Optional[Dict[str, dict]] = None
+        self._dirty = False
+
+    # --- 永続化 ---
+
+    def _load(self) -> Dict[str, dict]:
+        if self._files is None:
+            self._files = {}
+            if self.path.exists():
+                try:
+                    raw = json.loads(self.path.read_text(encoding='utf-8'))
+                    if raw.get('version') == INDEX_VERSION:
+                        self._files = raw.get('files', {})
+                except (json.JSONDecodeError, OSError):
+                    self._files = {}
+        return self._files
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix('.json.tmp')
+        payload = {'version': INDEX_VERSION, 'kind': self.kind.name,
+                   'record_len': self.kind.record_len, 'files': self._files}
+        tmp.write_text(json.dumps(payload, separators=(',', ':')), encoding='utf-8')
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+    # --- 更新 ---
+
+    def files_for_years(self, years: Optional[Iterable[int]] = None) -> List[Path]:
+        root = self.kind.root()
+        if not root.exists():
+            return []
+        if not self.kind.by_year or years is None:
+            dirs = sorted(d for d in root.iterdir() if d.is_dir() and d.name.isdigit())
+        else:
+            dirs = [root / str(y) for y in sorted(set(years))]
+        files: List[Path] = []
+        for d in dirs:
+            if d.exists():
+                files.extend(sorted(d.glob(self.kind.pattern)))
+        return files
+
+    def refresh(self, years: Optional[Iterable[int]] = None) -> int:
+        """新規/更新ファイルだけ再走査。 再走査したファイル数を返す。
+
+        years 指定時はその年ディレクトリ配下のみ対象 (他年のエントリは保持)。
+        """
+        files = self._load()
+        root = self.kind.root()
+        current = self.files_for_years(years)
+        seen = set()
+        rescanned = 0
+        for path in current:
+            rel = path.relative_to(root).as_posix()
+            seen.add(rel)
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entry = files.get(rel)
+            if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+                continue
+            try:
+                keys = _scan_file_keys(path, self.kind)
+            except OSError:
+                continue
+            files[rel] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'keys': keys}
+            rescanned += 1
+            self._dirty = True
+
+        # 削除されたファイル (対象範囲内のみ)
+        scope = {str(y) for y in years} if years is not None and self.kind.by_year else None
+        for rel in list(files):
+            if rel in seen:
+                continue
+            if scope is not None and rel.split('/', 1)[0] not in scope:
+                continue
+            del files[rel]
+            self._dirty = True
+
+        self.save()
+        return rescanned
+
+    # --- 参照 ---
+
+    def locate(
+        self, match: Callable[[str], bool], years: Optional[Iterable[int]] = None,
+    ) -> List[Tuple[Path, List[int]]]:
+        """match(key) が真のレコードの (ファイル, バイトオフセット昇順) リスト"""
+        root = self.kind.root()
+        scope = {str(y) for y in years} if years is not None and self.kind.by_year else None
+        out = []
+        for rel in sorted(self._load()):
+            if scope is not None and rel.split('/', 1)[0] not in scope:
+                continue
+            offsets = []
+            for key, runs in self._files[rel]['keys'].items():
+                if match(key):
+                    offsets.extend(n * self.kind.record_len for n in _from_runs(runs))
+            if offsets:
+                out.append((root / rel, sorted(offsets)))
+        return out
+
+    def read(
+        self, match: Callable[[str], bool], years: Optional[Iterable[int]] = None,
+    ) -> Iterator[bytes]:
+        """match(key) が真のレコードを seek して読む"""
+        rl = self.kind.record_len
+        for path, offsets in self.locate(match, years):
+            try:
+                with open(path, 'rb') as f:
+                    for off in offsets:
+                        f.seek(off)
+                        data = f.read(rl)
+                        if len(data) == rl:
+                            yield data
+            except OSError:
+                continue
+
+
+def _date_keys(dates: Iterable[str]) -> Tuple[set, set]:
+    """['2026-02-08'] → ({'20260208'}, {2026})"""
+    prefixes = {d.replace('-', '') for d in dates}
+    years = {int(p[:4]) for p in prefixes}
+    return prefixes, years
+
+
+def read_records(
+    kind: str,
+    dates: Optional[Iterable[str]] = None,
+    race_ids: Optional[Iterable[str]] = None,
+    keys: Optional[Iterable[str]] = None,
+    refresh: bool = True,
+) -> Iterator[bytes]:
+    """インデックス経由で該当レコードの生バイト列を返す
+
+    Args:
+        kind: 'SE' / 'SR' / 'UM'
+        dates: 開催日 (YYYY-MM-DD) — SE/SR のみ
+        race_ids: 16桁 race_id — SE/SR のみ
+        keys: 生キー (UM なら ketto_num)
+        refresh: 読む前に新規/更新DATファイルを取り込む
+    """
+    idx = RecordIndex(kind)
+    years: Optional[set] = None
+    conds: List[Callable[[str], bool]] = []
+
+    if dates is not None:
+        prefixes, years = _date_keys(dates)
+        conds.append(lambda k: k[:8] in prefixes)
+    if race_ids is not None:
+        rid_set = set(race_ids)
+        years = (years or set()) | {int(r[:4]) for r in rid_set}
+        conds.append(lambda k: k in rid_set)
+    if keys is not None:
+        key_set = set(keys)
+        conds.append(lambda k: k in key_set)
+
+    if not idx.kind.by_year or not years:
+        years = None
+    if refresh:
+        idx.refresh(years)
+
+    def match(k: str) -> bool:
+        return any(c(k) for c in conds) if conds else True
+
+    yield from idx.read(match, years)
@@ -16,6 +16,7 @@ from typing import Dict, Generator, List, Optional
 from ..config import jv_se_data_path
 from ..constants import SE_RECORD_LEN, SEX_CODES
 from . import race_id as rid
+from . import record_index
 
 
 def _decode(data: bytes, start: int, length: int) -> str:
@@ -262,6 +263,24 @@ def scan(
             yield record
 
 
+def scan_dates(
+    dates: List[str],
+    min_finish: int = 0,
+) -> Generator[Dict, None, None]:
+    """指定開催日 (YYYY-MM-DD) のSEレコードだけをオフセットインデックス経由で読む
+
+    年単位の scan() と違い、該当レコードだけ seek して読む。
+    インデックス (jv_se_record_index.json) は新規/更新DATを検知して自動更新。
+    """
+    for data in record_index.read_records('SE', dates=dates):
+        record = parse_record(data)
+        if record is None:
+            continue
+        if min_finish > 0 and record['finish_position'] != min_finish:
+            continue
+        yield record
+
+
 def count_records(years: List[int]) -> int:
     """レコード総数を概算"""
     total = 0
@@ -16,6 +16,7 @@ from typing import Dict, List, Optional
 from ..config import jv_se_data_path  # SR_DATAもSE_DATA配下にある
 from ..constants import SR_RECORD_LEN, VENUE_CODES, TRACK_TYPES, BABA_CODES, GRADE_CODES
 from . import race_id as rid
+from . import record_index
 
 
 @dataclass
@@ -375,3 +376,13 @@ def scan(years: List[int]) -> List[SrRecord]:
             i += 1
 
     return records
+
+
+def scan_dates(dates: List[str]) -> List[SrRecord]:
+    """指定開催日 (YYYY-MM-DD) のSRレコードだけをオフセットインデックス経由で読む"""
+    records = []
+    for data in record_index.read_records('SR', dates=dates):
+        result = parse_record(data)
+        if result:
+            records.append(result)
+    return records
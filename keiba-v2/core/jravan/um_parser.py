@@ -14,6 +14,7 @@ from typing import Dict, List, Optional
 
 from ..config import jv_um_data_path
 from ..constants import UM_RECORD_LEN, SEX_CODES, TOZAI_CODES
+from . import record_index
 
 
 def _decode(data: bytes, start: int, length: int) -> str:
@@ -235,8 +236,29 @@ def build_name_index(recent_n: int = 20) -> Dict[str, str]:
 
 
 def find_by_id(horse_id: str) -> Optional[HorseRecord]:
-    """馬IDで検索"""
+    """馬IDで検索 (最新ファイル優先)
+
+    オフセットインデックス (jv_um_record_index.json) があれば該当レコードへ直接 seek、
+    無効なら従来どおり全ファイルを走査する。
+    """
     horse_id = horse_id.zfill(10)
+    try:
+        idx = record_index.RecordIndex('UM')
+        idx.refresh()
+        located = idx.locate(lambda k: k == horse_id)
+    except OSError:
+        located = None
+    if located:
+        path, offsets = located[-1]  # get_um_files() と同じく最新ファイルを優先
+        try:
+            with open(path, 'rb') as f:
+                f.seek(offsets[0])
+                return parse_record(f.read(UM_RECORD_LEN))
+        except OSError:
+            pass
+    elif located is not None:
+        return None
+
     for um_file in get_um_files(0):  # 全ファイル検索
         try:
             data = um_file.read_bytes()
@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+馬名・騎手名・調教師名の正規化 n-gram 検索インデックス
+
+horse_name_index.json / trainer_kb_index.json は完全一致の dict で、
+カタカナ/ひらがな・全角/半角・長音の揺れ (「ディープインパクト」 vs 「ﾃﾞｨｰﾌﾟｲﾝﾊﾟｸﾄ」)
+は引けず、 調教師名の前方一致は全件線形走査だった。
+
+キー:
+  norm_key  — NFKC (全角/半角統一) + 小文字化 + ひらがな→カタカナ + 長音記号統一
+              + 空白・中点除去 + (地)(外)(父)(市) 接頭辞除去
+  loose_key — norm_key から長音を落とし、 小書き仮名→大書き、 ヴ→ブ 等を寄せたもの
+              (表記揺れに強い代わりに衝突しうる。 完全一致で引けないときの第二候補)
+
+検索:
+  exact(q)   — norm_key 一致 → 無ければ loose_key 一致 (loose_key 昇順配列の二分探索)
+               strict=True で norm_key 一致のみ
+  prefix(q)  — loose_key の前方一致 (ソート済み配列の二分探索)
+  fuzzy(q)   — loose_key の文字 bigram postings で候補を集め Dice 係数で順位付け
+  search(q)  — exact → prefix → fuzzy の順にカスケード
+
+保存形式 (.bin): マジック + JSON メタ + 長さ付きセクション
+  (名前 / 値 / norm_key / loose_key を \\0 区切り, ソート順・postings は uint32 配列)。
+  ロードは split と bigram→位置 の dict 構築だけで、 正規化の再計算やソートはしない。
+
+提供:
+    norm_key(s) / loose_key(s)
+    NameIndex.build(pairs) / NameIndex.load(path) / .save(path)
+    NameIndex.exact / prefix / fuzzy / search
+    index_path(kind)            — data3/indexes/{kind}_name_search.bin
+    load_name_index(kind)       — 無ければ None (呼び出し側は従来の dict にフォールバック)
+"""
+
+import bisect
+import json
+import re
+import sys
+import unicodedata
+from array import array
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+MAGIC = b'KNIX1\n'
+KINDS = ('horse', 'trainer', 'jockey')
+
+_PREFIX_RE = re.compile(r'^(?:[\(\[](?:地|外|父|市)[\)\]])+')
+_DASHES = str.maketrans({c: 'ー' for c in '‐‑‒–—―−-~〜～ｰ'})
+_DROP_RE = re.compile(r'[\s・･.．·]+')
+_SMALL = str.maketrans('ァィゥェォッャュョヮヵヶ', 'アイウエオツヤユヨワカケ')
+_LOOSE = str.maketrans({'ヴ': 'ブ', 'ヂ': 'ジ', 'ヅ': 'ズ', 'ヲ': 'オ', 'ー': None})
+
+
+def _hira_to_kata(s: str) -> str:
+    return ''.join(chr(ord(c) + 0x60) if 'ぁ' <= c <= 'ゖ' else c for c in s)
+
+
+def norm_key(s: str) -> str:
+    """表記揺れ (全角/半角・かな種別・長音記号・空白) を吸収した検索キー"""
+    if not s:
+        return ''
+    s = unicodedata.normalize('NFKC', s).lower()
+    s = _PREFIX_RE.sub('', s.strip())
+    s = _hira_to_kata(s).translate(_DASHES)
+    return _DROP_RE.sub('', s)
+
+
+def loose_key(s: str) -> str:
+    """norm_key をさらに緩めたキー (長音除去・小書き仮名・ヴ等の統一)"""
+    return norm_key(s).translate(_SMALL).translate(_LOOSE)
+
+
+def _grams(key: str) -> set:
+    """文字 bigram (両端に境界記号を付けるので 1 文字キーも 2 gram 持つ)"""
+    k = f'\x02{key}\x03'
+    return {k[i:i + 2] for i in range(len(k) - 1)}
+
+
+def _u32(values) -> bytes:
+    a = array('I', values)
+    if sys.byteorder != 'little':
+        a.byteswap()
+    return a.tobytes()
+
+
+def _from_u32(b: bytes) -> array:
+    a = array('I')
+    a.frombytes(b)
+    if sys.byteorder != 'little':
+        a.byteswap()
+    return a
+
+
+class NameIndex:
+    """名前 → 値 (ketto_num / 調教師コード等) の検索インデックス。 同名は複数値を保持する。"""
+
+    def __init__(self, names: List[str], values: List[str], norms: List[str],
+                 looses: List[str], order: array, grams: List[str],
+                 gram_offsets: array, postings: array, meta: Optional[dict] = None):
+        self.names = names
+        self.values = values
+        self.norms = norms
+        self.looses = looses
+        self.meta = meta or {}
+        self._order = order                          # loose_key 昇順の id 並び
+        self._sorted_loose = [looses[i] for i in order]
+        self._gram_id = {g: i for i, g in enumerate(grams)}
+        self._gram_offsets = gram_offsets
+        self._postings = postings
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    # ---- 構築 / 保存 ------------------------------------------------------
+
+    @classmethod
+    def build(cls, pairs: Iterable[Tuple[str, str]], meta: Optional[dict] = None) -> 'NameIndex':
+        """(名前, 値) 列から構築。 空の名前は除外、 (名前, 値) の重複は 1 件に。"""
+        seen = set()
+        names, values = [], []
+        for name, value in pairs:
+            if not name or (name, value) in seen:
+                continue
+            seen.add((name, value))
+            names.append(name)
+            values.append(str(value))
+        norms = [norm_key(n) for n in names]
+        looses = [k.translate(_SMALL).translate(_LOOSE) for k in norms]
+        order = array('I', sorted(range(len(names)), key=lambda i: (looses[i], i)))
+        post: Dict[str, List[int]] = defaultdict(list)
+        for i, lk in enumerate(looses):
+            for g in _grams(lk):
+                post[g].append(i)
+        grams = sorted(post)
+        offsets = array('I', [0])
+        flat = array('I')
+        for g in grams:
+            flat.extend(post[g])
+            offsets.append(len(flat))
+        return cls(names, values, norms, looses, order, grams, offsets, flat, meta)
+
+    def save(self, path: Path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        grams = sorted(self._gram_id, key=self._gram_id.get)
+        sections = [
+            '\0'.join(self.names).encode('utf-8'),
+            '\0'.join(self.values).encode('utf-8'),
+            '\0'.join(self.norms).encode('utf-8'),
+            '\0'.join(self.looses).encode('utf-8'),
+            '\0'.join(grams).encode('utf-8'),
+            _u32(self._order),
+            _u32(self._gram_offsets),
+            _u32(self._postings),
+        ]
+        meta = dict(self.meta, n=len(self.names), n_grams=len(grams))
+        head = json.dumps(meta, ensure_ascii=False).encode('utf-8')
+        tmp = path.with_name(path.name + '.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(MAGIC)
+            for blob in [head] + sections:
+                f.write(len(blob).to_bytes(8, 'little'))
+                f.write(blob)
+        tmp.replace(path)
+        return path
+
+    @classmethod
+    def load(cls, path: Path) -> 'NameIndex':
+        data = Path(path).read_bytes()
+        if not data.startswith(MAGIC):
+            raise ValueError(f"not a name search index: {path}")
+        pos = len(MAGIC)
+        blobs = []
+        while pos < len(data):
+            n = int.from_bytes(data[pos:pos + 8], 'little')
+            blobs.append(data[pos + 8:pos + 8 + n])
+            pos += 8 + n
+        if len(blobs) != 9:
+            raise ValueError(f"broken name search index: {path}")
+        meta = json.loads(blobs[0])
+
+        def strs(b: bytes) -> List[str]:
+            return b.decode('utf-8').split('\0') if meta.get('n') else []
+
+        grams = blobs[5].decode('utf-8').split('\0') if meta.get('n_grams') else []
+        return cls(strs(blobs[1]), strs(blobs[2]), strs(blobs[3]), strs(blobs[4]),
+                   _from_u32(blobs[6]), grams, _from_u32(blobs[7]), _from_u32(blobs[8]),
+                   meta)
+
+    # ---- 検索 -------------------------------------------------------------
+
+    def _hits(self, ids: Iterable[int]) -> List[Tuple[str, str]]:
+        return [(self.names[i], self.values[i]) for i in ids]
+
+    def exact(self, query: str, strict: bool = False) -> List[Tuple[str, str]]:
+        """[(名前, 値), ...] (norm_key 一致を優先、 無ければ loose_key 一致)
+
+        norm_key が一致すれば loose_key も一致するので、 loose_key の等値範囲を
+        二分探索で取り出してから norm_key で絞る (dict を持たずロードを軽くする)。
+        strict=True なら loose_key だけの一致 (ビッグアサー → ビッグアーサー 等) は返さない
+        (ID 解決のように取り違えが許されない用途)。
+        """
+        nq = norm_key(query)
+        lq = nq.translate(_SMALL).translate(_LOOSE)
+        if not lq:
+            return []
+        lo = bisect.bisect_left(self._sorted_loose, lq)
+        hi = bisect.bisect_right(self._sorted_loose, lq, lo)
+        ids = [self._order[j] for j in range(lo, hi)]
+        hits = [i for i in ids if self.norms[i] == nq]
+        return self._hits(hits or ([] if strict else ids))
+
+    def prefix(self, query: str, limit: int = 50) -> List[Tuple[str, str]]:
+        """loose_key の前方一致 (キー昇順, 最大 limit 件)"""
+        q = loose_key(query)
+        if not q:
+            return []
+        lo = bisect.bisect_left(self._sorted_loose, q)
+        out = []
+        for j in range(lo, min(lo + limit, len(self._order))):
+            if not self._sorted_loose[j].startswith(q):
+                break
+            out.append(self._order[j])
+        return self._hits(out)
+
+    def _posting(self, gram: str):
+        g = self._gram_id.get(gram)
+        if g is None:
+            return ()
+        return self._postings[self._gram_offsets[g]:self._gram_offsets[g + 1]]
+
+    def fuzzy(self, query: str, limit: int = 10,
+              min_score: float = 0.5) -> List[Tuple[str, str, float]]:
+        """bigram Dice 係数で近い名前 [(名前, 値, score), ...] (score 降順)"""
+        q = loose_key(query)
+        if not q:
+            return []
+        qg = _grams(q)
+        counts: Dict[int, int] = defaultdict(int)
+        for g in qg:
+            for i in self._posting(g):
+                counts[i] += 1
+        scored = []
+        nq = len(qg)
+        for i, shared in counts.items():
+            # loose_key の bigram 数 = 文字数 + 1 (境界込み, 重複 gram は稀なので近似)
+            score = 2.0 * shared / (nq + len(self.looses[i]) + 1)
+            if score >= min_score:
+                scored.append((-score, self.looses[i], i))
+        scored.sort()
+        return [(self.names[i], self.values[i], round(-s, 4)) for s, _, i in scored[:limit]]
+
+    def search(self, query: str, limit: int = 10,
+               min_score: float = 0.5) -> List[Tuple[str, str]]:
+        """exact → prefix → fuzzy の順に最初にヒットした段の結果を返す"""
+        hits = self.exact(query)
+        if hits:
+            return hits[:limit]
+        hits = self.prefix(query, limit=limit)
+        if hits:
+            return hits
+        return [(n, v) for n, v, _ in self.fuzzy(query, limit=limit, min_score=min_score)]
+
+
+# =====================================================================
+# 保存場所
+# =====================================================================
+
+def index_path(kind: str) -> Path:
+    from core import config
+    return config.indexes_dir() / f"{kind}_name_search.bin"
+
+
+def load_name_index(kind: str) -> Optional[NameIndex]:
+    """data3/indexes/{kind}_name_search.bin を読む (無い/壊れている場合は None)"""
+    path = index_path(kind)
+    if not path.exists():
+        return None
+    try:
+        return NameIndex.load(path)
+    except (OSError, ValueError) as e:
+        print(f"WARN: {path.name} unreadable: {e}")
+        return None
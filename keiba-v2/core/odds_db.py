@@ -486,6 +486,47 @@ def batch_get_place_odds(
     return result
 
 
+def batch_get_latest_odds_times(
+    race_codes: List[str],
+) -> Dict[str, Dict[str, Optional[str]]]:
+    """複数レースの時系列オッズ最終スナップショット時刻を一括取得 (vb_refresh 差分検出用)
+
+    GROUP BY + MAX のみ (オッズ本体の行は読まない) なので、 毎分叩いても軽い。
+    時系列が無いレースは値 None (呼び出し側で「変化不明」扱い)。
+
+    Returns:
+        {race_code: {'win': 'MMDDhhmm' | None, 'place': 'MMDDhhmm' | None}}
+    """
+    from core.db import get_connection
+
+    if not race_codes:
+        return {}
+
+    result = {rc: {'win': None, 'place': None} for rc in race_codes}
+
+    batch_size = 500
+    for i in range(0, len(race_codes), batch_size):
+        batch = race_codes[i:i + batch_size]
+        placeholders = ','.join(['%s'] * len(batch))
+
+        with get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            for key, table in (('win', 'odds1_tansho_jikeiretsu'),
+                               ('place', 'odds1_fukusho_jikeiretsu')):
+                cursor.execute(
+                    "SELECT RACE_CODE, MAX(HAPPYO_TSUKIHI_JIFUN) as max_time "
+                    f"FROM {table} WHERE RACE_CODE IN ({placeholders}) "
+                    "GROUP BY RACE_CODE",
+                    tuple(batch),
+                )
+                for r in cursor.fetchall():
+                    if r['RACE_CODE'] in result and r['max_time']:
+                        result[r['RACE_CODE']][key] = str(r['max_time'])
+            cursor.close()
+
+    return result
+
+
 def is_db_available() -> bool:
     """mykeibadb DBが接続可能かチェック"""
     try:
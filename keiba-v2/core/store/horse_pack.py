@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+馬マスタのシャード pack 形式
+
+data3/masters/horses/{ketto_num}.json (1馬1ファイル, 数十万ファイル) の代替として、
+ketto_num 先頭 SHARD_PREFIX_LEN 桁 (= 生年) ごとに 1 ファイルへまとめる。
+
+  data3/masters/horses_pack/{prefix}.jsonl     — 1 行 1 馬 (compact JSON, ketto_num 昇順)
+  data3/masters/horses_pack/{prefix}.idx.json  — {ketto_num: [byte offset, byte length]}
+
+1 頭の参照は idx を引いて seek + read するだけ (シャード全体はパースしない)。
+シャードは tmp 書き込み → os.replace で置き換えるので、読み手が途中状態を見ることはない。
+
+提供:
+    SHARD_PREFIX_LEN / shard_key(ketto_num)
+    pack_dir()                               — 既定の出力先
+    encode_record(d) / content_hash(data)    — 行の直列化 / 差分判定用ハッシュ
+    write_shard(dir, key, lines)             — {ketto_num: 行 bytes} → .jsonl + .idx.json
+    HorsePack(dir)                           — 読み手 (get / keys / iter_records)
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+SHARD_PREFIX_LEN = 4
+PACK_SUFFIX = '.jsonl'
+IDX_SUFFIX = '.idx.json'
+
+
+def shard_key(ketto_num: str) -> str:
+    return ketto_num[:SHARD_PREFIX_LEN]
+
+
+def pack_dir() -> Path:
+    from core import config
+    return config.masters_dir() / 'horses_pack'
+
+
+def encode_record(d: dict) -> bytes:
+    """1 馬分の行 (改行なし)"""
+    return json.dumps(d, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+def _replace_bytes(path: Path, data: bytes) -> None:
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def write_shard(out_dir: Path, key: str, lines: Dict[str, bytes]) -> Tuple[Path, Path]:
+    """シャード 1 つを書く。 lines は {ketto_num: encode_record(...)}。"""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    buf = bytearray()
+    index = {}
+    for ketto_num in sorted(lines):
+        line = lines[ketto_num]
+        index[ketto_num] = [len(buf), len(line)]
+        buf += line
+        buf += b'\n'
+    pack_path = out_dir / f'{key}{PACK_SUFFIX}'
+    idx_path = out_dir / f'{key}{IDX_SUFFIX}'
+    # pack → idx の順で置換 (idx が先に新しくなると旧 pack の範囲外を指しうる)
+    _replace_bytes(pack_path, bytes(buf))
+    _replace_bytes(idx_path, json.dumps(index, separators=(',', ':')).encode('utf-8'))
+    return pack_path, idx_path
+
+
+class HorsePack:
+    """シャード pack の読み手 (idx はシャードごとに遅延ロード)"""
+
+    def __init__(self, root: Optional[Path] = None):
+        self.root = Path(root) if root else pack_dir()
+        self._idx: Dict[str, Dict[str, List[int]]] = {}
+
+    def shard_keys(self) -> List[str]:
+        if not self.root.exists():
+            return []
+        return sorted(p.name[:-len(IDX_SUFFIX)] for p in self.root.glob(f'*{IDX_SUFFIX}'))
+
+    def _index(self, key: str) -> Dict[str, List[int]]:
+        idx = self._idx.get(key)
+        if idx is None:
+            path = self.root / f'{key}{IDX_SUFFIX}'
+            idx = json.loads(path.read_bytes()) if path.exists() else {}
+            self._idx[key] = idx
+        return idx
+
+    def __contains__(self, ketto_num: str) -> bool:
+        return ketto_num in self._index(shard_key(ketto_num))
+
+    def get(self, ketto_num: str) -> Optional[dict]:
+        key = shard_key(ketto_num)
+        loc = self._index(key).get(ketto_num)
+        if loc is None:
+            return None
+        with open(self.root / f'{key}{PACK_SUFFIX}', 'rb') as f:
+            f.seek(loc[0])
+            return json.loads(f.read(loc[1]))
+
+    def keys(self) -> Iterator[str]:
+        for key in self.shard_keys():
+            yield from sorted(self._index(key))
+
+    def iter_records(self) -> Iterator[dict]:
+        """全馬を ketto_num 順に (シャードは 1 回の読み込みで行分割)"""
+        for key in self.shard_keys():
+            path = self.root / f'{key}{PACK_SUFFIX}'
+            if not path.exists():
+                continue
+            for line in path.read_bytes().splitlines():
+                if line:
+                    yield json.loads(line)
@@ -0,0 +1,355 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+CK_DATA 調教の列指向ストア (ketto_num × 日付)
+
+CK_DATA は 1 日 × 場所 × 坂路/ウッド ごとの固定長ファイルで、 「ある馬のレース前 30 日の
+調教」を引くには日付範囲の全ファイルを開いて全レコードを走査するしかなかった。
+ここでは ck_parser の列配列を (ketto_num, 日付, 時刻) 順に並べた 1 つの .npz に
+まとめ、 馬の範囲と日付窓を二分探索 (searchsorted) で切り出す。
+
+  data3/indexes/ck_training/parts/{YYYYMM}.npz — 月ごとのパース済み列 (差分更新の単位)
+  data3/indexes/ck_training/_manifest.json      — 元ファイルの (size, mtime_ns)
+  data3/indexes/ck_training.npz                 — 全月を結合・ソートした本体
+
+再構築は (size, mtime_ns) が変わったファイルを含む月だけをパースし直し、
+本体は月パーツの結合 + ソートで作り直す (パースよりずっと安い)。
+
+列: ketto (int64) / day (int32, 1970-01-01 からの日数) / date (int32 YYYYMMDD) /
+    hhmm / loc (0=美浦, 1=栗東) / kind (0=坂路, 1=ウッド) /
+    time4f / time3f / time2f / lap4 / lap3 / lap2 / lap1 (0.1秒単位, 0=欠損)
+実在しない日付のレコード (20240230 等) は構築時に落とし、 件数を meta['bad_dates'] に残す。
+
+提供:
+    store_path() / parts_dir()
+    build_training_store(years=None, rebuild=False) — 差分更新して本体を書き出す
+    TrainingStore.load(path) / .save(path)
+    TrainingStore.window(ketto_num, race_date, days=30)   — 行範囲 (start, stop)
+    TrainingStore.workouts(ketto_num, race_date, days=30) — [{date, time4f, lapRank, ...}]
+    TrainingStore.window_features(ketto_num, race_date, days=30) — 窓内の集計
+    load_training_store()                                  — 無ければ None
+
+Usage:
+    from core.store.training_store import load_training_store
+    store = load_training_store()
+    rows = store.workouts('2019105283', '2025-01-05')          # 前日までの 30 日
+    feats = store.window_features('2019105283', '2025-01-05', days=14)
+"""
+
+import json
+import os
+from datetime import date as _date
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..jravan import ck_parser
+
+STORE_VERSION = 1
+
+_EPOCH = np.datetime64('1970-01-01', 'D')
+BAD_DAY = np.iinfo(np.int32).min        # 不正な日付 (from_columns で行ごと落とす)
+
+
+def store_path() -> Path:
+    from core import config
+    return config.indexes_dir() / 'ck_training.npz'
+
+
+def parts_dir() -> Path:
+    from core import config
+    return config.indexes_dir() / 'ck_training' / 'parts'
+
+
+def _manifest_path() -> Path:
+    return parts_dir().parent / '_manifest.json'
+
+
+def _ymd_to_day(ymd: np.ndarray) -> np.ndarray:
+    """YYYYMMDD (int) → 1970-01-01 からの日数。 ファイル内の日付は数種類なので unique で変換。
+
+    実在しない日付 (20240230 等、 壊れたレコード) は BAD_DAY にする (例外で構築を止めない)。
+    """
+    ymd = np.asarray(ymd, dtype=np.int64)
+    if ymd.size == 0:
+        return np.zeros(0, dtype=np.int32)
+    uniq, inv = np.unique(ymd, return_inverse=True)
+    days = np.empty(len(uniq), dtype=np.int32)
+    for i, v in enumerate(uniq):
+        try:
+            days[i] = _date_to_day(f'{int(v):08d}')
+        except ValueError:
+            days[i] = BAD_DAY
+    return days[inv]
+
+
+def _date_to_day(d) -> int:
+    """'YYYY-MM-DD' / 'YYYYMMDD' / date → 日数 (不正な日付は ValueError)"""
+    if isinstance(d, _date):
+        s = d.isoformat()
+    else:
+        s = str(d).strip()
+        if len(s) == 8 and s.isdigit():
+            s = f'{s[:4]}-{s[4:6]}-{s[6:]}'
+    return int((np.datetime64(s, 'D') - _EPOCH).astype(np.int64))
+
+
+# =============================================================================
+# ストア本体
+# =============================================================================
+
+class TrainingStore:
+    """(ketto, day, hhmm) 昇順に並んだ調教レコード列"""
+
+    def __init__(self, cols: Dict[str, np.ndarray], meta: Optional[dict] = None):
+        self.cols = cols
+        self.meta = meta or {}
+        self.ketto = cols['ketto']
+        self.day = cols['day']
+
+    def __len__(self) -> int:
+        return len(self.ketto)
+
+    @classmethod
+    def from_columns(cls, cols: Dict[str, np.ndarray], meta: Optional[dict] = None) -> 'TrainingStore':
+        """ck_parser の列 (順不同) → ソート済みストア
+
+        不正な日付の行は落とし、 件数を meta['bad_dates'] に残す。
+        """
+        cols = dict(cols)
+        cols['day'] = _ymd_to_day(cols['date'])
+        bad = cols['day'] == BAD_DAY
+        n_bad = int(bad.sum())
+        if n_bad:
+            print(f"WARN: {n_bad:,} training records with invalid date dropped "
+                  f"(e.g. {int(cols['date'][bad][0])})")
+            cols = {c: a[~bad] for c, a in cols.items()}
+        meta = dict(meta or {}, bad_dates=n_bad)
+        order = np.lexsort((cols['hhmm'], cols['day'], cols['ketto']))
+        return cls({c: np.ascontiguousarray(a[order]) for c, a in cols.items()}, meta)
+
+    def save(self, path: Path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        meta = dict(self.meta, version=STORE_VERSION, n=len(self))
+        tmp = path.with_name(path.stem + '.tmp.npz')
+        np.savez(tmp, _meta=np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8),
+                 **self.cols)
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path: Path) -> 'TrainingStore':
+        with np.load(path) as z:
+            meta = json.loads(z['_meta'].tobytes()) if '_meta' in z.files else {}
+            cols = {k: z[k] for k in z.files if k != '_meta'}
+        if meta.get('version') != STORE_VERSION:
+            raise ValueError(f"unsupported training store version: {meta.get('version')}")
+        return cls(cols, meta)
+
+    # ---- 検索 -------------------------------------------------------------
+
+    def horse_range(self, ketto_num) -> Tuple[int, int]:
+        """1 頭分の行範囲 (start, stop)"""
+        try:
+            k = int(ketto_num)
+        except (TypeError, ValueError):
+            return (0, 0)
+        lo = int(np.searchsorted(self.ketto, k, side='left'))
+        hi = int(np.searchsorted(self.ketto, k, side='right'))
+        return lo, hi
+
+    def window(self, ketto_num, race_date, days: int = 30) -> Tuple[int, int]:
+        """race_date の days 日前 〜 前日 の行範囲 (当日の調教は含めない)"""
+        lo, hi = self.horse_range(ketto_num)
+        if lo == hi:
+            return (lo, lo)
+        end = _date_to_day(race_date)
+        horse_days = self.day[lo:hi]
+        start = lo + int(np.searchsorted(horse_days, end - days, side='left'))
+        stop = lo + int(np.searchsorted(horse_days, end, side='left'))
+        return start, stop
+
+    def workouts(self, ketto_num, race_date, days: int = 30) -> List[dict]:
+        """窓内の調教 (日付・時刻順)。 タイムは秒 (欠損は None)。"""
+        s, e = self.window(ketto_num, race_date, days)
+        if s == e:
+            return []
+        c = {k: v[s:e] for k, v in self.cols.items()}
+        levels = ck_parser.time_levels(c['time4f'], c['loc'], c['kind'])
+        ranks = ck_parser.lap_ranks(c['lap2'], c['lap1'], c['time4f'], c['loc'], c['kind'])
+        out = []
+        for i in range(e - s):
+            d = int(c['date'][i])
+            row = {
+                'date': f'{d // 10000:04d}-{d // 100 % 100:02d}-{d % 100:02d}',
+                'hhmm': f"{int(c['hhmm'][i]):04d}",
+                'location': ck_parser.LOCATION_NAMES.get(int(c['loc'][i]), ''),
+                'kind': 'hill' if c['kind'][i] == ck_parser.KIND_HILL else 'wood',
+            }
+            for t in ck_parser.TIME_COLUMNS:
+                v = int(c[t][i])
+                row[t] = v / 10 if v else None
+            row['timeLevel'] = int(levels[i])
+            row['lapRank'] = str(ranks[i])
+            out.append(row)
+        return out
+
+    def window_features(self, ketto_num, race_date, days: int = 30) -> dict:
+        """窓内の調教を集計した特徴量 (調教が無ければ本数 0 ・他は None)"""
+        s, e = self.window(ketto_num, race_date, days)
+        feats = {
+            'n_workouts': e - s, 'n_hill': 0, 'n_wood': 0,
+            'days_since_last': None, 'best_hill_4f': None, 'best_wood_4f': None,
+            'max_time_level': None, 'last_lap_rank': None, 'last_lap1': None,
+        }
+        if s == e:
+            return feats
+        c = {k: v[s:e] for k, v in self.cols.items()}
+        hill = c['kind'] == ck_parser.KIND_HILL
+        feats['n_hill'] = int(hill.sum())
+        feats['n_wood'] = int((~hill).sum())
+        feats['days_since_last'] = _date_to_day(race_date) - int(c['day'][-1])
+        for key, m in (('best_hill_4f', hill), ('best_wood_4f', ~hill)):
+            t = c['time4f'][m]
+            t = t[t > 0]
+            if t.size:
+                feats[key] = int(t.min()) / 10
+        levels = ck_parser.time_levels(c['time4f'], c['loc'], c['kind'])
+        if levels.max() > 0:
+            feats['max_time_level'] = int(levels.max())
+        # 最終追い切り = ラップが取れている最後の 1 本
+        timed = np.flatnonzero((c['lap1'] > 0) & (c['lap2'] > 0))
+        if timed.size:
+            j = int(timed[-1])
+            feats['last_lap_rank'] = str(ck_parser.lap_ranks(
+                c['lap2'][j:j + 1], c['lap1'][j:j + 1], c['time4f'][j:j + 1],
+                c['loc'][j:j + 1], c['kind'][j:j + 1])[0])
+            feats['last_lap1'] = int(c['lap1'][j]) / 10
+        return feats
+
+
+# =============================================================================
+# 差分構築
+# =============================================================================
+
+def _load_manifest() -> dict:
+    p = _manifest_path()
+    if p.exists():
+        try:
+            m = json.loads(p.read_text(encoding='utf-8'))
+            if m.get('version') == STORE_VERSION:
+                return m
+        except (json.JSONDecodeError, OSError):
+            pass
+    return {'version': STORE_VERSION, 'files': {}}
+
+
+def _save_manifest(manifest: dict) -> None:
+    p = _manifest_path()
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_suffix('.json.tmp')
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=1), encoding='utf-8')
+    os.replace(tmp, p)
+
+
+def _month_of(path: Path) -> str:
+    """CK_DATA/{YYYY}/{YYYYMM}/xx.DAT → 'YYYYMM'"""
+    return path.parent.name
+
+
+def _save_part(path: Path, cols: Dict[str, np.ndarray]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.stem + '.tmp.npz')
+    np.savez(tmp, **cols)
+    os.replace(tmp, path)
+
+
+def _load_part(path: Path) -> Dict[str, np.ndarray]:
+    with np.load(path) as z:
+        return {k: z[k] for k in z.files}
+
+
+def build_training_store(years: Optional[List[int]] = None, rebuild: bool = False,
+                         verbose: bool = True) -> dict:
+    """CK_DATA → 月パーツ (変更月のみ) → ck_training.npz
+
+    years を指定すると走査はその年のファイルに限るが、 他の年の既存パーツは残して
+    本体に含める (日々の更新は当年だけ走査すればよい)。
+    Returns: {'files', 'parsed_months', 'records', 'written'}
+    """
+    root = ck_parser.jv_ck_data_path()
+    pdir = parts_dir()
+    manifest = {'version': STORE_VERSION, 'files': {}} if rebuild else _load_manifest()
+    old_files: Dict[str, list] = manifest['files']
+
+    files = ck_parser.get_ck_files(years)
+    seen: Dict[str, list] = {}
+    by_month: Dict[str, List[Path]] = {}
+    for f in files:
+        st = f.stat()
+        rel = f.relative_to(root).as_posix()
+        seen[rel] = [st.st_size, st.st_mtime_ns]
+        by_month.setdefault(_month_of(f), []).append(f)
+
+    # 変更・追加・削除されたファイルを含む月 (走査対象年のみ)
+    scanned_years = {str(y) for y in years} if years else None
+    stale = set()
+    for rel, sig in seen.items():
+        if old_files.get(rel) != sig:
+            stale.add(rel.split('/')[1])
+    for rel in old_files:
+        if rel not in seen and (scanned_years is None or rel.split('/')[0] in scanned_years):
+            stale.add(rel.split('/')[1])
+    for month in by_month:
+        if not (pdir / f'{month}.npz').exists():
+            stale.add(month)
+
+    for month in sorted(stale):
+        part = pdir / f'{month}.npz'
+        month_files = by_month.get(month, [])
+        if not month_files:
+            if part.exists():
+                part.unlink()
+            continue
+        cols = ck_parser.concat_columns(ck_parser.parse_ck_file(f) for f in month_files)
+        _save_part(part, cols)
+        if verbose:
+            print(f"  [CK] {month}: {len(month_files)} files, {len(cols['ketto']):,} records")
+
+    new_files = {rel: sig for rel, sig in old_files.items()
+                 if scanned_years is not None and rel.split('/')[0] not in scanned_years}
+    new_files.update(seen)
+    manifest['files'] = new_files
+
+    out = store_path()
+    written = False
+    if stale or rebuild or not out.exists():
+        parts = sorted(pdir.glob('*.npz')) if pdir.exists() else []
+        cols = ck_parser.concat_columns(_load_part(p) for p in parts)
+        store = TrainingStore.from_columns(cols, meta={'months': len(parts)})
+        store.save(out)
+        written = True
+        n_records = len(store)
+    else:
+        n_records = int(TrainingStore.load(out).meta.get('n', 0))
+    _save_manifest(manifest)
+
+    if verbose:
+        print(f"  [CK] {len(files):,} files, {len(stale)} months parsed, "
+              f"{n_records:,} records{' (written)' if written else ' (unchanged)'}")
+    return {'files': len(files), 'parsed_months': len(stale),
+            'records': n_records, 'written': written}
+
+
+def load_training_store(path: Optional[Path] = None) -> Optional[TrainingStore]:
+    """ck_training.npz を読む (無い/壊れている場合は None)"""
+    path = Path(path) if path else store_path()
+    if not path.exists():
+        return None
+    try:
+        return TrainingStore.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"WARN: {path.name} unreadable: {e}")
+        return None
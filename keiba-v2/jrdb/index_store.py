@@ -0,0 +1,391 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+JRDBインデックスの列指向ストア
+
+build_jrdb_index が出力する {key: {field: value}} 形式のインデックスを、
+フィールドごとの型付き配列 + ソート済みキー配列として .npz に保存する。
+巨大な文字列キーJSONを丸ごとパースする代わりに、配列をそのまま読み込み、
+行 dict は参照された時点で組み立てる。
+
+  キー:   ソート済み ASCII バイト配列 (例: "2020100001_2024-01-06")
+          SED/KYI は ketto_num → 日付 の順に並ぶので prefix_items() で
+          1頭分の全レコードを二分探索で取り出せる
+  列:     bool / int (最小幅に縮小) / float64 / str (UTF-8連結+オフセット)
+          / json (型が混在する列・リスト値)。 None と「フィールド無し」は
+          状態配列で区別するため、元JSONと値・型とも完全に一致する
+
+ColumnarIndex は読み取り専用 Mapping なので、既存の index.get(key) /
+`index or {}` / items() といった利用側コードはそのまま動く。
+
+Usage:
+    from jrdb.index_store import load_jrdb_index
+    sed = load_jrdb_index('sed')          # .npz 優先、無ければ旧 .json
+    row = sed.get('2020100001_2024-01-06')
+    for key, row in sed.prefix_items('2020100001_'):
+        ...
+"""
+
+import json
+from collections.abc import Mapping
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+STORE_VERSION = 1
+
+# 値の状態
+_VALUE, _NONE, _ABSENT = 0, 1, 2
+
+_INT_DTYPES = (np.int8, np.int16, np.int32, np.int64)
+
+
+# =============================================================================
+# 列エンコード
+# =============================================================================
+
+@dataclass
+class _Column:
+    kind: str                      # 'none' / 'bool' / 'int' / 'float' / 'str' / 'json'
+    state: np.ndarray              # uint8 (n,)
+    data: np.ndarray               # 値配列 (str/json は UTF-8 連結バイト)
+    offsets: Optional[np.ndarray] = None  # str/json のみ int64 (n+1,)
+
+
+def _infer_kind(values: Sequence) -> str:
+    kinds = set()
+    for v in values:
+        if v is None:
+            continue
+        if isinstance(v, bool):
+            kinds.add('bool')
+        elif isinstance(v, int):
+            kinds.add('int' if -2**63 <= v < 2**63 else 'json')
+        elif isinstance(v, float):
+            kinds.add('float')
+        elif isinstance(v, str):
+            kinds.add('str')
+        else:
+            kinds.add('json')
+        if len(kinds) > 1:
+            return 'json'  # 型混在 (int/float 含む) は値をそのまま保持
+    return kinds.pop() if kinds else 'none'
+
+
+def _shrink_int(arr: np.ndarray) -> np.ndarray:
+    if arr.size == 0:
+        return arr.astype(np.int8)
+    lo, hi = int(arr.min()), int(arr.max())
+    for dt in _INT_DTYPES:
+        info = np.iinfo(dt)
+        if info.min <= lo and hi <= info.max:
+            return arr.astype(dt)
+    return arr
+
+
+def _pack_blobs(chunks: List[bytes]) -> Tuple[np.ndarray, np.ndarray]:
+    lengths = np.fromiter((len(c) for c in chunks), dtype=np.int64, count=len(chunks))
+    offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    data = np.frombuffer(b''.join(chunks), dtype=np.uint8).copy()
+    return data, offsets
+
+
+def _encode_column(values: Sequence, state: np.ndarray) -> _Column:
+    """values[i] は state[i] == _VALUE の行だけ意味を持つ"""
+    present = [v for v, s in zip(values, state) if s == _VALUE]
+    kind = _infer_kind(present)
+    is_value = state == _VALUE
+    if kind == 'none':
+        # 値が全て None
+        state = np.where(is_value, _NONE, state).astype(np.uint8)
+        return _Column('none', state, np.zeros(0, dtype=np.uint8))
+    state = np.where(is_value & np.array([v is None for v in values], dtype=bool),
+                     _NONE, state).astype(np.uint8)
+    filled = state == _VALUE
+    if kind == 'bool':
+        data = np.array([bool(v) if f else False for v, f in zip(values, filled)], dtype=bool)
+        return _Column(kind, state, data)
+    if kind == 'int':
+        data = np.array([v if f else 0 for v, f in zip(values, filled)], dtype=np.int64)
+        return _Column(kind, state, _shrink_int(data))
+    if kind == 'float':
+        data = np.array([v if f else 0.0 for v, f in zip(values, filled)], dtype=np.float64)
+        return _Column(kind, state, data)
+    if kind == 'str':
+        chunks = [v.encode('utf-8') if f else b'' for v, f in zip(values, filled)]
+    else:
+        chunks = [json.dumps(v, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+                  if f else b'' for v, f in zip(values, filled)]
+    data, offsets = _pack_blobs(chunks)
+    return _Column(kind, state, data, offsets)
+
+
+def _column_values(col: _Column) -> List:
+    """列 → Python 値リスト (状態が _VALUE 以外の行は None)"""
+    n = len(col.state)
+    if col.kind == 'none':
+        return [None] * n
+    if col.offsets is not None:
+        blob = col.data.tobytes()
+        off = col.offsets.tolist()
+        if col.kind == 'str':
+            return [blob[off[i]:off[i + 1]].decode('utf-8') for i in range(n)]
+        return [json.loads(blob[off[i]:off[i + 1]]) if off[i + 1] > off[i] else None
+                for i in range(n)]
+    return col.data.tolist()
+
+
+def _take(col: _Column, idx: np.ndarray) -> _Column:
+    state = col.state[idx]
+    if col.kind == 'none':
+        return _Column('none', state, col.data)
+    if col.offsets is None:
+        return _Column(col.kind, state, col.data[idx])
+    starts = col.offsets[:-1][idx]
+    lengths = col.offsets[1:][idx] - starts
+    offsets = np.zeros(len(idx) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    # 各行のバイト範囲を連結: gather 位置 = 行開始 + 行内オフセット
+    pos = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1], dtype=np.int64)
+    return _Column(col.kind, state, col.data[pos], offsets)
+
+
+def _absent(n: int) -> _Column:
+    return _Column('none', np.full(n, _ABSENT, dtype=np.uint8), np.zeros(0, dtype=np.uint8))
+
+
+def _concat(cols: List[_Column]) -> _Column:
+    state = np.concatenate([c.state for c in cols])
+    kinds = {c.kind for c in cols} - {'none'}
+    if not kinds:
+        return _Column('none', state, np.zeros(0, dtype=np.uint8))
+    if len(kinds) > 1:
+        values: List = []
+        for c in cols:
+            values.extend(_column_values(c))
+        return _encode_column(values, state)
+    kind = kinds.pop()
+    if kind in ('str', 'json'):
+        datas, offs, base = [], [np.zeros(1, dtype=np.int64)], 0
+        for c in cols:
+            n = len(c.state)
+            if c.offsets is None:  # 'none' 列は空文字列として埋める
+                offs.append(np.full(n, base, dtype=np.int64))
+                continue
+            datas.append(c.data)
+            offs.append(c.offsets[1:] + base)
+            base += int(c.offsets[-1])
+        data = np.concatenate(datas) if datas else np.zeros(0, dtype=np.uint8)
+        return _Column(kind, state, data, np.concatenate(offs))
+    fill = {'bool': False, 'int': 0, 'float': 0.0}[kind]
+    parts = [c.data if c.kind == kind else np.full(len(c.state), fill) for c in cols]
+    data = np.concatenate(parts)
+    if kind == 'int':
+        data = _shrink_int(data.astype(np.int64))
+    elif kind == 'float':
+        data = data.astype(np.float64)
+    else:
+        data = data.astype(bool)
+    return _Column(kind, state, data)
+
+
+# =============================================================================
+# ColumnarIndex
+# =============================================================================
+
+class ColumnarIndex(Mapping):
+    """ソート済みキー + 型付き列の読み取り専用インデックス"""
+
+    def __init__(self, keys: np.ndarray, columns: Dict[str, _Column]):
+        self.key_array = keys             # bytes ('S') のソート済み一意配列
+        self.columns = columns            # フィールド名 → _Column (挿入順 = 元 dict の順)
+        self._pos: Optional[Dict[str, int]] = None
+        self._rows: Dict[int, dict] = {}
+        self._cols_py: Dict[str, tuple] = {}
+
+    # --- 構築 ---
+
+    @classmethod
+    def from_records(cls, keys: Sequence[str], rows: Sequence[dict]) -> 'ColumnarIndex':
+        """(key, row) 列から構築。 重複キーは後勝ち (dict 代入と同じ)"""
+        last: Dict[str, int] = {}
+        for i, k in enumerate(keys):
+            last[k] = i
+        order = sorted(last)
+        picked = [rows[last[k]] for k in order]
+
+        fields: Dict[str, None] = {}
+        for r in picked:
+            for f in r:
+                fields.setdefault(f, None)
+
+        n = len(picked)
+        columns: Dict[str, _Column] = {}
+        for f in fields:
+            values = [r.get(f) for r in picked]
+            state = np.array([_VALUE if f in r else _ABSENT for r in picked], dtype=np.uint8)
+            columns[f] = _encode_column(values, state) if n else _absent(0)
+        key_arr = np.array([k.encode('ascii') for k in order], dtype='S') if n \
+            else np.zeros(0, dtype='S1')
+        return cls(key_arr, columns)
+
+    @classmethod
+    def merge(cls, parts: Sequence['ColumnarIndex']) -> 'ColumnarIndex':
+        """複数インデックスを順に重ねる (後の part が同一キーを上書き)"""
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return cls(np.zeros(0, dtype='S1'), {})
+        if len(parts) == 1:
+            return parts[0]
+
+        keys = np.concatenate([p.key_array for p in parts])
+        # 後勝ち: 逆順で最初に出現した位置 = 元の並びで最後の出現
+        rev = keys[::-1]
+        uniq, first_rev = np.unique(rev, return_index=True)
+        sel = (len(keys) - 1 - first_rev).astype(np.int64)  # uniq はソート済み
+
+        fields: Dict[str, None] = {}
+        for p in parts:
+            for f in p.columns:
+                fields.setdefault(f, None)
+        columns: Dict[str, _Column] = {}
+        for f in fields:
+            stacked = _concat([p.columns.get(f) or _absent(len(p)) for p in parts])
+            columns[f] = _take(stacked, sel)
+        return cls(uniq, columns)
+
+    # --- 永続化 ---
+
+    def save(self, path: Path) -> None:
+        arrays = {'__keys__': self.key_array}
+        meta = {'version': STORE_VERSION, 'fields': []}
+        for i, (f, col) in enumerate(self.columns.items()):
+            meta['fields'].append([f, col.kind])
+            arrays[f'c{i}_state'] = col.state
+            arrays[f'c{i}_data'] = col.data
+            if col.offsets is not None:
+                arrays[f'c{i}_offsets'] = col.offsets
+        arrays['__meta__'] = np.frombuffer(
+            json.dumps(meta, ensure_ascii=False).encode('utf-8'), dtype=np.uint8)
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + '.tmp')
+        with open(tmp, 'wb') as fh:
+            np.savez(fh, **arrays)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> 'ColumnarIndex':
+        with np.load(path, allow_pickle=False) as z:
+            meta = json.loads(z['__meta__'].tobytes().decode('utf-8'))
+            if meta.get('version') != STORE_VERSION:
+                raise ValueError(f"unsupported store version: {meta.get('version')}")
+            keys = z['__keys__']
+            columns: Dict[str, _Column] = {}
+            for i, (f, kind) in enumerate(meta['fields']):
+                offsets = z[f'c{i}_offsets'] if f'c{i}_offsets' in z.files else None
+                columns[f] = _Column(kind, z[f'c{i}_state'], z[f'c{i}_data'], offsets)
+        return cls(keys, columns)
+
+    # --- 参照 ---
+
+    def _position(self, key: str) -> int:
+        if self._pos is None:
+            self._pos = {k: i for i, k in enumerate(self.key_array.astype('U').tolist())}
+        return self._pos.get(key, -1)
+
+    def _column_py(self, f: str) -> tuple:
+        """列を Python 値に一度だけ展開 (str/json は遅延デコード用に bytes のまま)"""
+        cached = self._cols_py.get(f)
+        if cached is None:
+            col = self.columns[f]
+            if col.offsets is not None:
+                cached = (col.kind, col.state.tolist(), col.data.tobytes(), col.offsets.tolist())
+            else:
+                values = col.data.tolist() if col.kind != 'none' else None
+                cached = (col.kind, col.state.tolist(), values, None)
+            self._cols_py[f] = cached
+        return cached
+
+    def row_at(self, i: int) -> dict:
+        row = self._rows.get(i)
+        if row is not None:
+            return row
+        row = {}
+        for f in self.columns:
+            kind, state, values, off = self._column_py(f)
+            s = state[i]
+            if s == _ABSENT:
+                continue
+            if s == _NONE:
+                row[f] = None
+            elif off is not None:
+                raw = values[off[i]:off[i + 1]]
+                row[f] = raw.decode('utf-8') if kind == 'str' else json.loads(raw)
+            else:
+                row[f] = values[i]
+        self._rows[i] = row
+        return row
+
+    def get(self, key, default=None):
+        i = self._position(key)
+        return self.row_at(i) if i >= 0 else default
+
+    def __getitem__(self, key) -> dict:
+        i = self._position(key)
+        if i < 0:
+            raise KeyError(key)
+        return self.row_at(i)
+
+    def __contains__(self, key) -> bool:
+        return self._position(key) >= 0
+
+    def __len__(self) -> int:
+        return len(self.key_array)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.key_array.astype('U').tolist())
+
+    def prefix_items(self, prefix: str) -> List[Tuple[str, dict]]:
+        """キーが prefix で始まる (key, row) をキー順で返す
+
+        SED/KYI なら prefix='{ketto_num}_' で1頭分を日付順に、
+        prefix='{ketto_num}_2024' で年内分を取り出せる。
+        """
+        p = prefix.encode('ascii')
+        lo = int(np.searchsorted(self.key_array, p, side='left'))
+        hi = int(np.searchsorted(self.key_array, p + b'\xff', side='left'))
+        return [(self.key_array[i].decode('ascii'), self.row_at(i)) for i in range(lo, hi)]
+
+    def to_dict(self) -> Dict[str, dict]:
+        return {k: self.row_at(i) for i, k in enumerate(self.key_array.astype('U').tolist())}
+
+
+# =============================================================================
+# Loader
+# =============================================================================
+
+def store_path(name: str, indexes_dir: Optional[Path] = None) -> Path:
+    if indexes_dir is None:
+        from core import config
+        indexes_dir = config.indexes_dir()
+    return Path(indexes_dir) / f'jrdb_{name}_index.npz'
+
+
+def load_jrdb_index(name: str, indexes_dir: Optional[Path] = None):
+    """jrdb_{name}_index.npz (無ければ旧 jrdb_{name}_index.json) を読む
+
+    Returns:
+        ColumnarIndex / dict。 どちらも無ければ None。
+    """
+    npz = store_path(name, indexes_dir)
+    if npz.exists():
+        return ColumnarIndex.load(npz)
+    legacy = npz.with_suffix('.json')
+    if legacy.exists():
+        with open(legacy, encoding='utf-8') as f:
+            return json.load(f)
+    return None
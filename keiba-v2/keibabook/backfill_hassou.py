@@ -25,7 +25,7 @@ sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 from core import config
 from keibabook.scraper import KeibabookScraper
 from keibabook.parsers.seiseki_parser import _extract_race_extras, parse_hassou_text
-from keibabook.ext_builder import update_kb_ext_field, update_kb_ext_race_level
+from keibabook.ext_builder import KbExtBatch
 
 from bs4 import BeautifulSoup
 
@@ -111,52 +111,56 @@ def backfill_hassou(
     errors = 0
     no_data = 0
 
-    for i, target in enumerate(targets):
-        rid_12 = target["race_id_12"]
-        rid_16 = target["race_id_16"]
-        date_str = target["date"]
-
-        try:
-            html = scraper.scrape_seiseki(rid_12)
-            soup = BeautifulSoup(html, "html.parser")
-            extras = _extract_race_extras(soup)
-
-            hassou = extras.get("hassou", "")
-
-            if extras:
-                # race_extras をレースレベルに保存
-                update_kb_ext_race_level(rid_16, date_str, {"race_extras": extras})
-
-                # 出遅れ馬にフラグ設定
-                if hassou:
-                    slow_starts = parse_hassou_text(hassou)
-                    if slow_starts:
-                        field_updates = {}
-                        for ss in slow_starts:
-                            bano = str(ss["umaban"])
-                            field_updates[bano] = {"is_slow_start": True}
-                        update_kb_ext_field(rid_16, date_str, field_updates)
-                        logger.info(f"  [{i+1}/{len(targets)}] {rid_12}: 発走={hassou[:30]} 出遅{len(slow_starts)}")
+    # race_extras と出遅れフラグを同じ書き込みにまとめ、 64 ファイルごとに書き出す
+    with KbExtBatch(max_pending=64) as kb_batch:
+        for i, target in enumerate(targets):
+            rid_12 = target["race_id_12"]
+            rid_16 = target["race_id_16"]
+            date_str = target["date"]
+
+            try:
+                html = scraper.scrape_seiseki(rid_12)
+                soup = BeautifulSoup(html, "html.parser")
+                extras = _extract_race_extras(soup)
+
+                hassou = extras.get("hassou", "")
+
+                if extras:
+                    # race_extras をレースレベルに保存
+                    kb_batch.update_race_level(rid_16, date_str, {"race_extras": extras})
+
+                    # 出遅れ馬にフラグ設定
+                    if hassou:
+                        slow_starts = parse_hassou_text(hassou)
+                        if slow_starts:
+                            field_updates = {}
+                            for ss in slow_starts:
+                                bano = str(ss["umaban"])
+                                field_updates[bano] = {"is_slow_start": True}
+                            kb_batch.update_fields(rid_16, date_str, field_updates)
+                            logger.info(f"  [{i+1}/{len(targets)}] {rid_12}: 発走={hassou[:30]} 出遅{len(slow_starts)}")
+                        else:
+                            logger.info(f"  [{i+1}/{len(targets)}] {rid_12}: 発走={hassou[:30]} (パース不能)")
+                            no_data += 1
                     else:
-                        logger.info(f"  [{i+1}/{len(targets)}] {rid_12}: 発走={hassou[:30]} (パース不能)")
+                        logger.info(f"  [{i+1}/{len(targets)}] {rid_12}: extras={list(extras.keys())} (発走なし)")
                         no_data += 1
+                    updated += 1
                 else:
-                    logger.info(f"  [{i+1}/{len(targets)}] {rid_12}: extras={list(extras.keys())} (発走なし)")
                     no_data += 1
-                updated += 1
-            else:
-                no_data += 1
-                if (i + 1) % 50 == 0:
-                    logger.info(f"  [{i+1}/{len(targets)}] {rid_12}: データなし")
+                    if (i + 1) % 50 == 0:
+                        logger.info(f"  [{i+1}/{len(targets)}] {rid_12}: データなし")
 
-        except Exception as e:
-            errors += 1
-            logger.error(f"  [{i+1}/{len(targets)}] {rid_12}: {e}")
+            except Exception as e:
+                errors += 1
+                logger.error(f"  [{i+1}/{len(targets)}] {rid_12}: {e}")
 
     elapsed = time.time() - t0
     logger.info(f"\n{'='*60}")
     logger.info(f"  Backfill完了")
     logger.info(f"  Updated: {updated}, NoData: {no_data}, Errors: {errors}")
+    logger.info(f"  kb_ext writes: {kb_batch.stats['written']} files "
+                f"(missing={kb_batch.stats['missing']}, errors={kb_batch.stats['errors']})")
     logger.info(f"  Elapsed: {elapsed:.0f}s ({elapsed/60:.1f}min)")
     logger.info(f"{'='*60}")
 
@@ -38,7 +38,7 @@ from keibabook.cyokyo_parser import parse_cyokyo_html
 from keibabook.parsers.speed_parser import parse_speed_html
 from keibabook.ext_builder import (
     build_kb_ext_from_scraped, save_kb_ext, update_kb_ext_field,
-    update_kb_ext_race_level, convert_race_id_12_to_16,
+    KbExtBatch, convert_race_id_12_to_16,
 )
 
 logging.basicConfig(
@@ -359,6 +359,8 @@ class KeibabookBatchScraper:
 
                     race_id_16 = convert_race_id_12_to_16(rid, date_str, venue)
                     if race_id_16:
+                        # 馬単位・レース単位の更新を 1 回の read-modify-write にまとめる
+                        kb_batch = KbExtBatch()
                         field_updates: dict[str, dict] = {}
 
                         # 寸評 + 前半3F（テーブルの列）
@@ -426,7 +428,7 @@ class KeibabookBatchScraper:
                             n_slow = len(slow_starts)
 
                         if field_updates:
-                            update_kb_ext_field(race_id_16, date_str, field_updates)
+                            kb_batch.update_fields(race_id_16, date_str, field_updates)
                             n_sunpyo = sum(1 for u in field_updates.values() if "sunpyo" in u)
                             n_3f = sum(1 for u in field_updates.values() if "first_3f" in u)
                             n_iv = sum(1 for u in field_updates.values() if "interview" in u)
@@ -446,7 +448,8 @@ class KeibabookBatchScraper:
                         if extras:
                             race_level["race_extras"] = extras
                         if race_level:
-                            update_kb_ext_race_level(race_id_16, date_str, race_level)
+                            kb_batch.update_race_level(race_id_16, date_str, race_level)
+                        kb_batch.flush(strict=True)
                     updated += 1
 
                 except Exception as e:
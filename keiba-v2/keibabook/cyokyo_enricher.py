@@ -30,6 +30,7 @@ sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
 from core import config
 from keibabook.cyokyo_parser import parse_cyokyo_html, extract_oikiri_summary
+from keibabook.ext_builder import write_kb_ext_file
 
 # debug HTMLの場所
 DEBUG_DIR = config.debug_dir()
@@ -162,8 +163,7 @@ def enrich_kb_ext(
         return False
 
     if not dry_run:
-        with open(kb_ext_path, "w", encoding="utf-8") as f:
-            json.dump(kb_ext, f, ensure_ascii=False, indent=2)
+        write_kb_ext_file(kb_ext_path, kb_ext)
 
     return True
 
@@ -9,6 +9,9 @@ keibabook拡張データ変換スクリプト
   2. レガシー: data2/integrated JSONからkb_ext JSON変換（過去データ一括変換用）
      → build_keibabook_ext() (CLI --year/--date)
 
+既存kb_extの部分更新 (paddok/seiseki/バックフィル) は KbExtBatch /
+bulk_update_kb_ext() でファイルごとに 1 回の read-modify-write にまとめる。
+
 12桁race_id → 16桁race_idの変換はvenue_name（日本語）で行う。
 
 Usage:
@@ -18,10 +21,11 @@ Usage:
 
 import argparse
 import json
+import os
 import sys
 import time
 from pathlib import Path
-from typing import Dict, Optional, Tuple
+from typing import Callable, Dict, Optional, Tuple
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
@@ -418,71 +422,191 @@ def save_kb_ext(race_id_16: str, kb_ext: dict, date_str: str) -> Path:
     return out_path
 
 
-def update_kb_ext_field(race_id_16: str, date_str: str, updates: dict) -> bool:
-    """既存kb_extの特定フィールドを更新（paddok/seiseki後の部分更新用）。
+def kb_ext_path(race_id_16: str, date_str: str) -> Path:
+    """kb_ext JSON のパス (data3/keibabook/YYYY/MM/DD/kb_ext_{race_id_16}.json)"""
+    parts = date_str.split('-')
+    return config.keibabook_dir() / parts[0] / parts[1] / parts[2] / f"kb_ext_{race_id_16}.json"
 
-    Args:
-        race_id_16: 16桁race_id
-        date_str: YYYY-MM-DD
-        updates: {umaban: {field: value, ...}, ...}
 
-    Returns:
-        更新成功かどうか
-    """
-    parts = date_str.split('-')
-    kb_path = config.keibabook_dir() / parts[0] / parts[1] / parts[2] / f"kb_ext_{race_id_16}.json"
+def write_kb_ext_file(path: Path, kb_ext: dict) -> None:
+    """kb_ext を compact JSON で書き出す (tmp → os.replace のアトミック置換)
 
-    if not kb_path.exists():
-        return False
+    部分更新の書き戻し用。 indent=2 の整形はバックフィルで同じファイルを
+    何度も書き直すときのコストの大半を占めるため使わない (読み手は json.load のみ)。
+    """
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(
+        json.dumps(kb_ext, ensure_ascii=False, separators=(',', ':')),
+        encoding='utf-8',
+    )
+    os.replace(tmp, path)
 
-    with open(kb_path, encoding='utf-8') as f:
-        kb_ext = json.load(f)
 
+def _apply_entry_updates(kb_ext: dict, updates: dict) -> bool:
     entries = kb_ext.get('entries', {})
     updated = False
-
     for umaban, fields in updates.items():
         if umaban in entries:
             entries[umaban].update(fields)
             updated = True
+    return updated
 
-    if updated:
-        kb_path.write_text(
-            json.dumps(kb_ext, ensure_ascii=False, indent=2),
-            encoding='utf-8',
-        )
 
-    return updated
+def _apply_race_level(kb_ext: dict, fields: dict) -> bool:
+    kb_ext.update(fields)
+    return True
 
 
-def update_kb_ext_race_level(race_id_16: str, date_str: str, fields: dict) -> bool:
-    """既存kb_extのレースレベル（トップレベル）フィールドを更新。
+class KbExtBatch:
+    """kb_ext 部分更新のバッファ (ファイルごとに 1 回の read-modify-write)
+
+    update_fields / update_race_level / update_with は更新を積むだけで、
+    flush() でファイルごとに 1 回読み込み → 積んだ順に適用 → 1 回書き戻す。
+    pending のファイル数が max_pending に達すると、 新しいファイルを積む前に
+    自動 flush する (同じレースの馬単位・レース単位の更新は同じ書き込みに乗る)。
+    with 文で使うと抜けるときに flush する (例外時もそれまでの更新は書き出す)。
+
+    Usage:
+        with KbExtBatch() as batch:
+            for race in races:
+                batch.update_fields(rid16, date_str, {umaban: {...}})
+                batch.update_race_level(rid16, date_str, {"laps": {...}})
+    """
+
+    def __init__(self, max_pending: int = 64):
+        self.max_pending = max_pending
+        self._pending: Dict[Path, list] = {}
+        self.stats = {'files': 0, 'written': 0, 'unchanged': 0, 'missing': 0, 'errors': 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        return False
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def _queue(self, path: Path, op: Callable[[dict], bool]) -> None:
+        if path not in self._pending and self.max_pending and len(self._pending) >= self.max_pending:
+            self.flush()
+        self._pending.setdefault(path, []).append(op)
+
+    def update_fields(self, race_id_16: str, date_str: str, updates: dict) -> None:
+        """entries[umaban] の部分更新を積む (updates: {umaban: {field: value}})"""
+        self._queue(kb_ext_path(race_id_16, date_str),
+                    lambda kb, u=updates: _apply_entry_updates(kb, u))
+
+    def update_race_level(self, race_id_16: str, date_str: str, fields: dict) -> None:
+        """トップレベルフィールドの更新を積む (fields: {"laps": {...}, ...})"""
+        self._queue(kb_ext_path(race_id_16, date_str),
+                    lambda kb, f=fields: _apply_race_level(kb, f))
+
+    def update_with(self, path: Path, fn: Callable[[dict], bool]) -> None:
+        """任意の更新関数を積む (fn(kb_ext) -> 変更したか)"""
+        self._queue(Path(path), fn)
+
+    def flush(self, strict: bool = False) -> Dict[Path, bool]:
+        """積んだ更新を書き出す。 {path: 書き込んだか} を返す
+
+        存在しないファイルは False (missing)。 壊れた JSON などの例外は
+        そのファイルだけ飛ばして stats['errors'] に数え、 strict=True なら
+        全ファイル処理後に最初の例外を送出する。
+        """
+        pending, self._pending = self._pending, {}
+        results: Dict[Path, bool] = {}
+        first_error = None
+        for path, ops in pending.items():
+            self.stats['files'] += 1
+            if not path.exists():
+                self.stats['missing'] += 1
+                results[path] = False
+                continue
+            try:
+                with open(path, encoding='utf-8') as f:
+                    kb_ext = json.load(f)
+                changed = False
+                for op in ops:
+                    changed = op(kb_ext) or changed
+                if changed:
+                    write_kb_ext_file(path, kb_ext)
+                    self.stats['written'] += 1
+                else:
+                    self.stats['unchanged'] += 1
+                results[path] = changed
+            except Exception as e:
+                self.stats['errors'] += 1
+                results[path] = False
+                if first_error is None:
+                    first_error = e
+                if not strict:
+                    print(f"  [KbExtBatch] {path.name}: {e}")
+        if strict and first_error is not None:
+            raise first_error
+        return results
+
+
+def bulk_update_kb_ext(
+    entry_updates: Optional[Dict[Tuple[str, str], dict]] = None,
+    race_updates: Optional[Dict[Tuple[str, str], dict]] = None,
+    max_pending: int = 256,
+) -> dict:
+    """バックフィル用の一括更新 (1 ファイル 1 回の書き込み)
+
+    Args:
+        entry_updates: {(race_id_16, date_str): {umaban: {field: value}}}
+        race_updates:  {(race_id_16, date_str): {field: value}}
+            同じレースに両方ある場合はレース単位 → 馬単位の順に適用する
+
+    Returns:
+        KbExtBatch.stats ({'files', 'written', 'unchanged', 'missing', 'errors'})
+    """
+    entry_updates = entry_updates or {}
+    race_updates = race_updates or {}
+    with KbExtBatch(max_pending=max_pending) as batch:
+        for key in dict.fromkeys([*race_updates, *entry_updates]):
+            if key in race_updates:
+                batch.update_race_level(*key, race_updates[key])
+            if key in entry_updates:
+                batch.update_fields(*key, entry_updates[key])
+    return batch.stats
+
+
+def update_kb_ext_field(race_id_16: str, date_str: str, updates: dict) -> bool:
+    """既存kb_extの特定フィールドを更新（paddok/seiseki後の部分更新用）。
+
+    1 レース即時書き込み版。 複数レース・複数フィールドをまとめるときは KbExtBatch。
 
     Args:
         race_id_16: 16桁race_id
         date_str: YYYY-MM-DD
-        fields: {field: value, ...}  例: {"laps": {...}, "race_details": {...}}
+        updates: {umaban: {field: value, ...}, ...}
 
     Returns:
         更新成功かどうか
     """
-    parts = date_str.split('-')
-    kb_path = config.keibabook_dir() / parts[0] / parts[1] / parts[2] / f"kb_ext_{race_id_16}.json"
+    batch = KbExtBatch()
+    batch.update_fields(race_id_16, date_str, updates)
+    return batch.flush(strict=True).get(kb_ext_path(race_id_16, date_str), False)
 
-    if not kb_path.exists():
-        return False
 
-    with open(kb_path, encoding='utf-8') as f:
-        kb_ext = json.load(f)
+def update_kb_ext_race_level(race_id_16: str, date_str: str, fields: dict) -> bool:
+    """既存kb_extのレースレベル（トップレベル）フィールドを更新。
 
-    kb_ext.update(fields)
+    1 レース即時書き込み版。 複数レース・複数フィールドをまとめるときは KbExtBatch。
 
-    kb_path.write_text(
-        json.dumps(kb_ext, ensure_ascii=False, indent=2),
-        encoding='utf-8',
-    )
+    Args:
+        race_id_16: 16桁race_id
+        date_str: YYYY-MM-DD
+        fields: {field: value, ...}  例: {"laps": {...}, "race_details": {...}}
 
-    return True
+    Returns:
+        更新成功かどうか
+    """
+    batch = KbExtBatch()
+    batch.update_race_level(race_id_16, date_str, fields)
+    return batch.flush(strict=True).get(kb_ext_path(race_id_16, date_str), False)
 
 
 # ============================================================
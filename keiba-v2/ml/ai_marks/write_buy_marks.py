@@ -22,10 +22,8 @@ from __future__ import annotations
 
 import argparse
 import json
-import os
 import sys
 from datetime import datetime
-from pathlib import Path
 
 # Windows コンソール (cp932) で — や★☆ を表示できるよう utf-8 に揃える (runner.py と同様)。
 if sys.platform == "win32" and hasattr(sys.stdout, "reconfigure"):
@@ -36,17 +34,13 @@ if sys.platform == "win32" and hasattr(sys.stdout, "reconfigure"):
 from ml.ai_marks.audit_log import append_audit
 from ml.ai_marks.buy_marks import extract_race_buy_marks
 from ml.ai_marks.dat_writer import write_buy_marks_to_dat
+from ml.purchase_ledger.writer import ensure_view
 
 # 監査レコードに必ず残す注記 (条件⑥)。
 DISPLAY_ONLY_NOTE = "買い軸印は表示用 — 購入の正本は purchase_ledger (税務SoT)"
 _AUDIT_SUBDIR = "buy_audit"
 
 
-def _ledger_path(date: str) -> Path:
-    root = Path(os.getenv("KEIBA_DATA_ROOT", "C:/KEIBA-CICD/data3"))
-    return root / "userdata" / "purchase_ledger" / f"{date}.json"
-
-
 def _venue_rno(race_id: str) -> str:
     """race_id 16桁 → '東京12R' 風の短ラベル (表示用、失敗時は末尾)。"""
     venue = {
@@ -68,7 +62,7 @@ def main(argv=None) -> int:
                     help="DAT (markSet=3) に実書込み + 監査ログ (未指定は dry-run)")
     args = ap.parse_args(argv)
 
-    lp = _ledger_path(args.date)
+    lp = ensure_view(args.date)        # view は遅延生成 — ジャーナルが先行していれば再生成
     if not lp.exists():
         print(f"[buy-marks] ledger なし: {lp}", file=sys.stderr)
         return 2
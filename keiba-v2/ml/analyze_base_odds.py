@@ -17,15 +17,14 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 from ml.utils.filters import is_obstacle
+from jrdb.index_store import load_jrdb_index
 
 DATA_DIR = "C:/KEIBA-CICD/data3"
 
 
 def load_kyi_index():
     """JRDB KYI index (base_odds, base_popularity etc.)"""
-    path = f"{DATA_DIR}/indexes/jrdb_kyi_index.json"
-    with open(path, encoding="utf-8") as f:
-        return json.load(f)
+    return load_jrdb_index('kyi', Path(DATA_DIR) / "indexes") or {}
 
 
 def load_races_with_results(year_range=(2024, 2025)):
@@ -17,6 +17,7 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 from ml.utils.filters import is_obstacle
+from jrdb.index_store import load_jrdb_index
 
 DATA_DIR = "C:/KEIBA-CICD/data3"
 
@@ -25,8 +26,7 @@ def load_all_data():
     """Load KYI, races, predictions"""
     print("Loading data...")
 
-    with open(f"{DATA_DIR}/indexes/jrdb_kyi_index.json", encoding="utf-8") as f:
-        kyi = json.load(f)
+    kyi = load_jrdb_index('kyi', Path(DATA_DIR) / "indexes") or {}
     print(f"  KYI: {len(kyi)} entries")
 
     races = []
@@ -20,6 +20,7 @@ import numpy as np
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 from core import config
+from jrdb.index_store import load_jrdb_index
 from ml.utils.filters import is_obstacle
 
 
@@ -36,9 +37,7 @@ def main():
         history_cache = json.load(f)
     print(f"  Horse history: {len(history_cache):,} horses")
 
-    sed_path = config.indexes_dir() / "jrdb_sed_index.json"
-    with open(sed_path, encoding='utf-8') as f:
-        jrdb_sed_index = json.load(f)
+    jrdb_sed_index = load_jrdb_index('sed') or {}
     print(f"  JRDB SED index: {len(jrdb_sed_index):,} entries")
 
     # --- IDM差分を収集 ---
@@ -38,6 +38,7 @@ from ml.experiment import (
 from ml.features.margin_target import add_margin_target_to_df
 from ml.features.baba_features import load_baba_index, get_baba_features
 from ml.utils.filters import is_obstacle
+from ml.utils.race_corpus import shared_corpus
 from ml.bet_engine import (
     PRESETS, BetStrategyParams,
     generate_recommendations, recommendations_summary,
@@ -61,9 +62,13 @@ def compute_closing_probas(
     sire_stats_index=None,
     pit_trainer_tl=None, pit_jockey_tl=None,
     jrdb_sed_index=None, jrdb_kyi_index=None, jrdb_kaa_index=None,
+    corpus=None,
 ) -> dict:
     """テスト用レースの closing_race_proba を計算
 
+    Args:
+        corpus: race JSON の読込元 RaceCorpus (None=プロセス共通)
+
     Returns:
         {race_id_str: proba} の辞書
     """
@@ -91,7 +96,8 @@ def compute_closing_probas(
 
     # CourseClosingTimeline を構築
     from ml.experiment_closing import build_course_timeline
-    course_timeline = build_course_timeline(date_index)
+    corpus = corpus or shared_corpus()
+    course_timeline = build_course_timeline(date_index, corpus=corpus)
 
     # race_id → date の逆引きマップを構築
     rid_to_date = {}
@@ -120,7 +126,7 @@ def compute_closing_probas(
                 # race_idから日付を推定 (YYYYMMDD...)
                 date_str = f'{rid_str[:4]}-{rid_str[4:6]}-{rid_str[6:8]}'
 
-            race = load_race_json(rid_str, date_str)
+            race = corpus.get(rid_str, date_str)
             if race is None:
                 skipped += 1
                 continue
@@ -7,6 +7,7 @@ Usage:
     python -m ml.batch_predict --from 2025-03-01 --to 2026-02-28
     python -m ml.batch_predict --from 2025-03-01 --to 2026-02-28 --with-bets
     python -m ml.batch_predict --from 2025-03-01 --to 2026-02-28 --with-bets --budget 30000
+    python -m ml.batch_predict --from 2026-01-01 --to 2026-01-31 --profile
 """
 
 import argparse
@@ -25,6 +26,7 @@ if sys.platform == 'win32':
 from core import config
 from ml.model_loader import load_model, load_model_safe
 from ml.utils.filters import is_obstacle, split_by_obstacle
+from ml.utils import profiler
 from ml.predict import (
     load_master_data,
     get_races_for_date, load_keibabook_ext,
@@ -65,6 +67,7 @@ def predict_date(
     model_obstacle_w=None,
     jockey_obstacle_tl: dict = None,
     trainer_obstacle_tl: dict = None,
+    horse_obs_index: dict = None,
 ):
     """1日分の予測を実行してpredictions.jsonを保存"""
     races = get_races_for_date(date)
@@ -175,6 +178,7 @@ def predict_date(
                 obstacle_calibrators=obstacle_calibrators,
                 jockey_obstacle_tl=jockey_obstacle_tl,
                 trainer_obstacle_tl=trainer_obstacle_tl,
+                horse_obs_index=horse_obs_index,
             )
             pred['model'] = 'enif'
             obstacle_predictions.append(pred)
@@ -314,7 +318,11 @@ def main():
                         help='買い目も生成')
     parser.add_argument('--budget', type=int, default=30000,
                         help='予算 (default: 30000)')
+    parser.add_argument('--profile', action='store_true',
+                        help='特徴量抽出のステージ別プロファイルを出力 (環境変数 KEIBA_PROFILE=1 と同等)')
     args = parser.parse_args()
+    if args.profile:
+        profiler.enable()
 
     t0 = time.time()
     print(f"\n{'='*60}")
@@ -353,11 +361,15 @@ def main():
     # 障害用PIT timeline
     jockey_obstacle_tl = None
     trainer_obstacle_tl = None
+    horse_obs_index = None
     if model_obstacle is not None and model_obstacle_w is not None:
-        from ml.features.obstacle_features import build_obstacle_personnel_timelines
+        from ml.features.obstacle_features import (
+            build_obstacle_personnel_timelines, build_horse_obstacle_index,
+        )
         jockey_obstacle_tl, trainer_obstacle_tl = build_obstacle_personnel_timelines(
             history_cache
         )
+        horse_obs_index = build_horse_obstacle_index(history_cache)
 
     # グレードオフセット
     grade_offsets = load_grade_offsets()
@@ -389,6 +401,7 @@ def main():
             model_obstacle_w=model_obstacle_w,
             jockey_obstacle_tl=jockey_obstacle_tl,
             trainer_obstacle_tl=trainer_obstacle_tl,
+            horse_obs_index=horse_obs_index,
         )
         total_races += n
         dt = time.time() - dt0
@@ -399,6 +412,7 @@ def main():
     print(f"\n{'='*60}")
     print(f"  Complete: {len(dates)} days, {total_races} races")
     print(f"  Elapsed: {elapsed:.0f}s ({elapsed/60:.1f}min)")
+    profiler.finish(f"batch_predict_{args.from_date}_{args.to_date}")
     print(f"{'='*60}\n")
 
 
@@ -0,0 +1,5 @@
+"""性能回帰ベンチマーク
+
+  - corpus: 合成 data3 / JV (SU*.DAT) / JRDB (SED) コーパスの決定的生成
+  - suite:  ホットパス計測 + 結果 JSON の保存・比較 (python -m ml.bench.suite)
+"""
@@ -0,0 +1,406 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""合成 data3 / JV / JRDB コーパス生成 (ベンチマーク用)
+
+実データと同じ配置・同じフォーマットで、 規模を指定して決定的に生成する
+(同じ CorpusSpec + seed なら同じバイト列)。 馬ごとの潜在能力 + ノイズで着順を決め、
+オッズ・上がり・通過順・走歴もそこから作るので、 特徴量計算・推論・買い目生成が
+実データに近い分岐を通る。
+
+生成物 (root 以下):
+  data3/races/YYYY/MM/DD/race_{race_id}.json     ← RaceMaster.to_dict()
+  data3/indexes/race_date_index.json             ← {date: [race_id]}
+  data3/ml/horse_history_cache.json              ← {ketto_num: [run]} (全コーパス分)
+  data3/masters/trainers.json / jockeys.json
+  data3/keibabook/YYYY/MM/DD/kb_ext_{race_id}.json
+  jv/SE_DATA/YYYY/SU{YYYYMM}.DAT                 ← 555 バイト固定長 (Shift-JIS)
+  data3/jrdb/raw/SED/SED{YYMMDD}.txt             ← 376 バイト固定長 + CRLF
+
+提供:
+    CorpusSpec / SCALES        — 規模 (small / medium / large)
+    Corpus                     — 生成結果 (パス・race 一覧・env 切替)
+    generate_corpus(root, spec)
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import random
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+from core.constants import SE_RECORD_LEN
+from core.models.race import RaceEntry, RaceMaster, RacePace
+
+VENUES = [("05", "東京"), ("06", "中山"), ("08", "京都"), ("09", "阪神"),
+          ("04", "新潟"), ("10", "小倉")]
+DISTANCES = {"turf": [1200, 1400, 1600, 1800, 2000, 2400], "dirt": [1200, 1400, 1600, 1800]}
+CONDITIONS = ["良", "良", "良", "稍重", "重", "不良"]
+GRADES = ["未勝利", "未勝利", "1勝クラス", "1勝クラス", "2勝クラス", "3勝クラス", "OP", "G3"]
+INTENSITIES = ["一杯に追う", "強めに追う", "馬なり余力", "馬なり", "末強め追う"]
+COMMENTS = ["状態良好", "仕上がり上々", "前走は不利", "距離短縮で", "叩いて良化", ""]
+MARGINS = ["ハナ", "クビ", "1/2", "3/4", "1", "1.1/2", "2", "3", "5", "大差"]
+SED_LINE_LEN = 376
+
+
+@dataclass(frozen=True)
+class CorpusSpec:
+    n_days: int = 8                   # 開催日数 (土日を週ごとに並べる)
+    venues_per_day: int = 2
+    races_per_venue: int = 12
+    n_horses: int = 2000
+    min_runners: int = 8
+    max_runners: int = 18
+    n_jockeys: int = 120
+    n_trainers: int = 200
+    start_date: str = "2025-01-04"
+    seed: int = 42
+
+    @property
+    def n_races(self) -> int:
+        return self.n_days * self.venues_per_day * self.races_per_venue
+
+
+SCALES: Dict[str, CorpusSpec] = {
+    "small": CorpusSpec(n_days=2, races_per_venue=6, n_horses=300),
+    "medium": CorpusSpec(),
+    "large": CorpusSpec(n_days=52, venues_per_day=3, n_horses=12000),
+}
+
+
+@dataclass
+class Corpus:
+    root: Path
+    spec: CorpusSpec
+    races: List[Tuple[str, str]] = field(default_factory=list)   # (date, race_id) 昇順
+
+    @property
+    def data_root(self) -> Path:
+        return self.root / "data3"
+
+    @property
+    def jv_root(self) -> Path:
+        return self.root / "jv"
+
+    @property
+    def jrdb_raw_dir(self) -> Path:
+        return self.data_root / "jrdb" / "raw"
+
+    @property
+    def dates(self) -> List[str]:
+        return sorted({d for d, _ in self.races})
+
+    @property
+    def years(self) -> List[int]:
+        return sorted({int(d[:4]) for d in self.dates})
+
+    def races_on(self, date_str: str) -> List[str]:
+        return [rid for d, rid in self.races if d == date_str]
+
+    @contextmanager
+    def env(self) -> Iterator["Corpus"]:
+        """KEIBA_DATA_ROOT / JV_DATA_ROOT をコーパスに向ける (抜けたら元に戻す)。"""
+        saved = {k: os.environ.get(k) for k in ("KEIBA_DATA_ROOT", "JV_DATA_ROOT")}
+        os.environ["KEIBA_DATA_ROOT"] = str(self.data_root)
+        os.environ["JV_DATA_ROOT"] = str(self.jv_root)
+        try:
+            yield self
+        finally:
+            for k, v in saved.items():
+                if v is None:
+                    os.environ.pop(k, None)
+                else:
+                    os.environ[k] = v
+
+
+# ---------------------------------------------------------------------------
+# 固定長レコード
+# ---------------------------------------------------------------------------
+
+def _put(buf: bytearray, start: int, text: str, length: int, *, sjis: bool = False) -> None:
+    raw = text.encode("shift_jis" if sjis else "ascii")[:length]
+    buf[start:start + len(raw)] = raw
+
+
+def _time_msst(sec: float) -> str:
+    tenths = int(round(sec * 10))
+    m, rest = divmod(tenths, 600)
+    return f"{m}{rest // 10:02d}{rest % 10}"
+
+
+def se_record(race: dict, e: dict) -> bytes:
+    """SE_DATA 555 バイトレコード (se_parser.parse_record の逆)。"""
+    rid = race["race_id"]
+    buf = bytearray(b" " * SE_RECORD_LEN)
+    _put(buf, 0, "SE7", 3)
+    _put(buf, 11, rid[0:4], 4)
+    _put(buf, 15, rid[4:8], 4)
+    _put(buf, 19, rid[8:10], 2)
+    _put(buf, 21, rid[10:12], 2)
+    _put(buf, 23, rid[12:14], 2)
+    _put(buf, 25, rid[14:16], 2)
+    _put(buf, 27, str(e["wakuban"]), 1)
+    _put(buf, 28, f"{e['umaban']:02d}", 2)
+    _put(buf, 30, e["ketto_num"], 10)
+    _put(buf, 40, e["horse_name"], 36, sjis=True)
+    _put(buf, 78, e["sex_cd"], 1)
+    _put(buf, 82, f"{e['age']:02d}", 2)
+    _put(buf, 84, "1", 1)
+    _put(buf, 85, e["trainer_code"], 5)
+    _put(buf, 90, e["trainer_name"], 8, sjis=True)
+    _put(buf, 288, f"{int(e['futan'] * 10):03d}", 3)
+    _put(buf, 296, e["jockey_code"], 5)
+    _put(buf, 306, e["jockey_name"], 8, sjis=True)
+    _put(buf, 324, f"{e['horse_weight']:03d}", 3)
+    _put(buf, 327, "+" if e["horse_weight_diff"] >= 0 else "-", 1)
+    _put(buf, 328, f"{abs(e['horse_weight_diff']):03d}", 3)
+    _put(buf, 334, f"{e['finish_position']:02d}", 2)
+    _put(buf, 338, _time_msst(e["_time_sec"]), 4)
+    for i, c in enumerate(e["corners"][:4]):
+        _put(buf, 351 + i * 2, f"{c:02d}", 2)
+    _put(buf, 359, f"{int(e['odds'] * 10):04d}", 4)
+    _put(buf, 363, f"{e['popularity']:02d}", 2)
+    _put(buf, 387, f"{int(e['last_4f'] * 10):03d}", 3)
+    _put(buf, 390, f"{int(e['last_3f'] * 10):03d}", 3)
+    return bytes(buf)
+
+
+def sed_line(race: dict, e: dict, rng: random.Random) -> bytes:
+    """JRDB SED 376 バイト行 (jrdb.parser.parse_sed_line の逆)。"""
+    rid = race["race_id"]
+    buf = bytearray(b" " * SED_LINE_LEN)
+    nichi_hex = format(int(rid[12:14]), "x")
+    _put(buf, 0, f"{rid[8:10]}{rid[2:4]}{int(rid[10:12]) % 10}{nichi_hex}{rid[14:16]}", 8)
+    _put(buf, 8, f"{e['umaban']:02d}", 2)
+    _put(buf, 10, e["ketto_num"][-8:], 8)
+    _put(buf, 18, rid[0:8], 8)
+    _put(buf, 26, e["horse_name"], 36, sjis=True)
+    _put(buf, 62, f"{race['distance']:04d}", 4)
+    _put(buf, 66, "1" if race["track_type"] == "turf" else "2", 1)
+    _put(buf, 69, "10", 2)
+    _put(buf, 130, f"{race['num_runners']:02d}", 2)
+    _put(buf, 140, f"{e['finish_position']:02d}", 2)
+    _put(buf, 143, _time_msst(e["_time_sec"]), 4)
+    _put(buf, 147, f"{int(e['futan'] * 10):03d}", 3)
+    _put(buf, 174, f"{e['odds']:6.1f}", 6)
+    _put(buf, 180, f"{e['popularity']:02d}", 2)
+    _put(buf, 182, f"{int(40 + e['_ability'] * 8):3d}", 3)
+    for off in range(185, 215, 3):
+        _put(buf, off, f"{rng.randint(-5, 5):3d}", 3)
+    _put(buf, 216, str(rng.randint(1, 5)), 1)
+    _put(buf, 221, rng.choice("HMS"), 1)
+    _put(buf, 222, rng.choice("HMS"), 1)
+    for off in (223, 228, 233, 238):
+        _put(buf, off, f"{rng.uniform(-20, 20):5.1f}", 5)
+    _put(buf, 258, f"{int((e['_time_sec'] - e['last_3f']) * 10) % 1000:03d}", 3)
+    _put(buf, 261, f"{int(e['last_3f'] * 10):03d}", 3)
+    _put(buf, 290, f"{max(1.0, e['odds'] / 3):6.1f}", 6)
+    for i, c in enumerate(e["corners"][:4]):
+        _put(buf, 308 + i * 2, f"{c:02d}", 2)
+    _put(buf, 322, e["jockey_code"], 5)
+    _put(buf, 327, e["trainer_code"], 5)
+    _put(buf, 332, f"{e['horse_weight']:03d}", 3)
+    return bytes(buf)
+
+
+# ---------------------------------------------------------------------------
+# シミュレーション
+# ---------------------------------------------------------------------------
+
+def _race_days(spec: CorpusSpec) -> List[str]:
+    start = date.fromisoformat(spec.start_date)
+    out = []
+    d = start
+    while len(out) < spec.n_days:
+        if d.weekday() in (5, 6):
+            out.append(d.isoformat())
+        d += timedelta(days=1)
+    return out
+
+
+def _simulate_race(rng: random.Random, race: dict, runners: List[dict]) -> List[dict]:
+    """能力 + ノイズで着順を決め、 タイム・上がり・通過順・オッズを付ける。"""
+    n = len(runners)
+    perf = sorted(((h["ability"] + rng.gauss(0, 0.8), i) for i, h in enumerate(runners)),
+                  reverse=True)
+    finish = {i: pos for pos, (_, i) in enumerate(perf, 1)}
+    strength = [math.exp(h["ability"] * 0.9 + rng.gauss(0, 0.3)) for h in runners]
+    total = sum(strength)
+    odds = [max(1.1, round(0.8 * total / s, 1)) for s in strength]
+    pop = {i: r for r, i in enumerate(sorted(range(n), key=lambda i: odds[i]), 1)}
+    base_time = race["distance"] / 1000 * (59.0 if race["track_type"] == "turf" else 61.5)
+    entries = []
+    for i, h in enumerate(runners):
+        fp = finish[i]
+        t = base_time + (fp - 1) * 0.15 + rng.uniform(0, 0.1)
+        l3 = round(33.5 + rng.uniform(0, 2.5) + (fp - 1) * 0.05, 1)
+        c_pos = max(1, min(n, round(fp + rng.gauss(0, 3))))
+        umaban = i + 1
+        entries.append({
+            "umaban": umaban, "wakuban": min(8, (umaban - 1) * 8 // n + 1),
+            "ketto_num": h["ketto_num"], "horse_name": h["name"], "sex_cd": h["sex_cd"],
+            "age": h["age"], "jockey_name": f"騎手{h['jockey']}", "trainer_name":
+                f"調教師{h['trainer']}", "jockey_code": f"{h['jockey']:05d}",
+            "trainer_code": f"{h['trainer']:05d}",
+            "futan": rng.choice([54.0, 55.0, 56.0, 57.0, 58.0]),
+            "horse_weight": h["weight"] + rng.randint(-8, 8),
+            "horse_weight_diff": rng.randint(-8, 8), "finish_position": fp,
+            "time": f"{int(t // 60)}:{t % 60:04.1f}" if t >= 60 else f"{t:.1f}",
+            "last_3f": l3, "last_4f": round(l3 + 11.8, 1), "odds": odds[i],
+            "popularity": pop[i], "margin": "" if fp == 1 else rng.choice(MARGINS),
+            "corners": [max(1, min(n, c_pos + rng.randint(-1, 1))) for _ in range(4)],
+            "_time_sec": t, "_ability": h["ability"],
+        })
+    return entries
+
+
+def _kb_ext(rng: random.Random, entries: List[dict]) -> dict:
+    out = {}
+    for e in entries:
+        out[str(e["umaban"])] = {
+            "training_arrow_value": rng.choice([-2, -1, 0, 1, 2]),
+            "mark_point": rng.randint(0, 10), "aggregate_mark_point": rng.randint(0, 30),
+            "rating": round(rng.uniform(40, 70), 1), "ai_index": rng.randint(30, 90),
+            "speed_indexes": [rng.choice([None, round(rng.uniform(60, 110), 1)])
+                              for _ in range(5)],
+            "cyokyo_detail": {
+                "oikiri_summary": {
+                    "oikiri_5f": round(rng.uniform(63, 70), 1),
+                    "oikiri_3f": round(rng.uniform(36, 41), 1),
+                    "oikiri_1f": round(rng.uniform(11.5, 13.5), 1),
+                    "oikiri_intensity": rng.choice(INTENSITIES),
+                    "oikiri_has_awase": rng.random() < 0.4,
+                    "oikiri_course": rng.choice(["美坂", "栗坂", "南W", "CW"]),
+                    "session_count": rng.randint(2, 8),
+                },
+                "rest_period": rng.choice(["中1週", "中2週", "中3週", "中4週", "休み明け"]),
+            },
+            "stable_comment": {"comment": rng.choice(COMMENTS)},
+            "previous_race_interview": {"interview": rng.choice(COMMENTS),
+                                        "next_race_memo": rng.choice(COMMENTS)},
+        }
+    return {"entries": out, "race_extras": {"hassou": ""}}
+
+
+def generate_corpus(root: Path, spec: CorpusSpec = CorpusSpec()) -> Corpus:
+    """root 以下にコーパスを生成して Corpus を返す (既存ファイルは上書き)。"""
+    root = Path(root)
+    rng = random.Random(spec.seed)
+    corpus = Corpus(root=root, spec=spec)
+    data = corpus.data_root
+
+    horses = [{
+        "ketto_num": f"20{19 + i % 5}{i:06d}", "name": f"シンセホース{i}",
+        "ability": rng.gauss(0, 1), "sex_cd": rng.choice("112"), "age": 3 + i % 5,
+        "weight": rng.randint(420, 520), "jockey": rng.randint(1, spec.n_jockeys),
+        "trainer": rng.randint(1, spec.n_trainers),
+    } for i in range(spec.n_horses)]
+
+    history: Dict[str, List[dict]] = {}
+    date_index: Dict[str, List[str]] = {}
+    se_by_month: Dict[Tuple[str, str], List[bytes]] = {}
+    venue_meet: Dict[str, Tuple[int, int]] = {}
+
+    for day_no, d in enumerate(_race_days(spec)):
+        y, m, dd = d.split("-")
+        day_horses = rng.sample(horses, min(len(horses),
+                                            spec.venues_per_day * spec.races_per_venue
+                                            * spec.max_runners))
+        cursor = 0
+        sed_lines: List[bytes] = []
+        for vi in range(spec.venues_per_day):
+            vc, vn = VENUES[(vi + day_no // 8) % len(VENUES)]
+            kai, nichi = venue_meet.get(vc, (1, 0))
+            nichi += 1
+            if nichi > 8:
+                kai, nichi = kai + 1, 1
+            venue_meet[vc] = (kai, nichi)
+            for rno in range(1, spec.races_per_venue + 1):
+                rid = f"{y}{m}{dd}{vc}{kai:02d}{nichi:02d}{rno:02d}"
+                track = "dirt" if rng.random() < 0.45 else "turf"
+                n = rng.randint(spec.min_runners, spec.max_runners)
+                runners = day_horses[cursor:cursor + n]
+                cursor += n
+                if len(runners) < 2:
+                    continue
+                race = {"race_id": rid, "date": d, "venue_code": vc, "venue_name": vn,
+                        "kai": kai, "nichi": nichi, "race_number": rno,
+                        "distance": rng.choice(DISTANCES[track]), "track_type": track,
+                        "track_condition": rng.choice(CONDITIONS),
+                        "num_runners": len(runners), "race_name": f"{vn}{rno}R",
+                        "grade": rng.choice(GRADES), "is_handicap": rng.random() < 0.1,
+                        "is_female_only": rng.random() < 0.1}
+                entries = _simulate_race(rng, race, runners)
+                l3 = sorted(e["last_3f"] for e in entries)[0]
+                s3 = round(l3 + rng.uniform(-1.5, 2.0), 1)
+                pace = RacePace(s3=s3, l3=l3, s4=round(s3 + 12, 1), l4=round(l3 + 12, 1),
+                                rpci=round(50 + (s3 - l3) * 3, 1),
+                                race_trend=rng.choice(["瞬発", "持続", "消耗"]),
+                                lap_times=[round(rng.uniform(11.2, 12.8), 1)
+                                           for _ in range(race["distance"] // 200)])
+                master = RaceMaster(
+                    **race, pace=pace,
+                    entries=[RaceEntry(**{k: v for k, v in e.items() if not k.startswith("_")})
+                             for e in entries],
+                    meta={"data_version": "4.2", "source": "synthetic",
+                          "created_at": f"{d}T00:00:00", "has_keibabook_ext": True})
+                race_dir = data / "races" / y / m / dd
+                race_dir.mkdir(parents=True, exist_ok=True)
+                (race_dir / f"race_{rid}.json").write_text(master.to_json(), encoding="utf-8")
+                kb_dir = data / "keibabook" / y / m / dd
+                kb_dir.mkdir(parents=True, exist_ok=True)
+                (kb_dir / f"kb_ext_{rid}.json").write_text(
+                    json.dumps(_kb_ext(rng, entries), ensure_ascii=False), encoding="utf-8")
+                date_index.setdefault(d, []).append(rid)
+                corpus.races.append((d, rid))
+
+                winner_t = min(e["_time_sec"] for e in entries)
+                for e in entries:
+                    history.setdefault(e["ketto_num"], []).append({
+                        "race_date": d, "race_id": rid, "venue_code": vc, "venue_name": vn,
+                        "track_type": track, "distance": race["distance"],
+                        "track_condition": race["track_condition"],
+                        "finish_position": e["finish_position"],
+                        "num_runners": race["num_runners"], "time": e["time"],
+                        "last_3f": e["last_3f"], "corners": e["corners"],
+                        "time_behind_winner": round(e["_time_sec"] - winner_t, 1),
+                        "margin": e["margin"], "odds": e["odds"], "futan": e["futan"],
+                        "horse_weight": e["horse_weight"], "popularity": e["popularity"],
+                        "jockey_code": e["jockey_code"], "trainer_code": e["trainer_code"],
+                        "grade": race["grade"], "umaban": e["umaban"],
+                        "is_handicap": race["is_handicap"],
+                        "is_female_only": race["is_female_only"],
+                    })
+                    se_by_month.setdefault((y, m), []).append(se_record(race, e))
+                    sed_lines.append(sed_line(race, e, rng))
+        sed_dir = corpus.jrdb_raw_dir / "SED"
+        sed_dir.mkdir(parents=True, exist_ok=True)
+        (sed_dir / f"SED{y[2:]}{m}{dd}.txt").write_bytes(b"\r\n".join(sed_lines) + b"\r\n")
+
+    for (y, m), recs in se_by_month.items():
+        se_dir = corpus.jv_root / "SE_DATA" / y
+        se_dir.mkdir(parents=True, exist_ok=True)
+        (se_dir / f"SU{y}{m}.DAT").write_bytes(b"".join(recs))
+
+    def _dump(path: Path, obj) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(obj, ensure_ascii=False), encoding="utf-8")
+
+    _dump(data / "ml" / "horse_history_cache.json", history)
+    _dump(data / "indexes" / "race_date_index.json", date_index)
+    for kind, n in (("jockeys", spec.n_jockeys), ("trainers", spec.n_trainers)):
+        _dump(data / "masters" / f"{kind}.json", [{
+            "code": f"{i:05d}", "name": f"{kind}{i}",
+            "win_rate": round(rng.uniform(0.02, 0.2), 3),
+            "top3_rate": round(rng.uniform(0.1, 0.45), 3), "total_runs": rng.randint(50, 900),
+            "venue_stats": {vc: {"runs": rng.randint(5, 200),
+                                 "top3_rate": round(rng.uniform(0.1, 0.45), 3)}
+                            for vc, _ in VENUES},
+        } for i in range(1, n + 1)])
+    _dump(root / "corpus_spec.json", asdict(spec))
+    return corpus
@@ -0,0 +1,410 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""性能回帰ベンチマーク — 合成コーパス上でホットパスを計測し JSON で比較する
+
+開催週末の本番中に遅くなったことに気付くのでは遅いので、 コミットごとに同じ合成コーパス
+(corpus.generate_corpus, seed 固定) で主要経路を計測し、 結果 JSON 同士を比較して
+閾値を超えた悪化を検出する。 DB / ネットワークには触らない。
+
+共有マシンでは CPU クロック自体が日によって揺れるため、 固定の純 Python 負荷
+(calibrate) の時間を各ベンチの直前に測って記録し、 比較時はその比で正規化する
+(--raw で無効化)。
+
+ベンチ (BENCHMARKS, 1 iteration の中身):
+  load_data          experiment.load_data (history cache / masters / pace / kb_ext)
+  features           compute_features_for_race × 最終日の全レース
+  predict            predict_race × 最終日の全レース (合成データで学習した小型 LightGBM)
+  recommendations    bet_engine.generate_recommendations (predict 出力, standard preset)
+  harville_place     harville.place_prob (全馬 × k=3) × 最終日の全レース
+  se_scan            se_parser.scan (SU*.DAT 全件)
+  jrdb_sed           jrdb.parser.load_sed_files (SED*.txt 全件)
+  ledger_votes       purchase_ledger.writer.record_portfolio_votes × 最終日の全レース
+
+結果 JSON:
+  {"meta": {commit, created_at, python, platform, scale, spec},
+   "results": {name: {"n_items", "repeat", "min_s", "median_s", "mean_s", "per_item_ms",
+                      "calibration_s"}}}
+
+CLI:
+    python -m ml.bench.suite --scale small
+    python -m ml.bench.suite --scale medium --only features,predict --repeat 5
+    python -m ml.bench.suite --compare base.json new.json --threshold 1.25
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core.jravan import se_parser  # noqa: E402
+from ml.bench.corpus import (  # noqa: E402
+    SCALES, SED_LINE_LEN, Corpus, CorpusSpec, generate_corpus,
+)
+
+DEFAULT_THRESHOLD = 1.25       # median がこの倍率を超えたら回帰
+META_COLS = {'race_id', 'date', 'ketto_num', 'horse_name', 'umaban', 'venue_name', 'grade',
+             'age_class', 'finish_position', 'is_top3', 'is_win', 'place_odds_low'}
+
+
+@dataclass
+class Benchmark:
+    name: str
+    setup: Callable[["BenchContext"], Any]        # 計測外。 戻り値が run に渡る
+    run: Callable[[Any], Any]                     # 1 iteration
+    n_items: Callable[[Any], int]                 # per_item_ms の分母
+
+
+# ---------------------------------------------------------------------------
+# 共有コンテキスト (コーパス + 重い前処理の遅延キャッシュ)
+# ---------------------------------------------------------------------------
+
+class BenchContext:
+    def __init__(self, corpus: Corpus):
+        self.corpus = corpus
+        self._cache: Dict[str, Any] = {}
+
+    @property
+    def day(self) -> str:
+        return self.corpus.dates[-1]
+
+    def once(self, key: str, fn: Callable[[], Any]) -> Any:
+        if key not in self._cache:
+            self._cache[key] = fn()
+        return self._cache[key]
+
+    def data(self) -> tuple:
+        from ml import experiment
+        return self.once("data", lambda: _quiet(experiment.load_data))
+
+    def races(self) -> List[dict]:
+        from ml import experiment
+        return self.once("races", lambda: [experiment.load_race_json(rid, self.day)
+                                           for rid in self.corpus.races_on(self.day)])
+
+    def models(self) -> tuple:
+        return self.once("models", lambda: _train_models(self))
+
+    def predictions(self) -> List[dict]:
+        return self.once("predictions", lambda: _predict_day(self.models(), self))
+
+
+def _quiet(fn: Callable, *args, **kwargs):
+    """計測対象の print を捨てる (端末出力のコストと雑音を除く)。"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+def _feature_kwargs(data: tuple) -> dict:
+    (history_cache, trainer_index, jockey_index, _date_index, pace_index, kb_ext_index,
+     training_summary_index, race_level_index, pedigree_index, sire_stats_index,
+     *_jrdb) = data
+    return dict(history_cache=history_cache, trainer_index=trainer_index,
+                jockey_index=jockey_index, pace_index=pace_index, kb_ext_index=kb_ext_index,
+                training_summary_index=training_summary_index,
+                race_level_index=race_level_index, pedigree_index=pedigree_index,
+                sire_stats_index=sire_stats_index)
+
+
+def _features_for(races: List[dict], data: tuple) -> List[dict]:
+    from ml.experiment import compute_features_for_race
+    kw = _feature_kwargs(data)
+    rows = []
+    for race in races:
+        rows.extend(compute_features_for_race(race, **kw))
+    return rows
+
+
+def _train_models(ctx: BenchContext) -> tuple:
+    """コーパス全レースの特徴量で P / W の小型 LightGBM を学習 (推論ベンチ用)。"""
+    import lightgbm as lgb
+    import numpy as np
+    import pandas as pd
+    from ml import experiment
+
+    races = [experiment.load_race_json(rid, d) for d, rid in ctx.corpus.races]
+    df = pd.DataFrame(_features_for(races, ctx.data()))
+    cols = [c for c in df.columns
+            if c not in META_COLS and pd.api.types.is_numeric_dtype(df[c])]
+    x = df[cols].astype(np.float64).to_numpy()
+    params = {'objective': 'binary', 'num_leaves': 15, 'learning_rate': 0.1,
+              'min_data_in_leaf': 5, 'verbose': -1, 'seed': 0, 'deterministic': True}
+    model_p = lgb.train(params, lgb.Dataset(x, df['is_top3'].to_numpy()), num_boost_round=60)
+    model_w = lgb.train(params, lgb.Dataset(x, df['is_win'].to_numpy()), num_boost_round=60)
+    return model_p, model_w, {'features_value': cols, 'version': 'bench'}
+
+
+def _predict_day(models: tuple, ctx: BenchContext) -> List[dict]:
+    from ml.predict import predict_race
+    model_p, model_w, meta = models
+    data = ctx.data()
+    kw = _feature_kwargs(data)
+    kb_ext_index = kw['kb_ext_index']
+    out = []
+    for race in ctx.races():
+        out.append(_quiet(
+            predict_race, dict(race), kb_ext_index.get(race['race_id']), model_p, meta,
+            kw['history_cache'], kw['trainer_index'], kw['jockey_index'], kw['pace_index'],
+            model_w=model_w, kb_ext_index=kb_ext_index,
+            race_level_index=kw['race_level_index'], pedigree_index=kw['pedigree_index'],
+            sire_stats_index=kw['sire_stats_index']))
+    return out
+
+
+# ---------------------------------------------------------------------------
+# ベンチ定義
+# ---------------------------------------------------------------------------
+
+def _setup_harville(ctx: BenchContext) -> List[dict]:
+    out = []
+    for race in ctx.races():
+        inv = {e['umaban']: 1.0 / e['odds'] for e in race['entries'] if e['odds'] > 0}
+        total = sum(inv.values())
+        out.append({k: v / total for k, v in inv.items()})
+    return out
+
+
+def _run_harville(probs_list: List[dict]) -> None:
+    from ml.strategies import harville
+    for probs in probs_list:
+        for h in probs:
+            harville.place_prob(probs, [h], 3)
+
+
+def _setup_ledger(ctx: BenchContext) -> dict:
+    votes = []
+    for race in ctx.races():
+        top = sorted(race['entries'], key=lambda e: e['odds'])[:3]
+        votes.append({'race_id': race['race_id'], 'tickets': [
+            {'bet_type': 'tansho', 'horses': [top[0]['umaban']], 'amount': 100},
+            {'bet_type': 'umaren', 'horses': sorted(e['umaban'] for e in top[:2]),
+             'amount': 200},
+            {'bet_type': 'wide', 'horses': sorted(e['umaban'] for e in top[1:3]),
+             'amount': 300}]})
+    return {'votes': votes, 'root': ctx.corpus.root / 'bench_ledger', 'n': 0}
+
+
+def _run_ledger(state: dict) -> None:
+    from ml.purchase_ledger import journal, writer
+    state['n'] += 1
+    ledger_dir = state['root'] / f"run{state['n']}"      # iteration ごとに空の台帳
+    with mock.patch.object(writer, 'LEDGER_DIR', ledger_dir), \
+            mock.patch.object(journal, '_JOURNALS', {}):
+        for v in state['votes']:
+            writer.record_portfolio_votes(race_id=v['race_id'], portfolio_strategy='bench',
+                                          tickets=v['tickets'])
+
+
+def _run_recommendations(preds: List[dict]) -> None:
+    from ml import bet_engine
+    with mock.patch.object(bet_engine, '_fetch_wide_odds_for_race', lambda rid: {}), \
+            mock.patch.object(bet_engine, '_fetch_umaren_odds_for_race', lambda rid: {}):
+        _quiet(bet_engine.generate_recommendations, preds, bet_engine.PRESETS['standard'])
+
+
+def _run_jrdb_sed(raw_dir: Path) -> None:
+    import jrdb.parser as jp
+    with mock.patch.object(jp, 'RAW_DIR', raw_dir):
+        _quiet(jp.load_sed_files)
+
+
+def _run_load_data(_) -> None:
+    from ml import experiment
+    _quiet(experiment.load_data)
+
+
+def _run_se_scan(years: List[int]) -> None:
+    for _ in se_parser.scan(years):
+        pass
+
+
+BENCHMARKS: Dict[str, Benchmark] = {b.name: b for b in [
+    Benchmark('load_data',
+              lambda ctx: None,
+              _run_load_data,
+              lambda _: 1),
+    Benchmark('features',
+              lambda ctx: (ctx.races(), ctx.data()),
+              lambda s: _features_for(*s),
+              lambda s: len(s[0])),
+    Benchmark('predict',
+              lambda ctx: (ctx.models(), ctx),
+              lambda s: _predict_day(*s),
+              lambda s: len(s[1].races())),
+    Benchmark('recommendations',
+              lambda ctx: ctx.predictions(),
+              _run_recommendations,
+              len),
+    Benchmark('harville_place',
+              _setup_harville,
+              _run_harville,
+              len),
+    Benchmark('se_scan',
+              lambda ctx: ctx.corpus.years,
+              _run_se_scan,
+              se_parser.count_records),
+    Benchmark('jrdb_sed',
+              lambda ctx: ctx.corpus.jrdb_raw_dir,
+              _run_jrdb_sed,
+              lambda d: sum(f.stat().st_size for f in (d / 'SED').glob('SED*.txt'))
+              // (SED_LINE_LEN + 2)),
+    Benchmark('ledger_votes',
+              _setup_ledger,
+              _run_ledger,
+              lambda s: len(s['votes'])),
+]}
+
+
+# ---------------------------------------------------------------------------
+# 実行・保存・比較
+# ---------------------------------------------------------------------------
+
+def time_benchmark(bench: Benchmark, ctx: BenchContext, repeat: int = 3) -> dict:
+    state = bench.setup(ctx)
+    n = max(1, int(bench.n_items(state)))
+    bench.run(state)                                   # warm-up (import / OS キャッシュ)
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        bench.run(state)
+        times.append(time.perf_counter() - t0)
+    median = statistics.median(times)
+    return {'calibration_s': calibrate(), 'n_items': n, 'repeat': repeat, 'min_s': round(min(times), 6),
+            'median_s': round(median, 6), 'mean_s': round(statistics.fmean(times), 6),
+            'per_item_ms': round(median / n * 1000, 4)}
+
+
+def calibrate(repeat: int = 5) -> float:
+    """マシン速度の基準 (固定の純 Python 負荷の median 秒)。"""
+    def work():
+        acc = 0
+        for i in range(200_000):
+            acc = (acc + i * i) % 1_000_003
+        return sorted(str(i) for i in range(20_000))
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        work()
+        times.append(time.perf_counter() - t0)
+    return round(statistics.median(times), 6)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=Path(__file__).resolve().parent,
+                              timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run_suite(corpus: Corpus, names: Optional[List[str]] = None, repeat: int = 3,
+              scale: str = 'custom', verbose: bool = True) -> dict:
+    """コーパス env 内で指定ベンチを計測し、 結果 dict (JSON 保存形式) を返す。"""
+    names = names or list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        raise ValueError(f"unknown benchmark: {unknown} (choices: {list(BENCHMARKS)})")
+    results = {}
+    with corpus.env():
+        ctx = BenchContext(corpus)
+        for name in names:
+            res = time_benchmark(BENCHMARKS[name], ctx, repeat=repeat)
+            results[name] = res
+            if verbose:
+                print(f"  {name:16s} median {res['median_s'] * 1000:9.1f} ms  "
+                      f"({res['per_item_ms']:.2f} ms/item × {res['n_items']})")
+    return {'meta': {'commit': _git_commit(),
+                     'created_at': datetime.now().isoformat(timespec='seconds'),
+                     'python': platform.python_version(), 'platform': platform.platform(),
+                     'scale': scale, 'spec': asdict(corpus.spec)},
+            'results': results}
+
+
+def compare_results(base: dict, new: dict, threshold: float = DEFAULT_THRESHOLD,
+                    normalize: bool = True) -> List[dict]:
+    """両方にあるベンチの median 比 (new / base)。 regression = ratio > threshold。
+
+    normalize=True で両方に calibration_s があれば、 その比で割ってマシン速度差を除く。
+    ratio は正規化後、 base_s / new_s は生の秒。
+    """
+    rows = []
+    if base.get('meta', {}).get('spec') != new.get('meta', {}).get('spec'):
+        print("[WARN] コーパス spec が異なる結果同士の比較です", file=sys.stderr)
+    for name, b in base.get('results', {}).items():
+        n = new.get('results', {}).get(name)
+        if n is None or not b.get('median_s'):
+            continue
+        cal_b, cal_n = b.get('calibration_s'), n.get('calibration_s')
+        speed = cal_n / cal_b if normalize and cal_b and cal_n else 1.0
+        ratio = n['median_s'] / b['median_s'] / speed
+        rows.append({'name': name, 'base_s': b['median_s'], 'new_s': n['median_s'],
+                     'ratio': round(ratio, 3), 'regression': ratio > threshold})
+    return rows
+
+
+def main() -> int:
+    from core import config
+
+    ap = argparse.ArgumentParser(description="合成コーパス上の性能回帰ベンチマーク")
+    ap.add_argument('--scale', default='small', choices=list(SCALES))
+    ap.add_argument('--only', default='', help=f"カンマ区切り ({','.join(BENCHMARKS)})")
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--seed', type=int, default=None, help="spec の seed を上書き")
+    ap.add_argument('--corpus-dir', default=None,
+                    help="コーパス生成先 (省略時は一時ディレクトリ、 終了時に削除)")
+    ap.add_argument('--out', default=None,
+                    help="結果 JSON (省略時 data3/ml/bench/{日時}_{commit}.json)")
+    ap.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), default=None)
+    ap.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    ap.add_argument('--raw', action='store_true', help="比較で calibration 正規化をしない")
+    args = ap.parse_args()
+
+    if args.compare:
+        base, new = (json.loads(Path(p).read_text(encoding='utf-8')) for p in args.compare)
+        rows = compare_results(base, new, args.threshold, normalize=not args.raw)
+        for r in rows:
+            flag = "  ← 回帰" if r['regression'] else ""
+            print(f"  {r['name']:16s} {r['base_s'] * 1000:9.1f} → {r['new_s'] * 1000:9.1f} ms "
+                  f"(x{r['ratio']:.2f}){flag}")
+        return 1 if any(r['regression'] for r in rows) else 0
+
+    spec = SCALES[args.scale]
+    if args.seed is not None:
+        spec = CorpusSpec(**{**asdict(spec), 'seed': args.seed})
+    names = [n.strip() for n in args.only.split(',') if n.strip()] or None
+    out_dir = config.ml_dir() / 'bench'          # コーパス env に入る前に解決
+
+    with contextlib.ExitStack() as stack:
+        root = (Path(args.corpus_dir) if args.corpus_dir
+                else Path(stack.enter_context(tempfile.TemporaryDirectory(prefix='keiba_bench_'))))
+        t0 = time.perf_counter()
+        corpus = generate_corpus(root, spec)
+        print(f"[bench] corpus {args.scale}: {len(corpus.races)} races, "
+              f"{len(corpus.dates)} days ({time.perf_counter() - t0:.1f}s)")
+        result = run_suite(corpus, names, repeat=args.repeat, scale=args.scale)
+
+    out = Path(args.out) if args.out else (
+        out_dir / f"{datetime.now():%Y%m%d_%H%M%S}_{result['meta']['commit'] or 'nogit'}.json")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f"[bench] saved → {out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
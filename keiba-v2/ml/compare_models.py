@@ -13,7 +13,6 @@ Usage:
 
 import argparse
 import io
-import json
 import sys
 from pathlib import Path
 
@@ -23,10 +22,8 @@ sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 from core import config
 
 
-def load_model_with_importance(version: str, model_name: str = "polaris"):
-    """指定バージョンのpolarisモデルとmeta + importance を取得"""
-    import lightgbm as lgb
-
+def _find_version_dir(version: str, model_name: str) -> Path:
+    """旧来の探索パス候補からバージョンディレクトリを探す"""
     base_dir = config.ml_dir() / "models" / model_name
     legacy_versions = config.ml_dir() / "versions"
     # 探索パス候補
@@ -38,33 +35,38 @@ def load_model_with_importance(version: str, model_name: str = "polaris"):
         legacy_versions / f"vpolaris-{version}",
         legacy_versions / version,
     ]
-    ver_dir = None
     for c in candidates:
         if c is not None and c.exists():
-            ver_dir = c
-            break
-    if ver_dir is None:
-        raise FileNotFoundError(
-            f"version '{version}' not found. tried: {[str(c) for c in candidates if c]}"
-        )
-
-    meta_path = ver_dir / "meta.json"
-    if not meta_path.exists():
-        meta_path = ver_dir / "model_meta.json"
-    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            return c
+    raise FileNotFoundError(
+        f"version '{version}' not found. tried: {[str(c) for c in candidates if c]}"
+    )
+
+
+def load_model_with_importance(version: str, model_name: str = "polaris"):
+    """指定バージョンのpolarisモデルとmeta + importance を取得
+
+    model_loader の ModelBundle 経由。 importance は fast-load キャッシュ
+    (manifest) に残るので、 2 回目以降の比較では Booster をパースしない。
+    """
+    from ml.model_loader import load_model, load_model_dir
+
+    try:
+        bundle = load_model(model_name, None if version in ("live", "active") else version)
+    except (FileNotFoundError, ValueError):
+        bundle = load_model_dir(_find_version_dir(version, model_name), model_name, version)
+    meta = bundle.meta
 
     importance = {}
     for tag in ("p", "w", "ar"):
-        model_file = ver_dir / f"model_{tag}.txt"
-        if not model_file.exists():
+        imp = bundle.feature_importance(f"model_{tag}", importance_type="gain")
+        if imp is None:
             continue
-        booster = lgb.Booster(model_file=str(model_file))
         feats = meta.get("features_per_model", {}).get(tag) or meta.get("features_value", [])
-        if len(feats) != booster.num_feature():
+        if len(feats) != len(imp["importance"]):
             # feat list 食い違い → booster側のnames使う
-            feats = booster.feature_name()
-        gains = booster.feature_importance(importance_type="gain")
-        importance[tag] = dict(zip(feats, gains))
+            feats = imp["feature_name"]
+        importance[tag] = dict(zip(feats, imp["importance"]))
 
     return meta, importance
 
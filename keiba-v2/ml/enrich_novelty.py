@@ -23,6 +23,7 @@ sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
 from core import config
+from jrdb.index_store import load_jrdb_index
 from ml.features.career_features import compute_career_features
 from ml.bet_engine import (
     passes_novelty_filter,
@@ -57,11 +58,8 @@ def load_indexes():
         history_cache = json.load(f)
     print(f"  History: {len(history_cache):,} horses")
 
-    sed_path = config.indexes_dir() / "jrdb_sed_index.json"
-    jrdb_sed_index = {}
-    if sed_path.exists():
-        with open(sed_path, encoding="utf-8") as f:
-            jrdb_sed_index = json.load(f)
+    jrdb_sed_index = load_jrdb_index('sed') or {}
+    if jrdb_sed_index:
         print(f"  JRDB SED: {len(jrdb_sed_index):,} entries")
     return history_cache, jrdb_sed_index
 
@@ -14,6 +14,7 @@ ML Experiment: LightGBM 3モデル(P/W/AR)学習・評価パイプライン
 Usage:
     python -m ml.experiment [--train-years 2020-2024] [--test-years 2025-2026]
     python -m ml.experiment --no-db  # DB未使用（旧JSON確定オッズ）
+    python -m ml.experiment --profile  # 特徴量抽出のステージ別プロファイル (ml/profile/ に出力)
 """
 
 import argparse
@@ -22,7 +23,7 @@ import sys
 import time
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
@@ -30,6 +31,11 @@ import pandas as pd
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
 from core import config
+from jrdb.index_store import load_jrdb_index
+from ml.utils import profiler
+from ml.utils.profiler import PROFILER
+from ml.utils.roi_cube import Axis, roi_cube
+from ml.utils.race_corpus import RaceCorpus, shared_corpus, use_training_cache
 
 # === Value Bet閾値 ===
 VALUE_BET_MIN_GAP = 3  # predict.pyと統一
@@ -296,11 +302,8 @@ PARAMS_AR = {
 
 
 def load_race_json(race_id: str, date: str) -> dict:
-    """レースJSONを読み込む"""
-    parts = date.split('-')
-    path = config.races_dir() / parts[0] / parts[1] / parts[2] / f"race_{race_id}.json"
-    with open(path, encoding='utf-8') as f:
-        return json.load(f)
+    """レースJSONを読み込む (プロセス共通 RaceCorpus 経由: 同一ファイルの decode は 1 回)"""
+    return shared_corpus().get(race_id, date)
 
 
 def _iter_date_index(date_index: dict):
@@ -315,16 +318,17 @@ def _iter_date_index(date_index: dict):
                 yield date_str, race_id
 
 
-def build_pace_index(date_index: dict) -> dict:
+def build_pace_index(date_index: dict, corpus: RaceCorpus = None) -> dict:
     """全レースJSONからペースデータを抽出して辞書化"""
     print("[Load] Building pace index...")
+    corpus = corpus or shared_corpus()
     pace_index = {}
     count = 0
     errors = 0
 
     for date_str, race_id in _iter_date_index(date_index):
         try:
-            race = load_race_json(race_id, date_str)
+            race = corpus.get(race_id, date_str)
             pace = race.get('pace') or {}
             if pace.get('rpci'):
                 pace_index[race_id] = {
@@ -634,7 +638,7 @@ def _build_venue_timelines(records: list, trainer_tl: dict, jockey_tl: dict):
                     v['top3'] += 1
 
 
-def _build_close_timeline(jockey_tl: dict):
+def _build_close_timeline(jockey_tl: dict, corpus: RaceCorpus = None):
     """race JSONから騎手の接戦勝率累積タイムラインを構築"""
     from collections import defaultdict
 
@@ -645,14 +649,14 @@ def _build_close_timeline(jockey_tl: dict):
     # Collect all close events with dates
     events = []
 
-    races_dir = config.races_dir()
-    race_files = sorted(races_dir.glob("**/race_[0-9]*.json"))
+    corpus = corpus or shared_corpus()
+    race_files = corpus.race_files()
     race_count = 0
     close_count = 0
 
     for json_file in race_files:
         try:
-            data = json.loads(json_file.read_text(encoding='utf-8'))
+            data = corpus.load_path(json_file)
         except Exception:
             continue
         race_count += 1
@@ -723,15 +727,23 @@ def _parse_race_time(time_str: str):
         return None
 
 
-def build_pit_sire_timeline(date_index: dict, pedigree_index: dict) -> Tuple[dict, dict, dict]:
+def build_pit_sire_timeline(date_index: dict, pedigree_index: dict,
+                            sire_store=None) -> Tuple[dict, dict, dict]:
     """レースJSONからsire/dam/bms累積タイムラインを構築（PIT safe）
 
     各sire/dam/bms IDについて、各レース日の終了時点での累積統計を記録。
     ルックアップ時は bisect_left(dates, race_date) - 1 で race_date 以前の統計を取得。
 
+    sire_store (builders.build_sire_stats.SireStatsStore) を渡した場合は
+    レースJSONを読み直さずにストアから同形式のタイムラインを展開する。
+
     Returns:
         (sire_tl, dam_tl, bms_tl)
     """
+    if sire_store is not None:
+        print("[PIT] Expanding sire/dam/bms timeline from sire_stats_timeline store...")
+        return sire_store.pit_timelines()
+
     from collections import defaultdict
     from itertools import groupby
     from datetime import datetime as dt
@@ -977,7 +989,15 @@ def load_data(sire_cutoff: str = None) -> tuple:
         print("  Pedigree index: NOT FOUND (skipping)")
 
     # Sire stats index (v5.8)
+    sire_store = None
     if sire_cutoff:
+        from builders.build_sire_stats import load_sire_stats_store
+        sire_store = load_sire_stats_store()
+    if sire_store is not None:
+        # 累積タイムラインから任意カットオフの統計を再構成 (カットオフ別JSON不要)
+        sire_path = None
+        sire_stats_index = sire_store.stats_as_of(sire_cutoff)
+    elif sire_cutoff:
         suffix = sire_cutoff.replace('-', '')
         sire_path = config.indexes_dir() / f"sire_stats_index_cutoff_{suffix}.json"
         if not sire_path.exists():
@@ -987,10 +1007,12 @@ def load_data(sire_cutoff: str = None) -> tuple:
             print(f"  Falling back to default: {sire_path}")
     else:
         sire_path = config.indexes_dir() / "sire_stats_index.json"
-    sire_stats_index = {}
-    if sire_path.exists():
-        with open(sire_path, encoding='utf-8') as f:
-            sire_stats_index = json.load(f)
+    if sire_path is not None:
+        sire_stats_index = {}
+        if sire_path.exists():
+            with open(sire_path, encoding='utf-8') as f:
+                sire_stats_index = json.load(f)
+    if sire_stats_index:
         n_sire = len(sire_stats_index.get('sire', {}))
         n_dam = len(sire_stats_index.get('dam', {}))
         n_bms = len(sire_stats_index.get('bms', {}))
@@ -1008,44 +1030,21 @@ def load_data(sire_cutoff: str = None) -> tuple:
     # CK_DATA training summary index
     training_summary_index = build_training_summary_index(date_index)
 
-    # JRDB indexes (v7.0)
-    jrdb_sed_index = {}
-    jrdb_kyi_index = {}
-    sed_path = config.indexes_dir() / "jrdb_sed_index.json"
-    kyi_path = config.indexes_dir() / "jrdb_kyi_index.json"
-    if sed_path.exists():
-        with open(sed_path, encoding='utf-8') as f:
-            jrdb_sed_index = json.load(f)
-        print(f"  JRDB SED index: {len(jrdb_sed_index):,} entries")
-    else:
-        print("  JRDB SED index: NOT FOUND (skipping)")
-    if kyi_path.exists():
-        with open(kyi_path, encoding='utf-8') as f:
-            jrdb_kyi_index = json.load(f)
-        print(f"  JRDB KYI index: {len(jrdb_kyi_index):,} entries")
-    else:
-        print("  JRDB KYI index: NOT FOUND (skipping)")
+    # JRDB indexes (v7.0) — 列指向 .npz を優先 (無ければ旧 .json)
+    def _load_jrdb(name):
+        idx = load_jrdb_index(name)
+        if idx is None:
+            print(f"  JRDB {name.upper()} index: NOT FOUND (skipping)")
+            return {}
+        print(f"  JRDB {name.upper()} index: {len(idx):,} entries")
+        return idx
+    jrdb_sed_index = _load_jrdb('sed')
+    jrdb_kyi_index = _load_jrdb('kyi')
 
     # KAA index (v7.2: トラックバイアス)
-    jrdb_kaa_index = {}
-    kaa_path = config.indexes_dir() / "jrdb_kaa_index.json"
-    if kaa_path.exists():
-        with open(kaa_path, encoding='utf-8') as f:
-            jrdb_kaa_index = json.load(f)
-        print(f"  JRDB KAA index: {len(jrdb_kaa_index):,} entries")
-    else:
-        print("  JRDB KAA index: NOT FOUND (skipping)")
+    jrdb_kaa_index = _load_jrdb('kaa')
 
     # CYB/CHA/KKA/JOA indexes (Session 115: 新規JRDB5種)
-    def _load_jrdb(name):
-        p = config.indexes_dir() / f"jrdb_{name}_index.json"
-        if p.exists():
-            with open(p, encoding='utf-8') as f:
-                idx = json.load(f)
-            print(f"  JRDB {name.upper()} index: {len(idx):,} entries")
-            return idx
-        print(f"  JRDB {name.upper()} index: NOT FOUND (skipping)")
-        return {}
     jrdb_cyb_index = _load_jrdb('cyb')
     jrdb_cha_index = _load_jrdb('cha')
     jrdb_kka_index = _load_jrdb('kka')
@@ -1058,6 +1057,47 @@ def load_data(sire_cutoff: str = None) -> tuple:
             jrdb_cyb_index, jrdb_cha_index, jrdb_kka_index, jrdb_joa_index)
 
 
+from ml.features.base_features import extract_base_features
+from ml.features.past_features import compute_past_features
+from ml.features.trainer_features import get_trainer_features
+from ml.features.jockey_features import get_jockey_features
+from ml.features.running_style_features import compute_running_style_features
+from ml.features.rotation_features import compute_rotation_features
+from ml.features.pace_features import compute_pace_features
+from ml.features.training_features import compute_training_features
+from ml.features.speed_features import compute_speed_features
+from ml.features.comment_features import compute_comment_features
+from ml.features.slow_start_features import compute_slow_start_features
+from ml.features.pedigree_features import get_pedigree_features, build_sire_index
+from ml.features.baba_features import get_baba_features
+from ml.features.jrdb_features import compute_jrdb_features
+from ml.features.track_bias_features import (
+    compute_race_bias_features, compute_horse_bias_features
+)
+
+# 抽出器表 (compute_features_for_race 用)。 モジュールで 1 回だけ作り、
+# ステージ計時の包み直しは PROFILER の有効/無効が変わったときだけ
+_STAGE_FX = profiler.StageFunctions(
+    extract_base_features, compute_past_features,
+    get_trainer_features, get_jockey_features,
+    compute_running_style_features, compute_rotation_features,
+    compute_pace_features, compute_training_features, compute_speed_features,
+    compute_comment_features, compute_slow_start_features,
+    get_pedigree_features, build_sire_index, get_baba_features, compute_jrdb_features,
+    compute_race_bias_features, compute_horse_bias_features,
+)
+# feature_engine 指定時に engine のメソッドへ差し替える抽出器 (過去走系)
+_ENGINE_STAGE_OVERRIDES = {
+    'compute_past_features': 'past_features',
+    'compute_running_style_features': 'running_style_features',
+    'compute_rotation_features': 'rotation_features',
+    'compute_slow_start_features': 'slow_start_features',
+    'compute_jrdb_features': 'jrdb_features',
+    'compute_horse_bias_features': 'horse_bias_features',
+}
+
+
+@PROFILER.race('compute_features_for_race')
 def compute_features_for_race(
     race: dict,
     history_cache: dict,
@@ -1084,6 +1124,7 @@ def compute_features_for_race(
     jrdb_cha_index: dict = None,
     jrdb_kka_index: dict = None,
     jrdb_joa_index: dict = None,
+    feature_engine=None,
 ) -> List[dict]:
     """1レースの全出走馬の特徴量を計算
 
@@ -1093,27 +1134,13 @@ def compute_features_for_race(
         db_place_odds: mykeibadb複勝オッズ {umaban: {'odds_low': float, 'odds_high': float}}
         race_level_index: レースレベルインデックス {race_id: {level_vs_class, level_rank, ...}}
         pedigree_index: 血統インデックス {ketto_num: {sire: hansyoku_num, bms: hansyoku_num}}
+        feature_engine: IncrementalFeatureEngine (指定時は過去走系特徴量を
+            日付順スイープの状態から計算。 結果は従来関数と同一)
     """
-    from ml.features.base_features import extract_base_features
-    from ml.features.past_features import compute_past_features
-    from ml.features.trainer_features import get_trainer_features
-    from ml.features.jockey_features import get_jockey_features
-    from ml.features.running_style_features import compute_running_style_features
-    from ml.features.rotation_features import compute_rotation_features
-    from ml.features.pace_features import compute_pace_features
-    from ml.features.training_features import compute_training_features
-    from ml.features.speed_features import compute_speed_features
-    from ml.features.comment_features import compute_comment_features
-    from ml.features.slow_start_features import compute_slow_start_features
-    from ml.features.pedigree_features import get_pedigree_features, build_sire_index
-    from ml.features.baba_features import get_baba_features
-    from ml.features.jrdb_features import compute_jrdb_features
-    from ml.features.track_bias_features import (
-        compute_race_bias_features, compute_horse_bias_features
-    )
+    fx = _STAGE_FX.get(feature_engine, _ENGINE_STAGE_OVERRIDES)
 
     # Sire/Dam/BMS index (build once per race call)
-    _sire_idx, _dam_idx, _bms_idx = build_sire_index(sire_stats_index or {})
+    _sire_idx, _dam_idx, _bms_idx = fx.build_sire_index(sire_stats_index or {})
 
     race_date = race['date']
     race_id = race['race_id']
@@ -1145,6 +1172,9 @@ def compute_features_for_race(
     # CK_DATA調教サマリ（日付単位）
     ts_day = (training_summary_index or {}).get(race_date, {})
 
+    PROFILER.hit('kb_ext', kb_ext is not None)
+    PROFILER.hit('db_odds', bool(db_odds))
+
     rows = []
     for entry in race.get('entries', []):
         fp = entry.get('finish_position', 0)
@@ -1152,9 +1182,12 @@ def compute_features_for_race(
             continue
 
         ketto_num = entry.get('ketto_num', '')
+        if PROFILER.enabled:
+            PROFILER.hit('history', ketto_num in history_cache)
+            PROFILER.hit('ck_training', ketto_num in ts_day)
 
         # 基本特徴量
-        feat = extract_base_features(entry, race)
+        feat = fx.extract_base_features(entry, race)
 
         # DB事前オッズで上書き（データリーク解消）
         umaban = entry.get('umaban', 0)
@@ -1165,7 +1198,7 @@ def compute_features_for_race(
                 feat['popularity'] = ninki
 
         # 過去走特徴量
-        past = compute_past_features(
+        past = fx.compute_past_features(
             ketto_num=ketto_num,
             race_date=race_date,
             venue_code=venue_code,
@@ -1180,7 +1213,7 @@ def compute_features_for_race(
 
         # 調教師特徴量
         tc = entry.get('trainer_code', '')
-        trainer_feat = get_trainer_features(
+        trainer_feat = fx.get_trainer_features(
             tc, venue_code, trainer_index,
             race_date=race_date, pit_timeline=pit_trainer_tl,
         )
@@ -1188,14 +1221,14 @@ def compute_features_for_race(
 
         # 騎手特徴量
         jc = entry.get('jockey_code', '')
-        jockey_feat = get_jockey_features(
+        jockey_feat = fx.get_jockey_features(
             jc, venue_code, jockey_index,
             race_date=race_date, pit_timeline=pit_jockey_tl,
         )
         feat.update(jockey_feat)
 
         # 脚質特徴量 (v3.1)
-        rs_feat = compute_running_style_features(
+        rs_feat = fx.compute_running_style_features(
             ketto_num=ketto_num,
             race_date=race_date,
             entry_count=entry_count,
@@ -1204,7 +1237,7 @@ def compute_features_for_race(
         feat.update(rs_feat)
 
         # ローテ・コンディション特徴量 (v3.1 + v5.1 降格ローテ)
-        rot_feat = compute_rotation_features(
+        rot_feat = fx.compute_rotation_features(
             ketto_num=ketto_num,
             race_date=race_date,
             futan=entry.get('futan', 0.0),
@@ -1223,7 +1256,7 @@ def compute_features_for_race(
         feat.update(rot_feat)
 
         # ペース特徴量 (v3.1)
-        pace_feat = compute_pace_features(
+        pace_feat = fx.compute_pace_features(
             ketto_num=ketto_num,
             race_date=race_date,
             days_since_last_race=past.get('days_since_last_race', -1),
@@ -1234,7 +1267,7 @@ def compute_features_for_race(
 
         # 調教特徴量 (v3.3 + v4.1 CK_DATA)
         ck_training = ts_day.get(ketto_num) if ketto_num else None
-        train_feat = compute_training_features(
+        train_feat = fx.compute_training_features(
             umaban=str(entry.get('umaban', '')),
             kb_ext=kb_ext,
             ck_training=ck_training,
@@ -1242,21 +1275,21 @@ def compute_features_for_race(
         feat.update(train_feat)
 
         # スピード指数特徴量 (v3.5)
-        speed_feat = compute_speed_features(
+        speed_feat = fx.compute_speed_features(
             umaban=str(entry.get('umaban', '')),
             kb_ext=kb_ext,
         )
         feat.update(speed_feat)
 
         # コメントNLP特徴量 (v5.3)
-        comment_feat = compute_comment_features(
+        comment_feat = fx.compute_comment_features(
             umaban=str(entry.get('umaban', '')),
             kb_ext=kb_ext,
         )
         feat.update(comment_feat)
 
         # 出遅れ特徴量 (v5.4)
-        slow_feat = compute_slow_start_features(
+        slow_feat = fx.compute_slow_start_features(
             ketto_num=ketto_num,
             race_date=race_date,
             history_cache=history_cache,
@@ -1265,7 +1298,7 @@ def compute_features_for_race(
         feat.update(slow_feat)
 
         # 血統特徴量 (v5.9): 事前計算の集計統計量
-        ped_feat = get_pedigree_features(
+        ped_feat = fx.get_pedigree_features(
             ketto_num, pedigree_index or {}, _sire_idx, _dam_idx, _bms_idx,
             race_date=race_date,
             pit_sire_tl=pit_sire_tl, pit_dam_tl=pit_dam_tl, pit_bms_tl=pit_bms_tl,
@@ -1273,12 +1306,12 @@ def compute_features_for_race(
         feat.update(ped_feat)
 
         # 馬場特徴量 (v5.41)
-        baba_feat = get_baba_features(race_id, track_type, baba_index or {})
+        baba_feat = fx.get_baba_features(race_id, track_type, baba_index or {})
         feat.update(baba_feat)
 
         # JRDB特徴量 (v7.0 + Session 115: CYB/CHA/KKA/JOA)
         if jrdb_sed_index is not None or jrdb_kyi_index is not None:
-            jrdb_feat = compute_jrdb_features(
+            jrdb_feat = fx.compute_jrdb_features(
                 ketto_num=ketto_num,
                 race_date=race_date,
                 history_cache=history_cache,
@@ -1296,7 +1329,7 @@ def compute_features_for_race(
         # トラックバイアス特徴量 (v7.2)
         if jrdb_kaa_index:
             # 当日バイアス (レース共通、全馬同じ値)
-            race_bias = compute_race_bias_features(
+            race_bias = fx.compute_race_bias_features(
                 race_id=race_id,
                 race_date=race_date,
                 track_type=track_type,
@@ -1305,7 +1338,7 @@ def compute_features_for_race(
             feat.update(race_bias)
 
             # 過去走バイアス経験 (馬レベル)
-            horse_bias = compute_horse_bias_features(
+            horse_bias = fx.compute_horse_bias_features(
                 ketto_num=ketto_num,
                 race_date=race_date,
                 sed_index=jrdb_sed_index or {},
@@ -1370,6 +1403,8 @@ def build_dataset(
     jrdb_kka_index: dict = None,
     jrdb_joa_index: dict = None,
     save_features: bool = False,
+    feature_engine=None,
+    corpus: RaceCorpus = None,
 ) -> pd.DataFrame:
     """全レースの特徴量を構築してDataFrameで返す
 
@@ -1381,7 +1416,11 @@ def build_dataset(
         training_summary_index: CK_DATA調教サマリインデックス
         race_level_index: レースレベルインデックス
         save_features: True=特徴量スナップショットを保存
+        feature_engine: IncrementalFeatureEngine。 train→val→test で共有すると
+            走歴の畳み込みが全期間で1回になる (日付が遡る場合は自動で reset)
+        corpus: race JSON の読込元 (None=プロセス共通 RaceCorpus)
     """
+    corpus = corpus or shared_corpus()
     # 月フィルタ: YYYYMM形式の整数で比較
     date_min = min_year * 100 + (min_month or 1)
     date_max = max_year * 100 + (max_month or 12)
@@ -1420,53 +1459,69 @@ def build_dataset(
         except Exception as e:
             print(f"[DB Odds] Error: {e}, using JSON odds")
 
+    # 特徴量スナップショット: 日単位で1ブロックにまとめて追記
+    snapshot_writer = None
+    if save_features:
+        from ml.feature_snapshot import FeatureSnapshotWriter
+        snapshot_writer = FeatureSnapshotWriter(source="experiment")
+
+    if feature_engine is not None and target_races \
+            and target_races[0][0] < feature_engine.cursor:
+        feature_engine.reset()
+
     all_rows = []
     race_count = 0
     error_count = 0
 
     obstacle_count = 0
-    for date_str, race_id in target_races:
-        try:
-            race = load_race_json(race_id, date_str)
-            # 障害レースを除外（平地モデル専用）
-            if is_obstacle(race):
-                obstacle_count += 1
-                continue
-            rows = compute_features_for_race(
-                race, history_cache, trainer_index, jockey_index,
-                pace_index, kb_ext_index,
-                db_odds=db_odds_index.get(race_id),
-                training_summary_index=training_summary_index,
-                db_place_odds=db_place_odds_index.get(race_id),
-                race_level_index=race_level_index,
-                pedigree_index=pedigree_index,
-                sire_stats_index=sire_stats_index,
-                pit_trainer_tl=pit_trainer_tl,
-                pit_jockey_tl=pit_jockey_tl,
-                pit_sire_tl=pit_sire_tl,
-                pit_dam_tl=pit_dam_tl,
-                pit_bms_tl=pit_bms_tl,
-                baba_index=baba_index,
-                jrdb_sed_index=jrdb_sed_index,
-                jrdb_kyi_index=jrdb_kyi_index,
-                jrdb_kaa_index=jrdb_kaa_index,
-                jrdb_cyb_index=jrdb_cyb_index,
-                jrdb_cha_index=jrdb_cha_index,
-                jrdb_kka_index=jrdb_kka_index,
-                jrdb_joa_index=jrdb_joa_index,
-            )
-            if save_features and rows:
-                from ml.feature_snapshot import save_feature_snapshot
-                save_feature_snapshot(rows, race, source="experiment")
-            all_rows.extend(rows)
-            race_count += 1
-        except Exception as e:
-            error_count += 1
-            if error_count <= 3:
-                print(f"  ERROR: {race_id}: {e}")
-
-        if race_count % 1000 == 0 and race_count > 0:
-            print(f"  ... {race_count:,} races, {len(all_rows):,} entries")
+    try:
+        for date_str, race_id in target_races:
+            try:
+                with PROFILER.stage('load_race_json'):
+                    race = corpus.get(race_id, date_str)
+                # 障害レースを除外（平地モデル専用）
+                if is_obstacle(race):
+                    obstacle_count += 1
+                    continue
+                rows = compute_features_for_race(
+                    race, history_cache, trainer_index, jockey_index,
+                    pace_index, kb_ext_index,
+                    db_odds=db_odds_index.get(race_id),
+                    training_summary_index=training_summary_index,
+                    db_place_odds=db_place_odds_index.get(race_id),
+                    race_level_index=race_level_index,
+                    pedigree_index=pedigree_index,
+                    sire_stats_index=sire_stats_index,
+                    pit_trainer_tl=pit_trainer_tl,
+                    pit_jockey_tl=pit_jockey_tl,
+                    pit_sire_tl=pit_sire_tl,
+                    pit_dam_tl=pit_dam_tl,
+                    pit_bms_tl=pit_bms_tl,
+                    baba_index=baba_index,
+                    jrdb_sed_index=jrdb_sed_index,
+                    jrdb_kyi_index=jrdb_kyi_index,
+                    jrdb_kaa_index=jrdb_kaa_index,
+                    jrdb_cyb_index=jrdb_cyb_index,
+                    jrdb_cha_index=jrdb_cha_index,
+                    jrdb_kka_index=jrdb_kka_index,
+                    jrdb_joa_index=jrdb_joa_index,
+                    feature_engine=feature_engine,
+                )
+                if snapshot_writer is not None and rows:
+                    snapshot_writer.add(rows, race)
+                all_rows.extend(rows)
+                race_count += 1
+            except Exception as e:
+                error_count += 1
+                if error_count <= 3:
+                    print(f"  ERROR: {race_id}: {e}")
+
+            if race_count % 1000 == 0 and race_count > 0:
+                print(f"  ... {race_count:,} races, {len(all_rows):,} entries")
+    finally:
+        # 例外で抜けても溜めた日のブロックは書き出す (ファイルも閉じる)
+        if snapshot_writer is not None:
+            snapshot_writer.close()
 
     df = pd.DataFrame(all_rows)
 
@@ -1482,8 +1537,8 @@ def build_dataset(
     msg = f"[Build] {race_count:,} races, {len(df):,} entries, {error_count} errors"
     if obstacle_count > 0:
         msg += f", {obstacle_count} obstacle races excluded"
-    if save_features:
-        msg += f", snapshots saved to data3/features/"
+    if snapshot_writer is not None:
+        msg += f", snapshots saved to data3/features/ ({snapshot_writer.rows_written:,} rows)"
     print(msg)
     return df
 
@@ -1543,6 +1598,7 @@ def train_model(
     model_name: str = 'model',
     num_boost_round: int = 1500,
     sample_weight: np.ndarray = None,
+    dataset_cache=None,
 ) -> Tuple:
     """LightGBMモデルを学習
 
@@ -1550,6 +1606,8 @@ def train_model(
     NaN処理はLightGBMネイティブに委ねる（fillna(-1)しない）
     IsotonicRegressionでキャリブレーション（valセットでfit → testセットに適用）
     sample_weight: 学習データの重み（Noneで等重み）
+    dataset_cache: ml.utils.lgb_dataset_cache.DatasetCache。 指定時は同じ特徴量行列の
+        ビン化済み Dataset を P/W/AR で共有し、 ラベル・重みだけ差し替える
     """
     import lightgbm as lgb
 
@@ -1560,8 +1618,13 @@ def train_model(
     X_test = df_test[feature_cols]
     y_test = df_test[label_col]
 
-    train_data = lgb.Dataset(X_train, label=y_train, weight=sample_weight)
-    valid_data = lgb.Dataset(X_val, label=y_val, reference=train_data)
+    if dataset_cache is not None:
+        train_data = dataset_cache.train_set(X_train, y_train, weight=sample_weight,
+                                             params=params)
+        valid_data = dataset_cache.valid_set(X_val, y_val, train_data)
+    else:
+        train_data = lgb.Dataset(X_train, label=y_train, weight=sample_weight)
+        valid_data = lgb.Dataset(X_val, label=y_val, reference=train_data)
 
     weight_info = ""
     if sample_weight is not None:
@@ -1738,28 +1801,16 @@ def calc_ard_threshold_analysis(df: pd.DataFrame) -> List[dict]:
             ...
         ]
     """
-    results = []
-    for threshold in [50, 55, 60, 65, 70]:
-        subset = df[df['ar_deviation'] >= threshold]
-        total = len(subset)
-        if total == 0:
-            results.append({
-                'threshold': threshold,
-                'total': 0, 'wins': 0, 'win_rate': 0,
-                'places': 0, 'place_rate': 0,
-            })
-            continue
-        wins = int(subset['is_win'].sum())
-        places = int(subset['is_top3'].sum())
-        results.append({
-            'threshold': threshold,
-            'total': total,
-            'wins': wins,
-            'win_rate': round(wins / total, 4),
-            'places': places,
-            'place_rate': round(places / total, 4),
-        })
-    return results
+    cells = roi_cube(df, [Axis('ar_deviation', [50, 55, 60, 65, 70], key='threshold')],
+                     keep_empty=True)
+    return [{
+        'threshold': c['threshold'],
+        'total': c['count'],
+        'wins': c['win_hits'],
+        'win_rate': round(c['win_hits'] / c['count'], 4) if c['count'] else 0,
+        'places': c['place_hits'],
+        'place_rate': round(c['place_hits'] / c['count'], 4) if c['count'] else 0,
+    } for c in cells]
 
 
 def _get_place_odds(row) -> float:
@@ -1771,84 +1822,61 @@ def _get_place_odds(row) -> float:
     return max(row['odds'] / 3.5, 1.1)
 
 
+def _place_odds_array(df: pd.DataFrame) -> np.ndarray:
+    """_get_place_odds の列演算版 (行ごとの apply を避ける)"""
+    est = np.maximum(df['odds'].to_numpy(dtype=np.float64, na_value=np.nan) / 3.5, 1.1)
+    if 'place_odds_low' not in df.columns:
+        return est
+    low = df['place_odds_low'].to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.where(low > 0, low, est)
+
+
 def calc_roi_analysis(df: pd.DataFrame, pred_col: str, ascending: bool = False) -> dict:
     """ROI分析（Top1）"""
     df['pred_rank'] = df.groupby('race_id')[pred_col].rank(ascending=ascending, method='min')
-    top1 = df[df['pred_rank'] == 1].copy()
 
-    # 単勝ROI
-    total_bets = len(top1) * 100
-    win_return = top1[top1['is_win'] == 1]['odds'].sum() * 100
-    win_roi = win_return / total_bets * 100 if total_bets > 0 else 0
-
-    # 複勝ROI: DB実複勝オッズを優先、なければ推定
-    place_hits = top1[top1['is_top3'] == 1]
-    place_return = place_hits.apply(_get_place_odds, axis=1).sum() * 100
-    place_roi = place_return / total_bets * 100 if total_bets > 0 else 0
+    # 単勝ROI / 複勝ROI: DB実複勝オッズを優先、なければ推定
+    [top1] = roi_cube(df, [Axis('pred_rank', [1], op='<=')],
+                      place_odds=_place_odds_array(df), keep_empty=True)
 
     # DB複勝オッズのカバレッジ
     has_db_place = 0
-    if 'place_odds_low' in top1.columns:
-        has_db_place = int(top1['place_odds_low'].notna().sum())
+    if 'place_odds_low' in df.columns:
+        has_db_place = int(df.loc[df['pred_rank'] == 1, 'place_odds_low'].notna().sum())
 
     return {
-        'top1_win_roi': round(win_roi, 1),
-        'top1_place_roi': round(place_roi, 1),
-        'top1_bets': len(top1),
+        'top1_win_roi': top1['win_roi'],
+        'top1_place_roi': top1['place_roi'],
+        'top1_bets': top1['count'],
         'place_odds_db_count': has_db_place,
     }
 
 
+def _vb_gap(df: pd.DataFrame, rank_col: str) -> np.ndarray:
+    """odds_rank - モデル順位 (odds_rank >= rank + min_gap ⇔ gap >= min_gap)"""
+    return (df['odds_rank'] - df[rank_col]).to_numpy(dtype=np.float64, na_value=np.nan)
+
+
 def calc_value_bet_analysis(df: pd.DataFrame, rank_col: str = 'pred_rank_p') -> List[dict]:
     """Value Bet分析: モデル順位とオッズ順位の乖離を利用"""
     if rank_col not in df.columns or 'odds_rank' not in df.columns:
         return []
 
-    results = []
-    for min_gap in [2, 3, 4, 5]:
-        total_bets = 0
-        place_return = 0
-        win_return = 0
-        place_hits = 0
-        win_hits = 0
-        total_count = 0
-
-        for race_id, group in df.groupby('race_id'):
-            # Value Bet候補: モデルで上位3位以内 かつ odds_rankとの乖離がmin_gap以上
-            candidates = group[
-                (group[rank_col] <= 3) &
-                (group['odds_rank'] >= group[rank_col] + min_gap)
-            ]
-
-            for _, row in candidates.iterrows():
-                bet = 100
-                total_bets += bet
-                total_count += 1
-
-                if row['is_win'] == 1:
-                    win_return += row['odds'] * bet
-                    win_hits += 1
-
-                if row['is_top3'] == 1:
-                    place_odds = _get_place_odds(row)
-                    place_return += place_odds * bet
-                    place_hits += 1
-
-        place_roi = place_return / total_bets * 100 if total_bets > 0 else 0
-        win_roi = win_return / total_bets * 100 if total_bets > 0 else 0
-        hit_rate = place_hits / total_count if total_count > 0 else 0
-
-        results.append({
-            'min_gap': min_gap,
-            'bet_count': total_count,
-            'win_hits': win_hits,
-            'win_roi': round(win_roi, 1),
-            'place_hits': place_hits,
-            'place_hit_rate': round(hit_rate, 4),
-            'place_roi': round(place_roi, 1),
-        })
-
-    return results
+    # Value Bet候補: モデルで上位3位以内 かつ odds_rankとの乖離がmin_gap以上
+    cells = roi_cube(
+        df, [Axis('gap', [2, 3, 4, 5], key='min_gap')],
+        mask=(df[rank_col] <= 3).to_numpy(), extra={'gap': _vb_gap(df, rank_col)},
+        place_odds=_place_odds_array(df), keep_empty=True,
+    )
+    return [{
+        'min_gap': c['min_gap'],
+        'bet_count': c['count'],
+        'win_hits': c['win_hits'],
+        'win_roi': c['win_roi'],
+        'place_hits': c['place_hits'],
+        'place_hit_rate': round(c['place_hits'] / c['count'], 4) if c['count'] else 0,
+        'place_roi': c['place_roi'],
+    } for c in cells]
 
 
 def calc_vb_bootstrap_ci(
@@ -2132,37 +2160,23 @@ def calc_gap_margin_grid(df: pd.DataFrame) -> List[dict]:
     if 'pred_rank_p' not in df.columns or 'pred_margin_ar' not in df.columns:
         return []
 
-    grid = []
-    for min_gap in [3, 4, 5, 6]:
-        for max_margin in [0.6, 0.8, 1.0, 1.2, 1.5, None]:
-            mask = (
-                (df['pred_rank_p'] <= 3) &
-                (df['odds_rank'] >= df['pred_rank_p'] + min_gap)
-            )
-            if max_margin is not None:
-                mask = mask & (df['pred_margin_ar'] <= max_margin)
-            subset = df[mask]
-            if len(subset) == 0:
-                continue
+    place_col = 'place_odds_low' if 'place_odds_low' in df.columns else 'place_odds_min'
+    place_odds = df[place_col].fillna(0).to_numpy() if place_col in df.columns else None
+    return roi_cube(
+        df,
+        [Axis('gap', [3, 4, 5, 6], key='min_gap'),
+         Axis('pred_margin_ar', [0.6, 0.8, 1.0, 1.2, 1.5, None], op='<=', key='max_margin')],
+        mask=(df['pred_rank_p'] <= 3).to_numpy(), extra={'gap': _vb_gap(df, 'pred_rank_p')},
+        place_odds=place_odds,
+    )
 
-            total_bet = len(subset) * 100
-            win_return = float(subset[subset['is_win'] == 1]['odds'].sum()) * 100
-            place_col = 'place_odds_low' if 'place_odds_low' in df.columns else 'place_odds_min'
-            if place_col in df.columns:
-                place_return = float(subset[subset['is_top3'] == 1][place_col].fillna(0).sum()) * 100
-            else:
-                place_return = 0
-
-            grid.append({
-                'min_gap': min_gap,
-                'max_margin': max_margin,
-                'count': int(len(subset)),
-                'win_hits': int(subset['is_win'].sum()),
-                'win_roi': round(win_return / total_bet * 100, 1) if total_bet > 0 else 0,
-                'place_hits': int(subset['is_top3'].sum()),
-                'place_roi': round(place_return / total_bet * 100, 1) if total_bet > 0 else 0,
-            })
-    return grid
+
+def _gap_ard_place_odds(df: pd.DataFrame) -> Optional[np.ndarray]:
+    """gap×ARd グリッドの複勝倍率: DB値 (欠損は単勝/3.5)、 下限 1.1"""
+    place_col = 'place_odds_low' if 'place_odds_low' in df.columns else 'place_odds_min'
+    if place_col not in df.columns:
+        return None
+    return df[place_col].fillna(df['odds'] / 3.5).clip(lower=1.1).to_numpy()
 
 
 def calc_gap_ard_grid(df: pd.DataFrame) -> List[dict]:
@@ -2174,39 +2188,32 @@ def calc_gap_ard_grid(df: pd.DataFrame) -> List[dict]:
     if 'pred_rank_p' not in df.columns or 'ar_deviation' not in df.columns:
         return []
 
-    grid = []
-    for min_gap in [3, 4, 5, 6]:
-        for min_ard in [None, 45, 50, 55, 60, 65]:
-            mask = (
-                (df['pred_rank_p'] <= 3) &
-                (df['odds_rank'] >= df['pred_rank_p'] + min_gap)
-            )
-            if min_ard is not None:
-                mask = mask & (df['ar_deviation'] >= min_ard)
-            subset = df[mask]
-            if len(subset) == 0:
-                continue
+    return roi_cube(
+        df,
+        [Axis('gap', [3, 4, 5, 6], key='min_gap'),
+         Axis('ar_deviation', [None, 45, 50, 55, 60, 65], key='min_ard')],
+        mask=(df['pred_rank_p'] <= 3).to_numpy(), extra={'gap': _vb_gap(df, 'pred_rank_p')},
+        place_odds=_gap_ard_place_odds(df),
+    )
 
-            total_bet = len(subset) * 100
-            win_return = float(subset[subset['is_win'] == 1]['odds'].sum()) * 100
-            place_col = 'place_odds_low' if 'place_odds_low' in df.columns else 'place_odds_min'
-            place_return = 0.0
-            if place_col in df.columns:
-                place_subset = subset[subset['is_top3'] == 1]
-                place_return = float(place_subset[place_col].fillna(
-                    subset['odds'] / 3.5
-                ).clip(lower=1.1).sum()) * 100 if len(place_subset) > 0 else 0.0
-
-            grid.append({
-                'min_gap': min_gap,
-                'min_ard': min_ard,
-                'count': int(len(subset)),
-                'win_hits': int(subset['is_win'].sum()),
-                'win_roi': round(win_return / total_bet * 100, 1) if total_bet > 0 else 0,
-                'place_hits': int(subset['is_top3'].sum()),
-                'place_roi': round(place_return / total_bet * 100, 1) if total_bet > 0 else 0,
-            })
-    return grid
+
+def calc_gap_ard_grid_fine(df: pd.DataFrame, bootstrap_n: int = 200) -> List[dict]:
+    """gap × ARd の細粒度版 (gap 1刻み × ARd 2.5刻み) + セル別 Bootstrap CI
+
+    calc_gap_ard_grid と同じ集計を閾値キューブで一括計算する。
+    CI はレース単位リサンプリング (全セル共通の再標本)。
+    """
+    if 'pred_rank_p' not in df.columns or 'ar_deviation' not in df.columns:
+        return []
+
+    ards = [None] + [40 + 2.5 * i for i in range(13)]      # 40.0 .. 70.0
+    return roi_cube(
+        df,
+        [Axis('gap', list(range(2, 9)), key='min_gap'),
+         Axis('ar_deviation', ards, key='min_ard')],
+        mask=(df['pred_rank_p'] <= 3).to_numpy(), extra={'gap': _vb_gap(df, 'pred_rank_p')},
+        place_odds=_gap_ard_place_odds(df), bootstrap_n=bootstrap_n,
+    )
 
 
 def collect_race_predictions(df: pd.DataFrame) -> List[dict]:
@@ -2249,6 +2256,7 @@ def train_regression_model(
     model_name: str = 'Aura',
     num_boost_round: int = 1500,
     sample_weight: np.ndarray = None,
+    dataset_cache=None,
 ) -> Tuple:
     """着差回帰モデル (LGBMRegressor) を学習
 
@@ -2256,6 +2264,9 @@ def train_regression_model(
     NOTE: 分類モデルと異なりcalibratorを返さない (4-tuple)。
     将来 margin→P(win) 変換が必要な場合は calibrator 追加を検討。
     sample_weight: 学習データの重み（Noneで等重み）
+    dataset_cache: 指定時は df_train[feature_cols] 全行でビン化した Dataset
+        (P/W と共有) から target_margin 有効行を subset で取り出す。
+        ビン境界は NaN target 行を含む全行から決まる点だけ直接構築と異なる
 
     Returns:
         (model, metrics, importance, all_predictions)
@@ -2286,8 +2297,15 @@ def train_regression_model(
     print(f"\n[Train] {model_name}: {len(feature_cols)} features, "
           f"train={len(X_train):,}, val={len(X_val):,}, test={len(X_test):,}{weight_info}")
 
-    train_data = lgb.Dataset(X_train, label=y_train, weight=w_train)
-    valid_data = lgb.Dataset(X_val, label=y_val, reference=train_data)
+    if dataset_cache is not None:
+        train_data = dataset_cache.train_set(
+            df_train[feature_cols], y_train, weight=w_train, rows=mask_train.values,
+            params=params)
+        valid_data = dataset_cache.valid_set(
+            df_val[feature_cols], y_val, train_data, rows=mask_val.values)
+    else:
+        train_data = lgb.Dataset(X_train, label=y_train, weight=w_train)
+        valid_data = lgb.Dataset(X_val, label=y_val, reference=train_data)
 
     model = lgb.train(
         params, train_data, num_boost_round=num_boost_round,
@@ -2319,6 +2337,77 @@ def train_regression_model(
     return model, metrics, importance, all_pred
 
 
+def train_oof_folds(
+    X: pd.DataFrame,
+    y: pd.Series,
+    params: dict,
+    folds: List[Tuple[np.ndarray, np.ndarray]],
+    num_boost_round: int = 1500,
+    workers: int = 0,
+    label: str = 'OOF',
+) -> Tuple[np.ndarray, List[dict]]:
+    """K-fold の fold モデルを並列に学習し、 OOF 予測を X の行順で返す
+
+    全行で 1 回だけ lgb.Dataset を構築 (ビン化) し、 各 fold の学習/検証セットは
+    Dataset.subset で切り出す (fold ごとの再ビン化なし)。 fold はスレッドで同時に学習し
+    (LightGBM は学習中 GIL を離す)、 num_threads は CPU 数を fold 同時数で割った値。
+
+    Args:
+        folds: [(fold_train_pos, fold_val_pos), ...] — X 上の位置インデックス
+        workers: 同時に学習する fold 数 (0=fold数と CPU 数の小さい方, 1=逐次)
+
+    Returns:
+        (oof, fold_info) — oof は (len(X),) または多クラスなら (len(X), num_class)。
+        どの fold の検証にも入らない行は NaN。 fold_info は fold 別 {best_iter, n_val}。
+    """
+    import os
+    from concurrent.futures import ThreadPoolExecutor
+    import lightgbm as lgb
+
+    n_cpu = os.cpu_count() or 1
+    workers = workers or min(len(folds), n_cpu)
+    workers = max(1, min(workers, len(folds)))
+    fold_params = dict(params)
+    if workers > 1 and 'num_threads' not in fold_params:
+        fold_params['num_threads'] = max(1, n_cpu // workers)
+
+    full = lgb.Dataset(X, label=y, params={'verbose': -1}, free_raw_data=False).construct()
+    # subset の構築は C API 呼び出しなので主スレッドで済ませてから並列学習に渡す
+    sets = []
+    for tr_pos, vl_pos in folds:
+        ds_tr = full.subset(np.asarray(tr_pos)).construct()
+        ds_vl = full.subset(np.asarray(vl_pos)).construct()
+        sets.append((ds_tr, ds_vl))
+
+    def _fit(i: int):
+        ds_tr, ds_vl = sets[i]
+        model = lgb.train(
+            fold_params, ds_tr, num_boost_round=num_boost_round,
+            valid_sets=[ds_vl],
+            callbacks=[
+                lgb.early_stopping(stopping_rounds=50, verbose=False),
+                lgb.log_evaluation(period=0),
+            ],
+        )
+        return model, model.predict(X.iloc[folds[i][1]])
+
+    if workers == 1:
+        fitted = [_fit(i) for i in range(len(folds))]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            fitted = list(ex.map(_fit, range(len(folds))))
+
+    n_class = int(params.get('num_class', 1))
+    oof = np.full((len(X), n_class) if n_class > 1 else len(X), np.nan)
+    info = []
+    for (_, vl_pos), (model, pred) in zip(folds, fitted):
+        oof[np.asarray(vl_pos)] = pred
+        info.append({'best_iteration': model.best_iteration, 'n_val': len(vl_pos)})
+    print(f"  [{label}] {len(folds)} folds trained (workers={workers}, "
+          f"num_threads={fold_params.get('num_threads', 'auto')})")
+    return oof, info
+
+
 def run_track_split_experiment(
     df_train: pd.DataFrame,
     df_val: pd.DataFrame,
@@ -2533,11 +2622,18 @@ def main():
     parser.add_argument('--use-optuna', action='store_true',
                         help='Optuna最適化済みパラメータを使用 (ml/optuna/optuna_best_params.json)')
     parser.add_argument('--save-features', action='store_true',
-                        help='特徴量スナップショットをdata3/features/に保存')
+                        help="特徴量スナップショットをdata3/features/YYYY/features_{YYYYMMDD}.snap に追記")
+    parser.add_argument('--incremental-features', action='store_true',
+                        help='過去走系特徴量を日付順スイープのインクリメンタルエンジンで計算 (結果は同一・高速)')
     parser.add_argument('--sire-cutoff', type=str, default=None,
                         help='血統統計カットオフ日 (YYYY-MM-DD)。cutoff付きインデックスを使用')
     parser.add_argument('--perf-stack', action='store_true',
                         help='Perfモデル予測をスタッキング特徴量として追加')
+    parser.add_argument('--oof-workers', type=int, default=0,
+                        help='PerfStack OOF で同時に学習する fold 数 (0=自動, 1=逐次)')
+    parser.add_argument('--dataset-cache', default='memory', choices=['off', 'memory', 'disk'],
+                        help='P/W/AR でビン化済み LightGBM Dataset を共有 '
+                             '(disk: ml/cache/lgb_datasets にバイナリ保存して次回も再利用)')
     parser.add_argument('--ar-stack', action='store_true',
                         help='ARの ability_score を W のスタッキング特徴量として追加 (K-fold OOF). '
                              'NOTE: polaris 2.2でROI悪化が確認されたため非推奨。'
@@ -2552,7 +2648,12 @@ def main():
                         help='時間重みの半減期（年）。0=重みなし（従来動作）。例: 2.0=2年で重み半減')
     parser.add_argument('--no-set-active', action='store_true',
                         help='model_registry の active_version を更新しない（レース中の live 切替防止）')
+    parser.add_argument('--profile', action='store_true',
+                        help='特徴量抽出のステージ別プロファイルを出力 (環境変数 KEIBA_PROFILE=1 と同等)')
     args = parser.parse_args()
+    use_training_cache()
+    if args.profile:
+        profiler.enable()
 
     train_min, train_min_m, train_max, train_max_m = parse_period_range(args.train_years)
     val_min, val_min_m, val_max, val_max_m = parse_period_range(args.val_years)
@@ -2651,6 +2752,10 @@ def main():
 
     # データセット構築（3-way split）
     _save_feat = args.save_features
+    _engine = None
+    if args.incremental_features:
+        from ml.features.incremental_engine import IncrementalFeatureEngine
+        _engine = IncrementalFeatureEngine(history_cache, kb_ext_index, jrdb_sed_index)
     df_train = build_dataset(
         date_index, history_cache, trainer_index, jockey_index, pace_index,
         kb_ext_index, train_min, train_max, use_db_odds=use_db_odds,
@@ -2662,6 +2767,7 @@ def main():
         pit_trainer_tl=pit_trainer_tl, pit_jockey_tl=pit_jockey_tl,
         baba_index=baba_index,
         save_features=_save_feat,
+        feature_engine=_engine,
         jrdb_sed_index=jrdb_sed_index,
         jrdb_kyi_index=jrdb_kyi_index,
         jrdb_kaa_index=jrdb_kaa_index,
@@ -2681,6 +2787,7 @@ def main():
         pit_trainer_tl=pit_trainer_tl, pit_jockey_tl=pit_jockey_tl,
         baba_index=baba_index,
         save_features=_save_feat,
+        feature_engine=_engine,
         jrdb_sed_index=jrdb_sed_index,
         jrdb_kyi_index=jrdb_kyi_index,
         jrdb_kaa_index=jrdb_kaa_index,
@@ -2700,6 +2807,7 @@ def main():
         pit_trainer_tl=pit_trainer_tl, pit_jockey_tl=pit_jockey_tl,
         baba_index=baba_index,
         save_features=_save_feat,
+        feature_engine=_engine,
         jrdb_sed_index=jrdb_sed_index,
         jrdb_kyi_index=jrdb_kyi_index,
         jrdb_kaa_index=jrdb_kaa_index,
@@ -2879,9 +2987,8 @@ def main():
         kf = KFold(n_splits=N_FOLDS, shuffle=True, random_state=42)
         oof_preds = np.full((len(df_train), n_perf_cls), np.nan)
 
-        # df_train_perfのインデックスからdf_trainの位置への逆マップ
-        train_idx_map = {orig_idx: pos for pos, orig_idx in enumerate(df_train.index)}
-        perf_valid_positions = np.array([train_idx_map[idx] for idx in df_train_perf.index])
+        # df_train_perf の各行が df_train 上の何行目か (add_idm_diff_target は行を間引くだけ)
+        perf_valid_positions = df_train.index.get_indexer(df_train_perf.index)
 
         perf_params = {
             'objective': 'multiclass',
@@ -2902,44 +3009,27 @@ def main():
         }
 
         t_oof = time.time()
-        for fold_i, (fold_train_idx, fold_val_idx) in enumerate(kf.split(df_train_perf)):
-            df_fold_train = df_train_perf.iloc[fold_train_idx]
-            df_fold_val = df_train_perf.iloc[fold_val_idx]
-
-            X_ft = df_fold_train[perf_feature_cols]
-            y_ft = df_fold_train['perf_label']
-            X_fv = df_fold_val[perf_feature_cols]
-            y_fv = df_fold_val['perf_label']
-
-            ds_ft = lgb.Dataset(X_ft, label=y_ft)
-            ds_fv = lgb.Dataset(X_fv, label=y_fv, reference=ds_ft)
-
-            fold_model = lgb.train(
-                perf_params, ds_ft, num_boost_round=1500,
-                valid_sets=[ds_fv],
-                callbacks=[
-                    lgb.early_stopping(stopping_rounds=50),
-                    lgb.log_evaluation(period=0),  # silent
-                ],
-            )
-
-            fold_proba = fold_model.predict(X_fv)  # (n_val, 3)
-
-            # OOF予測を正しい位置に格納
-            for j, perf_idx in enumerate(df_fold_val.index):
-                pos = train_idx_map[perf_idx]
-                oof_preds[pos] = fold_proba[j]
+        X_perf_train = df_train_perf[perf_feature_cols]
+        y_perf_train = df_train_perf['perf_label']
+        perf_folds = list(kf.split(df_train_perf))
+        oof_perf, fold_info = train_oof_folds(
+            X_perf_train, y_perf_train, perf_params, perf_folds,
+            num_boost_round=1500, workers=args.oof_workers, label='PerfStack',
+        )
+        oof_preds[perf_valid_positions] = oof_perf
 
-            from sklearn.metrics import accuracy_score
-            fold_acc = accuracy_score(y_fv, np.argmax(fold_proba, axis=1))
+        from sklearn.metrics import accuracy_score
+        for fold_i, ((_, fold_val_idx), fi) in enumerate(zip(perf_folds, fold_info)):
+            fold_acc = accuracy_score(y_perf_train.iloc[fold_val_idx],
+                                      np.argmax(oof_perf[fold_val_idx], axis=1))
             print(f"  [PerfStack] Fold {fold_i+1}/{N_FOLDS}: "
-                  f"acc={fold_acc:.4f}, best_iter={fold_model.best_iteration}")
+                  f"acc={fold_acc:.4f}, best_iter={fi['best_iteration']}")
 
         # perf_labelが無い行（前走IDMが取れなかった行）はNaN → 全体Perfモデルで埋める
+        perf_model_full = lgb.Booster(model_file=str(perf_model_path))
         nan_mask = np.isnan(oof_preds[:, 0])
         n_nan = nan_mask.sum()
         if n_nan > 0:
-            perf_model_full = lgb.Booster(model_file=str(perf_model_path))
             X_nan = df_train.loc[df_train.index[nan_mask], perf_feature_cols]
             oof_preds[nan_mask] = perf_model_full.predict(X_nan)
             print(f"  [PerfStack] Filled {n_nan:,} rows without perf_label using full model")
@@ -2952,7 +3042,6 @@ def main():
         print(f"  [PerfStack] OOF done: {elapsed_oof:.0f}s")
 
         # --- Step 4: Val/Testは既存のfull Perfモデルで予測 ---
-        perf_model_full = lgb.Booster(model_file=str(perf_model_path))
         for split_name, df_split in [('Val', df_val), ('Test', df_test)]:
             X_perf = df_split[perf_feature_cols]
             perf_proba = perf_model_full.predict(X_perf)  # (n, 3)
@@ -2967,11 +3056,20 @@ def main():
         features_ar = list(features_ar) + perf_stack_cols
         print(f"  [PerfStack] Added {len(perf_stack_cols)} stacking features: {perf_stack_cols}")
 
+    # --- ビン化済み Dataset の共有 (同じ特徴量行列・Dataset パラメータなら P/W/AR で 1 回だけビン化) ---
+    dataset_cache = None
+    if args.dataset_cache != 'off':
+        from ml.utils.lgb_dataset_cache import DatasetCache
+        dataset_cache = DatasetCache(
+            config.ml_dir() / "cache" / "lgb_datasets" if args.dataset_cache == 'disk' else None,
+            verbose=True,
+        )
+
     # === Place モデル P (is_top3) ===
     model_p, metrics_p, importance_p, pred_p, cal_p, pred_p_raw = train_model(
         df_train, df_val, df_test, features_p, params_p, 'is_top3', 'Place',
         num_boost_round=optuna_num_boost_round.get('p', 1500),
-        sample_weight=train_sample_weight,
+        sample_weight=train_sample_weight, dataset_cache=dataset_cache,
     )
 
     # === Aura モデル AR (着差回帰) ===
@@ -2982,9 +3080,12 @@ def main():
     sed_for_margin = jrdb_sed_index if margin_mode in ('adjusted', 'adj_zscore') else None
     for label, df in [('train', df_train), ('val', df_val), ('test', df_test)]:
         add_margin_target_to_df(
-            df, date_index, load_race_json, cap=5.0,
+            df, date_index, shared_corpus(), cap=5.0,
             mode=margin_mode, sed_index=sed_for_margin, furi_scale=args.furi_scale,
         )
+    _cs = shared_corpus().stats()
+    print(f"[RaceCorpus] decodes={_cs['decodes']:,} hits={_cs['hits']:,} "
+          f"cached={_cs['cached']:,} evictions={_cs['evictions']:,}")
 
     # --- --ar-stack: K-fold OOF で df_train の ar_ability_score を生成 (リーク防止) ---
     if args.ar_stack:
@@ -3050,7 +3151,7 @@ def main():
     model_ar, metrics_ar, importance_ar, pred_ar = train_regression_model(
         df_train, df_val, df_test, features_ar, params_ar, 'Aura',
         num_boost_round=optuna_num_boost_round.get('ar', 1500),
-        sample_weight=train_sample_weight,
+        sample_weight=train_sample_weight, dataset_cache=dataset_cache,
     )
 
     # --- --ar-stack: ar_ability_score を全splitに格納し、features_w に追加 ---
@@ -3079,8 +3180,13 @@ def main():
     model_w, metrics_w, importance_w, pred_w, cal_w, pred_w_raw = train_model(
         df_train, df_val, df_test, features_w, params_w, 'is_win', 'Win',
         num_boost_round=optuna_num_boost_round.get('w', 1500),
-        sample_weight=train_sample_weight,
+        sample_weight=train_sample_weight, dataset_cache=dataset_cache,
     )
+    if dataset_cache is not None:
+        _ds = dataset_cache.stats()
+        print(f"[DatasetCache] built={_ds['built']} loaded={_ds['loaded']} "
+              f"hits={_ds['hits']} derived={_ds['derived']}")
+        dataset_cache.clear()
 
     # 予測結果をDataFrameに追加
     df_test['pred_proba_p'] = pred_p
@@ -3202,6 +3308,8 @@ def main():
     print("\n[Analysis] Gap × ARd grid...")
     gap_ard_grid = calc_gap_ard_grid(df_test)
     print(f"  Gap×ARd grid: {len(gap_ard_grid)} cells")
+    gap_ard_grid_fine = calc_gap_ard_grid_fine(df_test)
+    print(f"  Gap×ARd fine grid: {len(gap_ard_grid_fine)} cells (bootstrap CI)")
 
     # --- bet_engine プリセット バックテスト ---
     print("\n[Analysis] bet_engine preset backtest...")
@@ -3431,6 +3539,7 @@ def main():
     # === 新構造: models/polaris/live/ にも保存 ===
     new_live_dir = model_dir / "models" / "polaris" / "live"
     archive_root = model_dir / "models" / "polaris" / "archive"
+    import os
     import shutil
 
     # Session 119: 上書き前に既存 live を archive/v{prev_version}/ に退避
@@ -3459,7 +3568,11 @@ def main():
     for fname in ["model_p.txt", "model_w.txt", "model_ar.txt", "calibrators.pkl"]:
         src = model_dir / fname
         if src.exists():
-            shutil.copy2(str(src), str(new_live_dir / fname))
+            # tmp → os.replace (読み込み中のプロセスに書きかけのファイルを見せない)
+            dst = new_live_dir / fname
+            tmp = dst.with_name(dst.name + '.tmp')
+            shutil.copy2(str(src), str(tmp))
+            os.replace(tmp, dst)
     # meta.json は新構造用の統一名
     (new_live_dir / "meta.json").write_text(
         json.dumps(meta, ensure_ascii=False, indent=2), encoding='utf-8'
@@ -3476,6 +3589,7 @@ def main():
             w_auc=auc_w if 'auc_w' in dir() else None,
             features=len(all_features_union),
             set_active=not args.no_set_active,
+            model_dir=new_live_dir,
         )
     except Exception as e:
         print(f"  [WARN] model_registry update failed: {e}")
@@ -3552,6 +3666,7 @@ def main():
         'race_predictions': race_preds,
         'gap_margin_grid': gap_margin_grid,
         'gap_ard_grid': gap_ard_grid,
+        'gap_ard_grid_fine': gap_ard_grid_fine,
         'ev_gap_comparison': ev_gap_results if ev_gap_results else None,
         'bet_engine_presets': bet_engine_presets if bet_engine_presets else None,
     }
@@ -3568,6 +3683,7 @@ def main():
     print(f"\n  Elapsed: {elapsed:.1f}s")
     print(f"  Models saved to: {model_dir}")
     print(f"  Results saved to: {result_path}")
+    profiler.finish('experiment')
     print(f"{'='*60}\n")
 
 
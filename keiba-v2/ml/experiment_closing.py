@@ -44,6 +44,7 @@ from ml.features.closing_race_features import (
 )
 from ml.features.baba_features import get_baba_features, load_baba_index, race_id_to_baba_key
 from ml.utils.filters import is_obstacle
+from ml.utils.race_corpus import RaceCorpus, shared_corpus, use_training_cache
 from core.jravan import race_id as rid
 
 # === ハイパーパラメータ ===
@@ -155,17 +156,15 @@ def train_closing_model(
 
 def build_course_timeline(
     date_index: dict,
+    corpus: RaceCorpus = None,
 ) -> CourseClosingTimeline:
     """全レースJSONからコース歴史統計タイムラインを構築"""
     print("[Build] Building course closing timeline...")
+    corpus = corpus or shared_corpus()
 
     def race_iter():
-        for date_str, race_id in _iter_date_index(date_index):
-            try:
-                race = load_race_json(race_id, date_str)
-                yield race, date_str
-            except Exception:
-                continue
+        for date_str, _, race in corpus.iter_races(date_index):
+            yield race, date_str
 
     timeline = CourseClosingTimeline()
     timeline.build(race_iter())
@@ -364,6 +363,7 @@ def main():
                         help='Test period (例: 2025.05-2026.03)')
     parser.add_argument('--no-db', action='store_true', help='DBオッズ未使用')
     args = parser.parse_args()
+    use_training_cache()
 
     train_min, train_min_m, train_max, train_max_m = parse_period_range(args.train_years)
     val_min, val_min_m, val_max, val_max_m = parse_period_range(args.val_years)
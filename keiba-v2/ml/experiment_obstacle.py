@@ -52,6 +52,7 @@ from ml.features.obstacle_features import (
     compute_trainer_obstacle_stats,
     compute_jockey_selection,
     build_obstacle_personnel_timelines,
+    build_horse_obstacle_index,
     compute_weight_gain_trend,
     compute_course_attributes,
     compute_prev_obstacle_level_diff,
@@ -199,8 +200,12 @@ def build_obstacle_dataset(
     jockey_obstacle_tl: dict = None,
     trainer_obstacle_tl: dict = None,
     jrdb_sed_index: dict = None,
+    horse_obs_index: dict = None,
 ) -> pd.DataFrame:
-    """障害レースのみの特徴量DataFrameを構築"""
+    """障害レースのみの特徴量DataFrameを構築
+
+    horse_obs_index: build_horse_obstacle_index の結果 (未指定ならここで構築)
+    """
     date_min = min_year * 100 + (min_month or 1)
     date_max = max_year * 100 + (max_month or 12)
     label_min = f"{min_year}-{min_month:02d}" if min_month else str(min_year)
@@ -231,6 +236,9 @@ def build_obstacle_dataset(
         except Exception as e:
             print(f"[DB Odds] Error: {e}, using JSON odds")
 
+    if horse_obs_index is None:
+        horse_obs_index = build_horse_obstacle_index(history_cache)
+
     all_rows = []
     race_count = 0
     flat_count = 0
@@ -342,7 +350,8 @@ def build_obstacle_dataset(
 
                 # v2.2: 障害走限定過去走統計
                 obs_past = compute_obstacle_only_past_stats(
-                    kn, race_date, distance, history_cache
+                    kn, race_date, distance, history_cache,
+                    horse_obs_index=horse_obs_index,
                 )
                 row.update(obs_past)
 
@@ -363,7 +372,8 @@ def build_obstacle_dataset(
 
                 # v2.3b: 同系統コースでの障害好走率
                 row.update(compute_same_group_stats(
-                    kn, race_date, venue_name, history_cache
+                    kn, race_date, venue_name, history_cache,
+                    horse_obs_index=horse_obs_index,
                 ))
 
                 # v2.5: 経験曲線特徴量
@@ -481,7 +491,9 @@ def main():
     jockey_obstacle_tl, trainer_obstacle_tl = build_obstacle_personnel_timelines(
         history_cache
     )
-    print(f"  Jockeys: {len(jockey_obstacle_tl):,}, Trainers: {len(trainer_obstacle_tl):,}")
+    horse_obs_index = build_horse_obstacle_index(history_cache)
+    print(f"  Jockeys: {len(jockey_obstacle_tl):,}, Trainers: {len(trainer_obstacle_tl):,}, "
+          f"Horses: {len(horse_obs_index):,}")
 
     # データセット構築
     build_kwargs = dict(
@@ -496,6 +508,7 @@ def main():
         jockey_obstacle_tl=jockey_obstacle_tl,
         trainer_obstacle_tl=trainer_obstacle_tl,
         jrdb_sed_index=jrdb_sed_index,
+        horse_obs_index=horse_obs_index,
     )
 
     df_train = build_obstacle_dataset(
@@ -0,0 +1,602 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+ウォークフォワード学習オーケストレータ
+
+安定性評価のために ml.experiment を --train-years/--val-years/--test-years をずらして
+何度も実行すると、 毎回 load_data → 特徴量構築 → P/W/AR の逐次学習をやり直していた。
+本モジュールは全期間の特徴量行列を 1 回だけ構築し (--dataset で pickle 再利用も可)、
+日付でローリング窓を切り出して各 fold を並列に学習し、 fold 別 AUC / ECE /
+ROI (レース単位 Bootstrap CI) を 1 つのレポートにまとめる。
+
+窓の定義 (月単位, make_folds):
+  fold i の test 開始 = first_test + i * step
+  val   = test 開始直前の val_months か月
+  train = val 直前の train_months か月 (--expanding なら fold 0 の train 開始に固定)
+
+並列化: fold ごとにスレッドを割り当て (--parallel 本同時), LightGBM の num_threads は
+--threads-per-fold。 LightGBM の学習は GIL を離すのでスレッドで十分並列になり、
+特徴量 DataFrame はプロセス間コピーせず共有できる。
+学習・評価は experiment.train_model / train_regression_model と同じ
+(Isotonic キャリブレーション込み)。 PerfStack / ARStack / 芝ダ分離は対象外。
+
+血統統計 (sire/dam/bms): 全期間で 1 つの統計を使うと各 fold の test 期間の成績が
+特徴量に混入する。 sire_stats_timeline ストアがあれば fold ごとに test 開始前日時点の
+統計 (SireStatsStore.stats_as_of) で血統特徴量を差し替える。 ストアが無い場合は
+--sire-cutoff (最初の test 開始より前) の静的統計を使う。
+
+--dataset の pickle には構築時の span / オプションを df.attrs に記録し、 再利用時に
+今回の設定と照合する (不一致ならエラー)。
+
+出力: data3/ml/walk_forward/walk_forward_{YYYYMMDD_HHMMSS}.json
+  folds[]  — 期間・件数・P/W の AUC/ECE・AR の MAE・Top1/VB ROI と CI
+  summary  — 指標ごとの mean/std/min/max、 VB ROI の CI 下限 > 100% の fold 数、
+             (test 窓が重ならない場合) 全 fold を結合した pooled ROI と CI
+
+Usage:
+    python -m ml.experiment_walk_forward --first-test 2024.01 --windows 12
+    python -m ml.experiment_walk_forward --first-test 2024.01 --windows 12 \\
+        --train-months 48 --val-months 1 --test-months 1 --parallel 3 --threads-per-fold 4
+    python -m ml.experiment_walk_forward --first-test 2023.01 --windows 8 --test-months 3 \\
+        --expanding --models p,w --dataset data3/ml/walk_forward/wf_dataset.pkl
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core import config
+from ml.experiment import (
+    FEATURE_COLS_VALUE, P_ONLY_FEATURES, PARAMS_AR, PARAMS_P, PARAMS_W,
+    _compute_time_weights, _parse_period, _place_odds_array,
+    build_dataset, build_pit_personnel_timeline, load_data,
+    train_model, train_regression_model,
+)
+from ml.features.pedigree_features import build_sire_index, get_pedigree_features
+from ml.utils.race_corpus import shared_corpus, use_training_cache
+from ml.utils.roi_cube import Axis, roi_cube
+
+MODELS = ('p', 'w', 'ar')
+VB_GAPS = [2, 3, 4, 5]
+
+# pooled ROI 用に fold の test 予測から残す列
+_KEEP_COLS = ['race_id', 'date', 'is_win', 'is_top3', 'odds', 'odds_rank', 'place_odds_low']
+
+
+# =============================================================================
+# 窓の定義
+# =============================================================================
+
+def _ym_add(ym: int, months: int) -> int:
+    """YYYYMM に months か月を加算"""
+    m = ym // 100 * 12 + ym % 100 - 1 + months
+    return m // 12 * 100 + m % 12 + 1
+
+
+def _ym_label(ym: int) -> str:
+    return f"{ym // 100}-{ym % 100:02d}"
+
+
+@dataclass(frozen=True)
+class Fold:
+    """1 窓分の期間 (各 (開始 YYYYMM, 終了 YYYYMM), 両端含む)"""
+    index: int
+    train: Tuple[int, int]
+    val: Tuple[int, int]
+    test: Tuple[int, int]
+
+    def to_dict(self) -> dict:
+        return {
+            'fold': self.index,
+            'train': f"{_ym_label(self.train[0])} ~ {_ym_label(self.train[1])}",
+            'val': f"{_ym_label(self.val[0])} ~ {_ym_label(self.val[1])}",
+            'test': f"{_ym_label(self.test[0])} ~ {_ym_label(self.test[1])}",
+        }
+
+
+def make_folds(first_test: int, n_windows: int, train_months: int = 48,
+               val_months: int = 1, test_months: int = 1,
+               step_months: Optional[int] = None, expanding: bool = False) -> List[Fold]:
+    """ローリング (または拡張) 窓を作る。 first_test は YYYYMM。 step 省略時は test_months。"""
+    step = step_months or test_months
+    folds = []
+    train_start0 = None
+    for i in range(n_windows):
+        test_start = _ym_add(first_test, i * step)
+        val_start = _ym_add(test_start, -val_months)
+        train_end = _ym_add(val_start, -1)
+        train_start = _ym_add(train_end, -(train_months - 1))
+        if train_start0 is None:
+            train_start0 = train_start
+        folds.append(Fold(
+            index=i,
+            train=(train_start0 if expanding else train_start, train_end),
+            val=(val_start, _ym_add(test_start, -1)),
+            test=(test_start, _ym_add(test_start, test_months - 1)),
+        ))
+    return folds
+
+
+def folds_overlap(folds: Sequence[Fold]) -> bool:
+    """test 窓が重なるか (step < test_months)"""
+    tests = sorted(f.test for f in folds)
+    return any(b[0] <= a[1] for a, b in zip(tests, tests[1:]))
+
+
+def date_ym(df: pd.DataFrame) -> np.ndarray:
+    """'date' 列 (YYYY-MM-DD) → YYYYMM の int 配列"""
+    d = df['date'].astype(str)
+    return (d.str[:4].astype(int) * 100 + d.str[5:7].astype(int)).to_numpy()
+
+
+def _period(df: pd.DataFrame, ym: np.ndarray, span: Tuple[int, int]) -> pd.DataFrame:
+    return df[(ym >= span[0]) & (ym <= span[1])]
+
+
+# =============================================================================
+# fold 別の血統統計
+# =============================================================================
+
+def fold_sire_cutoff(fold: Fold) -> str:
+    """fold の血統統計カットオフ = test 開始の前日 (YYYY-MM-DD, 当日含む)"""
+    y, m = divmod(fold.test[0], 100)
+    return (date(y, m, 1) - timedelta(days=1)).isoformat()
+
+
+def pedigree_frame(sire_stats: dict, pedigree_index: dict, ketto_nums) -> pd.DataFrame:
+    """ketto_num → 血統特徴量 (sire_/dam_/bms_ 列) の表 (index=ketto_num)"""
+    sire_idx, dam_idx, bms_idx = build_sire_index(sire_stats)
+    rows = {k: get_pedigree_features(k, pedigree_index, sire_idx, dam_idx, bms_idx)
+            for k in ketto_nums}
+    return pd.DataFrame.from_dict(rows, orient='index').astype(np.float64)
+
+
+def make_fold_pedigree(sire_store, pedigree_index: dict,
+                       ketto_nums) -> Callable[[Fold], pd.DataFrame]:
+    """fold → その fold の test 開始前日時点の血統特徴量表 を返す関数 (train_fold の pedigree)"""
+    keys = pd.unique(pd.Series(ketto_nums, dtype=str))
+
+    def _for_fold(fold: Fold) -> pd.DataFrame:
+        return pedigree_frame(sire_store.stats_as_of(fold_sire_cutoff(fold)),
+                              pedigree_index, keys)
+    return _for_fold
+
+
+def _with_pedigree(part: pd.DataFrame, ped: pd.DataFrame) -> pd.DataFrame:
+    """part の血統特徴量列を ped (ketto_num 索引) の値で置き換えたコピー"""
+    cols = [c for c in ped.columns if c in part.columns]
+    if not cols or part.empty:
+        return part
+    vals = ped.reindex(part['ketto_num'].astype(str).to_numpy())[cols].to_numpy()
+    return part.assign(**{c: vals[:, j] for j, c in enumerate(cols)})
+
+
+# =============================================================================
+# fold 学習・評価
+# =============================================================================
+
+def _roi_block(df: pd.DataFrame, rank_col: str, bootstrap_n: int) -> dict:
+    """Top1 ROI と VB (モデル 3 位以内 × odds_rank 乖離) ROI、 どちらも CI 付き"""
+    place_odds = _place_odds_array(df)
+    [top1] = roi_cube(df, [Axis(rank_col, [1], op='<=', key='top')],
+                      place_odds=place_odds, keep_empty=True, bootstrap_n=bootstrap_n)
+    vb = []
+    if 'odds_rank' in df.columns:
+        gap = (df['odds_rank'] - df[rank_col]).to_numpy(dtype=np.float64, na_value=np.nan)
+        vb = roi_cube(df, [Axis('gap', VB_GAPS, key='min_gap')],
+                      mask=(df[rank_col] <= 3).to_numpy(), extra={'gap': gap},
+                      place_odds=place_odds, keep_empty=True, bootstrap_n=bootstrap_n)
+    top1.pop('top', None)
+    return {'top1': top1, 'vb': vb}
+
+
+def train_fold(fold: Fold, df: pd.DataFrame, ym: np.ndarray,
+               features: Dict[str, List[str]], params: Dict[str, dict],
+               models: Sequence[str] = MODELS, threads: int = 0,
+               num_boost_round: int = 1500, time_decay: float = 0,
+               bootstrap_n: int = 1000,
+               pedigree: Optional[Callable[[Fold], pd.DataFrame]] = None) -> dict:
+    """1 fold を学習して指標 dict を返す (test 予測は '_test' に DataFrame で同梱)
+
+    pedigree (make_fold_pedigree) を渡すと train/val/test の血統特徴量を
+    その fold のカットオフ時点の統計で差し替える。
+    """
+    t0 = time.time()
+    df_tr = _period(df, ym, fold.train)
+    df_vl = _period(df, ym, fold.val)
+    df_ts = _period(df, ym, fold.test).copy()
+    if pedigree is not None and min(len(df_tr), len(df_vl), len(df_ts)) > 0:
+        ped = pedigree(fold)
+        df_tr, df_vl, df_ts = (_with_pedigree(p, ped) for p in (df_tr, df_vl, df_ts))
+    result = dict(fold.to_dict(), train_size=len(df_tr), val_size=len(df_vl),
+                  test_size=len(df_ts), test_races=int(df_ts['race_id'].nunique()))
+    if min(len(df_tr), len(df_vl), len(df_ts)) == 0:
+        result['skipped'] = 'empty period'
+        return result
+    if pedigree is not None:
+        result['sire_cutoff'] = fold_sire_cutoff(fold)
+
+    weight = _compute_time_weights(df_tr, time_decay) if time_decay > 0 else None
+    thread_params = {'num_threads': threads} if threads > 0 else {}
+    name = f"F{fold.index}"
+
+    for key, label_col in (('p', 'is_top3'), ('w', 'is_win')):
+        if key not in models:
+            continue
+        _, metrics, _, pred, _, _ = train_model(
+            df_tr, df_vl, df_ts, features[key], {**params[key], **thread_params},
+            label_col, f"{name}-{key.upper()}",
+            num_boost_round=num_boost_round, sample_weight=weight,
+        )
+        df_ts[f'pred_proba_{key}'] = pred
+        df_ts[f'pred_rank_{key}'] = df_ts.groupby('race_id')[f'pred_proba_{key}'].rank(
+            ascending=False, method='min')
+        result[key] = {
+            'metrics': {k: metrics[k] for k in ('auc', 'ece', 'ece_calibrated',
+                                                'brier_calibrated', 'auc_val', 'best_iteration')},
+            'roi': _roi_block(df_ts, f'pred_rank_{key}', bootstrap_n),
+        }
+
+    if 'ar' in models and 'target_margin' in df.columns:
+        _, metrics_ar, _, pred_ar = train_regression_model(
+            df_tr, df_vl, df_ts, features['ar'], {**params['ar'], **thread_params},
+            f"{name}-AR", num_boost_round=num_boost_round, sample_weight=weight,
+        )
+        df_ts['pred_margin_ar'] = pred_ar
+        df_ts['pred_rank_ar'] = df_ts.groupby('race_id')['pred_margin_ar'].rank(
+            ascending=True, method='min')
+        result['ar'] = {
+            'metrics': metrics_ar,
+            'roi': _roi_block(df_ts, 'pred_rank_ar', bootstrap_n),
+        }
+
+    keep = [c for c in _KEEP_COLS if c in df_ts.columns] + \
+        [c for c in df_ts.columns if c.startswith(('pred_rank_', 'pred_proba_', 'pred_margin_'))]
+    result['_test'] = df_ts[keep]
+    result['elapsed_sec'] = round(time.time() - t0, 1)
+    return result
+
+
+def run_folds(folds: Sequence[Fold], df: pd.DataFrame, parallel: int = 1,
+              **kwargs) -> List[dict]:
+    """全 fold を学習 (parallel > 1 ならスレッドで同時実行)。 戻り値は fold 順。"""
+    ym = date_ym(df)
+    if parallel <= 1 or len(folds) <= 1:
+        return [train_fold(f, df, ym, **kwargs) for f in folds]
+    with ThreadPoolExecutor(max_workers=parallel) as ex:
+        futures = [ex.submit(train_fold, f, df, ym, **kwargs) for f in folds]
+        return [fu.result() for fu in futures]
+
+
+# =============================================================================
+# レポート
+# =============================================================================
+
+def _describe(values: List[float]) -> Optional[dict]:
+    v = np.array([x for x in values if x is not None], dtype=np.float64)
+    if v.size == 0:
+        return None
+    return {'mean': round(float(v.mean()), 4), 'std': round(float(v.std()), 4),
+            'min': round(float(v.min()), 4), 'max': round(float(v.max()), 4), 'n': int(v.size)}
+
+
+def summarize(results: Sequence[dict], models: Sequence[str] = MODELS,
+              pooled: bool = True, bootstrap_n: int = 1000) -> dict:
+    """fold 横断の集計 (pooled=True なら全 fold の test 予測を結合して ROI/CI を再計算)"""
+    done = [r for r in results if 'skipped' not in r]
+    summary: dict = {'n_folds': len(results), 'n_trained': len(done)}
+    for key in models:
+        rows = [r[key] for r in done if key in r]
+        if not rows:
+            continue
+        s = {}
+        metric_names = ('auc', 'ece', 'ece_calibrated') if key != 'ar' else ('mae', 'correlation')
+        for m in metric_names:
+            s[m] = _describe([r['metrics'].get(m) for r in rows])
+        s['top1_place_roi'] = _describe([r['roi']['top1']['place_roi'] for r in rows])
+        s['top1_win_roi'] = _describe([r['roi']['top1']['win_roi'] for r in rows])
+        vb = {}
+        for gi, g in enumerate(VB_GAPS):
+            cells = [r['roi']['vb'][gi] for r in rows if r['roi']['vb']]
+            if not cells:
+                continue
+            vb[str(g)] = {
+                'place_roi': _describe([c['place_roi'] for c in cells]),
+                'folds_ci_low_over_100': sum(1 for c in cells if c.get('place_roi_ci_low', 0) > 100),
+            }
+        s['vb_place'] = vb
+        if pooled:
+            parts = [r['_test'] for r in done if f'pred_rank_{key}' in r['_test'].columns]
+            if parts:
+                s['pooled_roi'] = _roi_block(pd.concat(parts, ignore_index=True),
+                                             f'pred_rank_{key}', bootstrap_n)
+        summary[key] = s
+    return summary
+
+
+def print_report(results: Sequence[dict], summary: dict, models: Sequence[str]) -> None:
+    print(f"\n{'='*78}")
+    print("  Walk-forward summary")
+    print(f"{'='*78}")
+    head = f"  {'Fold':<5} {'Test':<19} {'N':>7}"
+    for key in models:
+        head += f" {key.upper() + ' AUC':>8} {key.upper() + ' ECE':>8}" if key != 'ar' \
+            else f" {'AR MAE':>8}"
+    head += f" {'VB3 Place ROI [CI]':>24}"
+    print(head)
+    for r in results:
+        line = f"  {r['fold']:<5} {r['test']:<19} {r['test_size']:>7,}"
+        if 'skipped' in r:
+            print(line + f"  ({r['skipped']})")
+            continue
+        for key in models:
+            m = r.get(key, {}).get('metrics', {})
+            if key == 'ar':
+                line += f" {m.get('mae', float('nan')):>8.4f}"
+            else:
+                line += f" {m.get('auc', float('nan')):>8.4f} {m.get('ece_calibrated', float('nan')):>8.4f}"
+        vb = r.get('p', {}).get('roi', {}).get('vb') or []
+        cell = next((c for c in vb if c['min_gap'] == 3), None)
+        if cell:
+            line += (f" {cell['place_roi']:>7.1f}% [{cell.get('place_roi_ci_low', 0):.0f}"
+                     f"-{cell.get('place_roi_ci_high', 0):.0f}]")
+        print(line)
+    for key in models:
+        s = summary.get(key)
+        if not s:
+            continue
+        metric = 'auc' if key != 'ar' else 'mae'
+        d = s.get(metric)
+        if d:
+            print(f"  {key.upper()} {metric}: mean={d['mean']:.4f} std={d['std']:.4f} "
+                  f"[{d['min']:.4f} ~ {d['max']:.4f}]")
+
+
+def save_report(results: Sequence[dict], summary: dict, settings: dict,
+                out_dir: Optional[Path] = None) -> Path:
+    out_dir = Path(out_dir) if out_dir else config.ml_dir() / "walk_forward"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    path = out_dir / f"walk_forward_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'settings': settings,
+        'folds': [{k: v for k, v in r.items() if not k.startswith('_')} for r in results],
+        'summary': summary,
+    }
+    path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+    return path
+
+
+# =============================================================================
+# 全期間データセット
+# =============================================================================
+
+def dataset_options(span: Tuple[int, int], use_db_odds: bool = True,
+                    sire_cutoff: Optional[str] = None, margin_mode: str = 'raw',
+                    furi_scale: float = 0.1, with_margin: bool = True) -> dict:
+    """データセットの構築条件 (pickle の df.attrs['walk_forward'] に記録して再利用時に照合)"""
+    return {'span': [int(span[0]), int(span[1])], 'use_db_odds': use_db_odds,
+            'sire_cutoff': sire_cutoff, 'margin_mode': margin_mode,
+            'furi_scale': furi_scale, 'with_margin': with_margin}
+
+
+def check_dataset(df: pd.DataFrame, options: dict) -> List[str]:
+    """再利用する pickle が今回の構築条件 options で使えるか。 問題点のリスト (空なら OK)。
+
+    span は記録値が今回の span を覆えばよい。 target_margin は今回不要なら有無を問わない。
+    """
+    meta = df.attrs.get('walk_forward')
+    if not meta:
+        return ['構築条件の記録なし (旧形式の pickle)']
+    problems = []
+    (lo, hi), (need_lo, need_hi) = meta['span'], options['span']
+    if lo > need_lo or hi < need_hi:
+        problems.append(f"span {_ym_label(lo)} ~ {_ym_label(hi)} が folds の "
+                        f"{_ym_label(need_lo)} ~ {_ym_label(need_hi)} を覆わない")
+    keys = ['use_db_odds', 'sire_cutoff']
+    if options['with_margin']:
+        if not meta.get('with_margin'):
+            problems.append('target_margin なし (AR 学習に必要)')
+        keys += ['margin_mode', 'furi_scale']
+    for k in keys:
+        if meta.get(k) != options[k]:
+            problems.append(f"{k}: {meta.get(k)!r} (pickle) != {options[k]!r}")
+    return problems
+
+
+def build_full_dataset(span: Tuple[int, int], use_db_odds: bool = True,
+                       sire_cutoff: Optional[str] = None, margin_mode: str = 'raw',
+                       furi_scale: float = 0.1, with_margin: bool = True) -> pd.DataFrame:
+    """span (YYYYMM, YYYYMM) の特徴量行列を 1 回だけ構築 (AR 用 target_margin も付与)
+
+    構築条件は df.attrs['walk_forward'] (dataset_options) に記録する。
+    """
+    from ml.features.baba_features import load_baba_index
+    from ml.features.margin_target import add_margin_target_to_df
+
+    (history_cache, trainer_index, jockey_index,
+     date_index, pace_index, kb_ext_index, training_summary_index,
+     race_level_index, pedigree_index, sire_stats_index,
+     jrdb_sed_index, jrdb_kyi_index, jrdb_kaa_index,
+     jrdb_cyb_index, jrdb_cha_index, jrdb_kka_index, jrdb_joa_index) = load_data(
+        sire_cutoff=sire_cutoff)
+    pit_trainer_tl, pit_jockey_tl = build_pit_personnel_timeline()
+    baba_index = load_baba_index()
+
+    df = build_dataset(
+        date_index, history_cache, trainer_index, jockey_index, pace_index,
+        kb_ext_index, span[0] // 100, span[1] // 100, use_db_odds=use_db_odds,
+        training_summary_index=training_summary_index,
+        race_level_index=race_level_index,
+        pedigree_index=pedigree_index,
+        sire_stats_index=sire_stats_index,
+        min_month=span[0] % 100, max_month=span[1] % 100,
+        pit_trainer_tl=pit_trainer_tl, pit_jockey_tl=pit_jockey_tl,
+        baba_index=baba_index,
+        jrdb_sed_index=jrdb_sed_index,
+        jrdb_kyi_index=jrdb_kyi_index,
+        jrdb_kaa_index=jrdb_kaa_index,
+        jrdb_cyb_index=jrdb_cyb_index,
+        jrdb_cha_index=jrdb_cha_index,
+        jrdb_kka_index=jrdb_kka_index,
+        jrdb_joa_index=jrdb_joa_index,
+    )
+    if with_margin:
+        sed = jrdb_sed_index if margin_mode in ('adjusted', 'adj_zscore') else None
+        add_margin_target_to_df(df, date_index, shared_corpus(), cap=5.0,
+                                mode=margin_mode, sed_index=sed, furi_scale=furi_scale)
+    df.attrs['walk_forward'] = dataset_options(span, use_db_odds, sire_cutoff, margin_mode,
+                                               furi_scale, with_margin)
+    return df
+
+
+def _load_pedigree_index() -> dict:
+    path = config.indexes_dir() / "pedigree_index.json"
+    if not path.exists():
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _ym_arg(s: str) -> int:
+    y, m = _parse_period(s)
+    return y * 100 + (m or 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Walk-forward ML experiment')
+    parser.add_argument('--first-test', required=True, help='最初の test 月 (例: 2024.01)')
+    parser.add_argument('--windows', type=int, default=12, help='fold 数')
+    parser.add_argument('--train-months', type=int, default=48)
+    parser.add_argument('--val-months', type=int, default=1)
+    parser.add_argument('--test-months', type=int, default=1)
+    parser.add_argument('--step-months', type=int, default=None, help='窓のずらし幅 (既定=test-months)')
+    parser.add_argument('--expanding', action='store_true', help='train 開始を fold 0 に固定 (拡張窓)')
+    parser.add_argument('--models', default='p,w,ar', help='学習するモデル (p,w,ar のカンマ区切り)')
+    parser.add_argument('--parallel', type=int, default=2, help='同時に学習する fold 数')
+    parser.add_argument('--threads-per-fold', type=int, default=0,
+                        help='fold あたりの LightGBM num_threads (0=CPU数/parallel)')
+    parser.add_argument('--num-boost-round', type=int, default=1500)
+    parser.add_argument('--time-decay', type=float, default=0, help='時間重みの半減期（年）')
+    parser.add_argument('--exclude-features', nargs='+', default=[])
+    parser.add_argument('--bootstrap', type=int, default=1000, help='ROI CI の Bootstrap 回数')
+    parser.add_argument('--no-db', action='store_true', help='DBオッズ未使用（JSON確定オッズ）')
+    parser.add_argument('--sire-cutoff', type=str, default=None,
+                        help='血統統計カットオフ日 (YYYY-MM-DD, 最初の test 開始より前)。 '
+                             'sire_stats_timeline ストアがあれば fold ごとのカットオフで上書き')
+    parser.add_argument('--margin-mode', default='raw',
+                        choices=['raw', 'adjusted', 'zscore', 'adj_zscore'])
+    parser.add_argument('--furi-scale', type=float, default=0.1)
+    parser.add_argument('--dataset', type=str, default=None,
+                        help='全期間特徴量の pickle。 存在すれば読込、 無ければ構築して保存')
+    args = parser.parse_args()
+    use_training_cache()
+
+    models = [m.strip().lower() for m in args.models.split(',') if m.strip()]
+    bad = [m for m in models if m not in MODELS]
+    if bad:
+        parser.error(f"unknown model(s): {bad}")
+
+    folds = make_folds(_ym_arg(args.first_test), args.windows, args.train_months,
+                       args.val_months, args.test_months, args.step_months, args.expanding)
+    span = (min(f.train[0] for f in folds), max(f.test[1] for f in folds))
+    threads = args.threads_per_fold or max(1, (os.cpu_count() or 1) // max(1, args.parallel))
+
+    print(f"\n{'='*60}")
+    print("  KeibaCICD - Walk-forward Experiment")
+    print(f"  Folds: {len(folds)} ({'expanding' if args.expanding else 'rolling'}), "
+          f"span {_ym_label(span[0])} ~ {_ym_label(span[1])}")
+    for f in folds:
+        d = f.to_dict()
+        print(f"    F{f.index}: train {d['train']} | val {d['val']} | test {d['test']}")
+    print(f"  Models: {','.join(m.upper() for m in models)}  "
+          f"parallel={args.parallel} x threads={threads}")
+    print(f"{'='*60}\n")
+
+    # === リーク防止: 血統統計は各 fold の test 開始前まで ===
+    from builders.build_sire_stats import load_sire_stats_store
+    sire_store = load_sire_stats_store()
+    first_test_start = f"{_ym_label(min(f.test[0] for f in folds))}-01"
+    if sire_store is not None:
+        print("[Sire] fold ごとに test 開始前日時点の血統統計で sire/dam/bms 特徴量を差し替え")
+    elif not args.sire_cutoff:
+        print("\n  WARNING: --sire-cutoff 未指定 → 全データの血統統計を使用（テスト期間リークあり）")
+        print(f"  推奨: --sire-cutoff {first_test_start} より前の日付を指定 "
+              f"(または python -m builders.build_sire_stats --timeline でストアを構築)\n")
+    elif args.sire_cutoff >= first_test_start:
+        parser.error(f"--sire-cutoff ({args.sire_cutoff}) >= 最初の test 開始 ({first_test_start}): "
+                     f"血統統計にテスト期間のデータが含まれ、リークが発生します")
+
+    t0 = time.time()
+    options = dataset_options(span, use_db_odds=not args.no_db, sire_cutoff=args.sire_cutoff,
+                              margin_mode=args.margin_mode, furi_scale=args.furi_scale,
+                              with_margin='ar' in models)
+    dataset_path = Path(args.dataset) if args.dataset else None
+    if dataset_path and dataset_path.exists():
+        df = pd.read_pickle(dataset_path)
+        problems = check_dataset(df, options)
+        if problems:
+            parser.error(f"--dataset {dataset_path} は今回の設定と不一致: {'; '.join(problems)} "
+                         f"(削除して再構築するか別パスを指定)")
+        print(f"[Dataset] Loaded {len(df):,} entries from {dataset_path}")
+    else:
+        df = build_full_dataset(span, use_db_odds=options['use_db_odds'],
+                                sire_cutoff=args.sire_cutoff, margin_mode=args.margin_mode,
+                                furi_scale=args.furi_scale, with_margin=options['with_margin'])
+        if dataset_path:
+            dataset_path.parent.mkdir(parents=True, exist_ok=True)
+            df.to_pickle(dataset_path)
+            print(f"[Dataset] Saved to {dataset_path}")
+    ym = date_ym(df)
+    if ym.size and (ym.min() > span[0] or ym.max() < span[1]):
+        print(f"  WARNING: dataset covers {_ym_label(int(ym.min()))} ~ {_ym_label(int(ym.max()))}, "
+              f"folds need {_ym_label(span[0])} ~ {_ym_label(span[1])}")
+    print(f"[Dataset] {len(df):,} entries, {df['race_id'].nunique():,} races "
+          f"({time.time() - t0:.0f}s)")
+
+    exclude = set(args.exclude_features)
+    base = [f for f in FEATURE_COLS_VALUE if f not in exclude and f in df.columns]
+    features = {
+        'p': base + [f for f in sorted(P_ONLY_FEATURES) if f in df.columns and f not in exclude],
+        'w': base,
+        'ar': base,
+    }
+    params = {'p': dict(PARAMS_P), 'w': dict(PARAMS_W), 'ar': dict(PARAMS_AR)}
+
+    pedigree = None
+    if sire_store is not None and 'ketto_num' in df.columns:
+        pedigree = make_fold_pedigree(sire_store, _load_pedigree_index(), df['ketto_num'])
+
+    t1 = time.time()
+    results = run_folds(
+        folds, df, parallel=args.parallel, features=features, params=params,
+        models=models, threads=threads, num_boost_round=args.num_boost_round,
+        time_decay=args.time_decay, bootstrap_n=args.bootstrap, pedigree=pedigree,
+    )
+    summary = summarize(results, models, pooled=not folds_overlap(folds),
+                        bootstrap_n=args.bootstrap)
+    print_report(results, summary, models)
+
+    settings = {k: v for k, v in vars(args).items()}
+    settings.update({'threads_per_fold': threads, 'n_features': {k: len(v) for k, v in features.items()},
+                     'sire_per_fold': pedigree is not None,
+                     'dataset_entries': len(df), 'train_sec': round(time.time() - t1, 1)})
+    path = save_report(results, summary, settings)
+    print(f"\n  Report saved to: {path}")
+    print(f"  Total: {time.time() - t0:.0f}s (training {time.time() - t1:.0f}s)")
+
+
+if __name__ == '__main__':
+    main()
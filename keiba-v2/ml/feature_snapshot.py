@@ -3,19 +3,58 @@
 """
 特徴量スナップショット保存・読み込み
 
-レース単位で計算された特徴量をJSONファイルとして保存する。
-保存先: data3/features/YYYY/MM/DD/features_{race_id}.json
+レース単位で計算された特徴量を、開催日ごとの追記専用・列指向ファイルに保存する。
+保存先: data3/features/YYYY/features_{YYYYMMDD}.snap
+
+ファイルは「ブロック」の連結で、1回の保存 = 1ブロックを末尾に追記する
+(既存データは書き換えない)。 各ブロックは 行 = 出走馬、列 = 特徴量 の
+float64 行列 + メタ列 (race_id / umaban / ketto_num / horse_name /
+finish_position) + ブロック共通情報 (source / model_version / saved_at /
+レース情報) を圧縮 npz で持つ。
+
+耐障害性:
+    ブロックは ヘッダ (長さ) + payload + CRC32 で、 追記後に fsync する。
+    書き込み途中で落ちた末尾ブロック (長さ不足 / CRC 不一致) は読み込み時に無視し、
+    次の追記時に切り詰めてから書く (壊れた末尾の後ろに有効ブロックが続かないように)。
+    末尾の検査はヘッダの長さを辿って最後のブロックだけ CRC を見る。 同じプロセスが
+    直前に追記したファイル ((size, mtime) が一致) は検査しない (predict のレース毎保存で
+    1 日 O(n²) の読み直しにならないように)。
+    v1 (CRC なし・float32) のブロックもそのまま読める。
 
 目的:
   - 特徴量の可視化・検証
   - リーク検出の基盤
   - 実験間の特徴量差分比較
+  - 学習時 (experiment) と推論時 (predict) の特徴量ずれ (train/serve skew) 検出
+
+提供:
+    save_feature_snapshot(rows, race, source, model_version)  — 1レース分を追記
+    FeatureSnapshotWriter       — build_dataset 用: 日単位にまとめて追記
+    load_snapshots(date_from, date_to, race_ids, features, source)
+                                — 期間/レース/特徴量サブセットで DataFrame 取得
+    load_feature_snapshot(race_id)
+                                — 1レース分を従来の dict 形式で取得 (旧JSONにも対応)
+    compare_sources(date_from, date_to, ...)
+                                — source 間の特徴量分布比較 (skew チェック)
+
+Usage:
+    from ml.feature_snapshot import load_snapshots, compare_sources
+    df = load_snapshots('2026-02-01', '2026-02-28', features=['odds', 'speed_idx_avg3'])
+    skew = compare_sources('2026-02-01', '2026-02-28')
 """
 
+import io
 import json
+import math
+import os
+import struct
+import zlib
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
 
 import sys
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -23,28 +62,247 @@ sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 from core import config
 
 
+# ブロックヘッダ: magic(4) + version(uint16) + reserved(uint16) + payload長(uint64)
+# v2 は payload の後ろに CRC32 (uint32) を付ける
+_MAGIC = b'FSNP'
+_FORMAT_VERSION = 2
+_READ_VERSIONS = (1, 2)
+_HEADER = struct.Struct('<4sHHQ')
+_TRAILER = struct.Struct('<I')
+
+# メタ情報以外の特徴量キーを特定
+META_KEYS = {
+    'race_id', 'date', 'ketto_num', 'horse_name', 'umaban',
+    'venue_name', 'grade', 'age_class',
+    'finish_position', 'is_top3', 'is_win', 'place_odds_low',
+}
+
+ROW_META_COLS = ['date', 'race_id', 'umaban', 'ketto_num', 'horse_name',
+                 'finish_position', 'source', 'model_version', 'saved_at']
+
+
+# =============================================================================
+# パス
+# =============================================================================
+
 def _race_id_to_date_parts(race_id: str) -> tuple:
     """race_id (16桁 YYYYMMDDJJKKNNRR) から (YYYY, MM, DD) を抽出"""
     return race_id[:4], race_id[4:6], race_id[6:8]
 
 
 def _features_dir(race_id: str) -> Path:
-    """スナップショット保存ディレクトリを返す"""
+    """旧形式 (レース単位JSON) の保存ディレクトリ"""
     yyyy, mm, dd = _race_id_to_date_parts(race_id)
     return config.data_root() / "features" / yyyy / mm / dd
 
 
+def snapshot_path(date: str) -> Path:
+    """開催日 (YYYY-MM-DD / YYYYMMDD) → 日別スナップショットファイル"""
+    ymd = date.replace('-', '')
+    return config.data_root() / "features" / ymd[:4] / f"features_{ymd}.snap"
+
+
+# =============================================================================
+# エンコード
+# =============================================================================
+
+def _serialize(val):
+    """JSON互換の値に変換"""
+    if val is None:
+        return None
+    if isinstance(val, float):
+        if math.isnan(val) or math.isinf(val):
+            return None
+        return round(val, 6)
+    if isinstance(val, (int, str, bool)):
+        return val
+    try:
+        return float(val)
+    except (TypeError, ValueError):
+        return str(val)
+
+
+def _as_number(val) -> Optional[float]:
+    """数値列に載せられる値なら float、そうでなければ None を返す (None/NaN → nan)"""
+    if val is None:
+        return math.nan
+    if isinstance(val, (bool, int, float, np.integer, np.floating)):
+        return float(val)
+    return None
+
+
+def _pack_strings(values: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    chunks = [(v or '').encode('utf-8') for v in values]
+    offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+    np.cumsum([len(c) for c in chunks], out=offsets[1:])
+    return np.frombuffer(b''.join(chunks), dtype=np.uint8).copy(), offsets
+
+
+def _unpack_strings(data: np.ndarray, offsets: np.ndarray) -> List[str]:
+    blob = data.tobytes()
+    off = offsets.tolist()
+    return [blob[off[i]:off[i + 1]].decode('utf-8') for i in range(len(off) - 1)]
+
+
+def _encode_block(
+    rows: List[dict],
+    races: Dict[str, dict],
+    source: str,
+    model_version: str,
+) -> bytes:
+    """行 dict 群 → 1ブロック分の圧縮 npz バイト列"""
+    feature_names: Dict[str, None] = {}
+    for row in rows:
+        for k in row:
+            if k not in META_KEYS:
+                feature_names.setdefault(k, None)
+
+    # 数値化できない値を含む列は JSON 列へ
+    numeric, extra = [], []
+    for k in feature_names:
+        if all(_as_number(row.get(k)) is not None for row in rows):
+            numeric.append(k)
+        else:
+            extra.append(k)
+
+    n = len(rows)
+    X = np.full((n, len(numeric)), np.nan, dtype=np.float64)
+    for i, row in enumerate(rows):
+        for j, k in enumerate(numeric):
+            X[i, j] = _as_number(row.get(k))
+
+    finish = np.array([_as_number(r.get('finish_position')) for r in rows], dtype=np.float64)
+    names_data, names_off = _pack_strings([r.get('horse_name', '') or '' for r in rows])
+    extra_json = json.dumps(
+        [{k: _serialize(r.get(k)) for k in extra} for r in rows], ensure_ascii=False)
+
+    meta = {
+        'source': source,
+        'model_version': model_version or '',
+        'saved_at': datetime.now().isoformat(timespec='seconds'),
+        'features': numeric,
+        'extra_features': extra,
+        'races': races,
+    }
+    arrays = {
+        '__meta__': np.frombuffer(json.dumps(meta, ensure_ascii=False).encode('utf-8'),
+                                  dtype=np.uint8),
+        'race_id': np.array([str(r.get('race_id', '')) for r in rows], dtype='S16'),
+        'ketto_num': np.array([str(r.get('ketto_num', '') or '') for r in rows], dtype='S10'),
+        'umaban': np.array([int(r.get('umaban') or 0) for r in rows], dtype=np.int16),
+        'finish_position': finish,
+        'horse_name': names_data,
+        'horse_name_offsets': names_off,
+        'X': X,
+        'extra': np.frombuffer(extra_json.encode('utf-8'), dtype=np.uint8),
+    }
+    buf = io.BytesIO()
+    np.savez_compressed(buf, **arrays)
+    return buf.getvalue()
+
+
+def _read_block(f) -> Optional[bytes]:
+    """現在位置から 1 ブロック読む。 末尾 / 書きかけ / 破損なら None"""
+    head = f.read(_HEADER.size)
+    if len(head) < _HEADER.size:
+        return None
+    magic, version, _, length = _HEADER.unpack(head)
+    if magic != _MAGIC or version not in _READ_VERSIONS:
+        return None
+    payload = f.read(length)
+    if len(payload) < length:
+        return None
+    if version >= 2:
+        trailer = f.read(_TRAILER.size)
+        if len(trailer) < _TRAILER.size:
+            return None
+        if _TRAILER.unpack(trailer)[0] != zlib.crc32(payload):
+            return None
+    return payload
+
+
+def _valid_length(path: Path) -> int:
+    """先頭から連続する完全なブロックの末尾オフセット
+
+    ヘッダの長さで次のブロックへ seek するだけで payload は読まず、
+    CRC は最後のブロックだけ検査する (書きかけの末尾の検出用。 途中のブロックは
+    読み込み時に _read_block が検査する)。
+    """
+    with open(path, 'rb') as f:
+        size = f.seek(0, os.SEEK_END)
+        pos = 0
+        last = None
+        while True:
+            f.seek(pos)
+            head = f.read(_HEADER.size)
+            if len(head) < _HEADER.size:
+                break
+            magic, version, _, length = _HEADER.unpack(head)
+            if magic != _MAGIC or version not in _READ_VERSIONS:
+                break
+            end = pos + _HEADER.size + length + (_TRAILER.size if version >= 2 else 0)
+            if end > size:
+                break
+            last, pos = (pos, version), end
+        if last is not None and last[1] >= 2:
+            f.seek(last[0])
+            if _read_block(f) is None:
+                return last[0]
+        return pos
+
+
+# 追記済みファイルの (size, mtime_ns)。 前回の追記から誰も触っていなければ再検査しない
+_appended_stat: Dict[str, Tuple[int, int]] = {}
+
+
+def _append_block(path: Path, payload: bytes) -> None:
+    """1 ブロック追記して fsync。 書きかけの末尾があれば先に切り詰める"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    key = str(path)
+    with open(path, 'ab') as f:
+        st = os.fstat(f.fileno())
+        size = st.st_size
+        if size and _appended_stat.get(key) != (size, st.st_mtime_ns):
+            valid = _valid_length(path)
+            if valid < size:
+                print(f"  [WARN] feature snapshot: truncated torn tail "
+                      f"{path.name} ({size - valid} bytes at offset {valid})")
+                f.truncate(valid)
+        f.write(_HEADER.pack(_MAGIC, _FORMAT_VERSION, 0, len(payload)))
+        f.write(payload)
+        f.write(_TRAILER.pack(zlib.crc32(payload)))
+        f.flush()
+        os.fsync(f.fileno())
+        st = os.fstat(f.fileno())
+        _appended_stat[key] = (st.st_size, st.st_mtime_ns)
+
+
+# =============================================================================
+# 保存
+# =============================================================================
+
+def _race_info(race: dict, date_str: str) -> dict:
+    return {
+        'date': date_str,
+        'venue_name': race.get('venue_name', ''),
+        'race_name': race.get('race_name', ''),
+        'grade': race.get('grade', ''),
+    }
+
+
 def save_feature_snapshot(
     rows: List[dict],
     race: dict,
     source: str = "experiment",
+    model_version: str = "",
 ) -> Optional[Path]:
-    """レース単位の特徴量スナップショットを保存
+    """レース単位の特徴量スナップショットを日別ファイルに追記
 
     Args:
         rows: compute_features_for_race() の戻り値（List[dict]、各馬の特徴量dict）
         race: レースJSON（メタ情報取得用）
         source: "experiment" or "predict"
+        model_version: 推論時のモデルバージョン (学習時は空)
 
     Returns:
         保存先パス（成功時）、None（失敗時）
@@ -53,78 +311,295 @@ def save_feature_snapshot(
         return None
 
     race_id = rows[0].get('race_id', '')
-    date_str = rows[0].get('date', '')
+    date_str = rows[0].get('date', '') or race.get('date', '')
+    if not race_id or not date_str:
+        return None
 
-    # メタ情報以外の特徴量キーを特定
-    meta_keys = {
-        'race_id', 'date', 'ketto_num', 'horse_name', 'umaban',
-        'venue_name', 'grade', 'age_class',
-        'finish_position', 'is_top3', 'is_win', 'place_odds_low',
-    }
+    path = snapshot_path(date_str)
+    _append_block(path, _encode_block(
+        rows, {race_id: _race_info(race, date_str)}, source, model_version))
+    return path
 
-    entries = []
-    feature_keys = None
-    for row in rows:
-        features = {k: _serialize(v) for k, v in row.items() if k not in meta_keys}
-        if feature_keys is None:
-            feature_keys = sorted(features.keys())
 
-        entries.append({
-            'umaban': row.get('umaban'),
-            'ketto_num': row.get('ketto_num', ''),
-            'horse_name': row.get('horse_name', ''),
-            'finish_position': row.get('finish_position'),
-            'features': features,
-        })
+class FeatureSnapshotWriter:
+    """開催日ごとに行をまとめて1ブロックで追記するライター
 
-    snapshot = {
-        'race_id': race_id,
-        'date': date_str,
-        'venue_name': race.get('venue_name', ''),
-        'race_name': race.get('race_name', ''),
-        'grade': race.get('grade', ''),
-        'source': source,
-        'saved_at': datetime.now().isoformat(timespec='seconds'),
-        'feature_count': len(feature_keys) if feature_keys else 0,
-        'entries': entries,
-    }
+    build_dataset(save_features=True) のように日付順に大量のレースを処理する場合、
+    レースごとに追記するより 1日 = 1ブロック にまとめた方が圧縮効率もよい。
+
+        with FeatureSnapshotWriter(source="experiment") as w:
+            for race in races:
+                w.add(rows, race)
+    """
+
+    def __init__(self, source: str = "experiment", model_version: str = ""):
+        self.source = source
+        self.model_version = model_version
+        self._date: Optional[str] = None
+        self._rows: List[dict] = []
+        self._races: Dict[str, dict] = {}
+        self.blocks_written = 0
+        self.rows_written = 0
+
+    def add(self, rows: List[dict], race: dict) -> None:
+        if not rows:
+            return
+        race_id = rows[0].get('race_id', '')
+        date_str = rows[0].get('date', '') or race.get('date', '')
+        if not race_id or not date_str:
+            return
+        if self._date is not None and date_str != self._date:
+            self.flush()
+        self._date = date_str
+        self._rows.extend(rows)
+        self._races[race_id] = _race_info(race, date_str)
+
+    def flush(self) -> None:
+        if self._rows and self._date:
+            _append_block(snapshot_path(self._date), _encode_block(
+                self._rows, self._races, self.source, self.model_version))
+            self.blocks_written += 1
+            self.rows_written += len(self._rows)
+        self._date = None
+        self._rows = []
+        self._races = {}
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self) -> 'FeatureSnapshotWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# =============================================================================
+# 読み込み
+# =============================================================================
+
+def _iter_raw_blocks(path: Path) -> Iterator[bytes]:
+    """日別ファイル → ブロック payload 列 (末尾の書きかけ・CRC 不一致ブロックは無視)"""
+    if not path.exists():
+        return
+    with open(path, 'rb') as f:
+        while True:
+            payload = _read_block(f)
+            if payload is None:
+                return
+            yield payload
+
+
+def _decode_block(payload: bytes, features: Optional[List[str]] = None) -> pd.DataFrame:
+    """ブロック → DataFrame (features 指定時はその列だけ展開)"""
+    with np.load(io.BytesIO(payload), allow_pickle=False) as z:
+        meta = json.loads(z['__meta__'].tobytes().decode('utf-8'))
+        races = meta.get('races', {})
+        race_ids = z['race_id'].astype('U').tolist()
+        data = {
+            'date': [races.get(r, {}).get('date', '') for r in race_ids],
+            'race_id': race_ids,
+            'umaban': z['umaban'].astype(np.int64),
+            'ketto_num': z['ketto_num'].astype('U').tolist(),
+            'horse_name': _unpack_strings(z['horse_name'], z['horse_name_offsets']),
+            'finish_position': z['finish_position'].astype(np.float64),
+            'source': meta.get('source', ''),
+            'model_version': meta.get('model_version', ''),
+            'saved_at': meta.get('saved_at', ''),
+        }
+        names = meta.get('features', [])
+        want = set(features) if features is not None else None
+        X = z['X']
+        for j, name in enumerate(names):
+            if want is None or name in want:
+                data[name] = X[:, j].astype(np.float64)
+        extra_names = meta.get('extra_features', [])
+        if extra_names and (want is None or want.intersection(extra_names)):
+            extra = json.loads(z['extra'].tobytes().decode('utf-8'))
+            for name in extra_names:
+                if want is None or name in want:
+                    data[name] = [e.get(name) for e in extra]
+    return pd.DataFrame(data)
+
+
+def _block_meta(payload: bytes) -> dict:
+    with np.load(io.BytesIO(payload), allow_pickle=False) as z:
+        return json.loads(z['__meta__'].tobytes().decode('utf-8'))
+
+
+def _iter_dates(date_from: str, date_to: str) -> Iterator[Path]:
+    """期間内に存在する日別ファイル"""
+    d0 = date_from.replace('-', '')
+    d1 = date_to.replace('-', '')
+    root = config.data_root() / "features"
+    for year in range(int(d0[:4]), int(d1[:4]) + 1):
+        ydir = root / str(year)
+        if not ydir.exists():
+            continue
+        for path in sorted(ydir.glob('features_*.snap')):
+            ymd = path.stem[len('features_'):]
+            if d0 <= ymd <= d1:
+                yield path
+
+
+def load_snapshots(
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    race_ids: Optional[Iterable[str]] = None,
+    features: Optional[Iterable[str]] = None,
+    source: Optional[str] = None,
+    latest_only: bool = True,
+) -> pd.DataFrame:
+    """スナップショットを DataFrame で取得 (行 = 出走馬)
+
+    Args:
+        date_from, date_to: 開催日範囲 (両端含む)。 date_to 省略時は date_from の1日。
+            race_ids のみ指定時は race_id の日付から対象ファイルを決める。
+        race_ids: 対象レースID (None=全レース)
+        features: 展開する特徴量名 (None=全特徴量)。 メタ列は常に含む。
+        source: "experiment" / "predict" で絞り込み (None=両方)
+        latest_only: 同一 (race_id, source) が複数回保存されていれば最新ブロックのみ
 
-    out_dir = _features_dir(race_id)
-    out_dir.mkdir(parents=True, exist_ok=True)
-    out_path = out_dir / f"features_{race_id}.json"
+    Returns:
+        DataFrame — 列: date, race_id, umaban, ketto_num, horse_name,
+        finish_position, source, model_version, saved_at, <特徴量...>
+    """
+    rid_set = set(race_ids) if race_ids is not None else None
+    feature_list = list(features) if features is not None else None
+
+    if date_from is not None:
+        paths = list(_iter_dates(date_from, date_to or date_from))
+    elif rid_set:
+        dates = sorted({r[:8] for r in rid_set})
+        paths = [p for p in (snapshot_path(d) for d in dates) if p.exists()]
+    else:
+        raise ValueError("date_from or race_ids is required")
+
+    frames: List[pd.DataFrame] = []
+    for path in paths:
+        blocks = list(_iter_raw_blocks(path))
+        metas = [_block_meta(b) for b in blocks]
+
+        # (race_id, source) ごとに最新ブロックを特定
+        latest: Dict[Tuple[str, str], int] = {}
+        for bi, meta in enumerate(metas):
+            for rid in meta.get('races', {}):
+                latest[(rid, meta.get('source', ''))] = bi
 
-    with open(out_path, 'w', encoding='utf-8') as f:
-        json.dump(snapshot, f, ensure_ascii=False, indent=1)
+        for bi, (payload, meta) in enumerate(zip(blocks, metas)):
+            src = meta.get('source', '')
+            if source is not None and src != source:
+                continue
+            block_races = set(meta.get('races', {}))
+            if rid_set is not None:
+                block_races &= rid_set
+            if latest_only:
+                block_races = {r for r in block_races if latest[(r, src)] == bi}
+            if not block_races:
+                continue
+            df = _decode_block(payload, feature_list)
+            if len(block_races) < len(meta.get('races', {})):
+                df = df[df['race_id'].isin(block_races)]
+            frames.append(df)
 
-    return out_path
+    if not frames:
+        cols = ROW_META_COLS + (feature_list or [])
+        return pd.DataFrame(columns=cols)
+    return pd.concat(frames, ignore_index=True, sort=False)
 
 
 def load_feature_snapshot(race_id: str) -> Optional[dict]:
-    """保存済みスナップショットを読み込む
+    """保存済みスナップショットを従来の dict 形式で読み込む
+
+    日別ファイルに無ければ旧形式 (features_{race_id}.json) を探す。
 
     Returns:
         スナップショットdict（存在しない場合はNone）
     """
-    out_dir = _features_dir(race_id)
-    path = out_dir / f"features_{race_id}.json"
-    if not path.exists():
-        return None
-    with open(path, 'r', encoding='utf-8') as f:
-        return json.load(f)
-
+    path = snapshot_path(race_id[:8])
+    hit: Optional[Tuple[bytes, dict]] = None
+    for payload in _iter_raw_blocks(path):
+        meta = _block_meta(payload)
+        if race_id in meta.get('races', {}):
+            hit = (payload, meta)  # 最後に保存されたものを採用
 
-def _serialize(val):
-    """JSON互換の値に変換"""
-    if val is None:
-        return None
-    if isinstance(val, float):
-        import math
-        if math.isnan(val) or math.isinf(val):
+    if hit is None:
+        legacy = _features_dir(race_id) / f"features_{race_id}.json"
+        if not legacy.exists():
             return None
-        return round(val, 6)
-    if isinstance(val, (int, str, bool)):
-        return val
-    try:
-        return float(val)
-    except (TypeError, ValueError):
-        return str(val)
+        with open(legacy, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    payload, meta = hit
+    df = _decode_block(payload)
+    df = df[df['race_id'] == race_id]
+    feature_keys = meta.get('features', []) + meta.get('extra_features', [])
+    entries = []
+    for _, r in df.iterrows():
+        fp = r['finish_position']
+        entries.append({
+            'umaban': int(r['umaban']),
+            'ketto_num': r['ketto_num'],
+            'horse_name': r['horse_name'],
+            'finish_position': None if math.isnan(fp) else int(fp),
+            'features': {k: _serialize(r[k]) for k in feature_keys},
+        })
+    info = meta['races'][race_id]
+    return {
+        'race_id': race_id,
+        'date': info.get('date', ''),
+        'venue_name': info.get('venue_name', ''),
+        'race_name': info.get('race_name', ''),
+        'grade': info.get('grade', ''),
+        'source': meta.get('source', ''),
+        'model_version': meta.get('model_version', ''),
+        'saved_at': meta.get('saved_at', ''),
+        'feature_count': len(feature_keys),
+        'entries': entries,
+    }
+
+
+# =============================================================================
+# Skew チェック
+# =============================================================================
+
+def compare_sources(
+    date_from: str,
+    date_to: Optional[str] = None,
+    features: Optional[Iterable[str]] = None,
+    source_a: str = "experiment",
+    source_b: str = "predict",
+) -> pd.DataFrame:
+    """同一期間の2ソース間で特徴量分布を比較する (train/serve skew チェック)
+
+    共通の (race_id, umaban) に揃えたうえで、特徴量ごとに
+    欠損率・平均・不一致率 (|a-b| > 1e-4) を返す。 不一致率の降順。
+    """
+    a = load_snapshots(date_from, date_to, features=features, source=source_a)
+    b = load_snapshots(date_from, date_to, features=features, source=source_b)
+    keys = ['race_id', 'umaban']
+    meta = set(ROW_META_COLS)
+    cols = [c for c in a.columns if c in b.columns and c not in meta]
+    if a.empty or b.empty or not cols:
+        return pd.DataFrame(columns=['feature', 'n', 'null_a', 'null_b',
+                                     'mean_a', 'mean_b', 'mismatch_rate'])
+
+    m = a[keys + cols].merge(b[keys + cols], on=keys, suffixes=('_a', '_b'))
+    out = []
+    for c in cols:
+        va = pd.to_numeric(m[f'{c}_a'], errors='coerce')
+        vb = pd.to_numeric(m[f'{c}_b'], errors='coerce')
+        both = va.notna() & vb.notna()
+        diff = (va[both] - vb[both]).abs() > 1e-4
+        mismatch = (diff.sum() + (va.isna() != vb.isna()).sum()) / max(len(m), 1)
+        out.append({
+            'feature': c,
+            'n': len(m),
+            'null_a': float(va.isna().mean()) if len(m) else 0.0,
+            'null_b': float(vb.isna().mean()) if len(m) else 0.0,
+            'mean_a': float(va.mean()) if both.any() else math.nan,
+            'mean_b': float(vb.mean()) if both.any() else math.nan,
+            'mismatch_rate': float(mismatch),
+        })
+    return pd.DataFrame(out).sort_values('mismatch_rate', ascending=False,
+                                         ignore_index=True)
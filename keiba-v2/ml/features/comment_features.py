@@ -10,9 +10,15 @@ keibabookの3種コメント（厩舎談話、前走インタビュー、次走
   → entries[umaban].stable_comment.comment       (厩舎談話)
   → entries[umaban].previous_race_interview.interview   (前走騎手インタビュー)
   → entries[umaban].previous_race_interview.next_race_memo  (次走メモ)
+
+全辞書のキーワードから Aho–Corasick オートマトンを1度だけ構築し、
+各テキストを1パス走査して「キーワード → 最初の出現位置」を得てから
+各カテゴリをスコアリングする (str.find をキーワード数ぶん回すのと同じ結果)。
+計算結果はコメント原文をキーに LRU でメモ化し、同一プロセス内の再ビルドで再利用する。
 """
 
 import re
+from collections import OrderedDict
 
 # ============================================================
 # 辞書定義
@@ -178,6 +184,86 @@ def _parse_memo(text: str) -> str:
     return text
 
 
+# ============================================================
+# Aho–Corasick マッチャー
+# ============================================================
+
+class KeywordAutomaton:
+    """複数キーワードの同時検索 (Aho–Corasick, 遷移表を事前展開した DFA)
+
+    first_positions(text) は {keyword: text.find(keyword)} のうち
+    見つかったものだけを返す (1パス走査)。
+    """
+
+    def __init__(self, keywords):
+        goto = [{}]
+        out = [[]]
+        for kw in dict.fromkeys(keywords):
+            if not kw:
+                continue
+            state = 0
+            for ch in kw:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append([])
+                state = nxt
+            out[state].append(kw)
+
+        # BFS で failure link を張りつつ、全文字の遷移を展開
+        fail = [0] * len(goto)
+        delta = [dict(goto[0])] + [None] * (len(goto) - 1)
+        queue = list(goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            out[state] = out[state] + out[fail[state]]
+            trans = dict(delta[fail[state]])
+            for ch, nxt in goto[state].items():
+                fail[nxt] = delta[fail[state]].get(ch, 0) if state else 0
+                trans[ch] = nxt
+                queue.append(nxt)
+            delta[state] = trans
+
+        self._delta = delta
+        self._out = [tuple((kw, len(kw) - 1) for kw in o) for o in out]
+
+    def first_positions(self, text: str) -> dict:
+        delta = self._delta
+        out = self._out
+        found = {}
+        state = 0
+        for i, ch in enumerate(text):
+            state = delta[state].get(ch, 0)
+            if out[state]:
+                for kw, back in out[state]:
+                    if kw not in found:
+                        found[kw] = i - back
+        return found
+
+
+_AUTOMATON = None
+
+
+def _automaton() -> KeywordAutomaton:
+    global _AUTOMATON
+    if _AUTOMATON is None:
+        _AUTOMATON = KeywordAutomaton([
+            *CONDITION_POSITIVE, *CONDITION_NEGATIVE,
+            *CONFIDENCE_POSITIVE, *CONFIDENCE_NEGATIVE,
+            *EXCUSE_KEYWORDS, *INTERVIEW_EXCUSE,
+            *MEMO_TROUBLE, *MEMO_POSITIVE,
+        ])
+    return _AUTOMATON
+
+
+# ============================================================
+# スコアリング
+# ============================================================
+
 def _check_negation(text: str, keyword: str, match_pos: int) -> bool:
     """キーワードマッチ位置の後方に否定表現があるかチェック"""
     end_pos = match_pos + len(keyword)
@@ -185,21 +271,26 @@ def _check_negation(text: str, keyword: str, match_pos: int) -> bool:
     return any(neg in window for neg in NEGATION_WORDS)
 
 
-def _score_text(text: str, pos_dict: dict, neg_dict: dict):
+def _score_text(text: str, pos_dict: dict, neg_dict: dict, found: dict = None):
     """テキストを辞書でスコアリング
 
+    Args:
+        found: _automaton().first_positions(text) の結果 (省略時はここで計算)
+
     Returns:
         (net_score, pos_count, neg_count)
     """
     if not text:
         return 0.0, 0, 0
+    if found is None:
+        found = _automaton().first_positions(text)
 
     pos_scores = []
     neg_scores = []
 
     # ポジティブキーワード検索
     for keyword, score in pos_dict.items():
-        idx = text.find(keyword)
+        idx = found.get(keyword, -1)
         if idx >= 0:
             if _check_negation(text, keyword, idx):
                 # 否定されている → 反転して軽減
@@ -209,7 +300,7 @@ def _score_text(text: str, pos_dict: dict, neg_dict: dict):
 
     # ネガティブキーワード検索
     for keyword, score in neg_dict.items():
-        idx = text.find(keyword)
+        idx = found.get(keyword, -1)
         if idx >= 0:
             if _check_negation(text, keyword, idx):
                 # 否定されている → 反転して軽減
@@ -224,38 +315,57 @@ def _score_text(text: str, pos_dict: dict, neg_dict: dict):
     return pos_max + neg_max, len(pos_scores), len(neg_scores)
 
 
-def _score_excuse_keywords(text: str, keyword_list: list) -> int:
+def _score_excuse_keywords(text: str, keyword_list: list, found: dict = None) -> int:
     """言い訳キーワードの存在チェック (0 or 1)"""
     if not text:
         return 0
-    return 1 if any(kw in text for kw in keyword_list) else 0
+    if found is None:
+        found = _automaton().first_positions(text)
+    return 1 if any(kw in found for kw in keyword_list) else 0
 
 
-def _score_interview_excuse(text: str) -> float:
+def _score_interview_excuse(text: str, found: dict = None) -> float:
     """前走インタビューの不利/敗因スコア"""
     if not text:
         return 0.0
+    if found is None:
+        found = _automaton().first_positions(text)
     scores = []
     for keyword, score in INTERVIEW_EXCUSE.items():
-        if keyword in text:
+        if keyword in found:
             scores.append(score)
     return max(scores) if scores else 0.0
 
 
-def _score_memo_trouble(text: str) -> float:
+def _score_memo_trouble(text: str, found: dict = None) -> float:
     """次走メモのトラブル/ポジティブスコア
 
     正=トラブルあり、負=ポジティブ評価
     """
     if not text:
         return 0.0
-    trouble_scores = [s for kw, s in MEMO_TROUBLE.items() if kw in text]
-    positive_scores = [s for kw, s in MEMO_POSITIVE.items() if kw in text]
+    if found is None:
+        found = _automaton().first_positions(text)
+    trouble_scores = [s for kw, s in MEMO_TROUBLE.items() if kw in found]
+    positive_scores = [s for kw, s in MEMO_POSITIVE.items() if kw in found]
     trouble = max(trouble_scores) if trouble_scores else 0.0
     positive = max(positive_scores) if positive_scores else 0.0
     return trouble - positive
 
 
+# コメント原文 (厩舎談話, インタビュー, 次走メモ) → 特徴量 の LRU。
+# 特徴量は 1 頭分の原文だけで決まるので、 kb_ext の同一性 (id) ではなく原文で引く
+# (同じ kb_ext を読み直しても当たり、 kb_ext をその場で書き換えれば別キーになる)。
+# 保持するのは原文の文字列と結果 dict だけで kb_ext 本体は参照しない。
+_TEXT_MEMO_MAX = 8192
+_text_memo: "OrderedDict[tuple, dict]" = OrderedDict()
+
+
+def clear_comment_cache() -> None:
+    """原文 → 特徴量 のメモを破棄"""
+    _text_memo.clear()
+
+
 # ============================================================
 # メイン関数
 # ============================================================
@@ -289,11 +399,38 @@ def compute_comment_features(
     if not kb_ext:
         return default
 
+    texts = _entry_texts(kb_ext, str(umaban))
+    if texts is None:
+        return default
+    cached = _text_memo.get(texts)
+    if cached is not None:
+        _text_memo.move_to_end(texts)
+        return dict(cached)
+
+    result = _compute_entry_features(umaban, kb_ext, default)
+    _text_memo[texts] = result
+    if len(_text_memo) > _TEXT_MEMO_MAX:
+        _text_memo.popitem(last=False)
+    return dict(result)
+
+
+def _entry_texts(kb_ext: dict, umaban: str) -> tuple:
+    """メモのキー: 1頭分のコメント原文 (エントリが無ければ None)"""
+    entry = (kb_ext.get('entries') or {}).get(umaban)
+    if not entry:
+        return None
+    stable = (entry.get('stable_comment') or {}).get('comment', '')
+    interview = entry.get('previous_race_interview') or {}
+    return stable, interview.get('interview', ''), interview.get('next_race_memo', '')
+
+
+def _compute_entry_features(umaban: str, kb_ext: dict, default: dict) -> dict:
     entries = kb_ext.get('entries', {})
     entry = entries.get(str(umaban))
     if not entry:
         return default
 
+    ac = _automaton()
     result = dict(default)
 
     # --- 厩舎談話 ---
@@ -302,9 +439,11 @@ def compute_comment_features(
 
     if stable_text and stable_text.strip():
         mark_score, body = _parse_stable_comment(stable_text)
-        condition_score, _, _ = _score_text(body, CONDITION_POSITIVE, CONDITION_NEGATIVE)
-        confidence_score, _, _ = _score_text(body, CONFIDENCE_POSITIVE, CONFIDENCE_NEGATIVE)
-        excuse_flag = _score_excuse_keywords(body, EXCUSE_KEYWORDS)
+        found = ac.first_positions(body)
+        condition_score, _, _ = _score_text(body, CONDITION_POSITIVE, CONDITION_NEGATIVE, found)
+        confidence_score, _, _ = _score_text(
+            body, CONFIDENCE_POSITIVE, CONFIDENCE_NEGATIVE, found)
+        excuse_flag = _score_excuse_keywords(body, EXCUSE_KEYWORDS, found)
 
         result['comment_stable_condition'] = condition_score
         result['comment_stable_confidence'] = confidence_score
@@ -320,8 +459,9 @@ def compute_comment_features(
 
     if interview_text and interview_text.strip():
         body = _parse_interview(interview_text)
-        condition_score, _, _ = _score_text(body, CONDITION_POSITIVE, CONDITION_NEGATIVE)
-        excuse_score = _score_interview_excuse(body)
+        found = ac.first_positions(body)
+        condition_score, _, _ = _score_text(body, CONDITION_POSITIVE, CONDITION_NEGATIVE, found)
+        excuse_score = _score_interview_excuse(body, found)
 
         result['comment_interview_condition'] = condition_score
         result['comment_interview_excuse_score'] = excuse_score
@@ -334,8 +474,9 @@ def compute_comment_features(
 
     if memo_text and memo_text.strip():
         body = _parse_memo(memo_text)
-        condition_score, _, _ = _score_text(body, CONDITION_POSITIVE, CONDITION_NEGATIVE)
-        trouble_score = _score_memo_trouble(body)
+        found = ac.first_positions(body)
+        condition_score, _, _ = _score_text(body, CONDITION_POSITIVE, CONDITION_NEGATIVE, found)
+        trouble_score = _score_memo_trouble(body, found)
 
         result['comment_memo_condition'] = condition_score
         result['comment_memo_trouble_score'] = trouble_score
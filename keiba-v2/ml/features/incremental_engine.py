@@ -0,0 +1,484 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+時系列スイープ型 インクリメンタル特徴量エンジン
+
+compute_past_features / compute_running_style_features /
+compute_rotation_features / compute_slow_start_features /
+compute_jrdb_features / compute_horse_bias_features は、毎回
+history_cache[ketto_num] の全走歴を race_date でフィルタして再集計する。
+学習データ構築では 1頭あたり O(走数²) になる。
+
+本エンジンは history_cache の全走を日付順に1回だけ畳み込み、馬ごとに
+  - 通算カウンタ (出走数・勝利数・複勝数)
+  - 条件別カウンタ (場・芝ダ・馬場状態・距離・頭数帯・転換/距離変化)
+  - 直近5走リングバッファ (着順・上がり・コーナー・着差・IDM・出遅れ)
+を保持する。 クエリ日 D の特徴量は「D より前の走」だけを畳み込んだ
+状態から出すため、当日以降の結果は混入しない (従来の race_date 未満
+フィルタと同じ時点整合)。
+
+直近N走だけで決まる特徴量は既存関数をリングバッファ上の走歴で呼び、
+全走歴に依存する集計値だけをカウンタで上書きする。 戻り値は既存関数と
+キー・値とも一致する (ml/tests/test_incremental_engine.py でパリティ検証)。
+
+前提: history_cache の各馬リストは race_date 昇順 (build_horse_history 準拠)。
+
+提供:
+    HorseState                 — 1頭分のローリング状態
+    IncrementalFeatureEngine   — 日付単調増加クエリ用エンジン
+        .past_features(...)            ≡ compute_past_features
+        .running_style_features(...)   ≡ compute_running_style_features
+        .rotation_features(...)        ≡ compute_rotation_features
+        .slow_start_features(...)      ≡ compute_slow_start_features
+        .jrdb_features(...)            ≡ compute_jrdb_features
+        .horse_bias_features(...)      ≡ compute_horse_bias_features
+
+Usage:
+    engine = IncrementalFeatureEngine(history_cache, kb_ext_index, jrdb_sed_index)
+    for date_str, race_id in sorted_races:
+        feat = engine.past_features(ketto_num, date_str, venue_code, ...)
+"""
+
+from collections import deque
+from fractions import Fraction
+from typing import Deque, Dict, List, Optional
+
+from ml.features.jrdb_features import compute_jrdb_features
+from ml.features.past_features import (
+    PRIOR_TOP3_ALPHA, PRIOR_TOP3_BETA, PRIOR_WIN_ALPHA, PRIOR_WIN_BETA,
+    _TT_MAP, bayesian_rate, compute_past_features,
+)
+from ml.features.rotation_features import compute_rotation_features
+from ml.features.running_style_features import compute_running_style_features
+from ml.features.track_bias_features import compute_horse_bias_features
+
+RECENT_WINDOW = 5
+HEAVY_CONDITIONS = ('重', '不良')
+
+
+def _field_cat(n: int) -> str:
+    if n <= 11:
+        return 'small'
+    elif n <= 15:
+        return 'mid'
+    return 'large'
+
+
+def _rate(counter: Optional[List[int]]) -> Optional[float]:
+    """[n, top3] → 複勝率 (n=0 なら None)"""
+    if not counter or counter[0] == 0:
+        return None
+    return round(counter[1] / counter[0], 4)
+
+
+def _smoothed(counter: Optional[List[int]]) -> float:
+    n, t = counter if counter else (0, 0)
+    return bayesian_rate(t, n, PRIOR_TOP3_ALPHA, PRIOR_TOP3_BETA)
+
+
+def _bump(table: dict, key, top3: int) -> None:
+    c = table.get(key)
+    if c is None:
+        table[key] = [1, top3]
+    else:
+        c[0] += 1
+        c[1] += top3
+
+
+# ============================================================
+# 馬ごとの状態
+# ============================================================
+
+class HorseState:
+    """1頭分のローリング状態 (畳み込み済み = クエリ日より前の走のみ)"""
+
+    __slots__ = (
+        'n', 'wins', 'top3', 'recent',
+        'venue', 'track_type', 'condition', 'heavy', 'distance', 'field_cat',
+        'surface_switch', 'shorten', 'extend',
+        'rs_recent', 'rs_front', 'rs_back',
+        'ss_total', 'ss_slow', 'ss_slow_top3', 'ss_recent',
+        'sed_recent', 'idm_n', 'idm_sum',
+    )
+
+    def __init__(self):
+        self.n = 0
+        self.wins = 0
+        self.top3 = 0
+        self.recent: Deque[dict] = deque(maxlen=RECENT_WINDOW)
+        # 条件別 [出走数, 複勝数]
+        self.venue: Dict[str, List[int]] = {}
+        self.track_type: Dict[str, List[int]] = {}
+        self.condition: Dict[str, List[int]] = {}
+        self.heavy = [0, 0]
+        self.distance: Dict[int, List[int]] = {}
+        self.field_cat: Dict[str, List[int]] = {}
+        self.surface_switch = [0, 0]
+        self.shorten = [0, 0]
+        self.extend = [0, 0]
+        # 脚質: コーナー有効走の直近5走 + 先行/非先行の [件数, 着順和]
+        self.rs_recent: Deque[dict] = deque(maxlen=RECENT_WINDOW)
+        self.rs_front = [0, 0]
+        self.rs_back = [0, 0]
+        # 出遅れ: 発走状況データのある走のみ
+        self.ss_total = 0
+        self.ss_slow = 0
+        self.ss_slow_top3 = 0
+        self.ss_recent: Deque[bool] = deque(maxlen=RECENT_WINDOW)
+        # JRDB SED: SEDのある走の直近5走 + 全期間IDM (厳密和)
+        self.sed_recent: Deque[dict] = deque(maxlen=RECENT_WINDOW)
+        self.idm_n = 0
+        self.idm_sum = Fraction(0)
+
+    def fold(self, run: dict, ketto_num: str,
+             kb_ext_index: Optional[dict], sed_index: Optional[dict]) -> None:
+        """1走分の結果を状態に加える"""
+        fp = run['finish_position']
+        top3 = 1 if 1 <= fp <= 3 else 0
+        self.n += 1
+        self.wins += fp == 1
+        self.top3 += top3
+
+        _bump(self.venue, run.get('venue_code'), top3)
+        _bump(self.track_type, run.get('track_type'), top3)
+        cond = run.get('track_condition', '')
+        _bump(self.condition, cond, top3)
+        if cond in HEAVY_CONDITIONS:
+            self.heavy[0] += 1
+            self.heavy[1] += top3
+        _bump(self.distance, run.get('distance', 0), top3)
+        nr = run.get('num_runners', 0)
+        if nr > 0:
+            _bump(self.field_cat, _field_cat(nr), top3)
+
+        if self.recent:
+            prev = self.recent[-1]
+            pr_tt = _TT_MAP.get(prev.get('track_type', ''))
+            r_tt = _TT_MAP.get(run.get('track_type', ''))
+            if pr_tt is not None and r_tt is not None and pr_tt != r_tt:
+                self.surface_switch[0] += 1
+                self.surface_switch[1] += top3
+            pd = prev.get('distance', 0)
+            rd = run.get('distance', 0)
+            if pd > 0 and rd > 0 and pd != rd:
+                c = self.shorten if rd < pd else self.extend
+                c[0] += 1
+                c[1] += top3
+        self.recent.append(run)
+
+        corners = run.get('corners')
+        if corners and len(corners) > 0 and nr > 0:
+            self.rs_recent.append(run)
+            if fp > 0:
+                c = self.rs_front if corners[0] <= 3 else self.rs_back
+                c[0] += 1
+                c[1] += fp
+
+        if kb_ext_index:
+            self._fold_slow_start(run, kb_ext_index)
+        if sed_index:
+            sed = sed_index.get(f"{ketto_num}_{run.get('race_date', '')}")
+            if sed:
+                self.sed_recent.append(run)
+                if sed.get('idm') is not None:
+                    self.idm_n += 1
+                    self.idm_sum += Fraction(sed['idm'])
+
+    def _fold_slow_start(self, run: dict, kb_ext_index: dict) -> None:
+        umaban = run.get('umaban', 0)
+        if not umaban:
+            return
+        kb_ext = kb_ext_index.get(run.get('race_id', ''))
+        if not kb_ext:
+            return
+        entry_data = kb_ext.get('entries', {}).get(str(umaban))
+        if entry_data is None:
+            return
+        if not kb_ext.get('race_extras', {}).get('hassou'):
+            return
+        slow = bool(entry_data.get('is_slow_start'))
+        self.ss_total += 1
+        self.ss_recent.append(slow)
+        if slow:
+            self.ss_slow += 1
+            fp = run.get('finish_position', 99)
+            num_runners = run.get('num_runners', 0)
+            place_limit = 3 if num_runners >= 8 else (2 if num_runners >= 5 else 0)
+            if fp <= place_limit:
+                self.ss_slow_top3 += 1
+
+
+# ============================================================
+# エンジン
+# ============================================================
+
+class IncrementalFeatureEngine:
+    """history_cache を日付順に畳み込みながら特徴量を返す
+
+    クエリの race_date は単調非減少であること (同日は何度でも可)。
+    遡る場合は reset() してから使う。
+    """
+
+    def __init__(
+        self,
+        history_cache: dict,
+        kb_ext_index: Optional[dict] = None,
+        jrdb_sed_index: Optional[dict] = None,
+    ):
+        self.history_cache = history_cache
+        self.kb_ext_index = kb_ext_index
+        self.jrdb_sed_index = jrdb_sed_index
+        # (race_date, ketto_num, 走歴内index) — 同日同馬は走歴順
+        events = []
+        for ketto_num, runs in history_cache.items():
+            if not isinstance(runs, list):
+                continue
+            for i, r in enumerate(runs):
+                events.append((r.get('race_date', ''), ketto_num, i))
+        events.sort()
+        self._events = events
+        self.reset()
+
+    def reset(self) -> None:
+        """状態を破棄して先頭から畳み込み直す"""
+        self._states: Dict[str, HorseState] = {}
+        self._pos = 0
+        self.cursor = ''
+
+    def advance_to(self, race_date: str) -> None:
+        """race_date より前の走を全て畳み込む"""
+        if race_date < self.cursor:
+            raise ValueError(
+                f"race_date {race_date} は処理済み日付 {self.cursor} より前です (reset() が必要)")
+        self.cursor = race_date
+        events = self._events
+        pos = self._pos
+        while pos < len(events) and events[pos][0] < race_date:
+            _, ketto_num, i = events[pos]
+            state = self._states.get(ketto_num)
+            if state is None:
+                state = self._states[ketto_num] = HorseState()
+            state.fold(self.history_cache[ketto_num][i], ketto_num,
+                       self.kb_ext_index, self.jrdb_sed_index)
+            pos += 1
+        self._pos = pos
+
+    def state(self, ketto_num: str, race_date: str) -> Optional[HorseState]:
+        """race_date 時点の状態 (走歴なしは None)"""
+        self.advance_to(race_date)
+        return self._states.get(ketto_num)
+
+    # ------------------------------------------------------------
+    # 過去走成績
+    # ------------------------------------------------------------
+
+    def past_features(
+        self,
+        ketto_num: str,
+        race_date: str,
+        venue_code: str,
+        track_type: str,
+        distance: int,
+        entry_count: int,
+        history_cache: dict = None,
+        race_level_index: dict = None,
+        track_condition: str = '',
+    ) -> dict:
+        """compute_past_features 互換 (history_cache は無視)"""
+        st = self.state(ketto_num, race_date)
+        window = list(st.recent) if st else []
+        # 直近N走・前走比較は既存関数をリングバッファ上で計算
+        result = compute_past_features(
+            ketto_num, race_date, venue_code, track_type, distance, entry_count,
+            {ketto_num: window}, race_level_index=race_level_index,
+            track_condition=track_condition,
+        )
+        if not st:
+            return result
+
+        # 全走歴集計をカウンタで上書き
+        total = st.n
+        result['total_career_races'] = total
+        result['win_rate_all'] = round(st.wins / total, 4)
+        result['top3_rate_all'] = round(st.top3 / total, 4)
+        result['win_rate_smoothed'] = bayesian_rate(
+            st.wins, total, PRIOR_WIN_ALPHA, PRIOR_WIN_BETA)
+        result['top3_rate_smoothed'] = bayesian_rate(
+            st.top3, total, PRIOR_TOP3_ALPHA, PRIOR_TOP3_BETA)
+        if total == 1:
+            result['career_stage'] = 1
+        elif total <= 5:
+            result['career_stage'] = 2
+        elif total <= 10:
+            result['career_stage'] = 3
+        else:
+            result['career_stage'] = 4
+
+        venue = st.venue.get(venue_code)
+        result['venue_top3_rate'] = _rate(venue) if venue else -1
+        result['venue_top3_rate_smoothed'] = _smoothed(venue)
+
+        tt = st.track_type.get('turf' if track_type == 'turf' else 'dirt')
+        result['track_type_top3_rate'] = _rate(tt) if tt else -1
+        result['track_type_top3_rate_smoothed'] = _smoothed(tt)
+
+        near = [0, 0]
+        exact = [0, 0]
+        for d, c in st.distance.items():
+            diff = abs(d - distance)
+            if diff <= 200:
+                near[0] += c[0]
+                near[1] += c[1]
+                if diff <= 100:
+                    exact[0] += c[0]
+                    exact[1] += c[1]
+        result['distance_fitness'] = _rate(near) if near[0] else -1
+        result['distance_fitness_smoothed'] = _smoothed(near)
+        result['exact_distance_top3_rate'] = _rate(exact) if exact[0] else -1
+        result['exact_distance_top3_rate_smoothed'] = _smoothed(exact)
+
+        result['condition_top3_rate'] = -1
+        result['condition_top3_rate_smoothed'] = None
+        if track_condition:
+            cond = st.condition.get(track_condition)
+            if cond:
+                result['condition_top3_rate'] = _rate(cond)
+            result['condition_top3_rate_smoothed'] = _smoothed(cond)
+
+        result['heavy_track_top3_rate'] = _rate(st.heavy) if st.heavy[0] else -1
+
+        last_race = st.recent[-1]
+        result['surface_switch_top3_rate'] = -1
+        prev_tt = _TT_MAP.get(last_race.get('track_type', ''))
+        cur_tt = _TT_MAP.get(track_type)
+        if (prev_tt is not None and cur_tt is not None and prev_tt != cur_tt
+                and st.surface_switch[0]):
+            result['surface_switch_top3_rate'] = _rate(st.surface_switch)
+
+        result['distance_direction_top3_rate'] = -1
+        prev_dist = last_race.get('distance', 0)
+        if prev_dist > 0 and distance > 0 and prev_dist != distance:
+            c = st.shorten if distance < prev_dist else st.extend
+            if c[0]:
+                result['distance_direction_top3_rate'] = _rate(c)
+
+        result['field_size_category_top3_rate'] = -1
+        if entry_count > 0:
+            fc = st.field_cat.get(_field_cat(entry_count))
+            if fc:
+                result['field_size_category_top3_rate'] = _rate(fc)
+
+        return result
+
+    # ------------------------------------------------------------
+    # 脚質・ローテ
+    # ------------------------------------------------------------
+
+    def running_style_features(
+        self,
+        ketto_num: str,
+        race_date: str,
+        entry_count: int,
+        history_cache: dict = None,
+    ) -> dict:
+        """compute_running_style_features 互換 (history_cache は無視)"""
+        st = self.state(ketto_num, race_date)
+        window = list(st.rs_recent) if st else []
+        result = compute_running_style_features(
+            ketto_num, race_date, entry_count, {ketto_num: window})
+        if window:
+            # 先行時 vs 非先行時の着順差は全走歴
+            result['pace_sensitivity'] = -1
+            (fn, fs), (bn, bs) = st.rs_front, st.rs_back
+            if fn and bn:
+                result['pace_sensitivity'] = round(bs / bn - fs / fn, 2)
+        return result
+
+    def rotation_features(
+        self,
+        ketto_num: str,
+        race_date: str,
+        futan: float,
+        horse_weight: int,
+        popularity: int,
+        jockey_code: str,
+        history_cache: dict = None,
+        **kwargs,
+    ) -> dict:
+        """compute_rotation_features 互換 (前走のみ参照)"""
+        st = self.state(ketto_num, race_date)
+        window = [st.recent[-1]] if st else []
+        return compute_rotation_features(
+            ketto_num, race_date, futan, horse_weight, popularity, jockey_code,
+            {ketto_num: window}, **kwargs)
+
+    # ------------------------------------------------------------
+    # 出遅れ
+    # ------------------------------------------------------------
+
+    def slow_start_features(
+        self,
+        ketto_num: str,
+        race_date: str,
+        history_cache: dict = None,
+        kb_ext_index: dict = None,
+    ) -> dict:
+        """compute_slow_start_features 互換 (畳み込み時の kb_ext_index を使用)"""
+        result = {
+            'horse_slow_start_rate': -1.0,
+            'horse_slow_start_last5': -1,
+            'horse_slow_start_resilience': -1.0,
+        }
+        if not ketto_num or not self.kb_ext_index:
+            return result
+        st = self.state(ketto_num, race_date)
+        if not st or not st.ss_total:
+            return result
+
+        result['horse_slow_start_rate'] = round(st.ss_slow / st.ss_total, 4)
+        result['horse_slow_start_last5'] = sum(st.ss_recent)
+        if st.ss_slow >= 2:
+            result['horse_slow_start_resilience'] = round(st.ss_slow_top3 / st.ss_slow, 4)
+        elif st.ss_slow == 1:
+            result['horse_slow_start_resilience'] = float(st.ss_slow_top3)
+        return result
+
+    # ------------------------------------------------------------
+    # JRDB
+    # ------------------------------------------------------------
+
+    def jrdb_features(
+        self,
+        ketto_num: str,
+        race_date: str,
+        history_cache: dict = None,
+        jrdb_sed_index: dict = None,
+        jrdb_kyi_index: dict = None,
+        **kwargs,
+    ) -> dict:
+        """compute_jrdb_features 互換 (全期間IDM平均のみカウンタ)"""
+        st = self.state(ketto_num, race_date)
+        window = list(st.recent) if st else []
+        result = compute_jrdb_features(
+            ketto_num, race_date, {ketto_num: window},
+            jrdb_sed_index or {}, jrdb_kyi_index or {}, **kwargs)
+        if st:
+            result['jrdb_idm_growth'] = 0.0
+            if result['jrdb_idm_last'] > -1 and st.idm_n >= 3:
+                mean = float(st.idm_sum / st.idm_n)
+                result['jrdb_idm_growth'] = round(result['jrdb_idm_last'] - mean, 1)
+        return result
+
+    def horse_bias_features(
+        self,
+        ketto_num: str,
+        race_date: str,
+        sed_index: dict,
+        kaa_index: dict,
+        history_cache: dict = None,
+    ) -> dict:
+        """compute_horse_bias_features 互換 (SEDのある直近5走のみ参照)"""
+        st = self.state(ketto_num, race_date)
+        window = list(st.sed_recent) if st else []
+        return compute_horse_bias_features(
+            ketto_num, race_date, sed_index, kaa_index, {ketto_num: window})
@@ -242,7 +242,7 @@ def add_margin_target_to_df(
     Args:
         df: build_dataset()の出力DataFrame (race_id, umaban カラムが必要)
         date_index: race_date_index
-        load_race_fn: load_race_json関数
+        load_race_fn: (race_id, date_str) → race dict。 load_race_json か RaceCorpus
         cap: 着差上限 (mode='raw'/'adjusted' のみ有効)
         mode: 'raw' / 'adjusted' / 'zscore' / 'adj_zscore'
         sed_index: JRDB SED index (mode='adjusted'/'adj_zscore' で必須)
@@ -10,6 +10,7 @@ v2.3: per-courseテーブル修正 + ハイレベル経験 + 平地プロフィ
 v2.3b: 3軸分類 + 障害数 + 直線路面 + 同系統コース成績
 v2.5: 経験曲線特徴量（重み付き過去走、成長速度、初障害割引）
 v2.5b: 着差特徴量（time_behind_winner秒ベース、勝ち馬との距離感）
+v2.5c: 騎手/調教師タイムラインと馬単位障害走を累積和配列化（参照 O(log n)、値は不変）
 
 主要特徴量:
 - obstacle_experience/exp_tier: 障害戦出走回数・経験ビン
@@ -29,8 +30,10 @@ v2.5b: 着差特徴量（time_behind_winner秒ベース、勝ち馬との距離
 - obs_debut_discount: 初障害を除外した場合の着順改善度 (v2.5)
 """
 
+from array import array
+from bisect import bisect_left
 from collections import defaultdict
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 # ── コース難易度テーブル (web UI obstacle analysis page由来) ──
 # Key: (venue_name, distance, surface) → difficulty level (10-53)
@@ -173,18 +176,49 @@ def compute_difficulty_exp_match(
 
 # ── PIT-safe 騎手/調教師 障害タイムライン ──
 
+class ObstacleTimeline:
+    """日付昇順の障害出走タイムライン (累積和付き)
+
+    dates[i] は i 走目の日付、 cum_wins[k] / cum_top3[k] は先頭 k 走の勝利数 / 好走数
+    (長さ n+1, 先頭は 0)。 race_date より前の成績は bisect 1 回 + 配列参照 2 回で引ける。
+    """
+
+    __slots__ = ('dates', 'cum_wins', 'cum_top3')
+
+    def __init__(self, rows: list):
+        """rows: [(race_date, is_win, is_top3), ...] (順不同)"""
+        rows = sorted(rows, key=lambda x: x[0])
+        self.dates = [r[0] for r in rows]
+        self.cum_wins = array('i', [0])
+        self.cum_top3 = array('i', [0])
+        w = t = 0
+        for _, is_win, is_top3 in rows:
+            w += is_win
+            t += is_top3
+            self.cum_wins.append(w)
+            self.cum_top3.append(t)
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def before(self, race_date: str) -> Tuple[int, int, int]:
+        """race_date より前の (出走数, 勝利数, 好走数)"""
+        idx = bisect_left(self.dates, race_date)
+        return idx, self.cum_wins[idx], self.cum_top3[idx]
+
+
 def build_obstacle_personnel_timelines(
     history_cache: dict,
-) -> Tuple[Dict[str, list], Dict[str, list]]:
+) -> Tuple[Dict[str, ObstacleTimeline], Dict[str, ObstacleTimeline]]:
     """history_cacheから障害レースの騎手/調教師タイムラインを構築
 
     Returns:
         (jockey_timeline, trainer_timeline)
-        jockey_timeline: {jockey_code: [(race_date, is_win, is_top3), ...]}  sorted by date
-        trainer_timeline: {trainer_code: [(race_date, is_top3), ...]}  sorted by date
+        jockey_timeline: {jockey_code: ObstacleTimeline}
+        trainer_timeline: {trainer_code: ObstacleTimeline}
     """
-    jockey_tl: Dict[str, list] = defaultdict(list)
-    trainer_tl: Dict[str, list] = defaultdict(list)
+    jockey_rows: Dict[str, list] = defaultdict(list)
+    trainer_rows: Dict[str, list] = defaultdict(list)
 
     for ketto_num, records in history_cache.items():
         if isinstance(records, dict):
@@ -200,23 +234,25 @@ def build_obstacle_personnel_timelines(
                 continue
             num_runners = rec.get('num_runners', 18)
             place_cutoff = 3 if num_runners >= 8 else (2 if num_runners >= 5 else 1)
-            is_win = 1 if fp == 1 else 0
-            is_top3 = 1 if fp <= place_cutoff else 0
+            row = (rd, 1 if fp == 1 else 0, 1 if fp <= place_cutoff else 0)
 
             jc = rec.get('jockey_code', '')
             tc = rec.get('trainer_code', '')
             if jc:
-                jockey_tl[jc].append((rd, is_win, is_top3))
+                jockey_rows[jc].append(row)
             if tc:
-                trainer_tl[tc].append((rd, is_top3))
+                trainer_rows[tc].append(row)
+
+    return ({jc: ObstacleTimeline(rows) for jc, rows in jockey_rows.items()},
+            {tc: ObstacleTimeline(rows) for tc, rows in trainer_rows.items()})
 
-    # ソート
-    for jc in jockey_tl:
-        jockey_tl[jc].sort(key=lambda x: x[0])
-    for tc in trainer_tl:
-        trainer_tl[tc].sort(key=lambda x: x[0])
 
-    return dict(jockey_tl), dict(trainer_tl)
+def _as_timeline(records, legacy_cols: Tuple[int, int]) -> ObstacleTimeline:
+    """旧形式 (タプルのリスト) で渡された場合の互換変換"""
+    if isinstance(records, ObstacleTimeline):
+        return records
+    wi, ti = legacy_cols
+    return ObstacleTimeline([(r[0], r[wi] if wi else 0, r[ti]) for r in records])
 
 
 def compute_jockey_obstacle_stats(
@@ -234,20 +270,14 @@ def compute_jockey_obstacle_stats(
     Returns:
         {'jockey_obstacle_races': int, 'jockey_obstacle_win_rate': float}
     """
-    records = jockey_obstacle_tl.get(jockey_code, [])
+    records = jockey_obstacle_tl.get(jockey_code)
     if not records:
         return {'jockey_obstacle_races': 0, 'jockey_obstacle_win_rate': global_win_rate}
 
-    # bisectで当該日以前のレコード数を取得
-    from bisect import bisect_left
-    dates = [r[0] for r in records]
-    idx = bisect_left(dates, race_date)
-
-    if idx == 0:
+    total, wins, _ = _as_timeline(records, (1, 2)).before(race_date)
+    if total == 0:
         return {'jockey_obstacle_races': 0, 'jockey_obstacle_win_rate': global_win_rate}
 
-    total = idx
-    wins = sum(1 for r in records[:idx] if r[1] == 1)
     # ベイズ平滑化
     smoothed = (wins + global_win_rate * prior_n) / (total + prior_n)
     return {
@@ -268,19 +298,14 @@ def compute_trainer_obstacle_stats(
     Returns:
         {'trainer_obstacle_top3_rate': float}
     """
-    records = trainer_obstacle_tl.get(trainer_code, [])
+    records = trainer_obstacle_tl.get(trainer_code)
     if not records:
         return {'trainer_obstacle_top3_rate': global_top3_rate}
 
-    from bisect import bisect_left
-    dates = [r[0] for r in records]
-    idx = bisect_left(dates, race_date)
-
-    if idx == 0:
+    total, _, top3s = _as_timeline(records, (0, 1)).before(race_date)
+    if total == 0:
         return {'trainer_obstacle_top3_rate': global_top3_rate}
 
-    total = idx
-    top3s = sum(1 for r in records[:idx] if r[1] == 1)
     smoothed = (top3s + global_top3_rate * prior_n) / (total + prior_n)
     return {
         'trainer_obstacle_top3_rate': round(smoothed, 4),
@@ -447,17 +472,75 @@ def compute_venue_skill_features(venue_name: str) -> dict:
     }
 
 
+# ── 馬単位の障害走インデックス (v2.5c) ──
+
+def _obs_top3(rec: dict) -> int:
+    fp = rec.get('finish_position', 99)
+    if fp is None:
+        return 0
+    nr = rec.get('num_runners', 18)
+    cutoff = 3 if nr >= 8 else (2 if nr >= 5 else 1)
+    return 1 if fp <= cutoff else 0
+
+
+class HorseObstacleRuns:
+    """1頭分の障害走 (日付昇順) + 勝利/好走/同系統グループ別の累積和
+
+    compute_obstacle_only_past_stats / compute_same_group_stats に渡すと、
+    当該日以前の件数は bisect 1 回で求まる (毎回の全走歴走査が不要)。
+    """
+
+    __slots__ = ('dates', 'recs', 'cum_wins', 'cum_top3', 'cum_group')
+
+    def __init__(self, obs_recs: list):
+        # 同日タイは「降順ソートの安定順」を逆にした並び (降順参照で旧実装と一致)
+        self.recs = sorted(obs_recs, key=lambda r: r.get('race_date', ''), reverse=True)[::-1]
+        self.dates = [r.get('race_date', '') for r in self.recs]
+        self.cum_wins = array('i', [0])
+        self.cum_top3 = array('i', [0])
+        self.cum_group = {g: (array('i', [0]), array('i', [0])) for g in SKILL_GROUP_VENUES}
+        for r in self.recs:
+            top3 = _obs_top3(r)
+            self.cum_wins.append(self.cum_wins[-1] + (1 if r.get('finish_position') == 1 else 0))
+            self.cum_top3.append(self.cum_top3[-1] + top3)
+            v = r.get('venue_name', '')
+            for g, venues in SKILL_GROUP_VENUES.items():
+                n, t = self.cum_group[g]
+                hit = v in venues
+                n.append(n[-1] + hit)
+                t.append(t[-1] + (top3 if hit else 0))
+
+    def index_before(self, race_date: str) -> int:
+        return bisect_left(self.dates, race_date)
+
+
+def build_horse_obstacle_index(history_cache: dict) -> Dict[str, HorseObstacleRuns]:
+    """history_cache → {ketto_num: HorseObstacleRuns} (障害走のある馬のみ)"""
+    index = {}
+    for ketto_num, records in history_cache.items():
+        if not records or isinstance(records, dict):
+            continue
+        obs = [r for r in records if r.get('track_type') == 'obstacle']
+        if obs:
+            index[ketto_num] = HorseObstacleRuns(obs)
+    return index
+
+
 def compute_same_group_stats(
     ketto_num: str,
     race_date: str,
     current_venue: str,
     history_cache: dict,
+    horse_obs_index: Optional[Dict[str, HorseObstacleRuns]] = None,
 ) -> dict:
     """同系統コースでの障害好走率（v2.3b, コースリンク）
 
     福島↔中山↔小倉, 新潟↔中京, 東京↔京都 の同系統コースでの過去成績。
     コース適性の転用: "福島で好走した馬は中山でも走れる" etc.
 
+    Args:
+        horse_obs_index: build_horse_obstacle_index の結果 (指定時は累積和で O(log n))
+
     Returns:
         {'obs_same_group_top3_rate': float}
     """
@@ -465,6 +548,16 @@ def compute_same_group_stats(
     if skill_type < 0:
         return {'obs_same_group_top3_rate': float('nan')}
 
+    if horse_obs_index is not None:
+        runs = horse_obs_index.get(ketto_num)
+        if runs is None:
+            return {'obs_same_group_top3_rate': float('nan')}
+        idx = runs.index_before(race_date)
+        n, t = runs.cum_group[skill_type]
+        if n[idx] == 0:
+            return {'obs_same_group_top3_rate': float('nan')}
+        return {'obs_same_group_top3_rate': round(t[idx] / n[idx], 4)}
+
     same_group = SKILL_GROUP_VENUES.get(skill_type, set())
 
     records = history_cache.get(ketto_num, [])
@@ -483,11 +576,7 @@ def compute_same_group_stats(
         if v not in same_group:
             continue
         total += 1
-        fp = rec.get('finish_position', 99)
-        nr = rec.get('num_runners', 18)
-        cutoff = 3 if nr >= 8 else (2 if nr >= 5 else 1)
-        if fp <= cutoff:
-            top3 += 1
+        top3 += _obs_top3(rec)
 
     if total == 0:
         return {'obs_same_group_top3_rate': float('nan')}
@@ -689,11 +778,13 @@ def compute_obstacle_only_past_stats(
     race_date: str,
     current_distance: int,
     history_cache: dict,
+    horse_obs_index: Optional[Dict[str, HorseObstacleRuns]] = None,
 ) -> dict:
     """障害レースのみの過去走統計（平地走を除外）
 
     既存の win_rate_all, top3_rate_all 等は平地走が混ざるため、
     障害走限定版を別特徴量として追加。
+    horse_obs_index 指定時は勝率/好走率を累積和から取り、 直近 N 走は日付順配列の末尾を使う。
 
     Returns:
         {
@@ -719,39 +810,45 @@ def compute_obstacle_only_past_stats(
         'obs_distance_fitness': float('nan'),
     }
 
-    records = history_cache.get(ketto_num, [])
-    if not records or isinstance(records, dict):
-        return _NAN_RESULT.copy()
+    if horse_obs_index is not None:
+        runs = horse_obs_index.get(ketto_num)
+        if runs is None:
+            return _NAN_RESULT.copy()
+        total = runs.index_before(race_date)
+        if total == 0:
+            return _NAN_RESULT.copy()
+        obs_recs = runs.recs[:total]
+        wins = runs.cum_wins[total]
+        top3s = runs.cum_top3[total]
+        obs_desc = obs_recs[::-1]
+    else:
+        records = history_cache.get(ketto_num, [])
+        if not records or isinstance(records, dict):
+            return _NAN_RESULT.copy()
 
-    # 障害走のみ抽出（PIT-safe: 当該日より前）
-    obs_recs = []
-    for rec in records:
-        rd = rec.get('race_date', '')
-        if rd >= race_date:
-            continue
-        if rec.get('track_type') == 'obstacle':
-            obs_recs.append(rec)
+        # 障害走のみ抽出（PIT-safe: 当該日より前）
+        obs_recs = []
+        for rec in records:
+            rd = rec.get('race_date', '')
+            if rd >= race_date:
+                continue
+            if rec.get('track_type') == 'obstacle':
+                obs_recs.append(rec)
 
-    total = len(obs_recs)
-    if total == 0:
-        return _NAN_RESULT.copy()
-
-    # 勝率・好走率
-    wins = sum(1 for r in obs_recs if r.get('finish_position') == 1)
-    top3s = 0
-    for r in obs_recs:
-        fp = r.get('finish_position', 99)
-        nr = r.get('num_runners', 18)
-        cutoff = 3 if nr >= 8 else (2 if nr >= 5 else 1)
-        if fp <= cutoff:
-            top3s += 1
+        total = len(obs_recs)
+        if total == 0:
+            return _NAN_RESULT.copy()
+
+        # 勝率・好走率
+        wins = sum(1 for r in obs_recs if r.get('finish_position') == 1)
+        top3s = sum(_obs_top3(r) for r in obs_recs)
+
+        # 日付降順でソート（最新→最古）
+        obs_desc = sorted(obs_recs, key=lambda r: r.get('race_date', ''), reverse=True)
 
     obs_win_rate = wins / total
     obs_top3_rate = top3s / total
 
-    # 日付降順でソート（最新→最古）
-    obs_desc = sorted(obs_recs, key=lambda r: r.get('race_date', ''), reverse=True)
-
     # 直近3走平均着順
     last3_fp = [r.get('finish_position', 0) for r in obs_desc[:3]
                 if r.get('finish_position') and r.get('finish_position') > 0]
@@ -783,14 +880,7 @@ def compute_obstacle_only_past_stats(
     dist_recs = [r for r in obs_recs
                  if abs(r.get('distance', 0) - current_distance) <= 200]
     if dist_recs:
-        dist_top3 = 0
-        for r in dist_recs:
-            fp = r.get('finish_position', 99)
-            nr = r.get('num_runners', 18)
-            cutoff = 3 if nr >= 8 else (2 if nr >= 5 else 1)
-            if fp <= cutoff:
-                dist_top3 += 1
-        obs_dist_fitness = dist_top3 / len(dist_recs)
+        obs_dist_fitness = sum(_obs_top3(r) for r in dist_recs) / len(dist_recs)
     else:
         obs_dist_fitness = float('nan')
 
@@ -12,8 +12,9 @@ Usage:
     # ライブモデルをロード
     bundle = load_model("polaris")
 
-    # 特定バージョンをロード
+    # 特定バージョンをロード (P/W/AR は初回アクセス時にパース、 同一版は LRU から)
     bundle = load_model("polaris", version="7.9")
+    bundle.feature_importance("model_p")   # manifest 保存済みなら Booster を読まない
 
     # 全モデル一覧
     models = list_models()
@@ -22,8 +23,11 @@ Usage:
     versions = list_versions("polaris")
 """
 
+import hashlib
 import json
 import pickle
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Dict, List, Optional
@@ -35,17 +39,93 @@ from core import config
 # ModelBundle: モデル一式を保持する値オブジェクト
 # ---------------------------------------------------------------------------
 
+# 遅延ロード対象 (アクセスされるまでパースしない)
+_LAZY_KEYS = ("model_p", "model_w", "model_ar", "calibrators")
+_LABELS = {"model_p": "P", "model_w": "W", "model_ar": "AR", "calibrators": "calibrators"}
+
+
+class StaleModelError(RuntimeError):
+    """遅延ロード時にサブモデルのファイルがバンドル作成時 (manifest) から変わっていた"""
+
+
 @dataclass
 class ModelBundle:
-    """ロードされたモデル一式"""
+    """ロードされたモデル一式
+
+    model_p / model_w / model_ar / calibrators は初回アクセス時にパースする
+    (P だけ使う評価スクリプトで AR の LightGBM テキストを読まない)。
+    files にはサブモデルのパス (無ければ None) を保持する。
+
+    パース前後にファイルの (size, mtime_ns) を manifest と照合し、 変わっていれば
+    StaleModelError (live/ が再学習で上書きされた場合に、 新しい W/AR を古い meta の
+    特徴量リストと組み合わせない)。 load_model() を呼び直せば新しいバンドルになる。
+    """
     name: str                            # "polaris", "enif", "eclipse"
     version: str                         # "polaris-2.0", "obstacle-v2.5b"
-    model_p: object = None               # LightGBM Booster (Place/主分類)
-    model_w: object = None               # LightGBM Booster (Win) — optional
-    model_ar: object = None              # LightGBM Booster (着差回帰) — optional
-    calibrators: Optional[dict] = None   # {'cal_p': ..., 'cal_w': ...}
     meta: dict = field(default_factory=dict)
     source: str = "live"                 # "live" or "archive"
+    files: Dict[str, Optional[Path]] = field(default_factory=dict)
+    manifest: Optional[dict] = field(default=None, repr=False)
+    _loaded: dict = field(default_factory=dict, repr=False)
+    _lock: object = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def _get(self, key: str):
+        if key in self._loaded:
+            return self._loaded[key]
+        with self._lock:
+            if key not in self._loaded:
+                path = self.files.get(key)
+                obj = None
+                if path is not None:
+                    self._check_unchanged(key, path)
+                    if key == "calibrators":
+                        with open(path, 'rb') as f:
+                            obj = pickle.load(f)
+                    else:
+                        import lightgbm as lgb
+                        obj = lgb.Booster(model_file=str(path))
+                    self._check_unchanged(key, path)
+                    print(f"[ModelLoader] {self.name} {_LABELS[key]} loaded: {path.name}")
+                self._loaded[key] = obj
+            return self._loaded[key]
+
+    def _check_unchanged(self, key: str, path: Path) -> None:
+        expected = ((self.manifest or {}).get('files') or {}).get(key)
+        if expected is None:
+            return
+        try:
+            st = path.stat()
+        except OSError:
+            st = None
+        if st is None or (st.st_size, st.st_mtime_ns) != (expected.get('size'), expected.get('mtime_ns')):
+            raise StaleModelError(
+                f"{self.name} {self.version} [{self.source}]: {path.name} が読み込み後に更新された "
+                f"(load_model() で再ロードすること)")
+
+    @property
+    def model_p(self):
+        """LightGBM Booster (Place/主分類)"""
+        return self._get("model_p")
+
+    @property
+    def model_w(self):
+        """LightGBM Booster (Win) — optional"""
+        return self._get("model_w")
+
+    @property
+    def model_ar(self):
+        """LightGBM Booster (着差回帰) — optional"""
+        return self._get("model_ar")
+
+    @property
+    def calibrators(self) -> Optional[dict]:
+        """{'cal_p': ..., 'cal_w': ...} — optional"""
+        return self._get("calibrators")
+
+    @property
+    def loaded_keys(self) -> List[str]:
+        """パース済みのサブモデル (テスト・診断用)"""
+        return [k for k in _LAZY_KEYS if self._loaded.get(k) is not None]
 
     @property
     def features(self) -> list:
@@ -66,15 +146,38 @@ class ModelBundle:
 
     @property
     def has_win(self) -> bool:
-        return self.model_w is not None
+        return self.files.get("model_w") is not None
 
     @property
     def has_ar(self) -> bool:
-        return self.model_ar is not None
+        return self.files.get("model_ar") is not None
 
     @property
     def has_calibrators(self) -> bool:
-        return self.calibrators is not None
+        return self.files.get("calibrators") is not None
+
+    def feature_importance(self, key: str = "model_p",
+                           importance_type: str = "gain") -> Optional[dict]:
+        """{'feature_name': [...], 'importance': [...]} を返す (サブモデル無しは None)
+
+        fast-load キャッシュ (manifest) に保存済みなら Booster をパースしない。
+        バージョン横断の比較 (compare_models) で全 Booster を読まずに済む。
+        """
+        if self.files.get(key) is None:
+            return None
+        cache_key = f"{key}:{importance_type}"
+        cached = (self.manifest or {}).get('importance', {}).get(cache_key)
+        if cached is not None:
+            return cached
+        booster = self._get(key)
+        result = {
+            'feature_name': booster.feature_name(),
+            'importance': [float(v) for v in booster.feature_importance(importance_type=importance_type)],
+        }
+        if self.manifest is not None:
+            self.manifest.setdefault('importance', {})[cache_key] = result
+            _save_manifest(self.manifest)
+        return result
 
     def summary(self) -> str:
         parts = [f"{self.name} v{self.version}"]
@@ -124,9 +227,10 @@ def _save_registry(data: dict) -> None:
 
 
 def invalidate_cache() -> None:
-    """レジストリキャッシュをクリア（テストやリロード用）"""
+    """レジストリキャッシュとバンドル LRU をクリア（テストやリロード用）"""
     global _registry_cache
     _registry_cache = None
+    clear_bundle_cache()
 
 
 # ---------------------------------------------------------------------------
@@ -257,85 +361,234 @@ def _find_file(model_dir: Path, model_name: str, file_key: str) -> Optional[Path
 
 
 # ---------------------------------------------------------------------------
-# メインAPI: load_model
+# fast-load キャッシュ: モデルディレクトリ単位の manifest
 # ---------------------------------------------------------------------------
+#
+# ml/cache/model_bundles/{model_name}@{dir名}-{hash}.json に
+#   files: {file_key: {path, size, mtime_ns, sha256}}, meta, importance
+# を保存する。 (size, mtime_ns) が一致すればファイルを再ハッシュせず meta も
+# manifest から取り出す。 レジストリのバージョンエントリに files (sha256) が
+# 記録されていれば照合し、 食い違えば manifest を作り直して再照合する。
+#
+# NOTE: LightGBM にはテキストより速いモデルのバイナリ形式が無い (Booster の
+# pickle も内部でモデル文字列を再パースする) ため、 Booster 自体は保存しない。
+# 起動短縮は遅延ロード、 版横断の比較は importance の manifest 保存で稼ぐ。
+
+_MANIFEST_FORMAT = 1
+_FILE_KEYS = ("meta",) + _LAZY_KEYS
+
+
+def _manifest_dir() -> Path:
+    return config.ml_dir() / "cache" / "model_bundles"
+
+
+def _manifest_path(model_name: str, model_dir: Path) -> Path:
+    digest = hashlib.blake2b(str(model_dir.resolve()).encode('utf-8'),
+                             digest_size=6).hexdigest()
+    return _manifest_dir() / f"{model_name}@{model_dir.name}-{digest}.json"
+
+
+def file_sha256(path: Path) -> str:
+    """ファイルの sha256 (レジストリ記録・manifest 照合用)"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _scan_files(model_dir: Path, model_name: str) -> Dict[str, dict]:
+    """{file_key: {path, size, mtime_ns}} — 存在するファイルのみ (stat だけで安価)"""
+    out = {}
+    for key in _FILE_KEYS:
+        path = _find_file(model_dir, model_name, key)
+        if path is not None:
+            st = path.stat()
+            out[key] = {'path': str(path), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+    return out
+
+
+def _same_files(manifest: Optional[dict], scanned: Dict[str, dict]) -> bool:
+    if not manifest or manifest.get('format') != _MANIFEST_FORMAT:
+        return False
+    cached = manifest.get('files', {})
+    if set(cached) != set(scanned):
+        return False
+    return all(
+        cached[k].get('path') == v['path'] and cached[k].get('size') == v['size']
+        and cached[k].get('mtime_ns') == v['mtime_ns']
+        for k, v in scanned.items()
+    )
 
-def load_model(model_name: str, version: Optional[str] = None) -> ModelBundle:
-    """モデルをロードして ModelBundle を返す。
 
-    Args:
-        model_name: "polaris", "enif", "eclipse" など
-        version: バージョン文字列。None/"live" = ライブモデル。
+def _save_manifest(manifest: dict) -> None:
+    from ml.utils.atomic_write import write_json_atomic
+    path = Path(manifest['_path'])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_json_atomic(path, {k: v for k, v in manifest.items() if k != '_path'}, indent=None)
 
-    Returns:
-        ModelBundle
-    """
-    import lightgbm as lgb
 
-    model_dir = _resolve_model_dir(model_name, version)
-    source = "live" if (version is None or version == "live") else "archive"
+def _registry_file_hashes(model_name: str, labels: List[str]) -> Optional[dict]:
+    """レジストリに記録された {file_key: sha256} (未登録・未記録なら None)"""
+    try:
+        registry = _load_registry()
+    except FileNotFoundError:
+        return None
+    entry = registry.get('models', {}).get(model_name) or {}
+    for v in entry.get('versions', []):
+        if v.get('version') in labels and v.get('files'):
+            return v['files']
+    return None
+
+
+def _build_manifest(model_name: str, model_dir: Path, scanned: Dict[str, dict]) -> dict:
+    files = {k: {**v, 'sha256': file_sha256(Path(v['path']))} for k, v in scanned.items()}
+    with open(files['meta']['path'], encoding='utf-8') as f:
+        meta = json.load(f)
+    return {
+        'format': _MANIFEST_FORMAT,
+        'model_name': model_name,
+        'model_dir': str(model_dir),
+        'files': files,
+        'meta': meta,
+        'importance': {},
+        '_path': str(_manifest_path(model_name, model_dir)),
+    }
+
+
+def _load_manifest(model_name: str, model_dir: Path, version: Optional[str],
+                   scanned: Dict[str, dict]) -> dict:
+    """manifest を読み、 stat/レジストリのハッシュで検証 (不一致なら作り直す)"""
+    path = _manifest_path(model_name, model_dir)
+    manifest = None
+    if path.exists():
+        try:
+            manifest = json.loads(path.read_text(encoding='utf-8'))
+            manifest['_path'] = str(path)
+        except (OSError, ValueError):
+            manifest = None
+
+    fresh = not _same_files(manifest, scanned)
+    if fresh:
+        manifest = _build_manifest(model_name, model_dir, scanned)
+
+    labels = [manifest['meta'].get('version')]
+    if version not in (None, "live"):
+        labels.append(version)
+    expected = _registry_file_hashes(model_name, [label for label in labels if label])
+    if expected:
+        def mismatched(m):
+            return sorted(k for k, h in expected.items()
+                          if k in m['files'] and m['files'][k]['sha256'] != h)
+        bad = mismatched(manifest)
+        if bad and not fresh:
+            # mtime を保ったまま中身が変わった (copy2 等) 可能性 → 再ハッシュ
+            manifest = _build_manifest(model_name, model_dir, scanned)
+            fresh = True
+            bad = mismatched(manifest)
+        if bad:
+            print(f"[WARN] {model_name} {model_dir.name}: registry hash mismatch {bad}")
+
+    if fresh:
+        _save_manifest(manifest)
+    return manifest
 
-    # Meta
-    meta_path = _find_file(model_dir, model_name, "meta")
-    if meta_path is None:
+
+# ---------------------------------------------------------------------------
+# バンドル LRU (版横断の比較・評価で同じバージョンを何度も読まない)
+# ---------------------------------------------------------------------------
+
+BUNDLE_CACHE_SIZE = 4
+
+_bundle_cache: "OrderedDict[tuple, ModelBundle]" = OrderedDict()
+_bundle_lock = threading.Lock()
+
+
+def clear_bundle_cache() -> None:
+    """プロセス内のバンドル LRU をクリア"""
+    with _bundle_lock:
+        _bundle_cache.clear()
+
+
+def _bundle_from_dir(model_name: str, model_dir: Path, version: Optional[str],
+                     source: str, use_cache: bool = True) -> ModelBundle:
+    scanned = _scan_files(model_dir, model_name)
+    if 'meta' not in scanned:
         raise FileNotFoundError(
             f"メタファイルが見つかりません: {model_dir}\n"
             f"  探索: {_STANDARD_FILES['meta']}, "
             f"{_LEGACY_FILE_MAP.get(model_name, {}).get('meta', '?')}"
         )
-    with open(meta_path, encoding='utf-8') as f:
-        meta = json.load(f)
-
-    ver_label = meta.get('version', version or '?')
-
-    # Model P (必須)
-    p_path = _find_file(model_dir, model_name, "model_p")
-    if p_path is None:
+    if 'model_p' not in scanned:
         raise FileNotFoundError(
             f"Placeモデルが見つかりません: {model_dir}"
         )
-    model_p = lgb.Booster(model_file=str(p_path))
-    print(f"[ModelLoader] {model_name} P loaded: {p_path.name}")
-
-    # Model W (optional)
-    model_w = None
-    w_path = _find_file(model_dir, model_name, "model_w")
-    if w_path is not None:
-        model_w = lgb.Booster(model_file=str(w_path))
-        print(f"[ModelLoader] {model_name} W loaded: {w_path.name}")
-
-    # Model AR (optional)
-    model_ar = None
-    ar_path = _find_file(model_dir, model_name, "model_ar")
-    if ar_path is not None:
-        model_ar = lgb.Booster(model_file=str(ar_path))
-        print(f"[ModelLoader] {model_name} AR loaded: {ar_path.name}")
-
-    # Calibrators (optional)
-    calibrators = None
-    cal_path = _find_file(model_dir, model_name, "calibrators")
-    if cal_path is not None:
-        with open(cal_path, 'rb') as f:
-            calibrators = pickle.load(f)
-        print(f"[ModelLoader] {model_name} calibrators loaded: {cal_path.name}")
-
-    if meta.get('has_calibrators') and calibrators is None:
+
+    cache_key = (model_name, str(model_dir.resolve()))
+    if use_cache:
+        with _bundle_lock:
+            hit = _bundle_cache.get(cache_key)
+            if hit is not None and _same_files(hit.manifest, scanned):
+                _bundle_cache.move_to_end(cache_key)
+                return hit
+
+    manifest = _load_manifest(model_name, model_dir, version, scanned)
+    meta = manifest['meta']
+    files = {k: (Path(scanned[k]['path']) if k in scanned else None) for k in _LAZY_KEYS}
+
+    if meta.get('has_calibrators') and files['calibrators'] is None:
         print(f"[WARN] {model_name} meta says calibrators exist but not found")
 
     bundle = ModelBundle(
         name=model_name,
-        version=ver_label,
-        model_p=model_p,
-        model_w=model_w,
-        model_ar=model_ar,
-        calibrators=calibrators,
+        version=meta.get('version', version or '?'),
         meta=meta,
         source=source,
+        files=files,
+        manifest=manifest,
     )
     print(f"[ModelLoader] {bundle.summary()}")
+
+    if use_cache:
+        with _bundle_lock:
+            _bundle_cache[cache_key] = bundle
+            _bundle_cache.move_to_end(cache_key)
+            while len(_bundle_cache) > BUNDLE_CACHE_SIZE:
+                _bundle_cache.popitem(last=False)
     return bundle
 
 
+# ---------------------------------------------------------------------------
+# メインAPI: load_model
+# ---------------------------------------------------------------------------
+
+def load_model(model_name: str, version: Optional[str] = None,
+               *, use_cache: bool = True) -> ModelBundle:
+    """モデルをロードして ModelBundle を返す。
+
+    サブモデル (P/W/AR/calibrators) は初回アクセス時にパースされる。
+    同じディレクトリのバンドルはプロセス内 LRU (BUNDLE_CACHE_SIZE 件) から
+    返す (ファイルの size/mtime が変わっていれば読み直す)。
+
+    Args:
+        model_name: "polaris", "enif", "eclipse" など
+        version: バージョン文字列。None/"live" = ライブモデル。
+        use_cache: False で LRU を使わず常に新しいバンドルを作る
+
+    Returns:
+        ModelBundle
+    """
+    model_dir = _resolve_model_dir(model_name, version)
+    source = "live" if (version is None or version == "live") else "archive"
+    return _bundle_from_dir(model_name, model_dir, version, source, use_cache)
+
+
+def load_model_dir(model_dir: Path, model_name: str = "polaris",
+                   version: Optional[str] = None, *, use_cache: bool = True) -> ModelBundle:
+    """レジストリを経由せずディレクトリを直接指定してロードする (旧版の比較用)"""
+    return _bundle_from_dir(model_name, Path(model_dir), version, "archive", use_cache)
+
+
 def load_model_safe(model_name: str, version: Optional[str] = None) -> Optional[ModelBundle]:
     """load_model のエラー安全版。ロード失敗時は None を返す。"""
     try:
@@ -405,8 +658,13 @@ def register_version(
     features: Optional[int] = None,
     archive_dir: Optional[str] = None,
     set_active: bool = False,
+    model_dir: Optional[Path] = None,
 ) -> None:
-    """新バージョンをレジストリに登録する"""
+    """新バージョンをレジストリに登録する
+
+    model_dir を渡すとモデルファイルの sha256 を files として記録し、
+    load_model の fast-load キャッシュ照合に使う。
+    """
     registry = _load_registry(force_reload=True)
     models = registry.setdefault('models', {})
     entry = models.get(model_name)
@@ -426,6 +684,11 @@ def register_version(
         v_entry['w_auc'] = round(w_auc, 4)
     if features is not None:
         v_entry['features'] = features
+    if model_dir is not None:
+        v_entry['files'] = {
+            key: file_sha256(Path(info['path']))
+            for key, info in _scan_files(Path(model_dir), model_name).items()
+        }
 
     # 既存バージョンの更新 or 新規追加
     existing_idx = None
@@ -126,6 +126,7 @@ def create_objective(
     df_train: pd.DataFrame,
     df_val: pd.DataFrame,
     feature_cols_all: List[str],
+    dataset_cache=None,
 ):
     """Optuna objective関数を生成
 
@@ -133,6 +134,8 @@ def create_objective(
         model_type: 'p' (Place), 'w' (Win), 'ar' (Aura)
         df_train, df_val: 学習・検証データ
         feature_cols_all: 全特徴量の上限リスト（DataFrameに存在する列のみ使用）
+        dataset_cache: DatasetCache。 指定時は同じ特徴量グループ構成・同じ
+            min_child_samples の trial (モデル間も含む) でビン化済み Dataset を再利用する
     """
     import lightgbm as lgb
 
@@ -167,8 +170,17 @@ def create_objective(
             X_val = df_val[feature_cols]
             y_val = df_val[label_col]
 
-        train_data = lgb.Dataset(X_train, label=y_train)
-        valid_data = lgb.Dataset(X_val, label=y_val, reference=train_data)
+        if dataset_cache is not None:
+            # AR も全行でビン化した base から有効行だけ取り出す (P/W と共有)
+            rows_tr = mask_train.values if model_type == 'ar' else None
+            rows_vl = mask_val.values if model_type == 'ar' else None
+            train_data = dataset_cache.train_set(
+                df_train[feature_cols], y_train, rows=rows_tr, params=params)
+            valid_data = dataset_cache.valid_set(
+                df_val[feature_cols], y_val, train_data, rows=rows_vl)
+        else:
+            train_data = lgb.Dataset(X_train, label=y_train)
+            valid_data = lgb.Dataset(X_val, label=y_val, reference=train_data)
 
         model = lgb.train(
             params, train_data, num_boost_round=num_boost_round,
@@ -203,6 +215,7 @@ def run_optimization(
     df_val: pd.DataFrame,
     n_trials: int = 100,
     timeout: Optional[int] = None,
+    dataset_cache=None,
 ) -> dict:
     """1モデルのOptuna最適化を実行"""
     import optuna
@@ -223,7 +236,8 @@ def run_optimization(
         pruner=optuna.pruners.MedianPruner(n_startup_trials=10),
     )
 
-    objective = create_objective(model_type, df_train, df_val, FEATURE_COLS_VALUE)
+    objective = create_objective(model_type, df_train, df_val, FEATURE_COLS_VALUE,
+                                 dataset_cache=dataset_cache)
 
     completed_before = len(study.trials)
     print(f"\n[Optuna] Model={model_type.upper()}, "
@@ -344,6 +358,9 @@ def main():
                         help='検証期間 (default: 2025.01-2025.02)')
     parser.add_argument('--no-db', action='store_true',
                         help='DBオッズ未使用')
+    parser.add_argument('--dataset-cache', default='memory', choices=['off', 'memory', 'disk'],
+                        help='同じ特徴量グループ構成の trial でビン化済み Dataset を再利用 '
+                             '(disk: ml/cache/lgb_datasets にバイナリ保存)')
     args = parser.parse_args()
 
     if not args.model and not args.all:
@@ -418,6 +435,15 @@ def main():
 
     print(f"\n[Data] train={len(df_train):,}, val={len(df_val):,}")
 
+    # ビン化済み Dataset キャッシュ (P/W/AR の study 間でも共有。 メモリ上は LRU 8 件)
+    dataset_cache = None
+    if args.dataset_cache != 'off':
+        from ml.utils.lgb_dataset_cache import DatasetCache
+        dataset_cache = DatasetCache(
+            config.ml_dir() / "cache" / "lgb_datasets" if args.dataset_cache == 'disk' else None,
+            max_entries=8,
+        )
+
     # 最適化実行
     results = {}
     for model_type in models_to_tune:
@@ -425,8 +451,11 @@ def main():
             model_type, df_train, df_val,
             n_trials=args.n_trials,
             timeout=args.timeout,
+            dataset_cache=dataset_cache,
         )
         results[model_type] = result
+    if dataset_cache is not None:
+        print(f"\n[DatasetCache] {dataset_cache.stats()}")
 
     # 統合結果保存
     if len(results) > 1:
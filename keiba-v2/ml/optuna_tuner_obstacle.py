@@ -44,6 +44,7 @@ from ml.experiment_obstacle import (
 )
 from ml.features.obstacle_features import (
     build_obstacle_personnel_timelines,
+    build_horse_obstacle_index,
 )
 
 
@@ -360,6 +361,7 @@ def main():
         jockey_obstacle_tl=jockey_obstacle_tl,
         trainer_obstacle_tl=trainer_obstacle_tl,
         jrdb_sed_index=jrdb_sed_index,
+        horse_obs_index=build_horse_obstacle_index(history_cache),
     )
 
     df_train = build_obstacle_dataset(
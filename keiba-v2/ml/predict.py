@@ -13,6 +13,7 @@ Usage:
     python -m ml.predict --latest           # 最新の開催日
     python -m ml.predict --no-db            # DBオッズ未使用
     python -m ml.predict --with-bets        # 推論+買い目一括（従来互換）
+    python -m ml.predict --profile          # ステージ別プロファイル (ml/profile/ に出力)
 """
 
 import argparse
@@ -28,8 +29,11 @@ import numpy as np
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
 from core import config
+from jrdb.index_store import load_jrdb_index
 from ml.model_loader import load_model, load_model_safe, ModelBundle
 from ml.utils.filters import is_obstacle, split_by_obstacle
+from ml.utils import profiler
+from ml.utils.profiler import PROFILER
 from ml.features.base_features import extract_base_features
 from ml.features.baba_features import load_baba_index, get_baba_features
 from ml.features.past_features import compute_past_features
@@ -43,6 +47,11 @@ from ml.features.speed_features import compute_speed_features
 from ml.features.comment_features import compute_comment_features
 from ml.features.slow_start_features import compute_slow_start_features
 from ml.features.career_features import compute_career_features, CAREER_FEATURE_COLS
+from ml.features.pedigree_features import get_pedigree_features, build_sire_index
+from ml.features.jrdb_features import compute_jrdb_features
+from ml.features.track_bias_features import (
+    compute_race_bias_features, compute_horse_bias_features
+)
 from ml.features.obstacle_features import (
     compute_obstacle_experience, compute_jockey_selection,
     compute_obstacle_level, compute_obstacle_exp_tier,
@@ -65,6 +74,18 @@ from ml.bet_engine import (
     passes_novelty_filter,
 )
 
+# === 抽出器表 (predict_race 用) ===
+# モジュールで 1 回だけ作る。 ステージ計時の包み直しは PROFILER の有効/無効が変わったときだけ
+_STAGE_FX = profiler.StageFunctions(
+    extract_base_features, compute_past_features,
+    get_trainer_features, get_jockey_features,
+    compute_running_style_features, compute_rotation_features,
+    compute_pace_features, compute_training_features, compute_speed_features,
+    compute_comment_features, compute_slow_start_features,
+    get_pedigree_features, build_sire_index, get_baba_features, compute_jrdb_features,
+    compute_race_bias_features, compute_horse_bias_features, compute_career_features,
+)
+
 # === Value Bet閾値 ===
 VALUE_BET_MIN_GAP = 3  # experiment_v3.pyと統一
 
@@ -157,10 +178,12 @@ def predict_obstacle_race(
     trainer_obstacle_tl: Optional[dict] = None,
     jrdb_sed_index: Optional[dict] = None,
     db_place_odds: Optional[Dict[int, dict]] = None,
+    horse_obs_index: Optional[dict] = None,
 ) -> dict:
-    """障害レースの予測を実行（v2: P+Wデュアル、v1: P only フォールバック）"""
-    from ml.features.pedigree_features import get_pedigree_features, build_sire_index
+    """障害レースの予測を実行（v2: P+Wデュアル、v1: P only フォールバック）
 
+    horse_obs_index: build_horse_obstacle_index の結果 (batch_predict 等で複数日を回す時用)
+    """
     # P/Wで異なる特徴量リストに対応 (Optuna最適化後)
     features_p = obstacle_meta.get('features_p') or obstacle_meta.get('features', [])
     features_w = obstacle_meta.get('features_w') or features_p
@@ -304,7 +327,8 @@ def predict_obstacle_race(
 
         # v2.2: 障害走限定過去走統計
         obs_past = compute_obstacle_only_past_stats(
-            ketto_num, race_date, distance, history_cache
+            ketto_num, race_date, distance, history_cache,
+            horse_obs_index=horse_obs_index,
         )
         feat.update(obs_past)
 
@@ -325,7 +349,8 @@ def predict_obstacle_race(
 
         # v2.3b: 同系統コースでの障害好走率
         feat.update(compute_same_group_stats(
-            ketto_num, race_date, venue_name, history_cache
+            ketto_num, race_date, venue_name, history_cache,
+            horse_obs_index=horse_obs_index,
         ))
 
         # v2.5: 経験曲線特徴量
@@ -631,37 +656,20 @@ def load_master_data():
     pit_trainer_tl, pit_jockey_tl = build_pit_personnel_timeline()
     print(f"  PIT: Trainer {len(pit_trainer_tl):,}, Jockey {len(pit_jockey_tl):,}")
 
-    # JRDB indexes (v7.0)
-    jrdb_sed_index = {}
-    jrdb_kyi_index = {}
-    sed_path = config.indexes_dir() / "jrdb_sed_index.json"
-    kyi_path = config.indexes_dir() / "jrdb_kyi_index.json"
-    if sed_path.exists():
-        with open(sed_path, encoding='utf-8') as f:
-            jrdb_sed_index = json.load(f)
-        print(f"  JRDB SED index: {len(jrdb_sed_index):,} entries")
-    if kyi_path.exists():
-        with open(kyi_path, encoding='utf-8') as f:
-            jrdb_kyi_index = json.load(f)
-        print(f"  JRDB KYI index: {len(jrdb_kyi_index):,} entries")
+    # JRDB indexes (v7.0) — 列指向 .npz を優先 (無ければ旧 .json)
+    def _load_jrdb_idx(name):
+        idx = load_jrdb_index(name)
+        if idx is None:
+            return {}
+        print(f"  JRDB {name.upper()} index: {len(idx):,} entries")
+        return idx
+    jrdb_sed_index = _load_jrdb_idx('sed')
+    jrdb_kyi_index = _load_jrdb_idx('kyi')
 
     # KAA index (v7.2: トラックバイアス)
-    jrdb_kaa_index = {}
-    kaa_path = config.indexes_dir() / "jrdb_kaa_index.json"
-    if kaa_path.exists():
-        with open(kaa_path, encoding='utf-8') as f:
-            jrdb_kaa_index = json.load(f)
-        print(f"  JRDB KAA index: {len(jrdb_kaa_index):,} entries")
+    jrdb_kaa_index = _load_jrdb_idx('kaa')
 
     # CYB/CHA/KKA/JOA indexes (Session 115)
-    def _load_jrdb_idx(name):
-        p = config.indexes_dir() / f"jrdb_{name}_index.json"
-        if p.exists():
-            with open(p, encoding='utf-8') as f:
-                idx = json.load(f)
-            print(f"  JRDB {name.upper()} index: {len(idx):,} entries")
-            return idx
-        return {}
     jrdb_cyb_index = _load_jrdb_idx('cyb')
     jrdb_cha_index = _load_jrdb_idx('cha')
     jrdb_kka_index = _load_jrdb_idx('kka')
@@ -785,6 +793,7 @@ def _fetch_race_shosai_from_db(race_id: str) -> Optional[dict]:
         return None
 
 
+@PROFILER.race('predict_race')
 def predict_race(
     race: dict,
     kb_ext: Optional[dict],
@@ -832,8 +841,7 @@ def predict_race(
         pit_trainer_tl: 調教師PIT timeline (Optional, point-in-time safe)
         pit_jockey_tl: 騎手PIT timeline (Optional, point-in-time safe)
     """
-    from ml.features.pedigree_features import get_pedigree_features, build_sire_index
-    from ml.features.jrdb_features import compute_jrdb_features
+    fx = _STAGE_FX.get()
 
     features_value = meta['features_value']
     # Optunaモデル別特徴量（異なるグループON/OFF時に使用）
@@ -844,7 +852,7 @@ def predict_race(
     race_label = f"{venue_name_disp}{race_number_disp}R"
 
     # Sire/Dam/BMS index (build once per predict_race call)
-    _sire_idx, _dam_idx, _bms_idx = build_sire_index(sire_stats_index or {})
+    _sire_idx, _dam_idx, _bms_idx = fx.build_sire_index(sire_stats_index or {})
 
     race_date = race['date']
     race_id = race['race_id']
@@ -860,7 +868,8 @@ def predict_race(
 
     # DB補完: track_type/distance/gradeが不足している場合
     if not track_type or distance == 0 or not current_grade:
-        _db_race = _fetch_race_shosai_from_db(race_id)
+        with PROFILER.stage('db_race_shosai'):
+            _db_race = _fetch_race_shosai_from_db(race_id)
         if _db_race:
             # DB補完で障害レースと判明した場合はフラグ付きで返す（main()で障害モデルにリダイレクト）
             if _db_race.get('track_type') == 'obstacle':
@@ -901,6 +910,8 @@ def predict_race(
     current_month = int(race_date.split('-')[1]) if len(race_date.split('-')) >= 2 else 0
 
     kb_entries = kb_ext.get('entries', {}) if kb_ext else {}
+    PROFILER.hit('kb_ext', kb_ext is not None)
+    PROFILER.hit('db_odds', bool(db_odds))
 
     if verbose:
         print(f"\n{'─'*60}")
@@ -914,9 +925,12 @@ def predict_race(
     for entry in race.get('entries', []):
         umaban = entry.get('umaban', 0)
         ketto_num = entry.get('ketto_num', '')
+        if PROFILER.enabled:
+            PROFILER.hit('history', ketto_num in history_cache)
+            PROFILER.hit('ck_training', ketto_num in (training_summary_day or {}))
 
         # 基本特徴量
-        feat = extract_base_features(entry, race)
+        feat = fx.extract_base_features(entry, race)
 
         # DB事前オッズで上書き
         if db_odds and umaban in db_odds:
@@ -926,7 +940,7 @@ def predict_race(
                 feat['popularity'] = ninki
 
         # 過去走特徴量
-        past = compute_past_features(
+        past = fx.compute_past_features(
             ketto_num=ketto_num,
             race_date=race_date,
             venue_code=venue_code,
@@ -941,7 +955,7 @@ def predict_race(
 
         # 調教師特徴量 (PIT mode: race_date時点の成績を使用)
         tc = entry.get('trainer_code', '')
-        trainer_feat = get_trainer_features(
+        trainer_feat = fx.get_trainer_features(
             tc, venue_code, trainer_index,
             race_date=race_date, pit_timeline=pit_trainer_tl,
         )
@@ -949,14 +963,14 @@ def predict_race(
 
         # 騎手特徴量 (PIT mode: race_date時点の成績を使用)
         jc = entry.get('jockey_code', '')
-        jockey_feat = get_jockey_features(
+        jockey_feat = fx.get_jockey_features(
             jc, venue_code, jockey_index,
             race_date=race_date, pit_timeline=pit_jockey_tl,
         )
         feat.update(jockey_feat)
 
         # 脚質特徴量 (v3.1)
-        rs_feat = compute_running_style_features(
+        rs_feat = fx.compute_running_style_features(
             ketto_num=ketto_num,
             race_date=race_date,
             entry_count=entry_count,
@@ -965,7 +979,7 @@ def predict_race(
         feat.update(rs_feat)
 
         # ローテ・コンディション特徴量 (v3.1 + v5.1 降格ローテ)
-        rot_feat = compute_rotation_features(
+        rot_feat = fx.compute_rotation_features(
             ketto_num=ketto_num,
             race_date=race_date,
             futan=entry.get('futan', 0.0),
@@ -984,7 +998,7 @@ def predict_race(
         feat.update(rot_feat)
 
         # ペース特徴量 (v3.1)
-        pace_feat = compute_pace_features(
+        pace_feat = fx.compute_pace_features(
             ketto_num=ketto_num,
             race_date=race_date,
             days_since_last_race=past.get('days_since_last_race', -1),
@@ -996,7 +1010,7 @@ def predict_race(
         # 調教特徴量 (v3.3 + v4.1 CK_DATA)
         kb_e = kb_entries.get(str(umaban))
         ck_training = (training_summary_day or {}).get(ketto_num) if ketto_num else None
-        train_feat = compute_training_features(
+        train_feat = fx.compute_training_features(
             umaban=str(umaban),
             kb_ext=kb_ext,
             ck_training=ck_training,
@@ -1004,21 +1018,21 @@ def predict_race(
         feat.update(train_feat)
 
         # スピード指数特徴量 (v3.5)
-        speed_feat = compute_speed_features(
+        speed_feat = fx.compute_speed_features(
             umaban=str(umaban),
             kb_ext=kb_ext,
         )
         feat.update(speed_feat)
 
         # コメントNLP特徴量 (v5.3)
-        comment_feat = compute_comment_features(
+        comment_feat = fx.compute_comment_features(
             umaban=str(umaban),
             kb_ext=kb_ext,
         )
         feat.update(comment_feat)
 
         # 出遅れ特徴量 (v5.4)
-        slow_feat = compute_slow_start_features(
+        slow_feat = fx.compute_slow_start_features(
             ketto_num=ketto_num,
             race_date=race_date,
             history_cache=history_cache,
@@ -1027,16 +1041,16 @@ def predict_race(
         feat.update(slow_feat)
 
         # 血統特徴量 (v5.8): 事前計算の集計統計量
-        ped_feat = get_pedigree_features(ketto_num, pedigree_index or {}, _sire_idx, _dam_idx, _bms_idx)
+        ped_feat = fx.get_pedigree_features(ketto_num, pedigree_index or {}, _sire_idx, _dam_idx, _bms_idx)
         feat.update(ped_feat)
 
         # 馬場特徴量 (v5.41)
-        baba_feat = get_baba_features(race_id, track_type, baba_index or {})
+        baba_feat = fx.get_baba_features(race_id, track_type, baba_index or {})
         feat.update(baba_feat)
 
         # JRDB特徴量 (v7.0 + Session 115: CYB/CHA/KKA/JOA)
         if jrdb_sed_index is not None or jrdb_kyi_index is not None:
-            jrdb_feat = compute_jrdb_features(
+            jrdb_feat = fx.compute_jrdb_features(
                 ketto_num=ketto_num,
                 race_date=race_date,
                 history_cache=history_cache,
@@ -1053,15 +1067,12 @@ def predict_race(
 
         # トラックバイアス特徴量 (v7.2)
         if jrdb_kaa_index:
-            from ml.features.track_bias_features import (
-                compute_race_bias_features, compute_horse_bias_features
-            )
-            race_bias = compute_race_bias_features(
+            race_bias = fx.compute_race_bias_features(
                 race_id=race_id, race_date=race_date,
                 track_type=track_type, kaa_index=jrdb_kaa_index,
             )
             feat.update(race_bias)
-            horse_bias = compute_horse_bias_features(
+            horse_bias = fx.compute_horse_bias_features(
                 ketto_num=ketto_num, race_date=race_date,
                 sed_index=jrdb_sed_index or {},
                 kaa_index=jrdb_kaa_index,
@@ -1070,7 +1081,7 @@ def predict_race(
             feat.update(horse_bias)
 
         # キャリア + 不確実性フラグ (Session 119: 未知数度)
-        career_feat = compute_career_features(
+        career_feat = fx.compute_career_features(
             ketto_num=ketto_num,
             race_date=race_date,
             history_cache=history_cache,
@@ -1164,7 +1175,9 @@ def predict_race(
             row['horse_name'] = p.get('horse_name', '')
             row['umaban'] = p.get('umaban')
             snap_rows.append(row)
-        save_feature_snapshot(snap_rows, race, source="predict")
+        with PROFILER.stage('feature_snapshot'):
+            save_feature_snapshot(snap_rows, race, source="predict",
+                                  model_version=str(meta.get('version', '')))
     except Exception as e:
         print(f"[WARN] Feature snapshot save failed: {e}")
 
@@ -1203,7 +1216,8 @@ def predict_race(
         ], dtype=np.float64)
 
     # === Place予測 P (is_top3) ===
-    pred_p_raw = model_p.predict(_build_model_array('p'))
+    with PROFILER.stage('model_p'):
+        pred_p_raw = model_p.predict(_build_model_array('p'))
 
     # === EV用 vs ランキング用の確率使い分け ===
     # EV計算: IsotonicRegressionでキャリブレーション済みの絶対確率を使用
@@ -1226,7 +1240,8 @@ def predict_race(
     ability_score = None
     rating_display = None
     if model_ar is not None:
-        ability_score = -model_ar.predict(_build_model_array('ar'))
+        with PROFILER.stage('model_ar'):
+            ability_score = -model_ar.predict(_build_model_array('ar'))
         rating_display = RATING_BASE + ability_score * RATING_SCALE
         # Method A: グレードオフセット適用
         grade_key = get_grade_key(current_grade, current_age_class)
@@ -1248,7 +1263,8 @@ def predict_race(
     rank_w_dict = {}
 
     if has_win_model:
-        pred_w_raw = model_w.predict(_build_model_array('w'))
+        with PROFILER.stage('model_w'):
+            pred_w_raw = model_w.predict(_build_model_array('w'))
 
         # IsotonicRegressionキャリブレーション（Win EV計算用）
         pred_w_for_ev = pred_w_raw  # デフォルト: rawをそのまま使用
@@ -1575,9 +1591,13 @@ def main():
                         help='推論+買い目を一括実行（従来互換）')
     parser.add_argument('--bankroll', type=int, default=50000,
                         help='バンクロール (Kelly推奨額の計算用, default: 50000)')
+    parser.add_argument('--profile', action='store_true',
+                        help='特徴量抽出のステージ別プロファイルを出力 (環境変数 KEIBA_PROFILE=1 と同等)')
     parser.add_argument('--verbose', '-v', action='store_true',
                         help='詳細出力: 特徴量・推論過程を可視化')
     args = parser.parse_args()
+    if args.profile:
+        profiler.enable()
 
     # バージョン一覧表示
     if args.list_versions:
@@ -2035,6 +2055,7 @@ def main():
     print(f"  Value Bets: {vb_count}")
     print(f"  Output:     {out_path}")
     print(f"  Elapsed:    {elapsed:.1f}s")
+    profiler.finish(f"predict_{date}")
     print(f"{'='*60}\n")
 
 
@@ -5,8 +5,10 @@ Step 1 (単勝 1 点) の minimal subset 実装。
 
   - writer: record_tansho_vote() — 投票成功時に portfolio + ticket を追記
   - idempotency: idempotency key + raw_legs 正規化
+  - journal: ハッシュチェーン付き追記ジャーナル (正本) + idempotency 索引
 
 ファイル配置:
-  data3/userdata/purchase_ledger/{YYYY-MM-DD}.json   ← ledger 本体
+  data3/userdata/purchase_ledger/journal/{YYYY-MM-DD}.jsonl ← 正本 (追記のみ, 7 年保存)
+  data3/userdata/purchase_ledger/{YYYY-MM-DD}.json   ← ledger view (ジャーナルから再生成可)
   data3/userdata/purchase_ledger/_index.jsonl        ← SHA256 追記台帳
 """
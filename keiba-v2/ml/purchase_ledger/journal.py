@@ -0,0 +1,369 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""ledger v2 追記ジャーナル — ハッシュチェーン付き append-only 正本
+
+旧方式は 1 票ごとに {date}.json を全読込 → 全 portfolio 走査で重複検査 → 全体を atomic 再書込み →
+sort_keys で全体 SHA256 を再計算、 と当日の投票数に比例するコストを毎回払っていた
+(投票窓の最終盤ほど遅くなる)。 本モジュールは 1 日 1 本のジャーナルを正本にする:
+
+  - 1 操作 = 1 レコードを append_jsonl で追記 (fsync + mkdir ロック)。 既存行は書き換えない
+  - 各レコードは hash = sha256(prev_hash + 正規化本体) で直前レコードに連鎖 (改ざん検出)。
+    チェーン先頭ハッシュが日次の SHA256 台帳 (_index.jsonl) に載る = 全体再ハッシュ不要
+  - プロセス内キャッシュが materialize 済 ledger と idempotency 索引を保持し、
+    他プロセスが追記した分だけ末尾から読み足す (重複検査 O(1))
+  - {date}.json は ledger の materialized view。 web / settle は従来どおりこれを読む。
+    投票ごとには書かず、 読み手が writer.ensure_view() でジャーナルより古いときだけ再生成する
+    (rebuild_view() でいつでも再生成できる)
+
+レコード op:
+  "portfolio" — {race_id, portfolio, events}: 投票 1 意思決定
+  "event"     — {event}: 失敗系など ticket を伴わないイベント
+  "snapshot"  — {ledger, reason}: ledger 全体の置換 (精算・修復などのバッチ変更 /
+                ジャーナル導入前の {date}.json の取込み)
+
+ジャーナルは追記のみで削除・ローテーションしない (税務 7 年保存。 view は派生物なので
+失っても復元できる)。 チェーン破損は自動修復しない (_load_ledger の JSON 破損と同じ方針)。
+例外は書込み途中で落ちた末尾 (改行なしの最終行) だけで、 次の append がチェーンロック下で:
+  - 末尾が検証済の完全なレコードなら改行を補って取り込む
+  - そうでなければ最終改行位置まで切り詰め、 JOURNAL_TAIL_TRUNCATED イベントとして記録する
+(放置すると次のレコードが同じ行に連結され、 以降のチェーン全体が読めなくなるため)
+
+提供:
+    JOURNAL_SUBDIR             — LEDGER_DIR 配下のジャーナル置き場
+    LedgerJournal              — 1 日分ジャーナル (refresh / append / append_with / 索引)
+    get_journal(path)          — プロセス内キャッシュ付きで LedgerJournal を返す
+    record_hash(prev, rec)     — レコードのチェーンハッシュ
+    verify_journal(path)       — チェーン全検査 → {"ok", "n_records", "head", "error"}
+
+CLI:
+    python -m ml.purchase_ledger.journal --date 2026-05-30 --verify
+    python -m ml.purchase_ledger.journal --date 2026-05-30 --rebuild
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+from ml.utils.jsonl_append import _acquire_lock, _release_lock, append_jsonl
+
+JOURNAL_SUBDIR = "journal"
+GENESIS_HASH = "0" * 64
+CHAIN_LOCK_TIMEOUT_SEC = 10.0
+
+LEDGER_VERSION = 2
+
+
+class JournalCorruptError(RuntimeError):
+    """ハッシュチェーン不一致 / 行破損"""
+
+
+def _now_iso() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def empty_ledger(date: str) -> dict:
+    return {"version": LEDGER_VERSION, "date": date, "races": [], "events": []}
+
+
+# ---------------------------------------------------------------------------
+# ハッシュチェーン
+# ---------------------------------------------------------------------------
+
+def _canonical(rec: dict) -> bytes:
+    body = {k: rec[k] for k in ("seq", "at", "op", "data")}
+    return json.dumps(body, ensure_ascii=False, sort_keys=True,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def record_hash(prev: str, rec: dict) -> str:
+    """sha256(prev_hash + 正規化本体)。 コストはレコード長のみに比例。"""
+    h = hashlib.sha256(prev.encode("ascii"))
+    h.update(_canonical(rec))
+    return h.hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# ジャーナル本体
+# ---------------------------------------------------------------------------
+
+class LedgerJournal:
+    """1 日分のジャーナル + materialize 済 ledger + idempotency 索引。
+
+    状態はすべてジャーナルの畳み込みで決まる。 append 前に必ず refresh() して
+    他プロセスの追記を取り込み、 チェーンロック下で prev を確定させる (分岐しない)。
+    """
+
+    def __init__(self, path: Path, date: Optional[str] = None):
+        self.path = Path(path)
+        self.date = date or self.path.name.split(".")[0]
+        self._reset()
+
+    def _reset(self) -> None:
+        self.ledger = empty_ledger(self.date)
+        self.seq = 0
+        self.head = GENESIS_HASH
+        self.offset = 0
+        self._races: dict[str, dict] = {}
+        self._portfolios: dict[str, dict] = {}      # idempotency_key → portfolio
+        self._seqs: dict[str, set] = {}              # race_id → 使用済 portfolio seq
+        self.counts = {"ticket_count": 0, "total_amount": 0, "portfolio_count": 0}
+
+    # ---- 索引 -------------------------------------------------------------
+
+    def _index_portfolio(self, race_id: str, pf: dict) -> None:
+        key = pf.get("idempotency_key")
+        if key:
+            self._portfolios[key] = pf
+        self._seqs.setdefault(race_id, set()).add(
+            (pf.get("portfolio_id") or "").split("-")[-1])
+        tickets = pf.get("tickets", [])
+        self.counts["portfolio_count"] += 1
+        self.counts["ticket_count"] += len(tickets)
+        self.counts["total_amount"] += sum(t.get("total_amount", 0) for t in tickets)
+
+    def _reindex(self) -> None:
+        self._races, self._portfolios, self._seqs = {}, {}, {}
+        self.counts = {"ticket_count": 0, "total_amount": 0, "portfolio_count": 0}
+        for race in self.ledger.get("races", []):
+            rid = race.get("race_id")
+            self._races[rid] = race
+            for pf in race.get("portfolios", []):
+                self._index_portfolio(rid, pf)
+
+    def find_portfolio(self, idempotency_key: str) -> Optional[dict]:
+        return self._portfolios.get(idempotency_key)
+
+    def used_seqs(self, race_id: str) -> set:
+        return set(self._seqs.get(race_id, ()))
+
+    # ---- 畳み込み ----------------------------------------------------------
+
+    def _apply(self, rec: dict) -> None:
+        op, data = rec["op"], rec["data"]
+        if op == "portfolio":
+            rid = data["race_id"]
+            race = self._races.get(rid)
+            if race is None:
+                race = {"race_id": rid, "state": "SUBMITTED", "portfolios": []}
+                self.ledger["races"].append(race)
+                self._races[rid] = race
+            pf = copy.deepcopy(data["portfolio"])
+            race["portfolios"].append(pf)
+            self.ledger["events"].extend(copy.deepcopy(data.get("events", [])))
+            self._index_portfolio(rid, pf)
+        elif op == "event":
+            self.ledger.setdefault("events", []).append(copy.deepcopy(data["event"]))
+        elif op == "snapshot":
+            led = copy.deepcopy(data["ledger"])
+            led.pop("journal", None)
+            led.setdefault("races", [])
+            led.setdefault("events", [])
+            self.ledger = led
+            self._reindex()
+        else:
+            raise JournalCorruptError(f"未知の op: {op!r} (seq={rec.get('seq')})")
+
+    def _consume(self, raw: bytes) -> None:
+        """末尾から読んだバイト列を検証しつつ畳み込む (未完の最終行は残す)。"""
+        end = raw.rfind(b"\n")
+        if end < 0:
+            return
+        for line in raw[:end].split(b"\n"):
+            if not line.strip():
+                continue
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise JournalCorruptError(f"ジャーナル行破損: {self.path}: {e}") from e
+            if rec.get("prev") != self.head or rec.get("seq") != self.seq + 1:
+                raise JournalCorruptError(
+                    f"チェーン不連続: {self.path} seq={rec.get('seq')} (期待 {self.seq + 1})")
+            if record_hash(self.head, rec) != rec.get("hash"):
+                raise JournalCorruptError(f"ハッシュ不一致: {self.path} seq={rec['seq']}")
+            self._apply(rec)
+            self.seq, self.head = rec["seq"], rec["hash"]
+        self.offset += end + 1
+
+    def refresh(self) -> None:
+        """他プロセスの追記分だけ読み足す。 ファイルが縮んでいたら全再構築。"""
+        try:
+            size = self.path.stat().st_size
+        except FileNotFoundError:
+            if self.seq:
+                self._reset()
+            return
+        if size < self.offset:
+            self._reset()
+        if size == self.offset:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            self._consume(f.read(size - self.offset))
+
+    # ---- 追記 --------------------------------------------------------------
+
+    def append(self, op: str, data: dict) -> dict:
+        """レコードを 1 件追記 (fsync 済) して畳み込む。 失敗時は例外。"""
+        return self.append_with(op, lambda _j: data)
+
+    def append_with(self, op: str,
+                    build: Callable[["LedgerJournal"], Optional[dict]]) -> Optional[dict]:
+        """チェーンロック下で最新状態に refresh してから build(self) で data を作り追記する。
+
+        重複検査・seq 採番のように「最新のジャーナルを見て決める」処理は build 内で行う
+        (ロック外で決めると、 別プロセスと同じ key / seq を二重に記録しうる)。
+        build が None を返したら何も追記せず None を返す。
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        lock = self.path.parent / f"{self.path.name}.chain.lock"
+        if not _acquire_lock(lock, CHAIN_LOCK_TIMEOUT_SEC):
+            raise RuntimeError(f"journal chain lock timeout: {lock}")
+        try:
+            self.refresh()
+            self._repair_torn_tail()
+            data = build(self)
+            if data is None:
+                return None
+            return self._write(op, data)
+        finally:
+            _release_lock(lock)
+
+    def _write(self, op: str, data: dict) -> dict:
+        """(チェーンロック保持中) 1 レコード追記して畳み込む"""
+        rec = {"seq": self.seq + 1, "at": _now_iso(), "op": op, "data": data,
+               "prev": self.head}
+        rec["hash"] = record_hash(self.head, rec)
+        if not append_jsonl(self.path, rec):
+            raise RuntimeError(f"journal append failed: {self.path}")
+        # 自分の追記分は読み直さずに畳み込む (offset も進める)
+        self.offset += len((json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8"))
+        self._apply(copy.deepcopy(rec))
+        self.seq, self.head = rec["seq"], rec["hash"]
+        return rec
+
+    def _repair_torn_tail(self) -> None:
+        """(チェーンロック保持中・refresh 直後) 改行で終わらない末尾を片付ける。
+
+        ロック下では他の書き手はいないので、 offset より後ろに残っているのは
+        書込み途中で落ちたプロセスの断片だけ。
+        """
+        try:
+            size = self.path.stat().st_size
+        except FileNotFoundError:
+            return
+        if size <= self.offset:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            tail = f.read(size - self.offset)
+        try:
+            rec = json.loads(tail)
+            complete = (isinstance(rec, dict) and rec.get("prev") == self.head
+                        and rec.get("seq") == self.seq + 1
+                        and record_hash(self.head, rec) == rec.get("hash"))
+        except (ValueError, KeyError, TypeError):
+            complete = False
+        if complete:
+            # 本体は書けていて改行だけ欠けた → 改行を補って取り込む
+            with open(self.path, "ab") as f:
+                f.write(b"\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.refresh()
+            return
+        with open(self.path, "r+b") as f:
+            f.truncate(self.offset)
+            f.flush()
+            os.fsync(f.fileno())
+        print(f"[journal] 書きかけの末尾 {len(tail)} bytes を切り詰め: {self.path}",
+              file=sys.stderr)
+        self._write("event", {"event": {
+            "id": f"evt-journal-{self.seq + 1}",
+            "at": _now_iso(),
+            "type": "JOURNAL_TAIL_TRUNCATED",
+            "race_id": None, "portfolio_id": None, "ticket_id": None,
+            "payload": {"offset": self.offset, "bytes": len(tail),
+                        "sha256": hashlib.sha256(tail).hexdigest()},
+        }})
+
+    def view(self) -> dict:
+        """{date}.json に書く materialized view (チェーン位置付き)。"""
+        return {**self.ledger, "journal": {"seq": self.seq, "head": self.head}}
+
+
+_JOURNALS: dict[str, LedgerJournal] = {}
+
+
+def get_journal(path: Path) -> LedgerJournal:
+    """絶対パス単位でキャッシュした LedgerJournal を refresh して返す。"""
+    key = str(Path(path).resolve())
+    j = _JOURNALS.get(key)
+    if j is None:
+        j = _JOURNALS[key] = LedgerJournal(Path(path))
+    try:
+        j.refresh()
+    except JournalCorruptError:
+        _JOURNALS.pop(key, None)
+        raise
+    return j
+
+
+def verify_journal(path: Path) -> dict:
+    """キャッシュを使わずに先頭からチェーンを全検査する。"""
+    j = LedgerJournal(Path(path))
+    try:
+        j.refresh()
+    except JournalCorruptError as e:
+        return {"ok": False, "n_records": j.seq, "head": j.head, "error": str(e)}
+    return {"ok": True, "n_records": j.seq, "head": j.head, "error": None}
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def main() -> int:
+    from ml.purchase_ledger import writer
+
+    ap = argparse.ArgumentParser(description="ledger journal verify / rebuild")
+    ap.add_argument("--date", required=True, help="YYYY-MM-DD")
+    ap.add_argument("--verify", action="store_true", help="チェーン検査 + view 照合")
+    ap.add_argument("--rebuild", action="store_true", help="ジャーナルから {date}.json 再生成")
+    args = ap.parse_args()
+
+    jpath = writer.journal_path_for_date(args.date)
+    if not jpath.exists():
+        print(f"journal なし: {jpath}", file=sys.stderr)
+        return 1
+    res = verify_journal(jpath)
+    print(json.dumps(res, ensure_ascii=False))
+    if not res["ok"]:
+        return 2
+    if args.verify:
+        vpath = writer.LEDGER_DIR / f"{args.date}.json"
+        if vpath.exists():
+            view = json.loads(vpath.read_text(encoding="utf-8"))
+            marker = view.pop("journal", None) or {}
+            j = LedgerJournal(jpath)
+            j.refresh()
+            same = view == j.ledger and marker.get("head") == j.head
+            print(f"view 照合: {'一致' if same else '不一致 (--rebuild で再生成)'}")
+            if not same:
+                return 3
+    if args.rebuild:
+        ok = writer.rebuild_view(args.date)
+        print(f"rebuild: {'OK' if ok else 'FAILED'}")
+        return 0 if ok else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
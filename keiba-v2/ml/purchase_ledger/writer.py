@@ -14,14 +14,25 @@
       投票失敗 (timeout/rejected/error) を VOTE_FAILED イベントで記録。
       ticket は作らない (お金が動いていないので)。
 
+  ensure_view(date) -> Path
+      view ({date}.json) がジャーナルより古ければ再生成してパスを返す (読み手用)。
+
 ファイル:
-  data3/userdata/purchase_ledger/{YYYY-MM-DD}.json
+  data3/userdata/purchase_ledger/journal/{YYYY-MM-DD}.jsonl ← 正本 (ハッシュチェーン追記, journal.py)
+  data3/userdata/purchase_ledger/{YYYY-MM-DD}.json      ← materialized view (web / settle が読む)
   data3/userdata/purchase_ledger/events_{YYYY-MM}.jsonl  ← イベントは別途 jsonl 保存 (検索性)
-  data3/userdata/purchase_ledger/_index.jsonl            ← SHA256 追記台帳
+  data3/userdata/purchase_ledger/_index.jsonl            ← SHA256 追記台帳 (チェーン先頭)
+
+1 票の記録はジャーナル 1 行の追記 + O(1) の idempotency 索引引きで完結する。
+view は投票・失敗イベントのたびには書かない (当日の全体を毎回書き直すと票数に比例して遅くなる)。
+読み手 (settle / 買い軸印) は ensure_view() でジャーナルより古い view だけ再生成してから読み、
+投票プロセスはバッチの最後に 1 回 ensure_view() して web 表示を追従させる。
+精算・修復などのバッチ変更 (commit_ledger_snapshot) は従来どおり view まで書く。
 """
 
 from __future__ import annotations
 
+import copy
 import hashlib
 import json
 import os
@@ -39,6 +50,12 @@ from ml.purchase_ledger.idempotency import (
     race_no_from_race_id,
     venue_code_from_race_id,
 )
+from ml.purchase_ledger.journal import (
+    JOURNAL_SUBDIR,
+    LedgerJournal,
+    empty_ledger,
+    get_journal,
+)
 from ml.utils.atomic_write import write_json_atomic
 from ml.utils.jsonl_append import append_jsonl
 
@@ -64,54 +81,59 @@ def _now_iso() -> str:
 
 
 def _ledger_path_for(race_id: str) -> Path:
-    """race_id から ledger ファイルパスを返す"""
+    """race_id から ledger ファイルパス (materialized view) を返す"""
     date = date_from_race_id(race_id)
     if not date:
         raise ValueError(f"invalid race_id (cannot derive date): {race_id}")
     return LEDGER_DIR / f"{date}.json"
 
 
-def _load_ledger(path: Path) -> dict:
-    """既存 ledger を読む。 無ければ空の v2 ledger を返す"""
-    if not path.exists():
-        return {
-            "version": LEDGER_VERSION,
-            "date": path.stem,
-            "races": [],
-            "events": [],
-        }
+def journal_path_for_date(date: str) -> Path:
+    """YYYY-MM-DD → ジャーナル (正本) パス"""
+    return LEDGER_DIR / JOURNAL_SUBDIR / f"{date}.jsonl"
+
+
+def _read_view(path: Path) -> dict:
     try:
         with open(path, encoding="utf-8") as f:
-            return json.load(f)
+            ledger = json.load(f)
     except json.JSONDecodeError as e:
         # 破損 ledger は事故処理 — 自動修復しない。 ふくだに報告
         raise RuntimeError(f"ledger JSON 破損: {path}: {e}")
+    ledger.pop("journal", None)
+    return ledger
 
 
-def _find_or_create_race(ledger: dict, race_id: str) -> dict:
-    """ledger.races[] から race_id を探す。 無ければ新規追加して返す"""
-    for race in ledger["races"]:
-        if race.get("race_id") == race_id:
-            return race
-    new_race = {
-        "race_id": race_id,
-        "state": "SUBMITTED",
-        "portfolios": [],
-    }
-    ledger["races"].append(new_race)
-    return new_race
+def _load_ledger(path: Path) -> dict:
+    """既存 ledger を読む (ジャーナルがあればその畳み込み)。 無ければ空の v2 ledger を返す
+
+    戻り値は呼び出し側が自由に書き換えてよいコピー。 書き戻しは commit_ledger_snapshot()。
+    """
+    date = path.stem
+    jpath = journal_path_for_date(date)
+    if jpath.exists():
+        return copy.deepcopy(get_journal(jpath).ledger)
+    if not path.exists():
+        return empty_ledger(date)
+    return _read_view(path)
+
+
+def _open_journal(date: str) -> LedgerJournal:
+    """書き込み用にジャーナルを開く。 未導入の日の {date}.json は snapshot として取り込む。"""
+    j = get_journal(journal_path_for_date(date))
+    if j.seq == 0:
+        view_path = LEDGER_DIR / f"{date}.json"
+        if view_path.exists():
+            j.append("snapshot", {"ledger": _read_view(view_path), "reason": "legacy_import"})
+    return j
 
 
-def _assign_portfolio_seq(race: dict) -> str:
+def _next_portfolio_seq(used: set, race_id: str) -> str:
     """同一 race 内で未使用の portfolio seq (A/B/C/...) を返す"""
-    used = {
-        (p.get("portfolio_id") or "").split("-")[-1]
-        for p in race.get("portfolios", [])
-    }
     for c in "ABCDEFGHIJKLMNOPQRSTUVWXYZ":
         if c not in used:
             return c
-    raise RuntimeError(f"portfolio seq A-Z 全使用済: race_id={race.get('race_id')}")
+    raise RuntimeError(f"portfolio seq A-Z 全使用済: race_id={race_id}")
 
 
 def _make_portfolio_id(race_id: str, seq: str) -> str:
@@ -122,46 +144,86 @@ def _make_portfolio_id(race_id: str, seq: str) -> str:
     return f"pf-{date_compact}-{venue}{race_no}-{seq}"
 
 
-def _find_duplicate_portfolio(race: dict, idempotency_key: str) -> Optional[dict]:
-    for p in race.get("portfolios", []):
-        if p.get("idempotency_key") == idempotency_key:
-            return p
-    return None
+def _write_view(j: LedgerJournal) -> bool:
+    """ジャーナルの畳み込みを {date}.json (web / settle が読む view) に書き出す"""
+    return write_json_atomic(LEDGER_DIR / f"{j.date}.json", j.view())
+
 
+def _update_index(ledger_path: Path, ledger: Optional[dict] = None) -> None:
+    """SHA256 追記台帳 (_index.jsonl) を更新 (14 §7.2)
 
-def _update_index(ledger_path: Path, ledger: dict) -> None:
-    """SHA256 追記台帳 (_index.jsonl) を更新 (14 §7.2)"""
+    ジャーナルがある日はチェーン先頭ハッシュ + 増分集計を載せる (全体再ハッシュしない)。
+    """
     try:
-        content = json.dumps(ledger, ensure_ascii=False, sort_keys=True)
-        sha256 = hashlib.sha256(content.encode("utf-8")).hexdigest()
-        ticket_count = sum(
-            len(p.get("tickets", []))
-            for r in ledger.get("races", [])
-            for p in r.get("portfolios", [])
-        )
-        total_amount = sum(
-            t.get("total_amount", 0)
-            for r in ledger.get("races", [])
-            for p in r.get("portfolios", [])
-            for t in p.get("tickets", [])
-        )
-        portfolio_count = sum(
-            len(r.get("portfolios", []))
-            for r in ledger.get("races", [])
-        )
-        entry = {
-            "date": ledger.get("date"),
-            "sha256": sha256,
-            "updated_at": _now_iso(),
-            "ticket_count": ticket_count,
-            "total_amount": total_amount,
-            "portfolio_count": portfolio_count,
-        }
+        jpath = journal_path_for_date(ledger_path.stem)
+        if jpath.exists():
+            j = get_journal(jpath)
+            entry = {"date": j.date, "sha256": j.head, "seq": j.seq,
+                     "updated_at": _now_iso(), **j.counts}
+        else:
+            ledger = ledger if ledger is not None else _load_ledger(ledger_path)
+            content = json.dumps(ledger, ensure_ascii=False, sort_keys=True)
+            pfs = [p for r in ledger.get("races", []) for p in r.get("portfolios", [])]
+            entry = {
+                "date": ledger.get("date"),
+                "sha256": hashlib.sha256(content.encode("utf-8")).hexdigest(),
+                "updated_at": _now_iso(),
+                "ticket_count": sum(len(p.get("tickets", [])) for p in pfs),
+                "total_amount": sum(t.get("total_amount", 0)
+                                    for p in pfs for t in p.get("tickets", [])),
+                "portfolio_count": len(pfs),
+            }
         append_jsonl(LEDGER_DIR / "_index.jsonl", entry)
     except Exception as e:
         print(f"[ledger] _index.jsonl 更新失敗 (本体は保存済): {e}", file=sys.stderr)
 
 
+def commit_ledger_snapshot(date: str, ledger: dict, reason: str) -> bool:
+    """_load_ledger で取り出して書き換えた ledger 全体を snapshot としてジャーナルに確定。
+
+    精算・修復などのバッチ変更用。 view と _index.jsonl も更新する。
+    """
+    try:
+        j = _open_journal(date)
+        j.append("snapshot", {"ledger": ledger, "reason": reason})
+    except Exception as e:
+        print(f"[ledger] snapshot 確定失敗: {e}", file=sys.stderr)
+        return False
+    if not _write_view(j):
+        print(f"[ledger] view 書き出し失敗 (journal は確定済): {date}", file=sys.stderr)
+    _update_index(LEDGER_DIR / f"{date}.json")
+    return True
+
+
+def rebuild_view(date: str) -> bool:
+    """ジャーナルから {date}.json を再生成 (view 破損・欠損時)"""
+    jpath = journal_path_for_date(date)
+    if not jpath.exists():
+        return False
+    return _write_view(get_journal(jpath))
+
+
+def ensure_view(date: str) -> Path:
+    """view ({date}.json) がジャーナルより古い / 無ければ再生成し、 view のパスを返す。
+
+    投票のホットパスはジャーナル追記のみなので、 {date}.json を直接開く読み手はこれを通す。
+    mtime が同じ (粗い時刻精度で同一 tick) 場合も古いとみなす = 余分な再生成はあっても取りこぼさない。
+    ジャーナルの無い日 (導入前の ledger) は何もしない。
+    """
+    view_path = LEDGER_DIR / f"{date}.json"
+    try:
+        j_mtime = journal_path_for_date(date).stat().st_mtime_ns
+    except FileNotFoundError:
+        return view_path
+    try:
+        stale = view_path.stat().st_mtime_ns <= j_mtime
+    except FileNotFoundError:
+        stale = True
+    if stale and not rebuild_view(date):
+        print(f"[ledger] view 再生成失敗 (journal は確定済): {view_path}", file=sys.stderr)
+    return view_path
+
+
 def _append_event(event: dict) -> None:
     """events_{YYYY-MM}.jsonl にイベントを追記 (14 §6, §8 events 肥大化対策)"""
     now = datetime.now()
@@ -191,6 +253,82 @@ _BET_TYPE_HORSE_COUNT = {
 }
 
 
+def _build_portfolio(
+    *,
+    race_id: str,
+    portfolio_id: str,
+    portfolio_strategy: str,
+    norm: list[dict],
+    portfolio_idempotency: str,
+    now: str,
+    receipt_number: Optional[str],
+    receipt_time: Optional[str],
+    clicked_at: Optional[str],
+) -> tuple[dict, list[dict]]:
+    """正規化済 ticket 群から portfolio 本体と付随イベントを組み立てる"""
+    ticket_objs = []
+    portfolio_total = 0
+    for i, t in enumerate(norm, start=1):
+        raw_legs = {"horses": t["horses"]}
+        ticket_id = f"{portfolio_id}#t{i}"
+        ticket = {
+            "ticket_id": ticket_id,
+            "strategy_name": t["strategy_name"],
+            "formation_type": "single",
+            "pattern_label": t["pattern_label"],
+            "raw_legs": raw_legs,
+            "notes": t["notes"],
+            "bet_type": t["bet_type"],
+            "total_amount": t["amount"],
+            "idempotency_key": make_ticket_idempotency_key(
+                race_id, t["bet_type"], raw_legs, t["strategy_name"]),
+            "created_at": now,
+            "submitted_at": clicked_at or now,
+        }
+        if t["ev_at_decision"] is not None:
+            ticket["ev_at_decision"] = t["ev_at_decision"]
+        if receipt_number:
+            ticket["ipat_confirmed_at"] = now
+            ticket["ipat_receipt_number"] = receipt_number
+            if receipt_time:
+                ticket["ipat_receipt_time"] = receipt_time
+        ticket_objs.append(ticket)
+        portfolio_total += t["amount"]
+
+    portfolio = {
+        "portfolio_id": portfolio_id,
+        "portfolio_strategy": portfolio_strategy,
+        "created_at": now,
+        "tickets": ticket_objs,
+        "portfolio_total": portfolio_total,
+        "idempotency_key": portfolio_idempotency,
+    }
+    # イベント追記 (portfolio 単位、 本体 events[] + jsonl 両方)
+    events_to_add = [
+        _make_event("FF_WRITTEN", race_id, portfolio_id, None,
+                    count=len(ticket_objs), amount=portfolio_total),
+        _make_event("TARGET_IMPORTED", race_id, portfolio_id, None, by="target_clicker"),
+        _make_event("APPROVED", race_id, portfolio_id, None, by="target_clicker.auto_vote"),
+    ]
+    if receipt_number:
+        events_to_add.append(_make_event(
+            "IPAT_CONFIRMED", race_id, portfolio_id, None,
+            by="target_clicker.auto_vote",
+            receipt_number=receipt_number, receipt_time=receipt_time,
+        ))
+    return portfolio, events_to_add
+
+
+def _duplicate_result(dup: dict, ledger_path: Path) -> RecordResult:
+    return RecordResult(
+        success=True, action="duplicate",
+        reason="既存 portfolio と idempotency 一致 — スキップ",
+        portfolio_id=dup["portfolio_id"],
+        ticket_id=(dup["tickets"][0]["ticket_id"] if dup.get("tickets") else None),
+        ledger_path=str(ledger_path),
+    )
+
+
 def record_portfolio_votes(
     *,
     race_id: str,
@@ -269,89 +407,50 @@ def record_portfolio_votes(
 
     ledger_path = _ledger_path_for(race_id)
     try:
-        ledger_path.parent.mkdir(parents=True, exist_ok=True)
-        ledger = _load_ledger(ledger_path)
+        j = _open_journal(ledger_path.stem)
     except Exception as e:
         return RecordResult(success=False, action="error",
                              reason=f"ledger load failed: {e}")
 
-    race = _find_or_create_race(ledger, race_id)
-
-    # 重複検査 (同じ意思決定を 2 回 click した場合)
-    dup = _find_duplicate_portfolio(race, portfolio_idempotency)
+    # 重複検査 (同じ意思決定を 2 回 click した場合) — idempotency 索引で O(1)
+    dup = j.find_portfolio(portfolio_idempotency)
     if dup is not None:
-        return RecordResult(
-            success=True, action="duplicate",
-            reason="既存 portfolio と idempotency 一致 — スキップ",
-            portfolio_id=dup["portfolio_id"],
-            ticket_id=(dup["tickets"][0]["ticket_id"] if dup.get("tickets") else None),
-            ledger_path=str(ledger_path),
+        return _duplicate_result(dup, ledger_path)
+
+    built: dict = {}
+
+    def _build(jj: LedgerJournal) -> Optional[dict]:
+        # チェーンロック下で再検査 + seq 採番 (ロック外の検査後に別プロセスが
+        # 同じ key / seq を記録していても二重記録しない)
+        dup = jj.find_portfolio(portfolio_idempotency)
+        if dup is not None:
+            built["duplicate"] = dup
+            return None
+        seq = _next_portfolio_seq(jj.used_seqs(race_id), race_id)
+        portfolio, events = _build_portfolio(
+            race_id=race_id, portfolio_id=_make_portfolio_id(race_id, seq),
+            portfolio_strategy=portfolio_strategy, norm=norm,
+            portfolio_idempotency=portfolio_idempotency, now=now,
+            receipt_number=receipt_number, receipt_time=receipt_time,
+            clicked_at=clicked_at,
         )
+        built.update(portfolio=portfolio, events=events)
+        return {"race_id": race_id, "portfolio": portfolio, "events": events}
 
-    seq = _assign_portfolio_seq(race)
-    portfolio_id = _make_portfolio_id(race_id, seq)
-
-    ticket_objs = []
-    portfolio_total = 0
-    for i, t in enumerate(norm, start=1):
-        raw_legs = {"horses": t["horses"]}
-        ticket_id = f"{portfolio_id}#t{i}"
-        ticket = {
-            "ticket_id": ticket_id,
-            "strategy_name": t["strategy_name"],
-            "formation_type": "single",
-            "pattern_label": t["pattern_label"],
-            "raw_legs": raw_legs,
-            "notes": t["notes"],
-            "bet_type": t["bet_type"],
-            "total_amount": t["amount"],
-            "idempotency_key": make_ticket_idempotency_key(
-                race_id, t["bet_type"], raw_legs, t["strategy_name"]),
-            "created_at": now,
-            "submitted_at": clicked_at or now,
-        }
-        if t["ev_at_decision"] is not None:
-            ticket["ev_at_decision"] = t["ev_at_decision"]
-        if receipt_number:
-            ticket["ipat_confirmed_at"] = now
-            ticket["ipat_receipt_number"] = receipt_number
-            if receipt_time:
-                ticket["ipat_receipt_time"] = receipt_time
-        ticket_objs.append(ticket)
-        portfolio_total += t["amount"]
-
-    portfolio = {
-        "portfolio_id": portfolio_id,
-        "portfolio_strategy": portfolio_strategy,
-        "created_at": now,
-        "tickets": ticket_objs,
-        "portfolio_total": portfolio_total,
-        "idempotency_key": portfolio_idempotency,
-    }
-    race["portfolios"].append(portfolio)
-
-    # イベント追記 (portfolio 単位、 本体 events[] + jsonl 両方)
-    events_to_add = [
-        _make_event("FF_WRITTEN", race_id, portfolio_id, None,
-                    count=len(ticket_objs), amount=portfolio_total),
-        _make_event("TARGET_IMPORTED", race_id, portfolio_id, None, by="target_clicker"),
-        _make_event("APPROVED", race_id, portfolio_id, None, by="target_clicker.auto_vote"),
-    ]
-    if receipt_number:
-        events_to_add.append(_make_event(
-            "IPAT_CONFIRMED", race_id, portfolio_id, None,
-            by="target_clicker.auto_vote",
-            receipt_number=receipt_number, receipt_time=receipt_time,
-        ))
+    try:
+        j.append_with("portfolio", _build)
+    except Exception as e:
+        return RecordResult(success=False, action="error",
+                             reason=f"journal append failed: {e}",
+                             portfolio_id=built.get("portfolio", {}).get("portfolio_id"))
+    if "duplicate" in built:
+        return _duplicate_result(built["duplicate"], ledger_path)
+    portfolio, events_to_add = built["portfolio"], built["events"]
+    ticket_objs = portfolio["tickets"]
+    portfolio_id = portfolio["portfolio_id"]
     for ev in events_to_add:
-        ledger["events"].append(ev)
         _append_event(ev)
-
-    ok = write_json_atomic(ledger_path, ledger)
-    if not ok:
-        return RecordResult(success=False, action="error",
-                             reason="atomic write failed", portfolio_id=portfolio_id)
-    _update_index(ledger_path, ledger)
+    _update_index(ledger_path)
 
     return RecordResult(
         success=True, action="recorded",
@@ -669,12 +768,9 @@ def _record_failure_event(
     if race_id and len(race_id) == 16:
         try:
             ledger_path = _ledger_path_for(race_id)
-            ledger_path.parent.mkdir(parents=True, exist_ok=True)
-            ledger = _load_ledger(ledger_path)
-            ledger.setdefault("events", []).append(event)
-            ok = write_json_atomic(ledger_path, ledger)
-            if ok:
-                _update_index(ledger_path, ledger)
+            j = _open_journal(ledger_path.stem)
+            j.append("event", {"event": event})
+            _update_index(ledger_path)
         except Exception as e:
             print(f"[ledger] {event_type} 記録失敗 (jsonl は記録済): {e}",
                   file=sys.stderr)
@@ -715,7 +811,7 @@ def record_settlement(
       - portfolio 内全 ticket が settle 済になったら portfolio_pnl / portfolio_roi を確定
       - SETTLED イベント (portfolio 単位、 source / reconciled の provenance 付き) を発火
       - race 内全 ticket が settle 済になったら race.state を SETTLED に遷移
-      - _index.jsonl の SHA256 を更新
+      - 変更後の ledger 全体を snapshot としてジャーナルに確定し、 view / _index.jsonl を更新
 
     Args:
         date: YYYY-MM-DD (ledger ファイル名)
@@ -735,7 +831,7 @@ def record_settlement(
         1.0 が損益分岐、 1.133 なら回収率 113.3%。 portfolio_pnl は payout - invest。
     """
     ledger_path = LEDGER_DIR / f"{date}.json"
-    if not ledger_path.exists():
+    if not ledger_path.exists() and not journal_path_for_date(date).exists():
         return SettleResult(success=False, reason=f"ledger not found: {ledger_path}")
 
     try:
@@ -814,16 +910,13 @@ def record_settlement(
             ledger_path=str(ledger_path),
         )
 
+    ledger.setdefault("events", []).extend(new_events)
+    if not commit_ledger_snapshot(date, ledger, reason="settlement"):
+        return SettleResult(success=False, reason="journal commit failed",
+                            ledger_path=str(ledger_path))
     for ev in new_events:
-        ledger.setdefault("events", []).append(ev)
         _append_event(ev)
 
-    ok = write_json_atomic(ledger_path, ledger)
-    if not ok:
-        return SettleResult(success=False, reason="atomic write failed",
-                            ledger_path=str(ledger_path))
-    _update_index(ledger_path, ledger)
-
     return SettleResult(
         success=True,
         settled_tickets=settled_tickets,
@@ -35,10 +35,9 @@ sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
 from core import config
 from ml.purchase_ledger.writer import (
-    LEDGER_DIR, record_portfolio_votes, _load_ledger, _make_event,
-    _append_event, _update_index, _now_iso,
+    LEDGER_DIR, commit_ledger_snapshot, record_portfolio_votes, _load_ledger, _make_event,
+    _append_event, _now_iso,
 )
-from ml.utils.atomic_write import write_json_atomic
 
 CODE2NAME = {0: "tansho", 1: "fukusho", 2: "wakuren", 3: "umaren",
              4: "wide", 5: "umatan", 6: "sanrenpuku", 7: "sanrentan"}
@@ -211,7 +210,9 @@ def main():
         _append_event(ev)
 
     # 旧 superseded マークを先に保存 (record_portfolio_votes が再読込するため)
-    write_json_atomic(ledger_path, ledger)
+    if not commit_ledger_snapshot(date, ledger, reason="repair_supersede"):
+        print("superseded マークの確定に失敗 → 中断", file=sys.stderr)
+        return
 
     # 正しい買い目を新規 portfolio として追記
     info_by_id = confirmed
@@ -58,7 +58,7 @@ from ml.settle_purchases import (
     get_db_num_runners,
     load_race_data,
 )
-from ml.purchase_ledger.writer import record_settlement, LEDGER_DIR
+from ml.purchase_ledger.writer import record_settlement, ensure_view
 
 
 # formation_type=="single" かつこの集合に含まれる bet_type のみ settle 対象
@@ -285,7 +285,7 @@ def settle(date: str, force: bool = False, dry_run: bool = False,
                     False (暫定 = ticket.reconciled=False で記録)。 reconcile 本体未実装の
                     現状は常に False で運用される。
     """
-    ledger_path = LEDGER_DIR / f"{date}.json"
+    ledger_path = ensure_view(date)
     if not ledger_path.exists():
         return {"error": f"ledger not found: {ledger_path}"}
 
@@ -21,6 +21,7 @@ from typing import Dict, List, Optional, Tuple
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
 from core import config
+from core.name_search import norm_key
 from core.db import query
 from core.odds_db import get_final_win_odds, get_final_place_odds
 
@@ -225,10 +226,18 @@ def resolve_wide_pair(item: dict, race_data: Optional[dict]) -> Optional[Tuple[i
         name_map = get_db_horse_names(race_id)
 
     umabans = []
+    norm_map = None
     for name in names:
         name = name.strip()
         if name in name_map:
             umabans.append(name_map[name])
+            continue
+        # 完全一致しない場合は表記揺れ (全角/半角・かな種別・長音) を吸収して再照合
+        if norm_map is None:
+            norm_map = {norm_key(k): v for k, v in name_map.items()}
+        uma = norm_map.get(norm_key(name))
+        if uma is not None:
+            umabans.append(uma)
 
     if len(umabans) >= 2:
         return (min(umabans[0], umabans[1]), max(umabans[0], umabans[1]))
@@ -48,6 +48,8 @@ def _print_race(race_id: str, label: str, rs, timing: dict) -> None:
         print(f"    --bet {spec}")
     for w in rs.warnings:
         print(f"    ⚠ {w}")
+    if 'joint_log_growth' in rs.diagnostics:
+        print(f"    joint Kelly E[log g]={rs.diagnostics['joint_log_growth']:.6f}")
 
 
 def main() -> int:
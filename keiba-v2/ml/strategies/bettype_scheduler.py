@@ -11,12 +11,14 @@ multi-bettype 化したスケジューラ。 単発パス方式 (Task Scheduler
   ③ 投票 = runner を ★--bet 群★ で起動 (--from-json は bet_type を tansho に潰すため不可)
 
 state/lock は freebudget と別ファイル (bettype_scheduler*) で衝突回避。
+--daemon で常駐モード (scheduler_daemon: 投票時刻タイマー発火、 state/lock は単発パスと共通)。
 
 CLI:
     python -m ml.strategies.bettype_scheduler --date today --strategy concentrate       # dry
     python -m ml.strategies.bettype_scheduler --date 2026-05-31 --now 14:50              # 時刻擬似
     python -m ml.strategies.bettype_scheduler --date today --confirm --i-understand-live # 実弾
     python -m ml.strategies.bettype_scheduler --date today --halt                        # 当日停止
+    python -m ml.strategies.bettype_scheduler --date today --daemon                      # 常駐 (タイマー発火)
 """
 
 from __future__ import annotations
@@ -27,6 +29,7 @@ import subprocess
 import sys
 from datetime import datetime
 from pathlib import Path
+from typing import Optional
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
 
@@ -215,14 +218,20 @@ def run_pass(date_str: str, *, now: datetime, live: bool, bankroll: int,
 def _run_pass_inner(date_str: str, day_dir: Path, *, now: datetime, live: bool,
                     bankroll: int, strategy: str, ev_floor: float, sizing: str,
                     per_day_max_yen: int, login_timeout: int,
-                    notify_on_skip: bool = True, verbose: bool = True) -> dict:
-    predictions = load_predictions(day_dir)
+                    notify_on_skip: bool = True, verbose: bool = True,
+                    predictions: Optional[dict] = None, post_times: Optional[dict] = None,
+                    only_races: Optional[set] = None) -> dict:
+    """1 パス本体。 predictions/post_times/only_races は daemon モード用 (ロード済み当日
+    プラン + タイマー発火したレースだけ評価)。 未指定なら従来通り全レースを見る。"""
+    if predictions is None:
+        predictions = load_predictions(day_dir)
     if predictions is None:
         if verbose:
             print(f"[bettype] predictions.json なし → 何もしない", file=sys.stderr)
         return {"voted": [], "skipped": [], "halted": False}
 
-    post_times = load_post_times(day_dir, date_str=date_str)
+    if post_times is None:
+        post_times = load_post_times(day_dir, date_str=date_str)
     per_race_cap = read_per_race_cap()
 
     sp = state_path(day_dir, live=live)
@@ -278,6 +287,8 @@ def _run_pass_inner(date_str: str, day_dir: Path, *, now: datetime, live: bool,
             pass
 
     for race_id in sorted(pred_by_id):
+        if only_races is not None and race_id not in only_races:
+            continue
         if race_id in state["votes"] and state["votes"][race_id].get("exit_code") == 0:
             continue  # 投票済み (冪等)
         pr = pred_by_id[race_id]
@@ -335,6 +346,8 @@ def _run_pass_inner(date_str: str, day_dir: Path, *, now: datetime, live: bool,
         res["sizing"] = sizing
         if rs.warnings:
             res["sizing_warnings"] = rs.warnings
+        if rs.diagnostics:
+            res["sizing_diagnostics"] = rs.diagnostics
         state["votes"][race_id] = res
         newly_voted.append((race_id, res))
         if res["exit_code"] == 0:
@@ -376,6 +389,34 @@ def _run_pass_inner(date_str: str, day_dir: Path, *, now: datetime, live: bool,
             "halted": state.get("halted", False)}
 
 
+def run_daemon(date_str: str, *, live: bool, bankroll: int, strategy: str,
+               ev_floor: float, sizing: str, per_day_max_yen: int, login_timeout: int,
+               notify_on_skip: bool = True, verbose: bool = True) -> dict:
+    """常駐モード (--daemon)。 当日プランを 1 回ロードし、 投票時刻タイマーで発火した
+    レースだけ評価・サイジング・投票する (scheduler_daemon.RaceDayDaemon)。
+    predictions.json は更新時 (vb_refresh) のみ再読込。 state/lock は単発パスと共通。"""
+    import asyncio
+    from ml.strategies.scheduler_daemon import PlanCache, RaceDayDaemon
+
+    date_str = resolve_date(date_str)
+    day_dir = date_dir_for(date_str)
+    cache = PlanCache(Path(day_dir) / "predictions.json", lambda: load_predictions(day_dir))
+
+    def fire(now: datetime, only_races: set, post_times: dict) -> dict:
+        predictions, _ = cache.get()
+        return _run_pass_inner(
+            date_str, day_dir, now=now, live=live, bankroll=bankroll, strategy=strategy,
+            ev_floor=ev_floor, sizing=sizing, per_day_max_yen=per_day_max_yen,
+            login_timeout=login_timeout, notify_on_skip=notify_on_skip, verbose=verbose,
+            predictions=predictions, post_times=post_times, only_races=only_races)
+
+    daemon = RaceDayDaemon(
+        date_str, lock_path=lock_path(day_dir),
+        load_post_times=lambda: load_post_times(day_dir, date_str=date_str),
+        fire=fire, plan_version=cache.version, tag="bettype", verbose=verbose)
+    return asyncio.run(daemon.run())
+
+
 # ---------------------------------------------------------------------------
 # CLI
 # ---------------------------------------------------------------------------
@@ -384,6 +425,8 @@ def parse_args():
     p = argparse.ArgumentParser(description=__doc__.split("\n")[0])
     p.add_argument("--date", default="today")
     p.add_argument("--now", default=None, help="擬似時刻 HH:MM (テスト用)")
+    p.add_argument("--daemon", action="store_true",
+                   help="常駐モード: 当日プランを 1 回ロードしレースごとの投票時刻タイマーで発火")
     p.add_argument("--confirm", action="store_true", help="実 click (live)")
     p.add_argument("--i-understand-live", action="store_true",
                    help="実弾を承認 (--confirm と両方必須 = 金経路の二重フラグ)")
@@ -425,6 +468,17 @@ def main() -> int:
               file=sys.stderr)
         return 2
     date_str = resolve_date(args.date)
+    if args.daemon:
+        if args.now:
+            print("[bettype] --daemon は実時刻で動く (--now とは併用不可)。 中止。",
+                  file=sys.stderr)
+            return 2
+        out = run_daemon(
+            date_str, live=live, bankroll=args.bankroll, strategy=args.strategy,
+            ev_floor=args.ev_floor, sizing=args.sizing,
+            per_day_max_yen=args.per_day_max_yen, login_timeout=args.login_timeout,
+            notify_on_skip=not args.no_skip_notify, verbose=not args.quiet)
+        return 3 if out.get("halted") else 0
     now = parse_now(args.now, date_str)
     out = run_pass(
         date_str, now=now, live=live, bankroll=args.bankroll, strategy=args.strategy,
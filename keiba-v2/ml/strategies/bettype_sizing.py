@@ -16,6 +16,10 @@ DB/IO/subprocess なし。 bettype_scheduler から呼ばれる。
   アンカー◎単: p = 軸の pred_proba_w_cal (= HorseStrength.pred_w, calibrated), odds = axis_odds。
   アンカー◎複: p = fukusho plan の hit_prob (harville place 確率), odds = place_odds_min (最低値=保守)。
 
+★joint_kelly サイザー (--sizing joint_kelly): 上記ヒューリスティックの代わりに、 選定 plan の
+  全買い目をハーヴィル top-3 着順上で同時 Kelly 最適化 (joint_kelly.py)。 券種間相関を厳密に
+  扱い、 per_race_cap / 1点上限を制約として直接満たす。 比較は bettype_sizing_bench.py。
+
 入力: be.RaceEfficiency (各 plan の odds_legs/EV/hit_prob) + bettype_selection.BetSelection。
 出力: RaceSizing (SizedLeg のリスト + 内訳)。
 """
@@ -27,11 +31,13 @@ from typing import Callable, Dict, List, Optional, Tuple
 
 from ml.strategies.kelly import BET_UNIT_YEN, MIN_BET_YEN, kelly_amount
 from ml.strategies import bettype_fund as bf  # noqa: E402
+from ml.strategies import joint_kelly as jk  # noqa: E402
 
 # アンカー (◎単/複) = 排反/相関の無い独立 1 点なので Kelly を厳密適用してよい券種。
 ANCHOR_BET_TYPES = ("tansho", "fukusho")
 DEFAULT_SIZER = "anchor_kelly_combo_ev"
 ADAPTIVE_SIZER = "adaptive_fund"
+JOINT_SIZER = "joint_kelly"
 
 
 def _legs_key(legs) -> tuple:
@@ -65,7 +71,8 @@ class RaceSizing:
     combo_yen: int
     per_race_cap: int
     n_dropped: int = 0
-    warnings: List[str] = field(default_factory=list)
+    warnings: List[str] = field(default_factory=list)      # 異常・フォールバックのみ
+    diagnostics: Dict[str, float] = field(default_factory=dict)  # 参考値 (joint_log_growth 等)
 
 
 # ---------------------------------------------------------------------------
@@ -327,6 +334,78 @@ def size_race_adaptive(race_eff, selection, *, bankroll: int, per_race_cap: int,
     return rs
 
 
+def joint_tickets(race_eff, selection) -> List[Tuple["jk.Ticket", object]]:
+    """選定 plan の全 leg を (Ticket, 所属 plan) に展開。
+
+    入れ子幅 (馬連◎-相手2 ⊂ 相手3) の同一買い目は 1 点にまとめ、 EV の高い plan に帰属させる。
+    オッズ未取得の点は買えないので除外。 アンカー単勝のオッズは axis_odds。
+    """
+    eff_by_key = {(p.bet_type, _legs_key(p.legs)): p for p in race_eff.plans}
+    out: Dict[tuple, Tuple[jk.Ticket, object]] = {}
+    for sp in selection.selected_plans:
+        plan = eff_by_key.get((sp.bet_type, _legs_key(sp.legs)))
+        if plan is None:
+            continue
+        for i, leg in enumerate(plan.legs):
+            o = plan.odds_legs[i] if i < len(plan.odds_legs) else None
+            if plan.bet_type == "tansho" and race_eff.axis_odds:
+                o = race_eff.axis_odds
+            if o is None or o <= 1.0:
+                continue
+            key = (plan.bet_type, tuple(int(h) for h in leg))
+            cur = out.get(key)
+            if cur is None or (plan.expected_return or 0.0) > (cur[1].expected_return or 0.0):
+                out[key] = (jk.Ticket(plan.bet_type, key[1], float(o)), plan)
+    return list(out.values())
+
+
+def size_race_joint(race_eff, selection, *, bankroll: int, per_race_cap: int,
+                    kelly_fraction: float = 0.25, per_bet_cap_pct: float = 0.10,
+                    combo_share_of_residual: float = 1.0,
+                    weight_key: str = "ev") -> RaceSizing:
+    """選定 plan の全買い目をハーヴィル top-3 着順上で同時 Kelly 最適化 (joint_kelly)。
+
+    アンカー/複合の区別なく 1 つの凸問題で per_race_cap・1点上限を同時に満たす。
+    買い目 1 点 (単勝のみ) なら size_race のアンカー Kelly と同額。
+    ハーヴィル結果空間が作れない (3頭未満) レースは size_race にフォールバック。
+    combo_share_of_residual / weight_key は size_race 互換のため受けるだけ (未使用)。
+    """
+    rid = race_eff.race_id
+    pairs = joint_tickets(race_eff, selection)
+    win_probs = {s.umaban: s.win_prob for s in race_eff.strengths}
+    n_runners = race_eff.num_runners or len(win_probs)
+    cap = per_race_cap if per_race_cap > 0 else bankroll
+    solved = jk.solve_race(
+        win_probs, [t for t, _ in pairs], bankroll=bankroll, race_cap_yen=cap,
+        kelly_fraction=kelly_fraction, per_bet_cap_pct=per_bet_cap_pct,
+        places_k=3 if n_runners >= 8 else 2,
+    ) if pairs else None
+    if solved is None:
+        rs = size_race(race_eff, selection, bankroll=bankroll, per_race_cap=per_race_cap,
+                       kelly_fraction=kelly_fraction, per_bet_cap_pct=per_bet_cap_pct,
+                       combo_share_of_residual=combo_share_of_residual,
+                       weight_key=weight_key)
+        if pairs:
+            rs.warnings.append("joint_kelly: 着順空間なし → 既定サイザー")
+        return rs
+
+    amounts, f, R, pi = solved
+    legs: List[SizedLeg] = []
+    for (tk, plan), amt in zip(pairs, amounts):
+        if amt < MIN_BET_YEN:
+            continue
+        is_anchor = tk.bet_type in ANCHOR_BET_TYPES
+        legs.append(SizedLeg(rid, tk.bet_type, list(tk.horses), amt, plan.label, tk.odds,
+                             None if is_anchor else plan.expected_return, plan.hit_prob,
+                             "joint Kelly (Harville top3)"))
+    total = sum(l.amount for l in legs)
+    anchor_yen = sum(l.amount for l in legs if l.bet_type in ANCHOR_BET_TYPES)
+    growth = jk.expected_log_growth(R, pi, f)
+    return RaceSizing(race_id=rid, legs=legs, total_yen=total, anchor_yen=anchor_yen,
+                      combo_yen=total - anchor_yen, per_race_cap=per_race_cap,
+                      n_dropped=0, diagnostics={'joint_log_growth': growth})
+
+
 # ---------------------------------------------------------------------------
 # プラガブルサイザー登録
 # ---------------------------------------------------------------------------
@@ -335,6 +414,7 @@ SizerFn = Callable[..., RaceSizing]
 SIZERS: Dict[str, SizerFn] = {
     DEFAULT_SIZER: size_race,
     ADAPTIVE_SIZER: size_race_adaptive,
+    JOINT_SIZER: size_race_joint,
 }
 
 
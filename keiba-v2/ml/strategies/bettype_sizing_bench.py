@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""bettype_sizing ベンチマーク — 既定ヒューリスティック vs joint_kelly
+
+合成レース (モデル勝率 + ノイズ入り市場オッズ、 控除率込み) を作り、 全 plan を選定した
+BetSelection に対して各サイザーを実行して比較する:
+  - 速度: 1 レースあたり ms / 1 日 (既定 36 レース) 合計秒。 scheduler の投票窓 (4 分) 内か
+  - 品質: モデル (ハーヴィル top-3) 下の期待対数成長率 E[log wealth] と期待回収率
+
+DB/IO なし。 乱数 seed 固定で再現可能。
+
+CLI:
+    python -m ml.strategies.bettype_sizing_bench
+    python -m ml.strategies.bettype_sizing_bench --races 360 --bankroll 300000 --per-race-cap 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from itertools import combinations, permutations
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from ml.strategies import bettype_efficiency as be  # noqa: E402
+from ml.strategies import bettype_selection as bs  # noqa: E402
+from ml.strategies import bettype_sizing as sz  # noqa: E402
+from ml.strategies import harville as hv  # noqa: E402
+from ml.strategies import joint_kelly as jk  # noqa: E402
+
+VOTE_WINDOW_SEC = 240
+RACES_PER_DAY = 36
+TAKEOUT = {"tansho": 0.80, "fukusho": 0.80, "umaren": 0.775, "wide": 0.775,
+           "umatan": 0.75, "sanrenpuku": 0.75, "sanrentan": 0.725}
+
+
+# ---------------------------------------------------------------------------
+# 合成レース
+# ---------------------------------------------------------------------------
+
+def _combo_odds(market: dict, n_runners: int) -> dict:
+    """市場勝率 (ハーヴィル) × 控除率 → combo_odds (bettype_efficiency の形式)。"""
+    ids = sorted(market)
+    places_k = 3 if n_runners >= 8 else 2
+    set_dist = be.topk_set_distribution(market, places_k)
+    out = {bt: {} for bt in ("umaren", "wide", "umatan", "sanrenpuku", "sanrentan")}
+    for a, b in combinations(ids, 2):
+        kb = be._kumiban(a, b, ordered=False)
+        out["umaren"][kb] = {"odds": TAKEOUT["umaren"] / max(hv.umaren_prob(market, a, b), 1e-6)}
+        pw = sum(p for s, p in set_dist.items() if a in s and b in s)
+        out["wide"][kb] = {"odds": max(1.0, TAKEOUT["wide"] / max(pw, 1e-6))}
+    for a, b in permutations(ids, 2):
+        out["umatan"][be._kumiban(a, b, ordered=True)] = {
+            "odds": TAKEOUT["umatan"] / max(hv.umatan_prob(market, a, b), 1e-6)}
+    for a, b, c in combinations(ids, 3):
+        out["sanrenpuku"][be._kumiban(a, b, c, ordered=False)] = {
+            "odds": TAKEOUT["sanrenpuku"] / max(hv.sanrenpuku_prob(market, a, b, c), 1e-6)}
+    return out
+
+
+def synthetic_race(rng: np.random.Generator, idx: int):
+    """(RaceEfficiency, BetSelection) — 全 plan を選定済みにしたもの。"""
+    n = int(rng.integers(8, 19))
+    model = rng.gamma(1.2, 1.0, n)
+    model = model / model.sum()
+    market = model * np.exp(rng.normal(0, 0.35, n))
+    market = market / market.sum()
+    ids = list(range(1, n + 1))
+    model_p = {u: float(p) for u, p in zip(ids, model)}
+    market_p = {u: float(p) for u, p in zip(ids, market)}
+    strengths = []
+    for u in ids:
+        fuku = sum(p for s, p in be.topk_set_distribution(market_p, 3).items() if u in s) \
+            if n >= 8 else market_p[u]
+        strengths.append(be.HorseStrength(
+            umaban=u, horse_name=f"H{u}", win_prob=model_p[u],
+            odds=round(TAKEOUT["tansho"] / market_p[u], 1),
+            place_odds_min=max(1.0, round(TAKEOUT["fukusho"] / fuku * 0.8, 1)),
+            pred_w=model_p[u], pred_p=None, ar_deviation=None,
+            z_w=None, z_p=None, z_adr=None, composite=model_p[u]))
+    strengths.sort(key=lambda s: -s.win_prob)
+    axis = strengths[0].umaban
+    partners = [s.umaban for s in strengths[1:6]]
+    combo = _combo_odds(market_p, n)
+    plans = be.build_plans(strengths, model_p, combo, axis=axis, partners=partners,
+                           n_runners=n)
+    rid = f"2026010105010{idx % 12 + 1:03d}"
+    axis_s = strengths[0]
+    race_eff = be.RaceEfficiency(
+        race_id=rid, date="2026-01-01", venue_name="東京", race_number=idx % 12 + 1,
+        grade="", track_type="turf", distance=1600, num_runners=n,
+        axis_umaban=axis, axis_name=axis_s.horse_name, axis_odds=axis_s.odds,
+        partners=partners, weights=(1, 1, 1), specialist=None,
+        strengths=strengths, plans=plans)
+    selected = [bs.SelectedPlan(p.bet_type, p.label, p.legs, p.hit_prob,
+                                p.expected_return, p.synthetic_odds, p.vs_tansho, "bench")
+                for p in plans]
+    sel = bs.BetSelection(
+        race_id=rid, date="2026-01-01", venue_name="東京", race_number=idx % 12 + 1,
+        grade="", axis_umaban=axis, axis_name=axis_s.horse_name, axis_odds=axis_s.odds,
+        strategy="spread", requested_strategy="spread", ev_floor=0.0, taste=None,
+        specialist=None, selected_plans=selected, skipped_plans=[], decision_reason="bench")
+    return race_eff, sel
+
+
+# ---------------------------------------------------------------------------
+# 評価
+# ---------------------------------------------------------------------------
+
+def evaluate_sizing(race_eff, rs, bankroll: int) -> tuple:
+    """サイジング結果の (E[log wealth], 期待払戻, 投資額) をモデル着順分布で評価。"""
+    if not rs.legs:
+        return 0.0, 0.0, 0
+    tickets = [jk.Ticket(l.bet_type, tuple(l.horses), float(l.leg_odds or 0.0))
+               for l in rs.legs]
+    orders, pi = jk.harville_top3({s.umaban: s.win_prob for s in race_eff.strengths})
+    n = race_eff.num_runners or 0
+    R = jk.payout_matrix(orders, tickets, places_k=3 if n >= 8 else 2)
+    f = np.array([l.amount for l in rs.legs], dtype=float) / bankroll
+    stake = int(sum(l.amount for l in rs.legs))
+    expected_payout = float(pi @ (R @ f)) * bankroll
+    return jk.expected_log_growth(R, pi, f), expected_payout, stake
+
+
+def run(n_races: int, *, bankroll: int, per_race_cap: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    races = [synthetic_race(rng, i) for i in range(n_races)]
+    results = {}
+    for name in (sz.DEFAULT_SIZER, sz.JOINT_SIZER):
+        fn = sz.get_sizer(name)
+        t0 = time.perf_counter()
+        sized = [fn(re_, sel, bankroll=bankroll, per_race_cap=per_race_cap)
+                 for re_, sel in races]
+        elapsed = time.perf_counter() - t0
+        growth = payout = 0.0
+        stake = 0
+        for (re_, _), rs in zip(races, sized):
+            g, p, s = evaluate_sizing(re_, rs, bankroll)
+            growth += g
+            payout += p
+            stake += s
+        results[name] = {
+            "ms_per_race": elapsed / n_races * 1000,
+            "sec_per_day": elapsed / n_races * RACES_PER_DAY,
+            "log_growth": growth,
+            "stake": stake,
+            "expected_roi": payout / stake if stake else 0.0,
+            "n_legs": sum(len(rs.legs) for rs in sized),
+        }
+    return results
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description="bettype_sizing ベンチマーク (既定 vs joint_kelly)")
+    p.add_argument("--races", type=int, default=RACES_PER_DAY * 2)
+    p.add_argument("--bankroll", type=int, default=100_000)
+    p.add_argument("--per-race-cap", type=int, default=10_000)
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args(argv)
+
+    res = run(args.races, bankroll=args.bankroll, per_race_cap=args.per_race_cap,
+              seed=args.seed)
+    print(f"races={args.races} bankroll={args.bankroll:,} per_race_cap={args.per_race_cap:,}")
+    print(f"{'sizer':<24}{'ms/race':>9}{'s/day':>8}{'legs':>7}{'stake':>11}"
+          f"{'E[ROI]':>8}{'Σ E[log]':>11}")
+    for name, r in res.items():
+        print(f"{name:<24}{r['ms_per_race']:>9.2f}{r['sec_per_day']:>8.2f}{r['n_legs']:>7}"
+              f"{r['stake']:>11,}{r['expected_roi']:>8.3f}{r['log_growth']:>11.5f}")
+    slow = max(r["sec_per_day"] for r in res.values())
+    print(f"投票窓 {VOTE_WINDOW_SEC}s に対し 1日 {RACES_PER_DAY}R 最遅 {slow:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,6 +5,8 @@
 単発パス方式 (vb_refresh と同思想)。 Task Scheduler から 1-2 分ごとに叩かれる想定。
 各パスで「freebudget 候補のうち 投票ウィンドウ内 [投票時刻, 締切] かつ 未投票」 の
 レースを投票し、 状態ファイルで冪等性 (二重投票防止) を担保する。
+--daemon で常駐モード (scheduler_daemon: 朝 1 回起動 → 各レースの投票時刻タイマーで発火)。
+判定・state・安全機構は単発パスと共通 (同じ _run_pass_inner / 同じ state ファイル)。
 
 時刻定義 (ふくだ Session 135):
     締切     = 発走時刻 − 2 分
@@ -29,6 +31,9 @@ CLI:
     # 実弾 (シズネレビュー後 / 武装後のみ)
     python -m ml.strategies.freebudget_scheduler --date today --confirm --i-understand-live
 
+    # 常駐モード (朝 1 回起動 → 各レースの投票時刻にタイマー発火、 全締切後に終了)
+    python -m ml.strategies.freebudget_scheduler --date today --daemon [--confirm --i-understand-live]
+
 状態ファイル: <day_dir>/freebudget_scheduler_state[_dryrun].json
 """
 
@@ -298,17 +303,24 @@ def run_pass(date_str: str, *, now: datetime, live: bool,
 def _run_pass_inner(date_str: str, day_dir: Path, *, now: datetime, live: bool,
                     bankroll: int, kelly_fraction: float, per_bet_cap_pct: float,
                     preset: str, per_day_max_yen: int, login_timeout: int,
-                    verbose: bool = True) -> dict:
-    predictions = load_predictions(day_dir)
+                    verbose: bool = True, predictions: Optional[dict] = None,
+                    result=None, post_times: Optional[dict] = None,
+                    only_races: Optional[set] = None) -> dict:
+    """1 パス本体。 predictions/result/post_times/only_races は daemon モード用
+    (ロード済みの当日プランを渡し、 タイマー発火したレースだけ判定する)。 未指定なら従来通り。"""
+    if predictions is None:
+        predictions = load_predictions(day_dir)
     if predictions is None:
         if verbose:
             print(f"[scheduler] predictions.json なし → 何もしない", file=sys.stderr)
         return {"voted": [], "skipped": [], "halted": False}
 
-    result = extract_freebudget_bets(
-        predictions, bankroll=bankroll, kelly_fraction=kelly_fraction,
-        per_bet_cap_pct=per_bet_cap_pct, preset=preset)
-    post_times = load_post_times(day_dir, date_str=date_str)
+    if result is None:
+        result = extract_freebudget_bets(
+            predictions, bankroll=bankroll, kelly_fraction=kelly_fraction,
+            per_bet_cap_pct=per_bet_cap_pct, preset=preset)
+    if post_times is None:
+        post_times = load_post_times(day_dir, date_str=date_str)
 
     sp = state_path(day_dir, live=live)
     state = load_state(sp, date_str, "live" if live else "dry-run")
@@ -355,6 +367,8 @@ def _run_pass_inner(date_str: str, day_dir: Path, *, now: datetime, live: bool,
             pass
 
     for race_id in sorted(by_race):
+        if only_races is not None and race_id not in only_races:
+            continue
         if race_id in state["votes"] and state["votes"][race_id].get("exit_code") == 0:
             continue  # 投票済み (冪等)
         st = post_times.get(race_id, "")
@@ -448,6 +462,43 @@ def _run_pass_inner(date_str: str, day_dir: Path, *, now: datetime, live: bool,
             "halted": state.get("halted", False)}
 
 
+def run_daemon(date_str: str, *, live: bool, bankroll: int, kelly_fraction: float,
+               per_bet_cap_pct: float, preset: str, per_day_max_yen: int,
+               login_timeout: int, verbose: bool = True) -> dict:
+    """常駐モード (--daemon)。 当日プランを 1 回ロードし、 各レースの投票時刻タイマーで
+    そのレースだけ _run_pass_inner を回す (scheduler_daemon.RaceDayDaemon)。
+
+    候補生成 (extract_freebudget_bets) は bankroll 超過の EV 順切り捨てが全レース横断なので
+    レース単位に分けず、 predictions.json が更新された時だけ全体を再計算してキャッシュする。
+    """
+    import asyncio
+    from ml.strategies.scheduler_daemon import PlanCache, RaceDayDaemon
+
+    date_str = resolve_date(date_str)
+    day_dir = date_dir_for(date_str)
+    cache = PlanCache(
+        Path(day_dir) / "predictions.json", lambda: load_predictions(day_dir),
+        derive=lambda p: extract_freebudget_bets(
+            p, bankroll=bankroll, kelly_fraction=kelly_fraction,
+            per_bet_cap_pct=per_bet_cap_pct, preset=preset))
+
+    def fire(now: datetime, only_races: set, post_times: dict) -> dict:
+        predictions, result = cache.get()
+        return _run_pass_inner(
+            date_str, day_dir, now=now, live=live, bankroll=bankroll,
+            kelly_fraction=kelly_fraction, per_bet_cap_pct=per_bet_cap_pct,
+            preset=preset, per_day_max_yen=per_day_max_yen,
+            login_timeout=login_timeout, verbose=verbose,
+            predictions=predictions, result=result, post_times=post_times,
+            only_races=only_races)
+
+    daemon = RaceDayDaemon(
+        date_str, lock_path=lock_path(day_dir),
+        load_post_times=lambda: load_post_times(day_dir, date_str=date_str),
+        fire=fire, plan_version=cache.version, tag="scheduler", verbose=verbose)
+    return asyncio.run(daemon.run())
+
+
 def halt_day(date_str: str, *, live: bool, reason: str) -> dict:
     """当日の state に halted=True を立てて以降のパスを全停止する (web「停止」用)。
 
@@ -476,6 +527,8 @@ def parse_args():
     p = argparse.ArgumentParser(description=__doc__.split("\n")[0])
     p.add_argument("--date", default="today")
     p.add_argument("--now", default=None, help="擬似時刻 HH:MM (テスト用)")
+    p.add_argument("--daemon", action="store_true",
+                   help="常駐モード: 当日プランを 1 回ロードしレースごとの投票時刻タイマーで発火")
     p.add_argument("--confirm", action="store_true", help="実 click (live)")
     p.add_argument("--i-understand-live", action="store_true",
                    help="実弾を承認 (--confirm と両方必須 = 金経路の二重フラグ)")
@@ -519,6 +572,17 @@ def main() -> int:
               "(実弾の二重フラグ)。 中止。", file=sys.stderr)
         return 2
     date_str = resolve_date(args.date)
+    if args.daemon:
+        if args.now:
+            print("[scheduler] --daemon は実時刻で動く (--now とは併用不可)。 中止。",
+                  file=sys.stderr)
+            return 2
+        out = run_daemon(
+            date_str, live=live, bankroll=args.bankroll,
+            kelly_fraction=args.kelly_fraction, per_bet_cap_pct=args.per_bet_cap_pct,
+            preset=args.preset, per_day_max_yen=args.per_day_max_yen,
+            login_timeout=args.login_timeout, verbose=not args.quiet)
+        return 3 if out.get("halted") else 0
     now = parse_now(args.now, date_str)
     out = run_pass(
         date_str, now=now, live=live,
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""同時 Kelly (joint outcome) ソルバー — 全券種の買い目を 1 レースの着順分布上で同時最適化
+
+bettype_sizing の既定サイザーは「アンカー = 単独 Kelly」+「複合 = 残予算を EV 比例 → plan 内
+逆オッズ」+「fit_legs_to_cap の貪欲 drop」という leg 単位のヒューリスティック。 券種間の相関
+(馬連◎-3 と ワイド◎-3 は同じ着順で同時に当たる/外れる) を無視している。
+
+本モジュールはハーヴィルの top-3 着順 (全 n·(n-1)·(n-2) 通り) を結果空間とし、
+    R[m, t] = 着順 m で買い目 t が当たれば払戻倍率 oₜ、 外れれば 0
+の払戻行列 (M × T) を numpy で一括構築、
+    max_f  Σ_m π_m · log(1 − Σ_t f_t + Σ_t R[m,t] f_t)
+    s.t.   0 ≤ f_t ≤ u,  Σ_t f_t ≤ s
+(同時 Kelly / 上限付き成長率最大化、 凹) を射影勾配法 (Armijo バックトラック) で解く。
+射影は box ∩ 半空間 {Σf ≤ s} への厳密射影 (τ の二分探索)。
+
+分数 Kelly は「g* = 上限 u/κ, s/κ で解いた成長最適解、 f = κ·g*」とする。 買い目 1 点
+(単勝のみ) なら f = min(κ·kelly_raw, u) となり kelly.kelly_amount と一致する。
+
+純関数のみ (DB/IO なし)。 1 レース (18頭 = 4,896 着順 × 20 点前後) で数 ms。
+
+提供:
+    Ticket                           — 買い目 (券種・馬番・オッズ)
+    harville_top3(win_probs)         — top-3 着順 (M,3) と確率 (M,)
+    payout_matrix(orders, tickets)   — 払戻倍率行列 R (M, T)
+    project_capped_simplex(v, u, s)  — {0≤f≤u, Σf≤s} への射影
+    solve_growth(R, pi, ...)         — 同時 Kelly 解 g (T,)
+    expected_log_growth(R, pi, f)    — 期待対数成長率
+    round_stakes(f, bankroll, ...)   — 100円単位へ丸め
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ml.strategies import harville as hv
+
+BET_TYPES = ("tansho", "fukusho", "umaren", "wide", "umatan", "sanrenpuku", "sanrentan")
+
+
+@dataclass(frozen=True)
+class Ticket:
+    bet_type: str
+    horses: Tuple[int, ...]     # 馬単/三連単は着順どおり
+    odds: float                 # 100円あたり払戻倍率 (複勝は最低値=保守)
+
+
+# ---------------------------------------------------------------------------
+# 結果空間 (ハーヴィル top-3)
+# ---------------------------------------------------------------------------
+
+def harville_top3(win_probs: Dict[int, float]) -> Tuple[np.ndarray, np.ndarray]:
+    """全 top-3 着順 (1着,2着,3着) とその確率。 3頭未満なら空配列。
+
+    probs は normalize 済みに揃える。 Σπ = 1 (ハーヴィルの周辺化)。
+    """
+    probs = hv.normalize(win_probs)
+    ids = np.array(sorted(probs), dtype=np.int64)
+    n = len(ids)
+    if n < 3:
+        return np.zeros((0, 3), dtype=np.int64), np.zeros(0)
+    p = np.array([probs[int(h)] for h in ids])
+    i, j, k = np.meshgrid(np.arange(n), np.arange(n), np.arange(n), indexing="ij")
+    mask = (i != j) & (j != k) & (i != k)
+    i, j, k = i[mask], j[mask], k[mask]
+    d1 = 1.0 - p[i]
+    d2 = d1 - p[j]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pi = p[i] * (p[j] / d1) * (p[k] / d2)
+    pi = np.where((d1 > 0) & (d2 > 0), pi, 0.0)
+    orders = np.stack([ids[i], ids[j], ids[k]], axis=1)
+    return orders, pi
+
+
+def payout_matrix(orders: np.ndarray, tickets: Sequence[Ticket], *,
+                  places_k: int = 3) -> np.ndarray:
+    """R[m, t] = 着順 m で ticket t が的中なら odds、 外れ 0。
+
+    places_k: 複勝/ワイドの着内数 (bettype_efficiency.build_plans と同じく 8頭以上 3、 未満 2)。
+    """
+    m = len(orders)
+    R = np.zeros((m, len(tickets)))
+    if m == 0:
+        return R
+    first, second, third = orders[:, 0], orders[:, 1], orders[:, 2]
+
+    def in_top(h, k):
+        hit = (first == h) | (second == h)
+        return hit | (third == h) if k >= 3 else hit
+
+    for t, tk in enumerate(tickets):
+        h = tk.horses
+        bt = tk.bet_type
+        if bt == "tansho":
+            hit = first == h[0]
+        elif bt == "fukusho":
+            hit = in_top(h[0], places_k)
+        elif bt == "umaren":
+            hit = ((first == h[0]) & (second == h[1])) | ((first == h[1]) & (second == h[0]))
+        elif bt == "wide":
+            hit = in_top(h[0], places_k) & in_top(h[1], places_k)
+        elif bt == "umatan":
+            hit = (first == h[0]) & (second == h[1])
+        elif bt == "sanrenpuku":
+            hit = in_top(h[0], 3) & in_top(h[1], 3) & in_top(h[2], 3)
+        elif bt == "sanrentan":
+            hit = (first == h[0]) & (second == h[1]) & (third == h[2])
+        else:
+            raise ValueError(f"unknown bet_type: {bt!r} (allowed: {BET_TYPES})")
+        R[:, t] = np.where(hit, tk.odds, 0.0)
+    return R
+
+
+# ---------------------------------------------------------------------------
+# ソルバー
+# ---------------------------------------------------------------------------
+
+def project_capped_simplex(v: np.ndarray, upper: np.ndarray, total: float,
+                           n_bisect: int = 60) -> np.ndarray:
+    """{0 ≤ f ≤ upper, Σf ≤ total} へのユークリッド射影。"""
+    f = np.clip(v, 0.0, upper)
+    if f.sum() <= total:
+        return f
+    lo, hi = 0.0, float(np.max(v))
+    for _ in range(n_bisect):
+        tau = 0.5 * (lo + hi)
+        if np.clip(v - tau, 0.0, upper).sum() > total:
+            lo = tau
+        else:
+            hi = tau
+    return np.clip(v - hi, 0.0, upper)
+
+
+def expected_log_growth(R: np.ndarray, pi: np.ndarray, f: np.ndarray) -> float:
+    """Σ π_m log(1 − Σf + R_m·f)。 破産 (wealth ≤ 0) の着順に正確率があれば -inf。"""
+    w = 1.0 - f.sum() + R @ f
+    live = pi > 0
+    if np.any(w[live] <= 0):
+        return -np.inf
+    return float(pi[live] @ np.log(w[live]))
+
+
+def solve_growth(R: np.ndarray, pi: np.ndarray, *, upper, total: float,
+                 max_iter: int = 500, tol: float = 1e-10) -> np.ndarray:
+    """上限付き同時 Kelly: max E[log wealth] s.t. 0≤g≤upper, Σg≤total。
+
+    射影勾配 + Armijo バックトラック (凹関数なので大域解に収束)。
+    的中確率 0 の買い目は最適解で必ず 0 なので事前に除外して次元を下げる
+    (負 EV でも他の買い目のヘッジになり得るため EV では除外しない)。
+    """
+    n_t = R.shape[1]
+    g = np.zeros(n_t)
+    if n_t == 0 or total <= 0:
+        return g
+    upper = np.broadcast_to(np.asarray(upper, dtype=float), (n_t,)).copy()
+    active = (pi @ (R > 0) > 0) & (upper > 0)
+    if not active.any():
+        return g
+    live = pi > 0
+    A = R[live][:, active] - 1.0     # 超過リターン (M', T')
+    w_pi = pi[live]
+    u = upper[active]
+
+    def objective(x):
+        w = 1.0 + A @ x
+        if np.any(w <= 0):
+            return -np.inf, w
+        return float(w_pi @ np.log(w)), w
+
+    x = np.zeros(A.shape[1])
+    fx, w = objective(x)
+    step = 1.0
+    for _ in range(max_iter):
+        grad = A.T @ (w_pi / w)
+        while True:
+            x_new = project_capped_simplex(x + step * grad, u, total)
+            f_new, w_new = objective(x_new)
+            if f_new >= fx + 1e-4 * float(grad @ (x_new - x)):
+                break
+            step *= 0.5
+            if step < 1e-12:
+                x_new, f_new, w_new = x, fx, w
+                break
+        moved = float(np.max(np.abs(x_new - x)))
+        x, fx, w = x_new, f_new, w_new
+        if moved < tol:
+            break
+        step = min(step * 2.0, 1e6)
+    g[active] = x
+    return g
+
+
+def round_stakes(f: np.ndarray, bankroll: int, *, unit: int = 100,
+                 min_bet: int = 100) -> List[int]:
+    """賭け率 → 100円単位 (切り捨て、 min 未満 0)。 切り捨てなので Σ は上限を超えない。"""
+    amounts = (np.floor(np.asarray(f) * bankroll / unit) * unit).astype(int)
+    return [int(a) if a >= min_bet else 0 for a in amounts]
+
+
+def solve_race(win_probs: Dict[int, float], tickets: Sequence[Ticket], *,
+               bankroll: int, race_cap_yen: int, kelly_fraction: float,
+               per_bet_cap_pct: float, places_k: int = 3,
+               ) -> Optional[Tuple[List[int], np.ndarray, np.ndarray, np.ndarray]]:
+    """1 レース分: 行列構築 → 分数同時 Kelly → 丸め。
+
+    Returns: (amounts, f, R, pi)。 3頭未満や bankroll 不正なら None。
+    """
+    if bankroll <= 0 or kelly_fraction <= 0:
+        return None
+    orders, pi = harville_top3(win_probs)
+    if len(orders) == 0:
+        return None
+    R = payout_matrix(orders, tickets, places_k=places_k)
+    # f = κ·g なので g 側の上限は κ で割る (Σf ≤ race_cap/bankroll, f ≤ per_bet_cap_pct)
+    total = min(1.0, race_cap_yen / bankroll / kelly_fraction)
+    upper = min(1.0, per_bet_cap_pct / kelly_fraction)
+    g = solve_growth(R, pi, upper=upper, total=total)
+    f = kelly_fraction * g
+    return round_stakes(f, bankroll), f, R, pi
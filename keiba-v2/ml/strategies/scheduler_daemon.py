@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""当日スケジューラの常駐 (asyncio daemon) モード — freebudget / bettype 共通
+
+単発パス方式 (Task Scheduler が 1-2 分ごとに起動) は、 毎パス Python 起動・全 import・
+predictions/state 再読込・全レースの窓判定をやり直すため、 投票が窓オープンから最大 2 分遅れ、
+CPU も無駄に回る。 本モジュールは 1 プロセスを当日常駐させ:
+
+  - 発走時刻を 1 回ロード (DB 正本は当日変更に追従するため POST_TIME_REFRESH_SEC ごとに再取得)
+  - 各レースの投票時刻 (発走−6分) にタイマーを張り、 その時刻に ★そのレースだけ★ パスを実行
+  - 窓内で未投票のレースは predictions.json が更新された (vb_refresh のオッズ更新) 時だけ再評価、
+    締切直後にもう 1 回だけパスを通して単発パスと同じ missed 記録を残す
+  - 投票 (runner) が非0終了したレースは plan 更新を待たず、 指数バックオフ
+    (RETRY_BASE_SEC, 2倍ずつ, 上限 RETRY_MAX_SEC) で締切まで最大 RETRY_LIMIT 回再試行する
+  - predictions の読込・派生計算 (候補生成) は mtime が変わった時だけ (PlanCache)
+  - 投票判定・安全機構は各 scheduler の _run_pass_inner をそのまま呼ぶ (state ファイル・冪等性・
+    halt・鮮度・cap・連続失敗は単発パスと完全に同一)
+  - 多重起動ロックは常駐中ずっと保持し heartbeat で mtime を更新 (単発パスと併用しても
+    二重投票しない。 daemon がクラッシュすればロックは LOCK_STALE_SEC 後に stale 扱い)
+
+投票 (runner サブプロセス, 最大 180 秒) は asyncio.to_thread で実行し、 その間も heartbeat は動く。
+全レースの締切を過ぎるか halted になったら終了する。
+
+提供:
+    PlanCache                   — predictions.json の mtime 監視キャッシュ (+ 派生計算)
+    race_windows(date, times)   — race_id → (vote_at, deadline)
+    RaceDayDaemon               — タイマー駆動の当日ループ (fire コールバックに 1 パスを委譲)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from ml.strategies.freebudget_race import race_timing
+from ml.strategies.freebudget_scheduler import acquire_lock, release_lock
+
+POST_TIME_REFRESH_SEC = 600      # 発走時刻 (DB 正本) の再取得間隔
+PLAN_POLL_SEC = 20               # 窓内レースがある間の predictions.json mtime 監視間隔
+HEARTBEAT_SEC = 60               # ロック mtime 更新間隔 (< LOCK_STALE_SEC)
+RETRY_BASE_SEC = 15              # 投票失敗 (exit_code != 0) 後の初回再試行までの待ち
+RETRY_MAX_SEC = 120              # 再試行間隔の上限
+RETRY_LIMIT = 4                  # 1 レースあたりの再試行回数上限 (締切前のみ)
+
+FireFn = Callable[[datetime, Set[str], Dict[str, str]], dict]
+
+
+# ---------------------------------------------------------------------------
+# predictions キャッシュ
+# ---------------------------------------------------------------------------
+
+class PlanCache:
+    """predictions.json を mtime_ns で監視し、 変わった時だけ再読込 + derive を再計算する。"""
+
+    def __init__(self, path: Path, load: Callable[[], Optional[dict]],
+                 derive: Optional[Callable[[dict], Any]] = None):
+        self.path = Path(path)
+        self._load = load
+        self._derive = derive
+        self._version: Optional[int] = None
+        self._loaded = False
+        self._predictions: Optional[dict] = None
+        self._derived: Any = None
+        self.n_loads = 0
+
+    def version(self) -> Optional[int]:
+        try:
+            return self.path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def get(self) -> Tuple[Optional[dict], Any]:
+        v = self.version()
+        if not self._loaded or v != self._version:
+            self._predictions = self._load()
+            self._derived = (self._derive(self._predictions)
+                             if self._derive and self._predictions is not None else None)
+            self._version = v
+            self._loaded = True
+            self.n_loads += 1
+        return self._predictions, self._derived
+
+
+# ---------------------------------------------------------------------------
+# タイマー
+# ---------------------------------------------------------------------------
+
+def race_windows(date_str: str, post_times: Dict[str, str],
+                 now: Optional[datetime] = None) -> Dict[str, Tuple[datetime, datetime]]:
+    """race_id → (vote_at, deadline)。 発走時刻不明のレースは含めない。"""
+    now = now or datetime.now()
+    out = {}
+    for rid, st in post_times.items():
+        t = race_timing(date_str, st, now)
+        if t["deadline"] is not None:
+            out[str(rid)] = (t["vote_at"], t["deadline"])
+    return out
+
+
+class RaceDayDaemon:
+    """投票時刻タイマーで fire(now, {race_id}, post_times) を呼ぶ当日常駐ループ。
+
+    fire は各 scheduler の _run_pass_inner を only_races 付きで呼ぶ同期関数
+    (戻り値は run_pass と同じ {"voted", "skipped", "halted"})。
+    now_fn / sleep は擬似時計でのテスト用に差し替え可能。
+    """
+
+    def __init__(self, date_str: str, *, lock_path: Path,
+                 load_post_times: Callable[[], Dict[str, str]],
+                 fire: FireFn,
+                 plan_version: Callable[[], Any] = lambda: None,
+                 now_fn: Callable[[], datetime] = datetime.now,
+                 sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+                 post_time_refresh_sec: int = POST_TIME_REFRESH_SEC,
+                 plan_poll_sec: int = PLAN_POLL_SEC,
+                 heartbeat_sec: int = HEARTBEAT_SEC,
+                 retry_base_sec: float = RETRY_BASE_SEC,
+                 retry_max_sec: float = RETRY_MAX_SEC,
+                 retry_limit: int = RETRY_LIMIT,
+                 tag: str = "daemon", verbose: bool = True):
+        self.date_str = date_str
+        self.lock_path = Path(lock_path)
+        self._load_post_times = load_post_times
+        self._fire = fire
+        self._plan_version = plan_version
+        self._now = now_fn
+        self._sleep = sleep
+        self.post_time_refresh_sec = post_time_refresh_sec
+        self.plan_poll_sec = plan_poll_sec
+        self.heartbeat_sec = heartbeat_sec
+        self.retry_base_sec = retry_base_sec
+        self.retry_max_sec = retry_max_sec
+        self.retry_limit = retry_limit
+        self.tag = tag
+        self.verbose = verbose
+        self.post_times: Dict[str, str] = {}
+        self.windows: Dict[str, Tuple[datetime, datetime]] = {}
+
+    def _log(self, msg: str) -> None:
+        if self.verbose:
+            print(f"[{self.tag}] {msg}", file=sys.stderr)
+
+    def _arm(self, now: datetime) -> None:
+        self.post_times = dict(self._load_post_times() or {})
+        self.windows = race_windows(self.date_str, self.post_times, now)
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_sec)
+            try:
+                os.utime(self.lock_path, None)
+            except OSError:
+                pass
+
+    def _schedule_retry(self, rid: str, res: dict, now: datetime,
+                        failures: Dict[str, int], retry_at: Dict[str, datetime]) -> None:
+        """投票失敗したレースの再試行時刻を決める (締切を過ぎる / 上限回数なら張らない)"""
+        failures[rid] = failures.get(rid, 0) + 1
+        n = failures[rid]
+        if n > self.retry_limit:
+            self._log(f"{rid} 投票失敗 {n}回 (exit={res.get('exit_code')}) → 再試行打ち切り")
+            return
+        delay = min(self.retry_base_sec * 2 ** (n - 1), self.retry_max_sec)
+        at = now + timedelta(seconds=delay)
+        if at > self.windows[rid][1]:
+            return                             # 締切後のパスで missed を記録する
+        retry_at[rid] = at
+        self._log(f"{rid} 投票失敗 (exit={res.get('exit_code')}) → {delay:.0f}秒後に再試行 ({n}/{self.retry_limit})")
+
+    async def run(self) -> dict:
+        if not acquire_lock(self.lock_path):
+            self._log(f"別プロセスが実行中 (lock={self.lock_path.name}) → 常駐しない")
+            return {"voted": [], "skipped": [], "halted": False, "locked_out": True,
+                    "passes": 0}
+        hb = asyncio.create_task(self._heartbeat())
+        try:
+            return await self._loop()
+        finally:
+            hb.cancel()
+            release_lock(self.lock_path)
+
+    async def _loop(self) -> dict:
+        now = self._now()
+        self._arm(now)
+        next_refresh = now + timedelta(seconds=self.post_time_refresh_sec)
+        self._log(f"{self.date_str} タイマー {len(self.windows)} レース")
+        attempted: Dict[str, Any] = {}     # race_id → 最終評価時の plan version
+        failures: Dict[str, int] = {}      # race_id → 投票失敗回数
+        retry_at: Dict[str, datetime] = {}  # race_id → 次の再試行時刻 (投票失敗時のみ)
+        done: Set[str] = set()
+        summary = {"voted": [], "skipped": [], "halted": False, "passes": 0}
+
+        while True:
+            now = self._now()
+            if now >= next_refresh:
+                self._arm(now)
+                next_refresh = now + timedelta(seconds=self.post_time_refresh_sec)
+            version = self._plan_version()
+            due = sorted(rid for rid, (va, dl) in self.windows.items()
+                         if rid not in done and va <= now
+                         and (rid not in attempted or attempted[rid] != version
+                              or dl < now
+                              or (rid in retry_at and retry_at[rid] <= now)))
+            if due:
+                out = await asyncio.to_thread(self._fire, now, set(due), self.post_times)
+                summary["passes"] += 1
+                for rid in due:
+                    attempted[rid] = version
+                    retry_at.pop(rid, None)
+                    if self.windows[rid][1] < now:
+                        done.add(rid)          # 締切後のパス (missed 記録) で打ち止め
+                for rid, res in out.get("voted", []):
+                    if res.get("exit_code") == 0:
+                        done.add(rid)
+                    elif rid not in done:
+                        self._schedule_retry(rid, res, now, failures, retry_at)
+                summary["voted"].extend(out.get("voted", []))
+                summary["skipped"].extend(out.get("skipped", []))
+                if out.get("halted"):
+                    summary["halted"] = True
+                    self._log("HALTED → 常駐終了")
+                    break
+                continue                       # 投票中に時間が進んでいるので再判定
+
+            pending = [w for rid, w in self.windows.items() if rid not in done]
+            if not pending:
+                self._log(f"全レース締切 → 常駐終了 (パス{summary['passes']}回)")
+                break
+            # 窓前 = 投票時刻に、 窓内 = 締切直後に 1 回 (単発パスと同じく missed を記録)
+            wake = min([va if va > now else dl + timedelta(seconds=1) for va, dl in pending]
+                       + [t for rid, t in retry_at.items() if rid not in done]
+                       + [next_refresh])
+            if any(va <= now <= dl for va, dl in pending):   # 窓内の未投票 → オッズ更新を監視
+                wake = min(wake, now + timedelta(seconds=self.plan_poll_sec))
+            await self._sleep(max(0.0, (wake - now).total_seconds()))
+        return summary
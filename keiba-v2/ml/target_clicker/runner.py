@@ -772,7 +772,10 @@ def main() -> int:
     #   - clicked 成功なら 各 ticket を record_tansho_vote
     #   - 失敗 (timeout/rejected/error) は record_vote_failure (race_id 単位で集約は難しいので 1 回)
     try:
-        from ml.purchase_ledger.writer import record_portfolio_votes, record_vote_failure
+        from ml.purchase_ledger.idempotency import date_from_race_id
+        from ml.purchase_ledger.writer import (
+            ensure_view, record_portfolio_votes, record_vote_failure,
+        )
         from collections import defaultdict
         _code2name = {v: k for k, v in BET_TYPE_CODE.items()}
         if result.success and result.action == "clicked":
@@ -840,6 +843,9 @@ def main() -> int:
                     strategy_name=strategy,
                 )
             vprint(f"[ledger] VOTE_FAILED 記録: {len(seen_races)} レース")
+        # view ({date}.json) は票ごとには書かない — web 表示用にバッチ末尾で 1 回だけ追従させる
+        for d in sorted({date_from_race_id(b.race_id) for b in bets} - {""}):
+            ensure_view(d)
     except Exception as e:
         # ledger 書込み失敗は本体 (audit JSONL) と独立 — 投票自体は成功してるので止めない
         print(f"[ledger] 書込み例外 (audit JSONL は正常): {type(e).__name__}: {e}",
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""ml/bench (合成コーパス + 性能回帰ベンチ) のテスト
+
+検証:
+  - 同じ spec なら同じバイト列 (SU*.DAT / race JSON / SED)
+  - SU*.DAT / SED を実パーサで読むと race JSON の出走馬と一致 (フォーマットの逆変換が正しい)
+  - run_suite が指定ベンチだけ計測して JSON 形式の結果を返す
+  - compare_results が閾値超えの悪化だけを回帰として報告
+"""
+
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from ml.bench import suite
+from ml.bench.corpus import CorpusSpec, generate_corpus
+
+SPEC = CorpusSpec(n_days=2, venues_per_day=1, races_per_venue=3, n_horses=60)
+
+
+def _race_json(corpus, rid):
+    d = next(d for d, r in corpus.races if r == rid)
+    y, m, dd = d.split("-")
+    path = corpus.data_root / "races" / y / m / dd / f"race_{rid}.json"
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def test_generation_is_deterministic(tmp_path):
+    a = generate_corpus(tmp_path / "a", SPEC)
+    b = generate_corpus(tmp_path / "b", SPEC)
+    assert a.races == b.races and len(a.races) == 6
+    files = sorted(p.relative_to(a.root) for p in a.root.rglob("*") if p.is_file())
+    assert files == sorted(p.relative_to(b.root) for p in b.root.rglob("*") if p.is_file())
+    for rel in files:
+        assert (a.root / rel).read_bytes() == (b.root / rel).read_bytes(), rel
+
+
+def test_fixed_width_files_roundtrip_through_parsers(tmp_path, monkeypatch):
+    import jrdb.parser as jp
+    from core.jravan import se_parser
+
+    corpus = generate_corpus(tmp_path, SPEC)
+    with corpus.env():
+        se = list(se_parser.scan(corpus.years))
+    rid = corpus.races[0][1]
+    race = _race_json(corpus, rid)
+    got = {r["umaban"]: r for r in se if r["race_id"] == rid}
+    assert len(got) == race["num_runners"] == len(race["entries"])
+    for e in race["entries"]:
+        r = got[e["umaban"]]
+        assert (r["ketto_num"], r["finish_position"], r["odds"], r["last_3f"]) == \
+            (e["ketto_num"], e["finish_position"], e["odds"], e["last_3f"])
+        assert r["horse_name"] == e["horse_name"] and r["jockey_code"] == e["jockey_code"]
+
+    monkeypatch.setattr(jp, "RAW_DIR", corpus.jrdb_raw_dir)
+    sed = jp.load_sed_files()
+    assert len(sed) == len(se)
+    first = [s for s in sed if s["race_date"] == race["date"]
+             and jp.parse_jrdb_race_key(s["jrdb_race_key"])["race_num"] == 1]
+    assert {s["umaban"] for s in first} == set(got)
+
+
+def test_run_suite_measures_selected_benchmarks(tmp_path):
+    corpus = generate_corpus(tmp_path, SPEC)
+    res = suite.run_suite(corpus, ["harville_place", "se_scan", "ledger_votes"],
+                          repeat=1, verbose=False)
+    assert set(res["results"]) == {"harville_place", "se_scan", "ledger_votes"}
+    r = res["results"]["ledger_votes"]
+    assert r["n_items"] == 3 and r["median_s"] > 0 and r["repeat"] == 1
+    assert res["results"]["se_scan"]["n_items"] == sum(len(_race_json(corpus, rid)["entries"])
+                                                       for _, rid in corpus.races)
+    assert res["meta"]["spec"]["seed"] == SPEC.seed
+    json.dumps(res)
+
+
+def test_compare_flags_only_regressions():
+    base = {"meta": {}, "results": {"a": {"median_s": 1.0}, "b": {"median_s": 2.0},
+                                    "gone": {"median_s": 1.0}}}
+    new = {"meta": {}, "results": {"a": {"median_s": 1.2}, "b": {"median_s": 3.0},
+                                   "added": {"median_s": 1.0}}}
+    rows = {r["name"]: r for r in suite.compare_results(base, new, threshold=1.25)}
+    assert set(rows) == {"a", "b"}
+    assert not rows["a"]["regression"] and rows["b"]["regression"]
+    assert rows["b"]["ratio"] == 1.5
+
+
+def test_compare_normalizes_by_machine_speed():
+    base = {"meta": {}, "results": {"a": {"median_s": 1.0, "calibration_s": 0.02}}}
+    new = {"meta": {}, "results": {"a": {"median_s": 2.0, "calibration_s": 0.04}}}
+    assert not suite.compare_results(base, new)[0]["regression"]       # 機械が半速なだけ
+    assert suite.compare_results(base, new, normalize=False)[0]["regression"]
@@ -253,3 +253,59 @@ def test_adaptive_sizer_boost_increases_anchor():
 def test_get_sizer_unknown_raises():
     with pytest.raises(ValueError):
         sz.get_sizer("nonexistent")
+
+
+# --- joint_kelly サイザー ---
+
+def _joint_race():
+    """8頭 (places_k=3)、 ◎3 軸の単勝 + 馬連2点 + 三連単1点。"""
+    probs = {3: 0.30, 7: 0.20, 11: 0.15, 1: 0.10, 2: 0.08, 4: 0.07, 5: 0.06, 6: 0.04}
+    strengths = [_strength(u, p, round(0.8 / p, 1)) for u, p in probs.items()]
+    plans = [
+        _plan("tansho", [[3]], hit_prob=0.3, ev=None, g=None, odds_legs=[5.0]),
+        _plan("umaren", [[3, 7], [3, 11]], hit_prob=0.2, ev=1.3, g=7.0, odds_legs=[9.0, 14.0]),
+        _plan("sanrentan", [[3, 7, 11]], hit_prob=0.02, ev=1.5, g=80.0, odds_legs=[80.0]),
+    ]
+    eff = _race_eff(3, 5.0, strengths, plans)
+    eff.num_runners = 8
+    sel = _selection(3, 5.0, [
+        _sel_plan("tansho", [[3]]),
+        _sel_plan("umaren", [[3, 7], [3, 11]], ev=1.3, g=7.0),
+        _sel_plan("sanrentan", [[3, 7, 11]], ev=1.5, g=80.0),
+    ])
+    return eff, sel
+
+
+def test_get_sizer_joint_registered():
+    assert sz.get_sizer(sz.JOINT_SIZER) is sz.size_race_joint
+
+
+def test_joint_single_tansho_matches_anchor_kelly():
+    eff, _ = _joint_race()
+    sel = _selection(3, 5.0, [_sel_plan("tansho", [[3]])])
+    rs = sz.size_race_joint(eff, sel, bankroll=10000, per_race_cap=3000)
+    assert [(l.bet_type, l.amount) for l in rs.legs] == [
+        ("tansho", sz.kelly_amount(0.3, 5.0, bankroll=10000,
+                                   kelly_fraction=0.25, per_bet_cap_pct=0.10))]
+
+
+def test_joint_respects_caps_and_units():
+    eff, sel = _joint_race()
+    rs = sz.size_race_joint(eff, sel, bankroll=100000, per_race_cap=2000)
+    assert rs.legs
+    assert rs.total_yen <= 2000
+    assert all(l.amount % 100 == 0 and 100 <= l.amount <= 10000 for l in rs.legs)
+    assert rs.total_yen == rs.anchor_yen + rs.combo_yen
+    assert rs.warnings == [] and rs.diagnostics['joint_log_growth'] > 0
+
+
+def test_joint_falls_back_without_outcome_space():
+    axis = 3
+    eff = _race_eff(axis, 5.0, [_strength(3, 0.3, 5.0), _strength(7, 0.2, 4.0)],
+                    [_plan("tansho", [[3]], hit_prob=0.3, ev=None, g=None, odds_legs=[5.0])])
+    sel = _selection(axis, 5.0, [_sel_plan("tansho", [[3]])])
+    rs = sz.size_race_joint(eff, sel, bankroll=10000, per_race_cap=3000)
+    base = sz.size_race(eff, sel, bankroll=10000, per_race_cap=3000)
+    assert [(l.bet_type, l.amount) for l in rs.legs] == \
+        [(l.bet_type, l.amount) for l in base.legs]
+    assert any("既定サイザー" in w for w in rs.warnings)
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""core/jravan/ck_parser と core/store/training_store (CK_DATA 調教ストア) のテスト
+
+検証:
+  - HC/WC 固定長レコードの列パースが 1 レコードずつの文字列スライスと一致
+    (不正な場所コード・空欄タイム・CRLF 欠けの行を含む)
+  - lap_ranks / time_levels が web calculateLapRank / calculateTimeLevel の規則どおり
+  - workouts(ketto, race_date, 30) が「前日までの 30 日」を線形走査と同じ範囲で返す
+  - 再構築は変更ファイルを含む月だけをパースし直す
+  - 実在しない日付 (20240230) のレコードは構築を止めず、 落として meta['bad_dates'] に数える
+"""
+
+import os
+import random
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core.jravan import ck_parser
+from core.store import training_store as ts
+
+
+def _hc(loc, ymd, hhmm, ketto, t4, t3, t2, l2, l1):
+    rec = f"{loc}{ymd}{hhmm}{ketto}{t4:04d}   {t3:04d}   {t2:04d}{l2:03d}{l1:03d}"
+    assert len(rec) == 47
+    return rec
+
+
+def _wc(loc, ymd, hhmm, ketto, t4, l4, t3, l3, t2, l2, l1):
+    rec = (f"{loc}{ymd}{hhmm}{ketto}" + " " * 45
+           + f"{t4:04d}{l4:03d}{t3:04d}{l3:03d}{t2:04d}{l2:03d}{l1:03d}")
+    assert len(rec) == 92
+    return rec
+
+
+def _write(path: Path, lines):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(("\r\n".join(lines) + "\r\n").encode('ascii'))
+
+
+@pytest.fixture()
+def jv_root(tmp_path, monkeypatch):
+    monkeypatch.setenv('JV_DATA_ROOT', str(tmp_path / 'jv'))
+    monkeypatch.setenv('KEIBA_DATA_ROOT', str(tmp_path / 'data3'))
+    return tmp_path / 'jv' / 'CK_DATA'
+
+
+def test_parse_matches_slicing():
+    hc = [_hc('0', '20250102', '0715', '2019105283', 528, 388, 251, 124, 127),
+          _hc('1', '20250102', '0730', '2020100001', 0, 0, 0, 0, 0),
+          _hc('9', '20250102', '0731', '2020100002', 540, 400, 260, 125, 125),   # 不正場所
+          _hc('1', '20250102', '0745', '2020100003', 510, 377, 245, 119, 118)]
+    hc[1] = hc[1][:23] + "    " + hc[1][27:]                                  # 4F 空欄
+    cols = ck_parser.parse_ck_bytes(("\r\n".join(hc) + "\r\n").encode(), ck_parser.KIND_HILL)
+    assert cols['ketto'].tolist() == [2019105283, 2020100001, 2020100003]
+    assert cols['loc'].tolist() == [0, 1, 1] and set(cols['date'].tolist()) == {20250102}
+    assert cols['time4f'].tolist() == [528, 0, 510] and cols['lap1'].tolist() == [127, 0, 118]
+    assert cols['lap4'].tolist() == [0, 0, 0] and cols['hhmm'].tolist() == [715, 730, 745]
+
+    wc = [_wc('0', '20250103', '0800', '2018100123', 530, 135, 395, 130, 265, 128, 137)]
+    for data in (("\r\n".join(wc)).encode(), ("\r\n".join(wc) + "\r\n").encode()):
+        c = ck_parser.parse_ck_bytes(data, ck_parser.KIND_WOOD)
+        assert [int(c[k][0]) for k in ck_parser.TIME_COLUMNS] == [530, 395, 265, 135, 130, 128, 137]
+
+
+def test_lap_rank_and_time_level_rules():
+    H, W = ck_parser.KIND_HILL, ck_parser.KIND_WOOD
+    cases = [  # lap2, lap1, time4f, loc, kind, rank, level
+        (118, 117, 515, 1, H, 'SS', 5), (118, 117, 560, 1, H, 'S+', 2),
+        (117, 119, 515, 1, H, 'S-', 5), (123, 119, 530, 0, H, 'A+', 5),
+        (125, 125, 546, 0, H, 'B=', 3), (131, 128, 581, 0, H, 'C+', 1),
+        (130, 133, 522, 0, W, 'D-', 4), (0, 120, 600, 1, W, '', 1), (119, 119, 0, 1, W, 'S=', 0),
+    ]
+    a = [np.array(x) for x in zip(*cases)]
+    assert ck_parser.lap_ranks(*a[:5]).tolist() == list(a[5])
+    assert ck_parser.time_levels(a[2], a[3], a[4]).tolist() == list(a[6])
+
+
+def _corpus(root: Path, seed=0):
+    """3 か月分・8 頭のランダムな調教 → {ketto: [(ymd, hhmm, t4), ...]}"""
+    rnd = random.Random(seed)
+    horses = [f"20201{i:05d}" for i in range(8)]
+    truth = {h: [] for h in horses}
+    for m in (1, 2, 3):
+        for d in range(1, 29, 3):
+            ymd = f"2025{m:02d}{d:02d}"
+            for prefix in ('HC', 'WC'):
+                for loc in '01':
+                    lines = []
+                    for h in rnd.sample(horses, 3):
+                        hhmm = f"{rnd.randint(6, 10):02d}{rnd.randint(0, 59):02d}"
+                        t4 = rnd.randint(500, 600)
+                        if prefix == 'HC':
+                            lines.append(_hc(loc, ymd, hhmm, h, t4, 390, 255, 125, 122))
+                        else:
+                            lines.append(_wc(loc, ymd, hhmm, h, t4, 130, 390, 128, 255, 125, 122))
+                        truth[h].append((ymd, hhmm, t4))
+                    _write(root / '2025' / f"2025{m:02d}" / f"{prefix}{loc}{ymd}.DAT", lines)
+    return truth
+
+
+def test_window_query_matches_linear_scan(jv_root):
+    truth = _corpus(jv_root)
+    stats = ts.build_training_store()
+    assert stats['parsed_months'] == 3 and stats['written']
+    store = ts.load_training_store()
+    assert len(store) == sum(len(v) for v in truth.values())
+
+    for h, rows in truth.items():
+        for race in ('2025-02-01', '2025-03-10', '2025-01-04', '2024-12-31'):
+            end = ts._date_to_day(race)
+            expect = sorted((ymd, hhmm, t4) for ymd, hhmm, t4 in rows
+                            if end - 30 <= ts._date_to_day(ymd) < end)
+            got = [(w['date'].replace('-', ''), w['hhmm'], round(w['time4f'] * 10))
+                   for w in store.workouts(h, race)]
+            assert got == expect, (h, race)
+            f = store.window_features(h, race)
+            assert f['n_workouts'] == len(expect) == f['n_hill'] + f['n_wood']
+            if expect:
+                assert f['days_since_last'] == end - ts._date_to_day(expect[-1][0])
+    assert store.workouts('2099100000', '2025-02-01') == []
+    assert store.window_features('bad', '2025-02-01')['n_workouts'] == 0
+
+
+def test_incremental_rebuild_only_touches_changed_month(jv_root):
+    _corpus(jv_root)
+    ts.build_training_store()
+    parts = ts.parts_dir()
+    before = {p.name: p.stat().st_mtime_ns for p in parts.glob('*.npz')}
+
+    again = ts.build_training_store()
+    assert again['parsed_months'] == 0 and not again['written']
+
+    target = sorted((jv_root / '2025' / '202502').glob('HC0*.DAT'))[0]
+    _write(target, [_hc('0', target.stem[3:], '0600', '2020199999', 520, 380, 250, 121, 119)])
+    st = target.stat()
+    os.utime(target, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    stats = ts.build_training_store()
+    assert stats['parsed_months'] == 1 and stats['written']
+    after = {p.name: p.stat().st_mtime_ns for p in parts.glob('*.npz')}
+    assert [n for n in after if after[n] != before[n]] == ['202502.npz']
+    assert len(ts.load_training_store().workouts('2020199999', '2025-03-01')) == 1
+
+    target.unlink()
+    assert ts.build_training_store(years=[2025])['parsed_months'] == 1
+    assert ts.load_training_store().workouts('2020199999', '2025-03-01') == []
+
+
+def test_invalid_date_rows_dropped(jv_root, capsys):
+    _write(jv_root / '2024' / '202402' / 'HC020240228.DAT', [
+        _hc('0', '20240228', '0700', '2020100001', 520, 380, 250, 121, 119),
+        _hc('0', '20240230', '0710', '2020100002', 530, 390, 255, 125, 122),   # 壊れた日付
+        _hc('1', '20240228', '0720', '2020100002', 540, 395, 258, 126, 124),
+    ])
+    stats = ts.build_training_store()
+    assert stats['written'] and stats['records'] == 2
+    assert "1 training records with invalid date dropped (e.g. 20240230)" in capsys.readouterr().out
+    store = ts.load_training_store()
+    assert store.meta['bad_dates'] == 1
+    assert [w['hhmm'] for w in store.workouts('2020100002', '2024-03-05')] == ['0720']
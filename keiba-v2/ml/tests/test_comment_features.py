@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""ml/features/comment_features の Aho–Corasick マッチャーとメモ化のテスト
+
+旧実装 (キーワードごとの str.find) と結果が完全一致することを確認する。
+"""
+
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from ml.features import comment_features as cf
+
+
+ALL_KEYWORDS = list(dict.fromkeys([
+    *cf.CONDITION_POSITIVE, *cf.CONDITION_NEGATIVE,
+    *cf.CONFIDENCE_POSITIVE, *cf.CONFIDENCE_NEGATIVE,
+    *cf.EXCUSE_KEYWORDS, *cf.INTERVIEW_EXCUSE, *cf.MEMO_TROUBLE, *cf.MEMO_POSITIVE,
+]))
+
+
+def _brute_found(text):
+    return {kw: text.find(kw) for kw in ALL_KEYWORDS if text.find(kw) >= 0}
+
+
+def _legacy_features(umaban, kb_ext):
+    """旧実装相当: 全スコアを str.find ベースの found で計算"""
+    entry = kb_ext['entries'][umaban]
+    out = {}
+    _, body = cf._parse_stable_comment(entry['stable_comment']['comment'])
+    f = _brute_found(body)
+    out['comment_stable_condition'] = cf._score_text(
+        body, cf.CONDITION_POSITIVE, cf.CONDITION_NEGATIVE, f)[0]
+    out['comment_stable_confidence'] = cf._score_text(
+        body, cf.CONFIDENCE_POSITIVE, cf.CONFIDENCE_NEGATIVE, f)[0]
+    out['comment_stable_excuse_flag'] = cf._score_excuse_keywords(body, cf.EXCUSE_KEYWORDS, f)
+    body = cf._parse_interview(entry['previous_race_interview']['interview'])
+    f = _brute_found(body)
+    out['comment_interview_condition'] = cf._score_text(
+        body, cf.CONDITION_POSITIVE, cf.CONDITION_NEGATIVE, f)[0]
+    out['comment_interview_excuse_score'] = cf._score_interview_excuse(body, f)
+    body = cf._parse_memo(entry['previous_race_interview']['next_race_memo'])
+    f = _brute_found(body)
+    out['comment_memo_condition'] = cf._score_text(
+        body, cf.CONDITION_POSITIVE, cf.CONDITION_NEGATIVE, f)[0]
+    out['comment_memo_trouble_score'] = cf._score_memo_trouble(body, f)
+    return out
+
+
+def _random_text(rng, n=12):
+    pieces = ALL_KEYWORDS + cf.NEGATION_WORDS + ['。', 'で', 'は', 'が', '馬', '状態', '、']
+    return ''.join(rng.choice(pieces) for _ in range(rng.randint(0, n)))
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    cf.clear_comment_cache()
+    yield
+    cf.clear_comment_cache()
+
+
+def test_automaton_matches_str_find():
+    rng = random.Random(7)
+    ac = cf._automaton()
+    for _ in range(2000):
+        text = _random_text(rng)
+        assert ac.first_positions(text) == _brute_found(text), text
+
+
+def test_overlapping_keywords():
+    ac = cf.KeywordAutomaton(['好調', '絶好調', '久々', '久々なので', 'なので'])
+    assert ac.first_positions('絶好調で久々なので好調') == {
+        '絶好調': 0, '好調': 1, '久々': 4, '久々なので': 4, 'なので': 6}
+    assert ac.first_positions('') == {}
+
+
+def test_features_match_legacy_exactly():
+    rng = random.Random(11)
+    for _ in range(300):
+        kb_ext = {'entries': {'1': {
+            'stable_comment': {'comment': '◎テスト【矢嶋師】' + _random_text(rng)},
+            'previous_race_interview': {
+                'interview': 'テスト（４着）Ｒ．キング騎手　' + _random_text(rng),
+                'next_race_memo': 'テスト……' + _random_text(rng),
+            },
+        }}}
+        got = cf.compute_comment_features('1', kb_ext)
+        for k, v in _legacy_features('1', kb_ext).items():
+            assert got[k] == v and type(got[k]) is type(v), (k, got[k], v)
+        assert got['comment_stable_mark'] == 4
+
+
+def test_memo_keyed_by_text_and_invalidation(monkeypatch):
+    kb_ext = {'entries': {'3': {
+        'stable_comment': {'comment': '○テスト【師】絶好調で楽しみ'},
+        'previous_race_interview': {'interview': '', 'next_race_memo': ''},
+    }}}
+    first = cf.compute_comment_features(3, kb_ext)
+    assert first['comment_stable_condition'] == 3.0
+
+    calls = []
+    real = cf._compute_entry_features
+    monkeypatch.setattr(cf, '_compute_entry_features',
+                        lambda *a: calls.append(a) or real(*a))
+    again = cf.compute_comment_features('3', kb_ext)
+    assert again == first and calls == []
+    again['comment_stable_condition'] = 99  # 呼び出し側の変更はメモに波及しない
+    assert cf.compute_comment_features('3', kb_ext)['comment_stable_condition'] == 3.0
+
+    # kb_ext をその場で書き換えたら再計算
+    kb_ext['entries']['3']['stable_comment']['comment'] = '○テスト【師】調子落ち'
+    assert cf.compute_comment_features('3', kb_ext)['comment_stable_condition'] == -3
+    assert len(calls) == 1
+
+
+def test_memo_shared_across_dicts_and_bounded(monkeypatch):
+    def kb(comment):
+        return {'entries': {'1': {'stable_comment': {'comment': comment}}}}
+
+    cf.clear_comment_cache()
+    calls = []
+    real = cf._compute_entry_features
+    monkeypatch.setattr(cf, '_compute_entry_features',
+                        lambda *a: calls.append(a) or real(*a))
+    a = cf.compute_comment_features('1', kb('○テスト【師】絶好調'))
+    assert cf.compute_comment_features('1', kb('○テスト【師】絶好調')) == a   # 読み直した別 dict
+    assert len(calls) == 1
+    assert cf.compute_comment_features('2', kb('○テスト【師】絶好調'))['comment_has_stable'] is None
+
+    monkeypatch.setattr(cf, '_TEXT_MEMO_MAX', 3)
+    for i in range(5):
+        cf.compute_comment_features('1', kb(f'○テスト{i}'))
+    assert len(cf._text_memo) == 3
+    assert all(type(t) is str for k in cf._text_memo for t in k)      # kb_ext 本体は保持しない
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""ml/feature_snapshot (日別・追記専用の列指向スナップショット) のテスト"""
+
+import json
+import math
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from ml import feature_snapshot as fs
+
+
+@pytest.fixture(autouse=True)
+def data_root(tmp_path, monkeypatch):
+    monkeypatch.setenv("KEIBA_DATA_ROOT", str(tmp_path))
+    return tmp_path
+
+
+def _rows(race_id, date, n=3, base=0.0):
+    return [{
+        'race_id': race_id, 'date': date, 'umaban': i, 'ketto_num': f"20201000{i:02d}",
+        'horse_name': f"テスト{i}", 'finish_position': i if i < 3 else None,
+        'odds': 2.5 * i + base, 'speed_idx_avg3': None if i == 2 else 50.0 + i,
+        'is_new_jockey': i == 1, 'style_label': 'nige' if i == 1 else None,
+    } for i in range(1, n + 1)]
+
+
+RACE = {'venue_name': '東京', 'race_name': 'テストS', 'grade': 'G3'}
+R1, R2, R3 = "2026020805010101", "2026020805010102", "2026021505010101"
+
+
+def test_append_and_query(data_root):
+    fs.save_feature_snapshot(_rows(R1, '2026-02-08'), RACE, source="predict", model_version="9.1")
+    fs.save_feature_snapshot(_rows(R2, '2026-02-08'), RACE, source="predict")
+    fs.save_feature_snapshot(_rows(R3, '2026-02-15'), RACE, source="predict")
+
+    # 1日1ファイル、レースごとにブロック追記
+    assert sorted(p.name for p in (data_root / "features" / "2026").iterdir()) == \
+        ["features_20260208.snap", "features_20260215.snap"]
+    assert len(list(fs._iter_raw_blocks(fs.snapshot_path('2026-02-08')))) == 2
+
+    df = fs.load_snapshots('2026-02-01', '2026-02-28')
+    assert len(df) == 9
+    assert set(df['race_id']) == {R1, R2, R3}
+
+    one = fs.load_snapshots(race_ids=[R2], features=['odds'])
+    assert list(one['odds']) == [2.5, 5.0, 7.5]
+    assert 'speed_idx_avg3' not in one.columns
+    assert math.isnan(one['finish_position'].iloc[2])
+
+    day = fs.load_snapshots('2026-02-08', features=['speed_idx_avg3', 'style_label'])
+    assert math.isnan(day['speed_idx_avg3'].iloc[1])
+    assert day['style_label'].iloc[0] == 'nige'
+    assert set(fs.load_snapshots('2026-02-08')['model_version']) == {'9.1', ''}
+
+
+def test_latest_only_and_legacy_dict(data_root):
+    fs.save_feature_snapshot(_rows(R1, '2026-02-08'), RACE, source="predict")
+    fs.save_feature_snapshot(_rows(R1, '2026-02-08', base=1.0), RACE, source="predict")
+    latest = fs.load_snapshots('2026-02-08')
+    assert list(latest['odds']) == [3.5, 6.0, 8.5]
+    assert len(fs.load_snapshots('2026-02-08', latest_only=False)) == 6
+
+    snap = fs.load_feature_snapshot(R1)
+    assert snap['race_id'] == R1 and snap['venue_name'] == '東京'
+    assert snap['entries'][0]['features']['odds'] == 3.5
+    assert snap['entries'][1]['features']['speed_idx_avg3'] is None
+    assert snap['entries'][2]['finish_position'] is None
+
+
+def test_legacy_json_fallback(data_root):
+    legacy_dir = data_root / "features" / "2025" / "12" / "28"
+    legacy_dir.mkdir(parents=True)
+    rid = "2025122806050801"
+    (legacy_dir / f"features_{rid}.json").write_text(
+        json.dumps({'race_id': rid, 'entries': []}), encoding='utf-8')
+    assert fs.load_feature_snapshot(rid) == {'race_id': rid, 'entries': []}
+    assert fs.load_feature_snapshot("2025122806050802") is None
+
+
+def test_writer_groups_by_day_and_compare_sources():
+    with fs.FeatureSnapshotWriter(source="experiment") as w:
+        w.add(_rows(R1, '2026-02-08'), RACE)
+        w.add(_rows(R2, '2026-02-08'), RACE)
+        w.add(_rows(R3, '2026-02-15'), RACE)
+    assert w.blocks_written == 2 and w.rows_written == 9
+
+    # 推論側で odds だけずれている
+    fs.save_feature_snapshot(_rows(R1, '2026-02-08', base=1.0), RACE, source="predict")
+    skew = fs.compare_sources('2026-02-08')
+    top = skew.iloc[0]
+    assert top['feature'] == 'odds' and top['mismatch_rate'] == 1.0
+    assert skew.set_index('feature').loc['speed_idx_avg3', 'mismatch_rate'] == 0.0
+
+
+def test_truncated_tail_is_ignored():
+    fs.save_feature_snapshot(_rows(R1, '2026-02-08'), RACE)
+    path = fs.snapshot_path('2026-02-08')
+    with open(path, 'ab') as f:
+        f.write(fs._HEADER.pack(fs._MAGIC, 1, 0, 1000) + b'partial')
+    assert len(fs.load_snapshots('2026-02-08')) == 3
+
+
+def test_torn_tail_truncated_on_next_append(capsys):
+    fs.save_feature_snapshot(_rows(R1, '2026-02-08'), RACE)
+    path = fs.snapshot_path('2026-02-08')
+    good = path.stat().st_size
+
+    # 書きかけ (長さ不足) → 次の追記で切り詰めてから書く
+    with open(path, 'ab') as f:
+        f.write(fs._HEADER.pack(fs._MAGIC, fs._FORMAT_VERSION, 0, 1000) + b'partial')
+    fs.save_feature_snapshot(_rows(R2, '2026-02-08'), RACE)
+    assert '[WARN]' in capsys.readouterr().out
+    assert set(fs.load_snapshots('2026-02-08')['race_id']) == {R1, R2}
+    assert fs._valid_length(path) == path.stat().st_size
+
+    # 長さは揃っているが中身が壊れた末尾 (CRC 不一致) も同様
+    size = path.stat().st_size
+    with open(path, 'r+b') as f:
+        f.seek(size - fs._TRAILER.size - 1)
+        last = f.read(1)[0]
+        f.seek(-1, 1)
+        f.write(bytes([last ^ 0xFF]))
+    fs._appended_stat.clear()                  # 別プロセスからの追記を想定 (検査し直す)
+    assert set(fs.load_snapshots('2026-02-08')['race_id']) == {R1}
+    fs.save_feature_snapshot(_rows(R3, '2026-02-08'), RACE)
+    assert set(fs.load_snapshots('2026-02-08')['race_id']) == {R1, R3}
+    assert path.stat().st_size > good
+
+
+def test_append_skips_revalidation_when_untouched(monkeypatch):
+    calls = []
+    real = fs._valid_length
+    monkeypatch.setattr(fs, '_valid_length', lambda p: calls.append(p) or real(p))
+    fs._appended_stat.clear()
+    for rid in (R1, R2, R3):
+        fs.save_feature_snapshot(_rows(rid, '2026-02-08'), RACE)
+    assert len(calls) == 0
+    path = fs.snapshot_path('2026-02-08')
+    fs._appended_stat.clear()
+    fs.save_feature_snapshot(_rows(R1, '2026-02-08'), RACE)
+    assert calls == [path] and real(path) == path.stat().st_size
+
+
+def test_float64_and_v1_blocks_readable():
+    rows = _rows(R1, '2026-02-08')
+    rows[0]['odds'] = 0.1 + 1e-12
+    fs.save_feature_snapshot(rows, RACE)
+    path = fs.snapshot_path('2026-02-08')
+    assert fs.load_snapshots('2026-02-08')['odds'].iloc[0] == 0.1 + 1e-12
+
+    # 旧形式 (v1: CRC なし) のブロックの後ろに v2 を追記しても両方読める
+    payload = fs._encode_block(_rows(R2, '2026-02-08'), {R2: {'date': '2026-02-08'}}, 'experiment', '')
+    path.write_bytes(fs._HEADER.pack(fs._MAGIC, 1, 0, len(payload)) + payload)
+    fs.save_feature_snapshot(_rows(R3, '2026-02-08'), RACE)
+    assert set(fs.load_snapshots('2026-02-08')['race_id']) == {R2, R3}
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""build_horse_master の差分書き込み / シャード pack / 同一パス馬名インデックスのテスト
+
+検証:
+  - 2 回目の実行では内容が変わった馬のファイル・シャードだけ書き直す
+  - manifest が無くても既存ファイルと同内容なら書かない (初回移行)
+  - HorsePack.get / iter_records が HorseMaster.to_dict() と一致
+  - indexes/horse_name_index.json が build_horse_name_index の走査結果と一致
+  - UM 0 件 / 名前数が減る実行ではインデックスを上書きしない (--force は上書き)
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from builders import build_horse_master as bhm
+from builders import build_horse_name_index as bni
+from core import config
+from core.models.horse import HorseMaster
+from core.store.horse_pack import HorsePack
+
+
+def _horses(rename=None):
+    horses = {}
+    for i in range(40):
+        k = f"{2018 + i % 3}10{i:04d}"
+        name = f"ウマ{i % 25}"                       # 同名馬あり
+        if rename and k in rename:
+            name = rename[k]
+        horses[k] = HorseMaster(ketto_num=k, name=name, sex_cd='1', trainer_code=f"{i:05d}")
+    return horses
+
+
+@pytest.fixture()
+def data_root(tmp_path, monkeypatch):
+    monkeypatch.setenv('KEIBA_DATA_ROOT', str(tmp_path))
+    return tmp_path
+
+
+def _mtimes(paths):
+    return {p.name: p.stat().st_mtime_ns for p in paths}
+
+
+def test_files_written_only_when_changed(data_root):
+    horses_dir = config.horses_dir()
+    m = bhm.load_manifest()
+    assert bhm.write_horse_files(_horses(), horses_dir, m) == (40, 0)
+    bhm.save_manifest(m)
+    before = _mtimes(horses_dir.glob('*.json'))
+
+    k = sorted(_horses())[5]
+    m = bhm.load_manifest()
+    assert bhm.write_horse_files(_horses({k: '改名'}), horses_dir, m) == (1, 39)
+    after = _mtimes(horses_dir.glob('*.json'))
+    assert [n for n in after if after[n] != before[n]] == [f"{k}.json"]
+    assert json.loads((horses_dir / f"{k}.json").read_text(encoding='utf-8'))['name'] == '改名'
+
+    # manifest 消失 → 内容比較で全件スキップ、 ハッシュは復元される
+    assert bhm.write_horse_files(_horses({k: '改名'}), horses_dir,
+                                 {'files': {}, 'shards': {}}) == (0, 40)
+    (horses_dir / f"{k}.json").unlink()
+    assert bhm.write_horse_files(_horses({k: '改名'}), horses_dir, m)[0] == 1
+    assert bhm.write_horse_files(_horses(), horses_dir, m, force=True) == (40, 0)
+
+
+def test_pack_roundtrip_and_shard_skip(data_root):
+    out = data_root / 'pack'
+    horses = _horses()
+    m = {'files': {}, 'shards': {}}
+    assert bhm.write_horse_pack(horses, out, m) == (3, 0)
+    pack = HorsePack(out)
+    assert pack.shard_keys() == ['2018', '2019', '2020']
+    for k, h in horses.items():
+        assert pack.get(k) == h.to_dict() and k in pack
+    assert pack.get('2018109999') is None and '2030100000' not in pack
+    assert list(pack.keys()) == sorted(horses)
+    assert [r['ketto_num'] for r in pack.iter_records()] == sorted(horses)
+
+    k = sorted(k for k in horses if k.startswith('2019'))[0]
+    assert bhm.write_horse_pack(_horses({k: '改名'}), out, m) == (1, 2)
+    assert HorsePack(out).get(k)['name'] == '改名'
+
+
+def test_build_writes_name_index_in_same_pass(data_root, monkeypatch):
+    horses = _horses()
+    recs = [type('R', (), dict(h.to_dict(), is_active=True))() for h in horses.values()]
+    monkeypatch.setattr(bhm.um_parser, 'get_um_files', lambda recent_n=0: [data_root / 'UM.DAT'])
+    (data_root / 'UM.DAT').write_bytes(b' ' * bhm.UM_RECORD_LEN * len(recs))
+    monkeypatch.setattr(bhm.um_parser, 'parse_record',
+                        lambda data, offset: recs[offset // bhm.UM_RECORD_LEN])
+
+    bhm.build_horse_masters(fmt='both')
+    idx = json.loads((config.indexes_dir() / 'horse_name_index.json').read_text(encoding='utf-8'))
+    assert idx['name_to_id'] == bni.build_index()
+    assert idx['name_to_id'] == bni.build_index_from_pack()
+    assert idx['name_to_id']['ウマ3'] == max(k for k, h in horses.items() if h.name == 'ウマ3')
+
+    man = bhm.load_manifest()
+    assert len(man['files']) == 40 and len(man['shards']) == 3
+
+
+def test_empty_or_shrinking_build_keeps_name_index(data_root, monkeypatch):
+    recs = [type('R', (), dict(h.to_dict(), is_active=True))() for h in _horses().values()]
+    monkeypatch.setattr(bhm.um_parser, 'get_um_files', lambda recent_n=0: [data_root / 'UM.DAT'])
+    monkeypatch.setattr(bhm.um_parser, 'parse_record',
+                        lambda data, offset: recs[offset // bhm.UM_RECORD_LEN])
+
+    def run(n, **kw):
+        (data_root / 'UM.DAT').write_bytes(b' ' * bhm.UM_RECORD_LEN * n)
+        bhm.build_horse_masters(**kw)
+
+    run(len(recs))
+    paths = [config.masters_dir() / 'horse_name_index.json',
+             config.indexes_dir() / 'horse_name_index.json',
+             config.indexes_dir() / 'horse_name_search.bin']
+    before = [p.read_bytes() for p in paths]
+    assert bhm.existing_index_size() == 25
+
+    monkeypatch.setattr(bhm.um_parser, 'get_um_files', lambda recent_n=0: [])
+    run(0)
+    assert [p.read_bytes() for p in paths] == before
+
+    monkeypatch.setattr(bhm.um_parser, 'get_um_files', lambda recent_n=0: [data_root / 'UM.DAT'])
+    run(10)
+    assert [p.read_bytes() for p in paths] == before
+    run(10, force=True)
+    assert bhm.existing_index_size() == 10
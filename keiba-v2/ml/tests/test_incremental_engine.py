@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""ml/features/incremental_engine のパリティテスト
+
+合成した走歴で、日付順スイープの結果が既存の compute_* 関数
+(全走歴を毎回フィルタ) と完全一致することを確認する。
+"""
+
+import random
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from ml.features.incremental_engine import IncrementalFeatureEngine
+from ml.features.jrdb_features import compute_jrdb_features
+from ml.features.past_features import compute_past_features
+from ml.features.rotation_features import compute_rotation_features
+from ml.features.running_style_features import compute_running_style_features
+from ml.features.slow_start_features import compute_slow_start_features
+from ml.features.track_bias_features import compute_horse_bias_features
+
+
+VENUES = [('05', '東京'), ('06', '中山'), ('08', '京都'), ('09', '阪神'), ('01', '札幌')]
+CONDITIONS = ['良', '稍重', '重', '不良', '']
+GRADES = ['新馬', '未勝利', '1勝クラス', '2勝クラス', 'OP', 'G3']
+MARGINS = ['ハナ', 'クビ', '1/2', '1.1/4', '3', '大差', '']
+
+
+def _synthetic(seed=7, n_horses=40, n_days=60):
+    """race_date 昇順の history_cache と付随インデックスを作る"""
+    rng = random.Random(seed)
+    start = date(2024, 1, 6)
+    days = [(start + timedelta(days=7 * i)).isoformat() for i in range(n_days)]
+    history = {}
+    kb_ext_index = {}
+    sed_index = {}
+    level_index = {}
+    for h in range(n_horses):
+        ketto = f"20210{h:05d}"
+        runs = []
+        for d in sorted(rng.sample(days, rng.randint(0, 25))):
+            vc, vn = rng.choice(VENUES)
+            nr = rng.randint(4, 18)
+            umaban = rng.randint(1, nr)
+            rid = f"{d.replace('-', '')}{vc}0101{rng.randint(1, 12):02d}"
+            fp = rng.choice([0] + list(range(1, nr + 1)))
+            run = {
+                'race_date': d, 'race_id': rid, 'venue_code': vc, 'venue_name': vn,
+                'track_type': rng.choice(['turf', 'dirt', 'turf', 'obstacle']),
+                'distance': rng.choice([1000, 1200, 1400, 1600, 1800, 2000, 2400, 0]),
+                'track_condition': rng.choice(CONDITIONS),
+                'finish_position': fp, 'num_runners': rng.choice([nr, nr, 0]),
+                'last_3f': rng.choice([0, 33.5, 34.1, 35.8, 36.2]),
+                'corners': rng.choice([[], [rng.randint(1, nr)],
+                                       [rng.randint(1, nr) for _ in range(4)]]),
+                'time_behind_winner': rng.choice([None, 0.0, 0.3, 1.25, 'x']),
+                'margin': rng.choice(MARGINS), 'odds': rng.choice([0, 2.5, 15.3]),
+                'futan': rng.choice([0, 54.0, 56.0, 57.5]),
+                'horse_weight': rng.choice([0, 452, 470, 488]),
+                'popularity': rng.randint(0, nr), 'jockey_code': rng.choice(['', '01', '02']),
+                'grade': rng.choice(GRADES), 'umaban': rng.choice([0, umaban, umaban]),
+                'is_handicap': rng.random() < 0.2, 'is_female_only': rng.random() < 0.2,
+            }
+            runs.append(run)
+            if rng.random() < 0.7:
+                kb_ext_index.setdefault(rid, {'entries': {}, 'race_extras': {
+                    'hassou': rng.choice(['', '出遅れあり'])}})
+                kb_ext_index[rid]['entries'][str(umaban)] = {
+                    'is_slow_start': rng.random() < 0.3}
+            if rng.random() < 0.8:
+                sed_index[f"{ketto}_{d}"] = {
+                    'race_date': d, 'venue_code': vc, 'track_code': rng.choice([1, 2]),
+                    'idm': rng.choice([None, 41, 48.5, 52.3, 60]),
+                    'agari_idx': rng.choice([None, 45.0, 50]),
+                    'ten_idx': rng.choice([None, 38.0, 47]),
+                    'deokure_adj': rng.choice([0, 1]), 'furi_adj': rng.choice([0, 2]),
+                    'joushou_code': rng.choice([0, 1, 3]),
+                    'race_pace': rng.choice(['H', 'M', 'S']),
+                    'corner4': rng.randint(0, nr), 'num_runners': nr,
+                    'finish_position': fp,
+                }
+            if rng.random() < 0.5:
+                level_index[rid] = {'level_vs_class': rng.choice([None, -1.5, 0.0, 2.25]),
+                                    'level_rank': rng.choice(['H', 'M', 'L', ''])}
+        history[ketto] = runs
+    return history, kb_ext_index, sed_index, level_index, days
+
+
+def _queries(history, days):
+    """(date, ketto_num, 条件) — 実走日 + 走っていない日も混ぜる"""
+    rng = random.Random(11)
+    out = []
+    for ketto, runs in history.items():
+        for r in runs:
+            out.append((r['race_date'], ketto, r))
+        for d in rng.sample(days, 5):
+            vc, vn = rng.choice(VENUES)
+            out.append((d, ketto, {
+                'venue_code': vc, 'venue_name': vn,
+                'track_type': rng.choice(['turf', 'dirt']),
+                'distance': rng.choice([1200, 1600, 2000]),
+                'track_condition': rng.choice(CONDITIONS),
+                'num_runners': rng.randint(0, 18), 'futan': 55.0, 'horse_weight': 460,
+                'popularity': 3, 'jockey_code': '01', 'grade': rng.choice(GRADES),
+                'is_handicap': False, 'is_female_only': True,
+            }))
+    out.append(('2030-01-01', '2099999999', out[0][2]))  # 走歴なし
+    out.sort(key=lambda q: q[0])
+    return out
+
+
+def test_parity_with_full_history_functions():
+    history, kb_ext_index, sed_index, level_index, days = _synthetic()
+    engine = IncrementalFeatureEngine(history, kb_ext_index, sed_index)
+    kaa_index = {}
+    n_checked = 0
+    for race_date, ketto, cur in _queries(history, days):
+        past_kw = dict(
+            venue_code=cur['venue_code'], track_type=cur['track_type'],
+            distance=cur['distance'], entry_count=cur['num_runners'],
+            race_level_index=level_index, track_condition=cur['track_condition'],
+        )
+        assert engine.past_features(ketto, race_date, history_cache=history, **past_kw) == \
+            compute_past_features(ketto, race_date, history_cache=history, **past_kw)
+
+        assert engine.running_style_features(ketto, race_date, cur['num_runners']) == \
+            compute_running_style_features(ketto, race_date, cur['num_runners'], history)
+
+        rot_args = (cur['futan'], cur['horse_weight'], cur['popularity'], cur['jockey_code'])
+        rot_kw = dict(current_grade=cur['grade'], current_venue=cur['venue_name'],
+                      current_distance=cur['distance'], current_track_type=cur['track_type'],
+                      current_month=int(race_date[5:7]),
+                      current_is_handicap=cur['is_handicap'],
+                      current_is_female_only=cur['is_female_only'])
+        assert engine.rotation_features(ketto, race_date, *rot_args, history, **rot_kw) == \
+            compute_rotation_features(ketto, race_date, *rot_args, history, **rot_kw)
+
+        assert engine.slow_start_features(ketto, race_date, history, kb_ext_index) == \
+            compute_slow_start_features(ketto, race_date, history, kb_ext_index)
+
+        assert engine.jrdb_features(ketto, race_date, history, sed_index, {}) == \
+            compute_jrdb_features(ketto, race_date, history, sed_index, {})
+
+        assert engine.horse_bias_features(ketto, race_date, sed_index, kaa_index, history) == \
+            compute_horse_bias_features(ketto, race_date, sed_index, kaa_index, history)
+        n_checked += 1
+    assert n_checked > 200
+
+
+def test_same_day_results_are_not_folded():
+    history = {'2021000001': [
+        {'race_date': '2024-01-06', 'race_id': 'a', 'finish_position': 1},
+        {'race_date': '2024-01-13', 'race_id': 'b', 'finish_position': 5},
+    ]}
+    engine = IncrementalFeatureEngine(history)
+    feat = engine.past_features('2021000001', '2024-01-13', '05', 'turf', 1600, 16)
+    assert feat['total_career_races'] == 1
+    assert feat['win_rate_all'] == 1.0
+    feat = engine.past_features('2021000001', '2024-01-14', '05', 'turf', 1600, 16)
+    assert feat['total_career_races'] == 2
+    assert feat['prev_finish'] == 5
+
+
+def test_backward_query_requires_reset():
+    history = {'2021000001': [{'race_date': '2024-01-06', 'finish_position': 2}]}
+    engine = IncrementalFeatureEngine(history)
+    engine.advance_to('2024-02-01')
+    with pytest.raises(ValueError):
+        engine.advance_to('2024-01-01')
+    engine.reset()
+    assert engine.state('2021000001', '2024-01-01') is None
+    assert engine.state('2021000001', '2024-01-07').n == 1
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""joint_kelly (同時 Kelly ソルバー) の単体テスト
+
+検証:
+  - harville_top3 の確率がハーヴィル ordered_prob と一致し Σπ=1
+  - 払戻行列の券種別的中判定
+  - 射影が box/総和制約を満たす
+  - 単勝 1 点の解が解析的 Kelly と一致、 負 EV は 0
+  - 相関した買い目で単独 Kelly より E[log] が下がらない
+"""
+import numpy as np
+import pytest
+
+from ml.strategies import harville as hv
+from ml.strategies import joint_kelly as jk
+
+PROBS = {1: 0.35, 2: 0.25, 3: 0.2, 4: 0.12, 5: 0.08}
+
+
+def test_harville_top3_matches_ordered_prob():
+    orders, pi = jk.harville_top3(PROBS)
+    assert orders.shape == (5 * 4 * 3, 3)
+    assert pi.sum() == pytest.approx(1.0)
+    for (a, b, c), p in zip(orders[:7], pi[:7]):
+        assert p == pytest.approx(hv.sanrentan_prob(PROBS, int(a), int(b), int(c)))
+
+
+def test_harville_top3_too_few_horses():
+    orders, pi = jk.harville_top3({1: 0.6, 2: 0.4})
+    assert len(orders) == 0 and len(pi) == 0
+
+
+def test_payout_matrix_hits():
+    orders = np.array([[1, 2, 3], [2, 1, 4]])
+    tickets = [jk.Ticket("tansho", (1,), 3.0), jk.Ticket("fukusho", (3,), 1.5),
+               jk.Ticket("umaren", (2, 1), 5.0), jk.Ticket("wide", (1, 4), 4.0),
+               jk.Ticket("umatan", (2, 1), 9.0), jk.Ticket("sanrenpuku", (4, 2, 1), 20.0),
+               jk.Ticket("sanrentan", (1, 2, 3), 60.0)]
+    R = jk.payout_matrix(orders, tickets)
+    assert R.tolist() == [[3.0, 1.5, 5.0, 0.0, 0.0, 0.0, 60.0],
+                          [0.0, 0.0, 5.0, 4.0, 9.0, 20.0, 0.0]]
+    with pytest.raises(ValueError):
+        jk.payout_matrix(orders, [jk.Ticket("wakuren", (1, 2), 5.0)])
+
+
+def test_project_capped_simplex_bounds():
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        v = rng.normal(0, 1, 8)
+        f = jk.project_capped_simplex(v, np.full(8, 0.3), 0.5)
+        assert f.min() >= 0 and f.max() <= 0.3 + 1e-12
+        assert f.sum() <= 0.5 + 1e-9
+
+
+def test_single_ticket_equals_analytic_kelly():
+    orders, pi = jk.harville_top3(PROBS)
+    R = jk.payout_matrix(orders, [jk.Ticket("tansho", (1,), 4.0)])
+    g = jk.solve_growth(R, pi, upper=1.0, total=1.0)
+    assert g[0] == pytest.approx((3.0 * 0.35 - 0.65) / 3.0, abs=1e-6)
+    R = jk.payout_matrix(orders, [jk.Ticket("tansho", (5,), 5.0)])   # EV 0.4
+    assert jk.solve_growth(R, pi, upper=1.0, total=1.0)[0] == pytest.approx(0.0, abs=1e-9)
+
+
+def test_joint_not_worse_than_independent_kelly():
+    orders, pi = jk.harville_top3(PROBS)
+    tickets = [jk.Ticket("tansho", (1,), 4.0), jk.Ticket("fukusho", (1,), 1.9),
+               jk.Ticket("umaren", (1, 2), 8.0)]
+    R = jk.payout_matrix(orders, tickets)
+    g = jk.solve_growth(R, pi, upper=1.0, total=1.0)
+    # 各点を単独 Kelly (p·o−1)/(o−1) で張った配分 (総和 1 以内に縮小)
+    p_hit = pi @ (R > 0)
+    o = np.array([t.odds for t in tickets])
+    naive = np.clip((p_hit * o - 1) / (o - 1), 0, None)
+    naive = naive / max(1.0, naive.sum())
+    assert jk.expected_log_growth(R, pi, g) >= jk.expected_log_growth(R, pi, naive) - 1e-12
+
+
+def test_round_stakes_floor_to_unit():
+    assert jk.round_stakes(np.array([0.0312, 0.0009, 0.1]), 10000) == [300, 0, 1000]
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""core/jravan/record_index (SU/SR/UM オフセットインデックス) のテスト
+
+env 隔離: JV_DATA_ROOT (DAT) と KEIBA_DATA_ROOT (indexes) を tmp に。
+合成した固定長レコードで、年スキャン結果との一致と差分更新を確認する。
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core.constants import SE_RECORD_LEN, SR_RECORD_LEN, UM_RECORD_LEN
+from core.jravan import record_index, se_parser, sr_parser, um_parser
+
+
+@pytest.fixture
+def sandbox(tmp_path, monkeypatch):
+    jv = tmp_path / "jv"
+    data = tmp_path / "data3"
+    monkeypatch.setenv("JV_DATA_ROOT", str(jv))
+    monkeypatch.setenv("KEIBA_DATA_ROOT", str(data))
+    return jv, data
+
+
+def _record(kind: bytes, length: int, head: str, kubun: bytes = b"7") -> bytes:
+    buf = bytearray(b" " * length)
+    buf[0:2] = kind
+    buf[2:3] = kubun
+    buf[11:11 + len(head)] = head.encode("ascii")
+    return bytes(buf)
+
+
+def _se(race_id: str, umaban: int) -> bytes:
+    rec = bytearray(_record(b"SE", SE_RECORD_LEN, race_id))
+    rec[27:28] = b"1"
+    rec[28:30] = f"{umaban:02d}".encode()
+    rec[30:40] = f"{2020100000 + umaban:010d}".encode()
+    return bytes(rec)
+
+
+def _write(path: Path, records) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"".join(records))
+
+
+RID_A = "2026020805010101"   # 2026-02-08 東京1R
+RID_B = "2026020805010102"   # 2026-02-08 東京2R
+RID_C = "2026021505010201"   # 2026-02-15
+RID_OLD = "2025122806050801"  # 2025-12-28
+
+
+def _build_se(jv: Path):
+    se_dir = jv / "SE_DATA"
+    _write(se_dir / "2026" / "SU202602.DAT",
+           [_se(RID_A, 1), _se(RID_C, 1), _se(RID_A, 2), _se(RID_B, 1), _se(RID_A, 3)])
+    _write(se_dir / "2025" / "SU202512.DAT", [_se(RID_OLD, 1)])
+
+
+def test_runs_roundtrip():
+    nums = [0, 1, 2, 5, 7, 8]
+    runs = record_index._to_runs(nums)
+    assert runs == [0, 3, 5, 1, 7, 2]
+    assert list(record_index._from_runs(runs)) == nums
+
+
+def test_se_scan_dates_matches_year_scan(sandbox):
+    jv, _ = sandbox
+    _build_se(jv)
+
+    expected = [r for r in se_parser.scan([2026]) if r["race_id"][:8] == "20260208"]
+    got = list(se_parser.scan_dates(["2026-02-08"]))
+
+    assert len(got) == 4
+    assert [(r["race_id"], r["umaban"]) for r in got] == \
+        [(r["race_id"], r["umaban"]) for r in expected]
+
+
+def test_index_persisted_and_incremental(sandbox):
+    jv, data = sandbox
+    _build_se(jv)
+
+    idx = record_index.RecordIndex("SE")
+    assert idx.refresh([2025, 2026]) == 2
+    assert (data / "indexes" / "jv_se_record_index.json").exists()
+
+    # 変更なし → 再走査ゼロ
+    idx2 = record_index.RecordIndex("SE")
+    assert idx2.refresh([2025, 2026]) == 0
+
+    # 新ファイル追加 → そのファイルだけ再走査
+    _write(jv / "SE_DATA" / "2026" / "SU202603.DAT", [_se("2026030105010101", 1)])
+    idx3 = record_index.RecordIndex("SE")
+    assert idx3.refresh([2026]) == 1
+    recs = list(se_parser.scan_dates(["2026-03-01"]))
+    assert [r["race_id"] for r in recs] == ["2026030105010101"]
+
+    # 既存ファイル更新 (追記) → 追加分も読める
+    path = jv / "SE_DATA" / "2026" / "SU202602.DAT"
+    path.write_bytes(path.read_bytes() + _se(RID_B, 2))
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    recs = list(se_parser.scan_dates(["2026-02-08"]))
+    assert len(recs) == 5
+
+    # 他年のエントリは年指定の refresh で消えない
+    idx4 = record_index.RecordIndex("SE")
+    idx4.refresh([2026])
+    assert "2025/SU202512.DAT" in idx4._load()
+
+
+def test_date_range_across_years(sandbox):
+    jv, _ = sandbox
+    _build_se(jv)
+    recs = list(se_parser.scan_dates(["2025-12-28", "2026-02-15"]))
+    assert sorted(r["race_id"] for r in recs) == [RID_OLD, RID_C]
+
+
+def test_sr_scan_dates(sandbox):
+    jv, _ = sandbox
+    sr_dir = jv / "SE_DATA" / "2026"
+    _write(sr_dir / "SR202602.DAT", [
+        _record(b"RA", SR_RECORD_LEN, RID_A),
+        _record(b"RA", SR_RECORD_LEN, RID_C),
+        _record(b"RA", SR_RECORD_LEN, RID_B, kubun=b"1"),  # 未確定は parse_record で除外
+    ])
+    expected = [r.race_id for r in sr_parser.scan([2026]) if r.race_id[:8] == "20260208"]
+    got = [r.race_id for r in sr_parser.scan_dates(["2026-02-08"])]
+    assert got == expected
+
+
+def test_um_find_by_id_prefers_newest_file(sandbox):
+    jv, _ = sandbox
+    um_dir = jv / "UM_DATA"
+    _write(um_dir / "2024" / "UM2024.DAT",
+           [_record(b"UM", UM_RECORD_LEN, "2020100001"), _record(b"UM", UM_RECORD_LEN, "2020100002")])
+    _write(um_dir / "2025" / "UM2025.DAT", [_record(b"UM", UM_RECORD_LEN, "2020100002")])
+
+    located = record_index.RecordIndex("UM")
+    located.refresh()
+    hits = located.locate(lambda k: k == "2020100002")
+    assert [p.parent.name for p, _ in hits] == ["2024", "2025"]
+
+    rec = um_parser.find_by_id("2020100001")
+    assert rec is not None and rec.ketto_num == "2020100001"
+    assert um_parser.find_by_id("9999999999") is None
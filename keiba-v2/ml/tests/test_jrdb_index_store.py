@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""jrdb/index_store (列指向JRDBインデックス) と build_jrdb_index の差分ビルドのテスト"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from jrdb.index_store import ColumnarIndex, load_jrdb_index
+from builders import build_jrdb_index as bji
+
+
+ROWS = {
+    "2020100001_2024-01-06": {"idm": 45, "ten_idx": -3.5, "name": "アイウ", "flag": True,
+                              "furlong_times": [12.1, 11.0], "mixed": 1, "opt": None},
+    "2020100001_2024-02-10": {"idm": 51, "ten_idx": 0.0, "name": "", "flag": False,
+                              "furlong_times": [], "mixed": 1.5, "opt": "x"},
+    "2020100002_2024-01-06": {"idm": 300, "ten_idx": None, "name": None, "flag": None,
+                              "furlong_times": None, "mixed": "a"},
+}
+
+
+def _roundtrip(index, tmp_path):
+    path = tmp_path / "idx.npz"
+    index.save(path)
+    return ColumnarIndex.load(path)
+
+
+def test_roundtrip_exact(tmp_path):
+    idx = _roundtrip(ColumnarIndex.from_records(list(ROWS), list(ROWS.values())), tmp_path)
+    assert len(idx) == 3
+    assert idx.to_dict() == ROWS
+    # 型も保持 (int は int、float は float、欠損フィールドは欠損のまま)
+    row = idx["2020100001_2024-01-06"]
+    assert type(row["idm"]) is int and type(row["ten_idx"]) is float
+    assert type(idx["2020100001_2024-02-10"]["mixed"]) is float
+    assert "opt" not in idx["2020100002_2024-01-06"]
+    assert idx.get("missing") is None and "missing" not in idx
+    assert idx.columns["idm"].data.dtype.itemsize == 2  # int は最小幅に縮小
+
+
+def test_prefix_items_sorted_by_date():
+    idx = ColumnarIndex.from_records(list(ROWS), list(ROWS.values()))
+    keys = [k for k, _ in idx.prefix_items("2020100001_")]
+    assert keys == ["2020100001_2024-01-06", "2020100001_2024-02-10"]
+    assert list(idx.keys()) == sorted(ROWS)
+    assert idx.prefix_items("2020100003_") == []
+
+
+def test_merge_last_wins_and_type_widening(tmp_path):
+    a = ColumnarIndex.from_records(["k1", "k2"], [{"v": 1, "s": "a"}, {"v": 2, "s": "b"}])
+    b = ColumnarIndex.from_records(["k2", "k3"], [{"v": 2.5, "t": 7}, {"v": 3.0, "s": "c"}])
+    merged = _roundtrip(ColumnarIndex.merge([a, b]), tmp_path)
+    expected = {}
+    for part in ({"k1": {"v": 1, "s": "a"}, "k2": {"v": 2, "s": "b"}},
+                 {"k2": {"v": 2.5, "t": 7}, "k3": {"v": 3.0, "s": "c"}}):
+        expected.update(part)
+    assert merged.to_dict() == expected
+    assert type(merged["k1"]["v"]) is int
+
+
+def test_load_jrdb_index_prefers_npz(tmp_path):
+    assert load_jrdb_index("sed", tmp_path) is None
+    (tmp_path / "jrdb_sed_index.json").write_text(json.dumps({"a": {"x": 1}}), encoding="utf-8")
+    assert load_jrdb_index("sed", tmp_path) == {"a": {"x": 1}}
+    ColumnarIndex.from_records(["b"], [{"x": 2}]).save(tmp_path / "jrdb_sed_index.npz")
+    assert dict(load_jrdb_index("sed", tmp_path)) == {"b": {"x": 2}}
+
+
+# =============================================================================
+# build_jrdb_index: ファイル単位キャッシュ
+# =============================================================================
+
+def _parse_line(line: bytes):
+    key, val = line.decode("ascii").split(",")
+    return {"key": key, "val": int(val)}
+
+
+@pytest.fixture
+def jrdb_sandbox(tmp_path, monkeypatch):
+    raw = tmp_path / "raw"
+    (raw / "TST").mkdir(parents=True)
+    monkeypatch.setattr(bji, "RAW_DIR", raw)
+    monkeypatch.setattr(bji, "INDEX_DIR", tmp_path / "indexes")
+    spec = bji.JrdbSpec("TST", "TST", 3, _parse_line, lambda r, stem: (r["key"], {"val": r["val"]}))
+    monkeypatch.setitem(bji.SPECS, "tst", spec)
+    return raw / "TST"
+
+
+def _write(path: Path, lines):
+    path.write_bytes(b"\r\n".join(l.encode("ascii") for l in lines) + b"\r\n")
+
+
+def test_build_index_incremental(jrdb_sandbox, monkeypatch):
+    _write(jrdb_sandbox / "TST240106.txt", ["a,1", "b,2"])
+    _write(jrdb_sandbox / "TST240113.txt", ["b,3", "c,4", "bad"])
+
+    idx = bji.build_index("tst", range(2024, 2025))
+    assert idx.to_dict() == {"a": {"val": 1}, "b": {"val": 3}, "c": {"val": 4}}
+
+    # 新ファイルだけパースされる
+    parsed = []
+    real = bji._build_part
+    monkeypatch.setattr(bji, "_build_part", lambda *a: parsed.append(a[1]) or real(*a))
+    _write(jrdb_sandbox / "TST240120.txt", ["a,9"])
+    idx = bji.build_index("tst", range(2024, 2025))
+    assert [Path(p).name for p in parsed] == ["TST240120.txt"]
+    assert idx["a"] == {"val": 9} and len(idx) == 3
+
+    # 年範囲外のファイルは対象外
+    assert len(bji.build_index("tst", range(2025, 2026))) == 0
+
+
+def test_build_index_parallel_matches_serial(jrdb_sandbox):
+    for d in range(1, 5):
+        _write(jrdb_sandbox / f"TST2401{d:02d}.txt", [f"k{d},{d}", f"shared,{d}"])
+    par = bji.build_index("tst", range(2024, 2025), workers=2)
+    ser = bji.build_index("tst", range(2024, 2025), rebuild=True)
+    assert par.to_dict() == ser.to_dict()
+    assert par["shared"] == {"val": 4}
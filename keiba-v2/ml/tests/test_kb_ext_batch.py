@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""keibabook/ext_builder の kb_ext 部分更新 (KbExtBatch / bulk_update_kb_ext) のテスト
+
+検証:
+  - update_kb_ext_field / update_kb_ext_race_level の戻り値・更新内容が従来どおり
+    (存在しないファイル・該当馬番なしは False でファイル不変)
+  - 同じファイルへの複数更新は積んだ順に適用され、 書き込みは 1 回 (compact JSON)
+  - max_pending で自動 flush、 壊れた JSON はそのファイルだけ errors に数える
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from keibabook import ext_builder as eb
+
+DATE = '2025-06-01'
+
+
+@pytest.fixture()
+def kb_root(tmp_path, monkeypatch):
+    monkeypatch.setenv('KEIBA_DATA_ROOT', str(tmp_path))
+    return tmp_path
+
+
+def _make(race_id_16, umabans=('1', '2', '3')):
+    path = eb.kb_ext_path(race_id_16, DATE)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    doc = {'race_id': race_id_16, 'entries': {u: {'umaban': int(u)} for u in umabans}}
+    path.write_text(json.dumps(doc, ensure_ascii=False, indent=2), encoding='utf-8')
+    return path
+
+
+@pytest.fixture()
+def writes(monkeypatch):
+    calls = []
+    real = eb.write_kb_ext_file
+
+    def spy(path, kb_ext):
+        calls.append(path.name)
+        real(path, kb_ext)
+    monkeypatch.setattr(eb, 'write_kb_ext_file', spy)
+    return calls
+
+
+def test_single_update_functions(kb_root, writes):
+    path = _make('2025060105030101')
+    assert eb.update_kb_ext_field('2025060105030101', DATE, {'2': {'sunpyo': '好位'}})
+    assert eb.update_kb_ext_race_level('2025060105030101', DATE, {'laps': {'lap_times': [12.1]}})
+    doc = json.loads(path.read_text(encoding='utf-8'))
+    assert doc['entries']['2'] == {'umaban': 2, 'sunpyo': '好位'}
+    assert doc['laps'] == {'lap_times': [12.1]}
+    assert '\n' not in path.read_text(encoding='utf-8') and '好位' in path.read_text(encoding='utf-8')
+
+    before = path.read_bytes()
+    assert not eb.update_kb_ext_field('2025060105030101', DATE, {'9': {'x': 1}})
+    assert path.read_bytes() == before
+    assert not eb.update_kb_ext_field('2099010105030101', DATE, {'1': {'x': 1}})
+    assert not eb.update_kb_ext_race_level('2099010105030101', DATE, {'x': 1})
+    assert writes == [path.name, path.name]
+    assert not list(path.parent.glob('*.tmp'))
+
+
+def test_batch_single_write_per_file(kb_root, writes):
+    a, b = _make('2025060105030101'), _make('2025060105030102')
+    with eb.KbExtBatch() as batch:
+        batch.update_race_level('2025060105030101', DATE, {'race_extras': {'hassou': '3番出遅れ'}})
+        batch.update_fields('2025060105030101', DATE, {'3': {'is_slow_start': True}})
+        batch.update_fields('2025060105030101', DATE, {'3': {'is_slow_start': False, 'memo': 'x'}})
+        batch.update_fields('2025060105030102', DATE, {'1': {'paddock_info': {'mark': '◎'}}})
+        batch.update_with(b, lambda kb: kb['entries'].pop('2', None) is not None)
+        assert len(batch) == 2 and writes == []
+    assert sorted(writes) == sorted([a.name, b.name])
+    da = json.loads(a.read_text(encoding='utf-8'))
+    assert da['race_extras']['hassou'] == '3番出遅れ'
+    assert da['entries']['3'] == {'umaban': 3, 'is_slow_start': False, 'memo': 'x'}
+    db = json.loads(b.read_text(encoding='utf-8'))
+    assert set(db['entries']) == {'1', '3'} and db['entries']['1']['paddock_info']['mark'] == '◎'
+    assert batch.stats['written'] == 2 and batch.stats['files'] == 2
+
+
+def test_auto_flush_errors_and_bulk(kb_root, writes):
+    ids = [f"20250601050301{r:02d}" for r in range(1, 6)]
+    paths = [_make(rid) for rid in ids]
+    paths[2].write_text('{broken', encoding='utf-8')
+
+    batch = eb.KbExtBatch(max_pending=2)
+    for rid in ids:
+        batch.update_fields(rid, DATE, {'1': {'n': rid}})
+        batch.update_race_level(rid, DATE, {'flag': True})     # 同じファイルは同じ flush に乗る
+    batch.update_fields('2099010105030101', DATE, {'1': {'n': 0}})
+    batch.flush()
+    assert writes == [p.name for i, p in enumerate(paths) if i != 2]
+    assert batch.stats == {'files': 6, 'written': 4, 'unchanged': 0, 'missing': 1, 'errors': 1}
+    with pytest.raises(ValueError):
+        eb.update_kb_ext_field(ids[2], DATE, {'1': {'n': 1}})
+
+    stats = eb.bulk_update_kb_ext(
+        entry_updates={(rid, DATE): {'2': {'bulk': i}} for i, rid in enumerate(ids) if rid != ids[2]},
+        race_updates={(ids[0], DATE): {'race_extras': {}}, (ids[1], DATE): {'race_extras': {'a': 1}}},
+    )
+    assert stats['written'] == 4 and stats['files'] == 4
+    d1 = json.loads(paths[1].read_text(encoding='utf-8'))
+    assert d1['entries']['2']['bulk'] == 1 and d1['race_extras'] == {'a': 1} and d1['flag'] is True
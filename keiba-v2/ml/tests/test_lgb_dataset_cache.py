@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""ml/utils/lgb_dataset_cache (ビン化済み LightGBM Dataset の共有) のテスト
+
+検証:
+  - train_model に cache を渡しても、 直接構築と予測が完全一致 (P/W で base は 1 回だけ構築)
+  - 低頻度フラグ特徴量 + min_child_samples / feature_fraction の違う P/W でも直接構築と一致
+    (feature_pre_filter / min_data_in_leaf はモデルごとのキーに入る)
+  - rows (順不同) + 重みで派生した AR 用セットが、 同じビン境界で直接構築した subset と一致
+  - ディスクキャッシュ: 2 回目はバイナリから読み込み、 予測は同一
+  - データが 1 値でも変わればキーが変わる、 ディスク上限を超えたら古い .bin から消す
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+lgb = pytest.importorskip("lightgbm")
+
+from ml.experiment import train_model
+from ml.utils.lgb_dataset_cache import DatasetCache, dataset_params_of, frame_fingerprint
+
+FEATS = [f"f{i}" for i in range(6)]
+PARAMS = {'objective': 'binary', 'metric': 'auc', 'num_leaves': 15, 'learning_rate': 0.1,
+          'min_child_samples': 30, 'feature_fraction': 0.8, 'bagging_fraction': 0.8,
+          'bagging_freq': 1, 'verbose': -1, 'seed': 7, 'num_threads': 1, 'deterministic': True}
+
+
+def _frame(n, seed):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.normal(size=(n, len(FEATS))), columns=FEATS)
+    df.loc[rng.random(n) < 0.1, 'f2'] = np.nan
+    s = df['f0'] + 0.5 * df['f1'].fillna(0) + rng.normal(scale=0.8, size=n)
+    df['is_top3'] = (s > 0.6).astype(int)
+    df['is_win'] = (s > 1.5).astype(int)
+    df['target_margin'] = np.where(rng.random(n) < 0.2, np.nan, -s)
+    return df
+
+
+def _split():
+    return _frame(3000, 0), _frame(800, 1), _frame(800, 2)
+
+
+def test_train_model_matches_direct_and_shares_base(capsys):
+    tr, vl, ts = _split()
+    cache = DatasetCache()
+    for label in ('is_top3', 'is_win'):
+        _, m_direct, _, p_direct, _, raw_direct = train_model(
+            tr, vl, ts, FEATS, PARAMS, label, num_boost_round=40)
+        _, m_cached, _, p_cached, _, raw_cached = train_model(
+            tr, vl, ts, FEATS, PARAMS, label, num_boost_round=40, dataset_cache=cache)
+        np.testing.assert_array_equal(raw_direct, raw_cached)
+        np.testing.assert_array_equal(p_direct, p_cached)
+        assert m_direct == m_cached
+    st = cache.stats()
+    assert st['built'] == 2 and st['derived'] == 4     # train/val base 各 1 回
+    capsys.readouterr()
+
+
+def test_low_support_feature_parity_per_params(capsys):
+    tr, vl, ts = _split()
+    rng = np.random.default_rng(5)
+    for df in (tr, vl, ts):
+        flag = np.zeros(len(df))
+        flag[rng.choice(len(df), size=len(df) // 100, replace=False)] = 1.0   # 1% だけ立つ
+        df['flag'] = flag
+        df.loc[df['flag'] == 1, 'is_win'] = 1
+    feats = FEATS + ['flag']
+    params_p = dict(PARAMS, min_child_samples=50, feature_fraction=0.5)
+    params_w = dict(PARAMS, min_child_samples=10, feature_fraction=0.5)
+    assert dataset_params_of(params_p)['min_data_in_leaf'] == 50
+    assert dataset_params_of({'feature_pre_filter': False, 'min_child_samples': 5}) == \
+        {'feature_pre_filter': False}
+
+    cache = DatasetCache()
+    for params, label in ((params_p, 'is_top3'), (params_w, 'is_win'), (params_p, 'is_win')):
+        *_, p_direct, _, raw_direct = train_model(
+            tr, vl, ts, feats, params, label, num_boost_round=40)
+        *_, p_cached, _, raw_cached = train_model(
+            tr, vl, ts, feats, params, label, num_boost_round=40, dataset_cache=cache)
+        np.testing.assert_array_equal(raw_direct, raw_cached)
+        np.testing.assert_array_equal(p_direct, p_cached)
+    assert cache.stats()['built'] == 4          # (P 設定, W 設定) × (train, val)
+    assert cache.key(tr[feats], params_p) != cache.key(tr[feats], params_w)
+    capsys.readouterr()
+
+
+def test_rows_and_weight_derivation():
+    tr, vl, _ = _split()
+    X = tr[FEATS]
+    rng = np.random.default_rng(3)
+    rows = rng.permutation(np.flatnonzero(tr['target_margin'].notna().to_numpy()))
+    y = tr['target_margin'].to_numpy()[rows]
+    w = rng.uniform(0.5, 1.5, size=len(rows))
+    params = {'objective': 'huber', 'num_leaves': 15, 'verbose': -1, 'seed': 1,
+              'num_threads': 1, 'deterministic': True}
+
+    cache = DatasetCache()
+    dtr = cache.train_set(X, y, weight=w, rows=rows, params=params)
+    vmask = vl['target_margin'].notna().to_numpy()
+    dvl = cache.valid_set(vl[FEATS], vl['target_margin'].to_numpy()[vmask], dtr, rows=vmask)
+    m1 = lgb.train(params, dtr, 30, valid_sets=[dvl])
+
+    # 直接: 全行でビン化 → 昇順 subset にラベル・重み
+    order = np.argsort(rows)
+    full = lgb.Dataset(X, label=np.zeros(len(X)), params={'verbose': -1},
+                       free_raw_data=False).construct()
+    sub = full.subset(rows[order]).construct()
+    sub.set_label(y[order])
+    sub.set_weight(w[order])
+    m2 = lgb.train(params, sub, 30)
+    np.testing.assert_array_equal(m1.predict(vl[FEATS]), m2.predict(vl[FEATS]))
+    assert dvl.num_data() == int(vmask.sum())
+
+
+def test_disk_cache_roundtrip_and_key(tmp_path):
+    tr, vl, _ = _split()
+    X = tr[FEATS]
+    preds = []
+    for _ in range(2):
+        cache = DatasetCache(tmp_path)
+        dtr = cache.train_set(X, tr['is_top3'])
+        dvl = cache.valid_set(vl[FEATS], vl['is_top3'], dtr)
+        m = lgb.train(PARAMS, dtr, 30, valid_sets=[dvl])
+        preds.append(m.predict(vl[FEATS]))
+    assert cache.stats()['loaded'] == 2 and cache.stats()['built'] == 0
+    assert len(list(tmp_path.glob('*.bin'))) == 2
+    np.testing.assert_array_equal(preds[0], preds[1])
+
+    X2 = X.copy()
+    X2.iloc[5, 3] += 1e-9
+    assert frame_fingerprint(X2) != frame_fingerprint(X)
+    assert cache.key(X2) != cache.key(X) and cache.key(X.copy()) == cache.key(X)
+    assert cache.key(X[FEATS[::-1]]) != cache.key(X)
+
+    small = DatasetCache(max_entries=1)
+    small.train_set(X, tr['is_top3'])
+    small.train_set(X2, tr['is_top3'])
+    assert small.stats()['cached'] == 1
+
+
+def test_disk_cache_pruned_to_limit(tmp_path):
+    tr, _, _ = _split()
+    cache = DatasetCache(tmp_path)
+    cache.train_set(tr[FEATS], tr['is_top3'])
+    size = next(tmp_path.glob('*.bin')).stat().st_size
+
+    small = DatasetCache(tmp_path, max_disk_bytes=int(size * 2.5))
+    for i in range(4):
+        X = tr[FEATS].copy()
+        X.iloc[0, 0] += i + 1
+        small.train_set(X, tr['is_top3'])
+    assert len(list(tmp_path.glob('*.bin'))) == 2 and small.stats()['pruned'] == 3
+    assert (tmp_path / f"{small.key(X)}.bin").exists()
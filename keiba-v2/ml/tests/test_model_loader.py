@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""ml/model_loader (遅延サブモデル・fast-load manifest・バンドル LRU) のテスト
+
+検証:
+  - load_model はサブモデルをパースせず、 アクセスしたものだけ読む (AR 未使用なら AR 未パース)
+  - 同じバージョンは LRU から同一オブジェクト、 ファイル更新で読み直し
+  - register_version(model_dir=) の sha256 と manifest を照合 (食い違えば再ハッシュ → 警告)
+  - feature_importance は manifest に保存され、 2 回目は Booster をパースしない
+  - live/ の上書き後に未ロードのサブモデルへアクセスすると StaleModelError (古い meta と混ぜない)
+"""
+
+import json
+import os
+import pickle
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+lgb = pytest.importorskip("lightgbm")
+
+from ml import model_loader as ml
+
+
+def _booster(seed, n_feat=4):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(400, n_feat))
+    y = (X[:, 0] + rng.normal(size=400) > 0).astype(int)
+    return lgb.train({'objective': 'binary', 'verbose': -1, 'num_leaves': 7, 'seed': seed},
+                     lgb.Dataset(X, y), 10)
+
+
+def _write_version(d: Path, version: str, seed: int, with_ar=True):
+    d.mkdir(parents=True, exist_ok=True)
+    _booster(seed).save_model(str(d / "model_p.txt"))
+    _booster(seed + 1).save_model(str(d / "model_w.txt"))
+    if with_ar:
+        _booster(seed + 2).save_model(str(d / "model_ar.txt"))
+    with open(d / "calibrators.pkl", 'wb') as f:
+        pickle.dump({'cal_p': None, 'cal_w': None}, f)
+    (d / "meta.json").write_text(json.dumps({
+        'version': version, 'features_value': [f"c{i}" for i in range(4)],
+        'has_calibrators': True}), encoding='utf-8')
+
+
+@pytest.fixture()
+def ml_root(tmp_path, monkeypatch):
+    monkeypatch.setenv('KEIBA_DATA_ROOT', str(tmp_path))
+    root = tmp_path / "ml"
+    root.mkdir()
+    (root / "model_registry.json").write_text(json.dumps(
+        {'models': {'polaris': {'active_version': '2.0', 'versions': []}}}), encoding='utf-8')
+    ml.invalidate_cache()
+    yield root
+    ml.invalidate_cache()
+
+
+def test_lazy_submodels_and_lru(ml_root, capsys):
+    live = ml_root / "models" / "polaris" / "live"
+    _write_version(live, '2.0', seed=1)
+    _write_version(ml_root / "models" / "polaris" / "archive" / "1.9", '1.9', seed=5, with_ar=False)
+
+    b = ml.load_model("polaris")
+    assert b.loaded_keys == [] and b.has_win and b.has_ar and b.has_calibrators
+    assert "+AR" in b.summary() and b.version == '2.0'
+    assert b.model_p.num_trees() == 10 and b.calibrators == {'cal_p': None, 'cal_w': None}
+    assert b.loaded_keys == ['model_p', 'calibrators']          # W/AR はパースしない
+
+    assert ml.load_model("polaris") is b                         # LRU
+    old = ml.load_model("polaris", version="1.9")
+    assert old is not b and not old.has_ar and old.model_ar is None
+    assert ml.load_model("polaris", use_cache=False) is not b
+
+    # ファイル更新 → 読み直し
+    p = live / "model_p.txt"
+    _booster(9).save_model(str(p))
+    st = p.stat()
+    os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    b2 = ml.load_model("polaris")
+    assert b2 is not b and b2.manifest['files']['model_p']['sha256'] == ml.file_sha256(p)
+    capsys.readouterr()
+
+
+def test_registry_hash_validation_and_importance_cache(ml_root, capsys, monkeypatch):
+    live = ml_root / "models" / "polaris" / "live"
+    _write_version(live, '2.0', seed=1)
+    ml.register_version("polaris", "2.0", model_dir=live, set_active=True)
+    files = ml.list_versions("polaris")[0]['files']
+    assert set(files) == {'meta', 'model_p', 'model_w', 'model_ar', 'calibrators'}
+
+    b = ml.load_model("polaris")
+    assert "registry hash mismatch" not in capsys.readouterr().out
+    imp = b.feature_importance("model_w")
+    assert len(imp['importance']) == 4 and b.loaded_keys == ['model_w']
+
+    # 2 回目: manifest から (Booster は作らない)
+    ml.clear_bundle_cache()
+    with monkeypatch.context() as m:
+        m.setattr(lgb, 'Booster', None)
+        b3 = ml.load_model("polaris")
+        assert b3.feature_importance("model_w") == imp and b3.loaded_keys == []
+
+    # size/mtime を保ったまま中身だけ差し替え (copy2 等) → stat では気付けないが、
+    # 再登録でレジストリの sha256 が変わると manifest と食い違い → 再ハッシュ
+    p = live / "model_ar.txt"
+    st = p.stat()
+    data = bytearray(p.read_bytes())
+    data[-2:] = b'\n\n' if data[-2:] != b'\n\n' else b' \n'
+    p.write_bytes(bytes(data))
+    os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns))
+    ml.register_version("polaris", "2.0", model_dir=live)
+    ml.clear_bundle_cache()
+    b4 = ml.load_model("polaris")
+    assert "registry hash mismatch" not in capsys.readouterr().out
+    assert b4.manifest['files']['model_ar']['sha256'] == ml.file_sha256(p)
+
+    # 登録後にファイルだけ更新 → 警告
+    _booster(11).save_model(str(live / "model_p.txt"))
+    os.utime(live / "model_p.txt", ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    ml.clear_bundle_cache()
+    ml.load_model("polaris")
+    assert "registry hash mismatch ['model_p']" in capsys.readouterr().out
+
+
+def test_lazy_submodel_rejects_overwritten_live(ml_root):
+    live = ml_root / "models" / "polaris" / "live"
+    _write_version(live, '2.0', seed=1)
+    b = ml.load_model("polaris")
+    assert b.model_p is not None
+
+    # 再学習が live/ をその場で上書き (W だけ新しい版、 meta はまだ古い)
+    p = live / "model_w.txt"
+    _booster(21).save_model(str(p))
+    st = p.stat()
+    os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    with pytest.raises(ml.StaleModelError, match="model_w.txt"):
+        b.model_w
+    assert b.model_p is not None                                # 読み込み済みは使える
+
+    b2 = ml.load_model("polaris")
+    assert b2 is not b and b2.model_w.num_trees() == 10
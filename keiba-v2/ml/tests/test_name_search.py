@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""core/name_search (正規化 n-gram 名前検索インデックス) のテスト
+
+検証:
+  - norm_key / loose_key が全角/半角・ひらがな・長音記号・中点・(外) 接頭辞を吸収
+  - exact / prefix / fuzzy / search、 同名の複数値、 .bin の保存→読込で結果が不変
+  - prefix が loose_key の線形 startswith 走査と一致
+  - resolve_trainer_code が検索インデックス有り/無しで同じコードを返し、 表記揺れも解決
+    (一字違い・前方一致の複数ヒットは採らない)
+  - exact(strict=True) と出馬表ビルダーは一字違いの別馬・騎手略記の曖昧一致を採らない
+  - settle_purchases.resolve_wide_pair が半角カナの馬名でも馬番を引ける
+"""
+
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core.name_search import NameIndex, loose_key, norm_key
+
+HORSES = [
+    ("ディープインパクト", "2002100816"), ("ディープブリランテ", "2009100502"),
+    ("ドウデュース", "2019105283"), ("ヴィクトワールピサ", "2007103143"),
+    ("サクラ", "2015100001"), ("サクラ", "2020100002"),              # 同名馬
+    ("サクラバクシンオー", "1989102048"), ("イクイノックス", "2019105219"),
+]
+
+
+def test_normalization_variants():
+    base = norm_key("ディープインパクト")
+    for v in ("ﾃﾞｨｰﾌﾟｲﾝﾊﾟｸﾄ", "でぃーぷいんぱくと", "(外)ディープ・インパクト",
+              "ディ－プインパクト", " ディープインパクト　", "（地）ディープインパクト"):
+        assert norm_key(v) == base, v
+    assert norm_key("ＡＢＣ　ｄｅｆ") == "abcdef"
+    assert loose_key("ディープインパクトー") == loose_key("デイプインパクト")
+    assert norm_key("") == "" and loose_key(None) == ""
+
+
+def test_lookup_modes_and_roundtrip(tmp_path):
+    idx = NameIndex.build(HORSES + [("", "x"), HORSES[0]], meta={"kind": "horse"})
+    assert len(idx) == len(HORSES)
+    loaded = NameIndex.load(idx.save(tmp_path / "horse_name_search.bin"))
+    assert loaded.meta["kind"] == "horse" and len(loaded) == len(HORSES)
+    for ix in (idx, loaded):
+        assert ix.exact("ﾄﾞｳﾃﾞｭｰｽ") == [("ドウデュース", "2019105283")]
+        assert sorted(v for _, v in ix.exact("さくら")) == ["2015100001", "2020100002"]
+        assert [n for n, _ in ix.prefix("ディープ")] == ["ディープインパクト", "ディープブリランテ"]
+        assert [n for n, _ in ix.prefix("ｻｸﾗ")][:2] == ["サクラ", "サクラ"]
+        assert ix.prefix("ゼンノ") == []
+        top = ix.fuzzy("ディープインパクド")                   # 1 文字違い
+        assert top[0][:2] == ("ディープインパクト", "2002100816") and top[0][2] >= 0.7
+        assert ix.fuzzy("ビクトワールピサ", min_score=0.6)[0][0] == "ヴィクトワールピサ"
+        assert ix.search("いくいのっくす") == [("イクイノックス", "2019105219")]
+        assert ix.search("サクラバク") == [("サクラバクシンオー", "1989102048")]
+        assert ix.search("ドウデュウス")[0][0] == "ドウデュース"
+    empty = NameIndex.load(NameIndex.build([]).save(tmp_path / "empty.bin"))
+    assert len(empty) == 0 and empty.search("アイ") == []
+
+
+def test_prefix_matches_linear_scan():
+    rnd = random.Random(0)
+    kana = "アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨラリルレロワンー"
+    pairs = [("".join(rnd.choice(kana) for _ in range(rnd.randint(2, 9))), f"{i:010d}")
+             for i in range(3000)]
+    idx = NameIndex.build(pairs)
+    for _ in range(200):
+        q = "".join(rnd.choice(kana) for _ in range(rnd.randint(1, 3)))
+        got = sorted(idx.prefix(q, limit=10_000))
+        lq = loose_key(q)
+        expect = sorted(set(p for p in pairs if lq and loose_key(p[0]).startswith(lq)))
+        assert got == expect, q
+
+
+def test_trainer_resolution_with_index():
+    from builders.build_race_from_keibabook import resolve_trainer_code
+
+    name_to_code = {"矢作芳人": "01075", "矢野英一": "01030", "国枝栄": "00438",
+                    "堀宣行": "01059", "堀井雅広": "00395"}
+    search = NameIndex.build((n, c) for n, c in name_to_code.items())
+    for kb in ("栗矢作芳", "美国枝", "美堀", "美堀宣", "栗矢", "国枝栄", "栗存在無", ""):
+        assert resolve_trainer_code(kb, name_to_code, search) == \
+            resolve_trainer_code(kb, name_to_code), kb
+    assert resolve_trainer_code("国枝　栄", name_to_code) == ""
+    assert resolve_trainer_code("国枝　栄", name_to_code, search) == "00438"
+    # 一字違い (loose 一致) は完全一致扱いしない / 前方一致が 2 件以上なら採らない
+    kana = {"カーター": "05001"}
+    assert resolve_trainer_code("カタ", kana, NameIndex.build(kana.items())) == ""
+    many = dict(name_to_code, 矢作太郎="09999")
+    many_search = NameIndex.build(many.items())
+    assert resolve_trainer_code("栗矢作", many, many_search) == ""
+    assert resolve_trainer_code("栗矢作芳", many, many_search) == "01075"
+
+
+def test_builder_rejects_near_miss_names(capsys):
+    from builders.build_race_from_keibabook import build_race_json_from_syutuba
+
+    horses = NameIndex.build([("ビッグアーサー", "2011104521"), ("ドウデュース", "2019105283")])
+    jockeys = NameIndex.build([("武豊", "00666"), ("武藤雅", "01169"), ("Ｍ．デムーロ", "05212")])
+    assert horses.exact("ビッグアサー") == [("ビッグアーサー", "2011104521")]     # loose 一致
+    assert horses.exact("ビッグアサー", strict=True) == []
+    assert horses.exact("ﾄﾞｳﾃﾞｭｰｽ", strict=True) == [("ドウデュース", "2019105283")]
+
+    syutuba = {"race_info": {}, "horses": [
+        {"馬番": "1", "馬名": "ビッグアサー", "騎手": "武"},
+        {"馬番": "2", "馬名": "ﾄﾞｳﾃﾞｭｰｽ", "騎手": "Ｍ．デム"},
+    ]}
+    race = build_race_json_from_syutuba(
+        "2025060105030101", "202506010501", "2025-06-01", "東京", 1, "", syutuba,
+        name_search={"horse": horses, "jockey": jockeys})
+    e1, e2 = race["entries"]
+    assert (e1["horse_name"], e1["ketto_num"]) == ("ビッグアサー", "")
+    assert e1["jockey_code"] == ""                                      # 武豊/武藤雅 で曖昧
+    assert (e2["horse_name"], e2["ketto_num"]) == ("ドウデュース", "2019105283")
+    assert e2["jockey_code"] == "05212"
+    assert "前方一致で解決: Ｍ．デム" in capsys.readouterr().out
+
+
+def test_wide_pair_resolves_halfwidth_names():
+    from ml.settle_purchases import resolve_wide_pair
+
+    race = {"entries": [{"horse_name": "ドウデュース", "umaban": 7},
+                        {"horse_name": "イクイノックス", "umaban": 2}]}
+    item = {"selection": "1-ﾄﾞｳﾃﾞｭｰｽ-イクイノックス", "horse_name": ""}
+    assert resolve_wide_pair(item, race) == (2, 7)
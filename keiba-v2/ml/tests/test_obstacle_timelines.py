@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""障害タイムライン (累積和配列) のテスト
+
+検証:
+  - ObstacleTimeline.before が当該日より前の (件数, 勝利, 好走) を返す (同日は含まない)
+  - 騎手/調教師成績が素朴な走査 (旧実装の式) と一致、 旧形式 (タプルリスト) も受け付ける
+  - horse_obs_index 指定時の compute_obstacle_only_past_stats / compute_same_group_stats が
+    未指定 (history_cache 走査) と一致
+"""
+
+import math
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from ml.features import obstacle_features as of
+
+VENUES = ['福島', '中山', '小倉', '新潟', '中京', '東京', '京都', '阪神', '札幌']
+
+
+def _history(seed=0, n_horses=300):
+    rnd = random.Random(seed)
+    hc = {}
+    for h in range(n_horses):
+        recs = []
+        for _ in range(rnd.randint(0, 20)):
+            recs.append({
+                'race_date': f"20{rnd.randint(20, 25)}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+                'track_type': 'obstacle' if rnd.random() < 0.6 else 'turf',
+                'finish_position': rnd.choice([0, 1, 2, 3, 4, 7, 11]),
+                'num_runners': rnd.choice([4, 6, 10, 14]),
+                'jockey_code': f"J{rnd.randint(0, 20)}", 'trainer_code': f"T{rnd.randint(0, 30)}",
+                'venue_name': rnd.choice(VENUES), 'distance': rnd.choice([2880, 3000, 3390]),
+                'last_3f': rnd.choice([0, 12.8, 13.6]),
+            })
+        hc[f"H{h:04d}"] = recs
+    hc['BAD'] = {'not': 'a list'}
+    return hc
+
+
+def _same(a: dict, b: dict) -> bool:
+    return a.keys() == b.keys() and all(
+        x == y or (isinstance(x, float) and math.isnan(x) and math.isnan(y))
+        for x, y in zip(a.values(), b.values()))
+
+
+def test_timeline_before_excludes_same_day():
+    tl = of.ObstacleTimeline([('2025-03-01', 1, 1), ('2025-01-05', 0, 1), ('2025-02-01', 0, 0)])
+    assert tl.dates == ['2025-01-05', '2025-02-01', '2025-03-01']
+    assert tl.before('2025-01-05') == (0, 0, 0)
+    assert tl.before('2025-02-02') == (2, 0, 1)
+    assert tl.before('2025-03-01') == (2, 0, 1)
+    assert tl.before('2026-01-01') == (3, 1, 2)
+
+
+def test_personnel_stats_match_naive_scan():
+    hc = _history()
+    jtl, ttl = of.build_obstacle_personnel_timelines(hc)
+    rows = [(r['race_date'], r['jockey_code'], r['trainer_code'], r['finish_position'],
+             r['num_runners']) for recs in hc.values() if isinstance(recs, list)
+            for r in recs if r['track_type'] == 'obstacle' and r['finish_position']]
+    for d in ('2021-06-01', '2023-01-15', '2025-12-31'):
+        for jc in ('J0', 'J7', 'J20', 'J99'):
+            past = [r for r in rows if r[1] == jc and r[0] < d]
+            got = of.compute_jockey_obstacle_stats(jc, d, jtl)
+            assert got['jockey_obstacle_races'] == len(past)
+            if past:
+                wins = sum(1 for r in past if r[3] == 1)
+                assert got['jockey_obstacle_win_rate'] == round((wins + 0.07 * 20) / (len(past) + 20), 4)
+            legacy = {jc: [(r[0], int(r[3] == 1), 0) for r in rows if r[1] == jc]}
+            assert of.compute_jockey_obstacle_stats(jc, d, legacy) == got
+        for tc in ('T0', 'T15'):
+            past = [r for r in rows if r[2] == tc and r[0] < d]
+            top3 = sum(1 for r in past if r[3] <= (3 if r[4] >= 8 else 2 if r[4] >= 5 else 1))
+            got = of.compute_trainer_obstacle_stats(tc, d, ttl)
+            expect = round((top3 + 0.25 * 20) / (len(past) + 20), 4) if past else 0.25
+            assert got == {'trainer_obstacle_top3_rate': expect}
+            legacy = {tc: [(r[0], int(r[3] <= (3 if r[4] >= 8 else 2 if r[4] >= 5 else 1)))
+                           for r in rows if r[2] == tc]}
+            assert of.compute_trainer_obstacle_stats(tc, d, legacy) == got
+
+
+def test_horse_index_matches_history_scan():
+    hc = _history(seed=3)
+    idx = of.build_horse_obstacle_index(hc)
+    assert 'BAD' not in idx
+    rnd = random.Random(5)
+    for _ in range(600):
+        h = rnd.choice(list(hc) + ['NOPE'])
+        d = f"20{rnd.randint(20, 26)}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}"
+        dist = rnd.choice([2880, 3000, 3390])
+        assert _same(of.compute_obstacle_only_past_stats(h, d, dist, hc, horse_obs_index=idx),
+                     of.compute_obstacle_only_past_stats(h, d, dist, hc))
+        v = rnd.choice(VENUES)
+        assert _same(of.compute_same_group_stats(h, d, v, hc, horse_obs_index=idx),
+                     of.compute_same_group_stats(h, d, v, hc))
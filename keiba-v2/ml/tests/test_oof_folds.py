@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""experiment.train_oof_folds (PerfStack 等の K-fold OOF 並列学習) のテスト
+
+検証:
+  - 並列 (workers>1) と逐次 (workers=1) で OOF 予測が一致
+  - 多クラスは (n, num_class)、 二値は (n,) で、 fold の検証位置にだけ値が入る
+  - 位置インデックスでの散布が fold モデルの predict(X.iloc[val]) と一致
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+lgb = pytest.importorskip("lightgbm")
+from sklearn.model_selection import KFold
+
+from ml.experiment import train_oof_folds
+
+
+def _data(n=1500, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(n, 5)), columns=[f"f{i}" for i in range(5)],
+                     index=rng.permutation(n) + 10_000)          # 位置 ≠ ラベルの index
+    X.iloc[rng.random(n) < 0.05, 2] = np.nan
+    score = X['f0'].to_numpy() + 0.5 * np.nan_to_num(X['f2'].to_numpy())
+    y = pd.Series(np.digitize(score + rng.normal(scale=0.5, size=n), [-0.5, 0.5]), index=X.index)
+    return X, y
+
+
+PARAMS = {'objective': 'multiclass', 'num_class': 3, 'metric': 'multi_logloss',
+          'num_leaves': 15, 'learning_rate': 0.1, 'verbose': -1, 'seed': 3,
+          'num_threads': 1, 'deterministic': True}
+
+
+def test_parallel_equals_serial_multiclass():
+    X, y = _data()
+    folds = list(KFold(n_splits=4, shuffle=True, random_state=0).split(X))
+    par, info = train_oof_folds(X, y, PARAMS, folds, num_boost_round=60, workers=4)
+    ser, info_s = train_oof_folds(X, y, PARAMS, folds, num_boost_round=60, workers=1)
+    assert par.shape == (len(X), 3) and not np.isnan(par).any()
+    np.testing.assert_array_equal(par, ser)
+    assert info == info_s and sum(f['n_val'] for f in info) == len(X)
+    np.testing.assert_allclose(par.sum(axis=1), 1.0, rtol=1e-9)
+
+
+def test_partial_folds_and_binary_scatter():
+    X, y = _data(seed=1)
+    yb = (y == 2).astype(int)
+    rng = np.random.default_rng(5)
+    pos = rng.permutation(len(X))
+    folds = [(pos[:600], pos[600:900]), (pos[300:900], pos[:300])]   # pos[300:600], pos[900:] は検証に入らない
+    params = {'objective': 'binary', 'num_leaves': 7, 'verbose': -1, 'seed': 1, 'num_threads': 1}
+    oof, _ = train_oof_folds(X, yb, params, folds, num_boost_round=30, workers=2)
+    assert oof.shape == (len(X),)
+    covered = np.concatenate([pos[:300], pos[600:900]])
+    assert not np.isnan(oof[covered]).any()
+    assert np.isnan(np.delete(oof, covered)).all()
+
+    # fold 0 を Dataset.subset で単独学習した結果と同じ位置に入っている
+    full = lgb.Dataset(X, label=yb, params={'verbose': -1}, free_raw_data=False).construct()
+    m = lgb.train(params, full.subset(folds[0][0]), num_boost_round=30,
+                  valid_sets=[full.subset(folds[0][1])],
+                  callbacks=[lgb.early_stopping(50, verbose=False)])
+    np.testing.assert_allclose(oof[folds[0][1]], m.predict(X.iloc[folds[0][1]]))
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""ml/utils/profiler のテスト
+
+検証:
+  - 無効時は wrap が関数をそのまま返し、 stage / hit / race は何も記録しない
+  - 入れ子ステージ: stages は子込みの累積、 folded は自己時間 (合計 = ルートの総時間)
+  - キャッシュヒット率 / レースレイテンシのパーセンタイル
+  - dump が JSON と collapsed-stack (.folded) を書く
+  - wrap_stage_functions は FEATURE_STAGES に載った抽出器だけを包む (無効時は素の関数)
+  - StageFunctions は有効/無効の切替時だけ包み直し、 差し替え元ごとの表を使い回す
+  - compute_features_for_race を有効化して回すと抽出器ごとのステージが揃う
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import pytest
+
+from ml.utils import profiler as prof_mod
+from ml.utils.profiler import Profiler, percentile
+
+
+def _sleep(sec):
+    time.sleep(sec)
+    return sec
+
+
+def test_disabled_is_passthrough():
+    p = Profiler(enabled=False)
+    assert p.wrap("x", _sleep) is _sleep
+    with p.stage("x"):
+        pass
+    p.hit("c", True)
+    p.count("n")
+    assert p.race("r")(lambda: 7)() == 7
+    rep = p.report()
+    assert rep["stages"] == {} and rep["caches"] == {} and rep["race_latency"] == {}
+
+
+def test_nested_stages_and_folded_self_time():
+    p = Profiler(enabled=True)
+    inner = p.wrap("inner", _sleep)
+
+    @p.race("race")
+    def run():
+        inner(0.01)
+        inner(0.01)
+        with p.stage("other"):
+            time.sleep(0.005)
+        return 1
+
+    assert run() == 1
+    rep = p.report()
+    assert rep["stages"]["inner"]["calls"] == 2
+    assert rep["stages"]["race"]["calls"] == 1
+    assert rep["stages"]["race"]["total_s"] >= rep["stages"]["inner"]["total_s"] + 0.005
+    folded = rep["folded_us"]
+    assert set(folded) == {"race", "race;inner", "race;other"}
+    # 自己時間の合計 = ルートの累積時間 (flamegraph の幅が一致)
+    assert abs(sum(folded.values()) - rep["stages"]["race"]["total_s"] * 1e6) < 10
+    assert rep["race_latency"]["race"]["n"] == 1
+
+
+def test_cache_hit_rate_and_latency_percentiles():
+    p = Profiler(enabled=True)
+    for h in (True, True, True, False):
+        p.hit("kb_ext", h)
+    p._latency["r"] = [i / 1000 for i in range(1, 101)]
+    rep = p.report()
+    assert rep["caches"]["kb_ext"] == {"hits": 3, "misses": 1, "hit_rate": 0.75}
+    lat = rep["race_latency"]["r"]
+    assert (lat["p50_ms"], lat["p90_ms"], lat["p99_ms"], lat["max_ms"]) == (50.0, 90.0, 99.0, 100.0)
+    assert percentile([], 50) == 0.0
+    assert percentile([5.0], 99) == 5.0
+
+
+def test_dump_writes_json_and_folded(tmp_path):
+    p = Profiler(enabled=True)
+    with p.stage("a"):
+        with p.stage("b"):
+            time.sleep(0.001)
+    out = p.dump(tmp_path / "prof" / "run.json")
+    rep = json.loads(out.read_text(encoding="utf-8"))
+    assert set(rep["stages"]) == {"a", "b"}
+    lines = out.with_suffix(".folded").read_text(encoding="utf-8").split()
+    assert "a;b" in lines
+
+
+def test_wrap_stage_functions(monkeypatch):
+    p = prof_mod.PROFILER
+    monkeypatch.setattr(p, "enabled", False)
+    ns = {'compute_past_features': _sleep, 'other': print}
+    fx = prof_mod.wrap_stage_functions(ns)
+    assert fx.compute_past_features is _sleep and not hasattr(fx, 'other')
+    assert not hasattr(fx, 'compute_career_features')
+
+    monkeypatch.setattr(p, "enabled", True)
+    p.reset()
+    fx = prof_mod.wrap_stage_functions(ns)
+    assert fx.compute_past_features(0) == 0
+    assert p.report()["stages"]["past"]["calls"] == 1
+    p.reset()
+
+
+def compute_past_features(sec):
+    return _sleep(sec)
+
+
+class _Engine:
+    def past_features(self, sec):
+        return -sec
+
+
+def test_stage_functions_rewrap_only_on_toggle(monkeypatch):
+    p = prof_mod.PROFILER
+    monkeypatch.setattr(p, "enabled", False)
+    table = prof_mod.StageFunctions(compute_past_features)
+    fx = table.get()
+    assert fx.compute_past_features is compute_past_features
+    assert table.get() is fx                                # 毎回は作り直さない
+
+    eng = _Engine()
+    over = {'compute_past_features': 'past_features'}
+    fe = table.get(eng, over)
+    assert fe.compute_past_features(2) == -2
+    assert table.get(eng, over) is fe and table.get(_Engine(), over) is not fe
+
+    monkeypatch.setattr(p, "enabled", True)                 # enable() 相当
+    p.reset()
+    fx2 = table.get()
+    assert fx2 is not fx and fx2.compute_past_features(0) == 0
+    assert p.report()["stages"]["past"]["calls"] == 1
+    p.reset()
+
+    with pytest.raises(ValueError, match="print"):           # FEATURE_STAGES 外は拒否
+        prof_mod.StageFunctions(print)
+
+
+def test_compute_features_for_race_stages(tmp_path, monkeypatch):
+    from ml.bench import suite
+    from ml.bench.corpus import CorpusSpec, generate_corpus
+
+    corpus = generate_corpus(tmp_path, CorpusSpec(n_days=2, venues_per_day=1,
+                                                  races_per_venue=2, n_horses=40))
+    p = prof_mod.PROFILER
+    monkeypatch.setattr(p, "enabled", False)
+    with corpus.env():
+        ctx = suite.BenchContext(corpus)
+        races = ctx.races()
+        data = ctx.data()
+        p.enabled = True
+        p.reset()
+        try:
+            rows = suite._features_for(races, data)
+        finally:
+            p.enabled = False
+    rep = p.report()
+    p.reset()
+    assert rows
+    assert rep["stages"]["compute_features_for_race"]["calls"] == len(races)
+    for name in ("base", "past", "trainer", "jockey", "running_style", "rotation", "pace",
+                 "training", "speed", "comment", "slow_start", "pedigree", "baba"):
+        assert rep["stages"][name]["calls"] == len(rows), name
+        assert f"compute_features_for_race;{name}" in rep["folded_us"]
+    assert rep["caches"]["history"]["hits"] + rep["caches"]["history"]["misses"] == len(rows)
+    assert rep["race_latency"]["compute_features_for_race"]["n"] == len(races)
@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""purchase_ledger ジャーナル (ハッシュチェーン追記正本) のテスト
+
+検証:
+  - 投票はジャーナル 1 行追記のみ (view は書かない)。 ensure_view で生成した view は
+    畳み込みと一致しチェーン位置を持ち、 以降の追記で古くなれば再生成される
+  - 重複検査は索引引き (別プロセスの追記も末尾読み足しで検出)
+  - 改ざん (本体書換え / 行削除) は verify_journal と読込で検出
+  - view を消しても rebuild_view で復元、 既存 {date}.json は snapshot として取込み
+  - 精算は snapshot で確定、 _index.jsonl にはチェーン先頭が載る
+  - 書きかけの末尾行 (改行なし) は次の追記で切り詰め / 補完され、 チェーンは壊れない
+  - 重複検査と seq 採番はチェーンロック下で再実行 (ロック外検査後の他プロセス記録を検出)
+
+Usage:
+    cd keiba-v2
+    python -m pytest ml/tests/test_purchase_ledger_journal.py -v
+"""
+
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import pytest
+
+from ml.purchase_ledger import journal, writer
+
+RACE = "2026053008031111"
+DATE = "2026-05-30"
+
+
+@pytest.fixture
+def ledger_dir(tmp_path, monkeypatch):
+    d = tmp_path / "purchase_ledger"
+    monkeypatch.setattr(writer, "LEDGER_DIR", d)
+    monkeypatch.setattr(journal, "_JOURNALS", {})
+    return d
+
+
+def _vote(umaban, amount=100, race_id=RACE):
+    return writer.record_tansho_vote(race_id=race_id, umaban=umaban, amount=amount,
+                                     strategy_name="t")
+
+
+def _records(ledger_dir):
+    path = ledger_dir / "journal" / f"{DATE}.jsonl"
+    return [json.loads(x) for x in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_vote_appends_one_record_and_view_matches(ledger_dir):
+    assert _vote(5).action == "recorded"
+    assert _vote(7).action == "recorded"
+    recs = _records(ledger_dir)
+    assert [r["op"] for r in recs] == ["portfolio", "portfolio"]
+    assert recs[1]["prev"] == recs[0]["hash"]
+    view_path = ledger_dir / f"{DATE}.json"
+    assert not view_path.exists()                           # ホットパスは view を書かない
+    assert writer.ensure_view(DATE) == view_path
+    view = json.loads(view_path.read_text(encoding="utf-8"))
+    assert view["journal"] == {"seq": 2, "head": recs[1]["hash"]}
+    pids = [p["portfolio_id"] for p in view["races"][0]["portfolios"]]
+    assert [p[-1] for p in pids] == ["A", "B"]
+    assert len(view["events"]) == 6
+
+    assert _vote(9).action == "recorded"
+    writer.ensure_view(DATE)                                # ジャーナルが先行 → 再生成
+    view = json.loads(view_path.read_text(encoding="utf-8"))
+    assert view["journal"]["seq"] == 3
+    assert len(view["races"][0]["portfolios"]) == 3
+
+
+def test_duplicate_detected_across_processes(ledger_dir):
+    assert _vote(5).action == "recorded"
+    journal._JOURNALS.clear()                 # 別プロセス = キャッシュなしから開く
+    res = _vote(5)
+    assert res.action == "duplicate"
+    # 別プロセスが直接追記した分も、 キャッシュ済プロセスの次の記録で拾う
+    other = journal.LedgerJournal(ledger_dir / "journal" / f"{DATE}.jsonl")
+    other.refresh()
+    pf = dict(other.ledger["races"][0]["portfolios"][0])
+    assert other.find_portfolio(pf["idempotency_key"])["portfolio_id"] == res.portfolio_id
+    pf.update(portfolio_id="pf-20260530-0811-B", idempotency_key="other-key")
+    other.append("portfolio", {"race_id": RACE, "portfolio": pf, "events": []})
+    res2 = _vote(9)
+    assert res2.portfolio_id.endswith("-C")   # B は他プロセスが使用済
+    assert len(_records(ledger_dir)) == 3
+    assert journal.verify_journal(ledger_dir / "journal" / f"{DATE}.jsonl")["ok"]
+
+
+def test_tamper_is_detected(ledger_dir):
+    _vote(5, amount=100)
+    _vote(7)
+    jpath = ledger_dir / "journal" / f"{DATE}.jsonl"
+    lines = jpath.read_text(encoding="utf-8").splitlines()
+    assert journal.verify_journal(jpath) == {"ok": True, "n_records": 2,
+                                             "head": json.loads(lines[1])["hash"],
+                                             "error": None}
+    jpath.write_text("\n".join([lines[0].replace('"total_amount": 100',
+                                                 '"total_amount": 10000'), lines[1]]) + "\n",
+                     encoding="utf-8")
+    res = journal.verify_journal(jpath)
+    assert not res["ok"] and "ハッシュ不一致" in res["error"]
+
+    jpath.write_text(lines[1] + "\n", encoding="utf-8")      # 先頭行を削除
+    assert not journal.verify_journal(jpath)["ok"]
+    journal._JOURNALS.clear()
+    assert _vote(9).action == "error"                       # 破損チェーンには追記しない
+
+
+def test_rebuild_view_and_legacy_import(ledger_dir):
+    ledger_dir.mkdir(parents=True)
+    legacy = {"version": 2, "date": DATE, "events": [], "races": [{
+        "race_id": RACE, "state": "SUBMITTED", "portfolios": [{
+            "portfolio_id": "pf-20260530-0811-A", "idempotency_key": "legacy-key",
+            "portfolio_total": 300,
+            "tickets": [{"ticket_id": "pf-20260530-0811-A#t1", "total_amount": 300}]}]}]}
+    (ledger_dir / f"{DATE}.json").write_text(json.dumps(legacy), encoding="utf-8")
+    res = _vote(5)
+    assert res.portfolio_id.endswith("-B")                  # 既存 A を索引に取込み済
+    recs = _records(ledger_dir)
+    assert [r["op"] for r in recs] == ["snapshot", "portfolio"]
+    assert recs[0]["data"]["reason"] == "legacy_import"
+
+    view_path = writer.ensure_view(DATE)                    # legacy view より新しいジャーナルを反映
+    before = json.loads(view_path.read_text(encoding="utf-8"))
+    assert before["journal"]["seq"] == 2
+    view_path.unlink()
+    journal._JOURNALS.clear()
+    assert writer.rebuild_view(DATE)
+    assert json.loads(view_path.read_text(encoding="utf-8")) == before
+
+
+def test_settlement_commits_snapshot_and_index_has_chain_head(ledger_dir):
+    res = _vote(5, amount=200)
+    r = writer.record_settlement(date=DATE, results=[
+        {"ticket_id": res.ticket_id, "payout": 640, "won": True, "payout_source": "db"}])
+    assert r.success and r.settled_tickets == 1
+    recs = _records(ledger_dir)
+    assert [x["op"] for x in recs] == ["portfolio", "snapshot"]
+    view = json.loads((ledger_dir / f"{DATE}.json").read_text(encoding="utf-8"))
+    assert view["races"][0]["state"] == "SETTLED"
+    assert view["races"][0]["portfolios"][0]["tickets"][0]["payout"] == 640
+    idx = [json.loads(x) for x in
+           (ledger_dir / "_index.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert idx[-1]["sha256"] == recs[-1]["hash"] and idx[-1]["seq"] == 2
+    assert idx[-1]["ticket_count"] == 1 and idx[-1]["total_amount"] == 200
+    # 冪等: 2 回目は何も追記しない
+    writer.record_settlement(date=DATE, results=[
+        {"ticket_id": res.ticket_id, "payout": 640, "won": True}])
+    assert len(_records(ledger_dir)) == 2
+
+
+def test_failure_event_journaled(ledger_dir):
+    writer.record_vote_failure(race_id=RACE, failure_action="timeout", reason="x")
+    recs = _records(ledger_dir)
+    assert recs[0]["op"] == "event"
+    assert recs[0]["data"]["event"]["type"] == "VOTE_FAILED"
+
+
+def test_torn_tail_is_truncated_before_next_append(ledger_dir, capsys):
+    assert _vote(5).action == "recorded"
+    jpath = ledger_dir / "journal" / f"{DATE}.jsonl"
+    good = jpath.read_bytes()
+    with open(jpath, "ab") as f:
+        f.write(b'{"seq": 2, "at": "2026-05-30T10:00:00", "op": "portf')    # 書込み途中で落ちた
+    assert journal.verify_journal(jpath)["ok"]             # 読み手は末尾を無視
+
+    journal._JOURNALS.clear()
+    res = _vote(7)
+    assert res.action == "recorded"
+    assert "切り詰め" in capsys.readouterr().err
+    recs = _records(ledger_dir)
+    assert [r["op"] for r in recs] == ["portfolio", "event", "portfolio"]
+    ev = recs[1]["data"]["event"]
+    assert ev["type"] == "JOURNAL_TAIL_TRUNCATED" and ev["payload"]["offset"] == len(good)
+    assert jpath.read_bytes().startswith(good)
+    res = journal.verify_journal(jpath)
+    assert res["ok"] and res["n_records"] == 3
+    assert _vote(9).action == "recorded"                   # 以降も追記できる
+
+
+def test_complete_record_missing_newline_is_kept(ledger_dir):
+    assert _vote(5).action == "recorded"
+    assert _vote(7).action == "recorded"
+    jpath = ledger_dir / "journal" / f"{DATE}.jsonl"
+    jpath.write_bytes(jpath.read_bytes()[:-1])             # 最終行の改行だけ欠けた
+    journal._JOURNALS.clear()
+    assert _vote(9).action == "recorded"
+    recs = _records(ledger_dir)
+    assert [r["op"] for r in recs] == ["portfolio"] * 3
+    assert recs[2]["data"]["portfolio"]["portfolio_id"].endswith("-C")
+    assert journal.verify_journal(jpath)["n_records"] == 3
+
+
+def test_idempotency_rechecked_under_chain_lock(ledger_dir, monkeypatch):
+    real_open = writer._open_journal
+    state = {"raced": False}
+
+    def open_then_race(date):
+        j = real_open(date)
+        if not state["raced"]:
+            # ロック外の重複検査と追記の間に、 別プロセスが同じ意思決定を記録した
+            state["raced"] = True
+            cached = dict(journal._JOURNALS)
+            journal._JOURNALS.clear()
+            assert _vote(5).action == "recorded"
+            journal._JOURNALS.clear()
+            journal._JOURNALS.update(cached)
+        return j
+
+    monkeypatch.setattr(writer, "_open_journal", open_then_race)
+    res = _vote(5)
+    assert res.action == "duplicate" and res.portfolio_id.endswith("-A")
+    assert len(_records(ledger_dir)) == 1
+    assert _vote(7).portfolio_id.endswith("-B")            # seq もロック下で採番
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""ml/utils/race_corpus (decode-once 共有コーパス) のテスト
+
+検証:
+  - get / load_path が json.load と同じ dict を返し、 返り値の書き換えがキャッシュに漏れない
+    (ネストした dict/list を含む)
+  - ファイルの mtime/size が変わればヒットせず読み直す
+  - 既定上限は小さく、 use_training_cache() で学習用に広がる (環境変数が優先)
+  - LRU 上限 (max_races) と 0 = キャッシュ無効、 ファイル欠損は FileNotFoundError
+  - build_pace_index → _build_close_timeline → build_dataset → add_margin_target_to_df
+    を通しても各ファイルの decode は 1 回
+"""
+
+import json
+import os
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from ml.bench.corpus import CorpusSpec, generate_corpus
+from ml.utils import race_corpus as rcmod
+from ml.utils.race_corpus import RaceCorpus
+
+SPEC = CorpusSpec(n_days=3, venues_per_day=1, races_per_venue=3, n_horses=60)
+
+
+@pytest.fixture()
+def corpus_dir(tmp_path):
+    return generate_corpus(tmp_path, SPEC)
+
+
+def test_get_matches_json_and_isolates_mutation(corpus_dir):
+    with corpus_dir.env():
+        rc = RaceCorpus()
+        files = rc.race_files()
+        assert files
+        for path in files:
+            expect = json.loads(path.read_text(encoding='utf-8'))
+            got = rc.load_path(path)
+            assert got == expect and list(got) == list(expect)
+            assert [list(e) for e in got['entries']] == [list(e) for e in expect['entries']]
+            race_id = path.stem[len('race_'):]
+            date = '-'.join(path.parts[-4:-1])
+            got['entries'][0]['umaban'] = -1
+            got['race_name'] = 'x'
+            got['entries'].pop()
+            assert rc.get(race_id, date) == expect
+        assert rc.stats()['decodes'] == len(files)
+        assert rc.stats()['hits'] == len(files)
+
+
+def test_lru_bound_and_missing_file(corpus_dir):
+    with corpus_dir.env():
+        rc = RaceCorpus(max_races=2)
+        files = rc.race_files()[:3]
+        for p in files:
+            rc.load_path(p)
+        assert rc.stats()['cached'] == 2 and rc.evictions == 1
+        rc.load_path(files[0])              # 追い出し済み → 再 decode
+        assert rc.decodes == 4
+        rc.load_path(files[2])
+        assert rc.hits == 1
+
+        off = RaceCorpus(max_races=0)
+        off.load_path(files[0])
+        off.load_path(files[0])
+        assert off.stats()['cached'] == 0 and off.decodes == 2
+
+        with pytest.raises(FileNotFoundError):
+            rc.get('209901010101', '2099-01-01')
+
+
+def test_nested_values_isolated_and_mtime_reload(tmp_path):
+    path = tmp_path / "race_x.json"
+    doc = {'race_id': 'x', 'pace': {'s3': 35.1}, 'lap_times': [12.0, 11.5],
+           'entries': [{'umaban': 1, 'past': [{'pos': 1}]}, {'umaban': 2, 'name': 'A'}]}
+    path.write_text(json.dumps(doc), encoding='utf-8')
+    rc = RaceCorpus()
+    got = rc.load_path(path)
+    got['pace']['s3'] = 0
+    got['lap_times'].append(99)
+    got['entries'][0]['past'][0]['pos'] = 9
+    assert rc.load_path(path) == doc and rc.hits == 1
+
+    doc['entries'][1]['name'] = 'B'
+    path.write_text(json.dumps(doc), encoding='utf-8')
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert rc.load_path(path)['entries'][1]['name'] == 'B'
+    assert rc.stats()['reloads'] == 1 and rc.decodes == 2 and rc.stats()['cached'] == 1
+
+    path.unlink()
+    with pytest.raises(FileNotFoundError):
+        rc.load_path(path)
+
+
+def test_default_size_and_training_opt_in(monkeypatch):
+    monkeypatch.delenv(rcmod.RACE_CACHE_ENV, raising=False)
+    monkeypatch.setattr(rcmod, '_SHARED', None)
+    assert rcmod.RACE_CACHE_SIZE < rcmod.TRAINING_RACE_CACHE_SIZE
+    assert rcmod.shared_corpus().max_races == rcmod.RACE_CACHE_SIZE
+    assert rcmod.use_training_cache() is rcmod.shared_corpus()
+    assert rcmod.shared_corpus().max_races == rcmod.TRAINING_RACE_CACHE_SIZE
+
+    monkeypatch.setenv(rcmod.RACE_CACHE_ENV, '3')
+    assert rcmod.use_training_cache().max_races == 3
+
+
+def test_pipeline_decodes_each_file_once(corpus_dir):
+    from ml import experiment as ex
+    from ml.features.margin_target import add_margin_target_to_df
+
+    with corpus_dir.env():
+        history_cache, trainer_index, jockey_index, date_index, *_ = ex.load_data()
+        rc = RaceCorpus()
+        n_files = len(rc.race_files())
+        pace = ex.build_pace_index(date_index, corpus=rc)
+        assert pace == ex.build_pace_index(date_index, corpus=RaceCorpus(max_races=0))
+        jockey_tl = defaultdict(lambda: {'close': {'dates': [], 'wins': [], 'seconds': []}})
+        ex._build_close_timeline(jockey_tl, corpus=rc)
+        years = corpus_dir.years
+        df = ex.build_dataset(
+            date_index, history_cache, trainer_index, jockey_index,
+            pace, {}, years[0], years[-1], use_db_odds=False, corpus=rc,
+        )
+        add_margin_target_to_df(df, date_index, rc)
+        assert len(df) and df['target_margin'].notna().all()
+        assert rc.decodes == n_files
+        assert rc.hits >= 2 * n_files
@@ -32,6 +32,7 @@ def ledger_dir(tmp_path, monkeypatch):
 
 
 def _load(ledger_dir):
+    writer.ensure_view("2026-05-30")
     return json.loads((ledger_dir / "2026-05-30.json").read_text(encoding="utf-8"))
 
 
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""ml/utils/roi_cube (閾値グリッド ROI キューブ) のテスト
+
+検証:
+  - threshold_cube: 3 次元 (>= / <= 混在, None 閾値, NaN 値, 未ソート閾値) が
+    セルごとのブールマスク集計と一致
+  - roi_cube: count / 的中 / ROI が素朴実装と一致、 keep_empty / extra 列
+  - Bootstrap CI: seed で決定的、 CI が点推定を挟む
+  - experiment の calc_gap_ard_grid / calc_value_bet_analysis がセル別マスク集計と一致
+"""
+
+import sys
+from itertools import product
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from ml.utils.roi_cube import Axis, roi_cube, threshold_cube
+
+
+def _frame(n_races=120, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for r in range(n_races):
+        n = int(rng.integers(8, 15))
+        fin = rng.permutation(n) + 1
+        odds = np.round(rng.gamma(1.5, 12, n) + 1.1, 1)
+        for k in range(n):
+            rows.append({
+                "race_id": f"R{r:04d}", "is_win": int(fin[k] == 1), "is_top3": int(fin[k] <= 3),
+                "odds": odds[k], "pred_proba_p": rng.random(),
+                "ar_deviation": rng.normal(50, 10) if rng.random() > 0.1 else np.nan,
+                "pred_margin_ar": rng.gamma(2, 0.4),
+                "place_odds_low": np.round(odds[k] / 3, 1) if rng.random() > 0.3 else np.nan,
+            })
+    df = pd.DataFrame(rows)
+    df["pred_rank_p"] = df.groupby("race_id")["pred_proba_p"].rank(ascending=False, method="min")
+    df["odds_rank"] = df.groupby("race_id")["odds"].rank(method="min")
+    return df
+
+
+def _passes(x, t, op):
+    if t is None:
+        return np.ones(len(x), dtype=bool)
+    return (x >= t) if op == ">=" else (x <= t)
+
+
+def test_threshold_cube_matches_masks_3d():
+    rng = np.random.default_rng(1)
+    n = 500
+    xs = [rng.normal(0, 1, n), rng.integers(0, 10, n).astype(float), rng.random(n)]
+    xs[0][::17] = np.nan
+    axes = [Axis("a", [0.5, None, -1.0, 0.0]),
+            Axis("b", [3, 7, 5, 3], op="<="),
+            Axis("c", [None, 0.25, 0.9], op="<=")]
+    w = rng.random(n)
+    cube = threshold_cube(xs, axes, {"n": np.ones(n), "w": w})
+    assert cube["n"].shape == (4, 4, 3)
+    for idx in product(*(range(len(ax.thresholds)) for ax in axes)):
+        m = np.ones(n, dtype=bool)
+        for x, ax, i in zip(xs, axes, idx):
+            m &= _passes(x, ax.thresholds[i], ax.op)
+        assert cube["n"][idx] == m.sum(), idx
+        assert cube["w"][idx] == pytest.approx(w[m].sum())
+
+
+def test_roi_cube_matches_naive_and_keep_empty():
+    df = _frame()
+    gap = (df["odds_rank"] - df["pred_rank_p"]).to_numpy()
+    place = df["place_odds_low"].fillna(0).to_numpy()
+    cells = roi_cube(df, [Axis("gap", [3, 6, 99], key="min_gap"),
+                          Axis("pred_margin_ar", [0.8, None], op="<=", key="max_margin")],
+                     mask=(df["pred_rank_p"] <= 3).to_numpy(), extra={"gap": gap},
+                     place_odds=place)
+    assert [(c["min_gap"], c["max_margin"]) for c in cells] == \
+        [(3, 0.8), (3, None), (6, 0.8), (6, None)]            # gap>=99 は空 → 出力なし
+    for c in cells:
+        m = (df["pred_rank_p"] <= 3) & (gap >= c["min_gap"])
+        if c["max_margin"] is not None:
+            m &= df["pred_margin_ar"] <= c["max_margin"]
+        sub = df[m]
+        assert c["count"] == len(sub)
+        assert c["win_hits"] == int(sub["is_win"].sum())
+        assert c["win_roi"] == round(sub.loc[sub["is_win"] == 1, "odds"].sum() / len(sub) * 100, 1)
+        assert c["place_roi"] == round(place[m.to_numpy() & (df["is_top3"] == 1).to_numpy()].sum()
+                                       / len(sub) * 100, 1)
+    full = roi_cube(df, [Axis("gap", [3, 99], key="min_gap")], extra={"gap": gap},
+                    keep_empty=True)
+    assert full[1] == {"min_gap": 99, "count": 0, "win_hits": 0, "win_roi": 0,
+                       "place_hits": 0, "place_roi": 0}
+
+
+def test_bootstrap_ci_deterministic_and_brackets_estimate():
+    df = _frame(n_races=200)
+    axes = [Axis("ar_deviation", [None, 50, 60], key="min_ard")]
+    place = df["place_odds_low"].fillna(1.1).to_numpy()
+    a = roi_cube(df, axes, place_odds=place, bootstrap_n=200, seed=7)
+    b = roi_cube(df, axes, place_odds=place, bootstrap_n=200, seed=7)
+    assert a == b
+    for c in a:
+        assert c["win_roi_ci_low"] <= c["win_roi"] <= c["win_roi_ci_high"]
+        assert c["place_roi_ci_low"] <= c["place_roi"] <= c["place_roi_ci_high"]
+    assert a[0]["win_roi_ci_high"] - a[0]["win_roi_ci_low"] > 0
+
+
+def test_experiment_grids_match_cellwise_masks():
+    from ml import experiment as ex
+
+    df = _frame()
+    grid = ex.calc_gap_ard_grid(df)
+    assert grid and {"min_gap", "min_ard", "count", "win_roi", "place_roi"} <= set(grid[0])
+    for c in grid:
+        m = (df["pred_rank_p"] <= 3) & (df["odds_rank"] >= df["pred_rank_p"] + c["min_gap"])
+        if c["min_ard"] is not None:
+            m &= df["ar_deviation"] >= c["min_ard"]
+        sub = df[m]
+        assert c["count"] == len(sub) and c["place_hits"] == int(sub["is_top3"].sum())
+
+    vb = ex.calc_value_bet_analysis(df)
+    assert [v["min_gap"] for v in vb] == [2, 3, 4, 5]
+    for v in vb:
+        m = (df["pred_rank_p"] <= 3) & (df["odds_rank"] >= df["pred_rank_p"] + v["min_gap"])
+        sub = df[m]
+        win_roi = round(sub.loc[sub["is_win"] == 1, "odds"].sum() / len(sub) * 100, 1) if len(sub) else 0
+        assert (v["bet_count"], v["win_roi"]) == (len(sub), win_roi)
+
+    fine = ex.calc_gap_ard_grid_fine(df, bootstrap_n=20)
+    coarse = {(c["min_gap"], c["min_ard"]): c for c in grid}
+    for c in fine:
+        key = (c["min_gap"], c["min_ard"])
+        if key in coarse:
+            assert c["count"] == coarse[key]["count"] and c["win_roi"] == coarse[key]["win_roi"]
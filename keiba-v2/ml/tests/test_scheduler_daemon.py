@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""scheduler_daemon (常駐モード) のテスト
+
+検証:
+  - PlanCache: predictions.json の mtime が変わった時だけ再読込・再派生
+  - RaceDayDaemon: 擬似時計で 1 日を回し、 投票時刻ちょうどに該当レースだけ発火
+  - 投票済みは再発火しない / 窓内未投票は plan 更新時のみ再評価 / 締切後 1 回で打ち止め
+  - 投票失敗 (exit_code != 0) は plan 更新なしでもバックオフで再試行 (締切・上限回数まで)
+  - halted で常駐終了、 ロック保持中は別プロセスが入れない
+  - _run_pass_inner(only_races=...) は対象レース以外を評価しない
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+from ml.strategies import bettype_scheduler as bsch
+from ml.strategies import scheduler_daemon as sd
+from ml.strategies.freebudget_scheduler import acquire_lock, release_lock
+
+DATE = "2026-05-31"
+R1, R2 = "2026053105020101", "2026053105020102"
+
+
+class _Clock:
+    def __init__(self, t):
+        self.t = t
+        self.sleeps = []
+
+    def now(self):
+        return self.t
+
+    async def sleep(self, sec):
+        self.sleeps.append(sec)
+        self.t += timedelta(seconds=sec)
+        await asyncio.sleep(0)
+
+
+def _daemon(tmp_path, clock, fire, *, version=lambda: 1, post_times=None):
+    return sd.RaceDayDaemon(
+        DATE, lock_path=tmp_path / "x.lock",
+        load_post_times=lambda: post_times or {R1: "10:10", R2: "10:40"},
+        fire=fire, plan_version=version, now_fn=clock.now, sleep=clock.sleep,
+        verbose=False)
+
+
+def test_plan_cache_reloads_only_on_mtime_change(tmp_path):
+    p = tmp_path / "predictions.json"
+    p.write_text("{}", encoding="utf-8")
+    calls = []
+    cache = sd.PlanCache(p, lambda: {"n": len(calls)}, derive=lambda d: calls.append(d) or 7)
+    assert cache.get() == ({"n": 0}, 7)
+    cache.get()
+    assert cache.n_loads == 1
+    st = p.stat()
+    os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert cache.get() == ({"n": 1}, 7)
+    assert cache.n_loads == 2
+
+
+def test_race_windows_skip_unknown_post_time():
+    w = sd.race_windows(DATE, {R1: "10:10", R2: ""})
+    assert list(w) == [R1]
+    vote_at, deadline = w[R1]
+    assert (vote_at.hour, vote_at.minute) == (10, 4)
+    assert (deadline.hour, deadline.minute) == (10, 8)
+
+
+def test_daemon_fires_each_race_at_vote_time(tmp_path):
+    clock = _Clock(datetime(2026, 5, 31, 9, 0))
+    fired = []
+
+    def fire(now, only, post_times):
+        fired.append((now, set(only)))
+        return {"voted": [(r, {"exit_code": 0}) for r in only if now <= datetime(2026, 5, 31, 11)],
+                "skipped": [], "halted": False}
+
+    out = asyncio.run(_daemon(tmp_path, clock, fire).run())
+    assert fired == [(datetime(2026, 5, 31, 10, 4), {R1}),
+                     (datetime(2026, 5, 31, 10, 34), {R2})]
+    assert out["passes"] == 2 and not out["halted"]
+    assert not (tmp_path / "x.lock").exists()       # 終了時にロック解放
+
+
+def test_daemon_reevaluates_only_on_plan_update_then_closes_after_deadline(tmp_path):
+    clock = _Clock(datetime(2026, 5, 31, 10, 0))
+    ver = {"v": 1}
+    fired = []
+
+    def fire(now, only, post_times):
+        fired.append((now, set(only), ver["v"]))
+        if now == datetime(2026, 5, 31, 10, 4):
+            ver["v"] = 2                 # 直後に vb_refresh がオッズ更新した想定
+        return {"voted": [], "skipped": [], "halted": False}
+
+    asyncio.run(_daemon(tmp_path, clock, fire, version=lambda: ver["v"],
+                        post_times={R1: "10:10"}).run())
+    times = [t for t, _, _ in fired]
+    assert times[0] == datetime(2026, 5, 31, 10, 4)
+    assert times[1] <= datetime(2026, 5, 31, 10, 4, 20)   # 更新を poll 間隔内に拾う
+    assert times[-1] > datetime(2026, 5, 31, 10, 8)      # 締切後 1 回 (missed 記録)
+    assert len(fired) == 3
+
+
+def test_daemon_retries_failed_vote_with_backoff(tmp_path):
+    clock = _Clock(datetime(2026, 5, 31, 10, 0))
+    fired = []
+
+    def fire(now, only, post_times):
+        fired.append(now)
+        ok = len(fired) >= 3             # 2 回失敗 → 3 回目で成功
+        return {"voted": [(r, {"exit_code": 0 if ok else 1}) for r in only],
+                "skipped": [], "halted": False}
+
+    out = asyncio.run(_daemon(tmp_path, clock, fire, post_times={R1: "10:10"}).run())
+    t0 = datetime(2026, 5, 31, 10, 4)
+    assert fired == [t0, t0 + timedelta(seconds=15), t0 + timedelta(seconds=45)]
+    assert [r["exit_code"] for _, r in out["voted"]] == [1, 1, 0]
+
+
+def test_daemon_retry_stops_at_limit_and_deadline(tmp_path):
+    clock = _Clock(datetime(2026, 5, 31, 10, 0))
+    fired = []
+
+    def fire(now, only, post_times):
+        fired.append(now)
+        return {"voted": [(r, {"exit_code": 2}) for r in only],
+                "skipped": [], "halted": False}
+
+    daemon = _daemon(tmp_path, clock, fire, post_times={R1: "10:10"})
+    daemon.retry_limit = 2
+    asyncio.run(daemon.run())
+    t0 = datetime(2026, 5, 31, 10, 4)
+    # 初回 + 再試行 2 回、 以降は締切後の 1 パス (missed 記録) だけ
+    assert fired[:3] == [t0, t0 + timedelta(seconds=15), t0 + timedelta(seconds=45)]
+    assert len(fired) == 4 and fired[-1] > datetime(2026, 5, 31, 10, 8)
+
+
+def test_daemon_stops_when_halted(tmp_path):
+    clock = _Clock(datetime(2026, 5, 31, 10, 0))
+    fired = []
+
+    def fire(now, only, post_times):
+        fired.append(set(only))
+        return {"voted": [], "skipped": [], "halted": True}
+
+    out = asyncio.run(_daemon(tmp_path, clock, fire).run())
+    assert out["halted"] is True
+    assert fired == [{R1}]
+
+
+def test_daemon_locked_out_when_other_process_holds_lock(tmp_path):
+    lp = tmp_path / "x.lock"
+    assert acquire_lock(lp)
+    clock = _Clock(datetime(2026, 5, 31, 10, 0))
+    out = asyncio.run(_daemon(tmp_path, clock, lambda *a: {}).run())
+    assert out["locked_out"] is True
+    release_lock(lp)
+
+
+def test_bettype_inner_only_races_evaluates_subset(monkeypatch, tmp_path):
+    preds = {"races": [{"race_id": R1, "venue_name": "東京", "race_number": 1},
+                       {"race_id": R2, "venue_name": "東京", "race_number": 2}],
+             "vb_refreshed_at": None}
+    now = datetime(2026, 5, 31, 10, 5)
+    monkeypatch.setattr(bsch, "race_timing",
+                        lambda d, st, n: {"deadline": now + timedelta(minutes=3),
+                                          "vote_at": now - timedelta(minutes=1)})
+    monkeypatch.setattr(bsch, "read_per_race_cap", lambda: 3000)
+    monkeypatch.setattr(bsch, "read_day_budget", lambda: (0, ""))
+    monkeypatch.setattr(bsch, "save_state", lambda sp, st: None)
+    monkeypatch.setattr(bsch, "load_predictions",
+                        lambda dd: (_ for _ in ()).throw(AssertionError("reloaded")))
+    seen = []
+    monkeypatch.setattr(bsch, "size_one_race",
+                        lambda pr, **k: seen.append(pr["race_id"]) or None)
+    bsch._run_pass_inner(DATE, tmp_path, now=now, live=False, bankroll=10000,
+                         strategy="concentrate", ev_floor=1.0,
+                         sizing="anchor_kelly_combo_ev", per_day_max_yen=30000,
+                         login_timeout=180, verbose=False, predictions=preds,
+                         post_times={R1: "10:10", R2: "10:10"}, only_races={R2})
+    assert seen == [R2]
@@ -71,10 +71,9 @@ def _result(tid, payout, won, source="db"):
 
 @pytest.fixture
 def ledger_dir(tmp_path, monkeypatch):
-    """writer / settle_ledger 両方の LEDGER_DIR を tmp に向ける"""
+    """writer.LEDGER_DIR を tmp に向ける (settle_ledger は writer.ensure_view 経由で読む)"""
     d = tmp_path / "purchase_ledger"
     monkeypatch.setattr(writer, "LEDGER_DIR", d)
-    monkeypatch.setattr(settle_ledger, "LEDGER_DIR", d)
     return d
 
 
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""builders/build_sire_stats.py SireStatsStore ユニットテスト
+
+ストアから再構成した任意カットオフの統計が、カットオフ別に
+build_sire_stats() を回した結果と一致することを確認する。
+"""
+
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import pytest
+
+from builders.build_sire_stats import (
+    SireStatsStore, build_sire_stats, build_sire_stats_store,
+)
+
+
+def _synthetic_corpus(seed=0, n_days=40, n_horses=120):
+    rng = random.Random(seed)
+    pedigree = {}
+    for h in range(n_horses):
+        pedigree[f'H{h:04d}'] = {
+            'sire': f'S{rng.randrange(6):02d}',
+            'dam': f'D{rng.randrange(40):03d}' if rng.random() > 0.05 else None,
+            'bms': f'B{rng.randrange(8):02d}',
+        }
+    horses = list(pedigree) + ['UNKNOWN1', 'UNKNOWN2']
+    trends = ['sprint', 'even', 'sustained_hp', 'long_sprint', None, 'unknown']
+
+    races = []
+    month, day = 1, 1
+    for d in range(n_days):
+        day += rng.choice([1, 6])
+        if day > 28:
+            month, day = month + 1, 1
+        date = f'2024-{month:02d}-{day:02d}'
+        runners_today = rng.sample(horses, 60)
+        for r in range(rng.randint(1, 4)):
+            field = runners_today[r * 15:(r + 1) * 15][:rng.randint(5, 15)]
+            entries = []
+            for pos, kn in enumerate(field, start=1):
+                entries.append({
+                    'ketto_num': kn,
+                    'finish_position': 0 if rng.random() < 0.03 else pos,
+                    'age': rng.choice([2, 3, 4, 5, None]),
+                })
+            races.append({
+                'race_id': f'{date}_{r}',
+                'date': date,
+                'num_runners': len(entries),
+                'pace': {'rpci': rng.choice([46.0, 51.0, 54.0, None]),
+                         'race_trend_v2': rng.choice(trends)},
+                'entries': entries,
+            })
+    return races, pedigree
+
+
+def _strip_meta(stats):
+    meta = {k: v for k, v in stats['meta'].items()
+            if k not in ('built_at', 'cutoff', 'source', 'store_last_date', 'stale_days')}
+    return {'sire': stats['sire'], 'dam': stats['dam'], 'bms': stats['bms'], 'meta': meta}
+
+
+@pytest.fixture(scope='module')
+def corpus():
+    races, pedigree = _synthetic_corpus()
+    return races, pedigree, build_sire_stats_store(races, pedigree)
+
+
+class TestStatsAsOf:
+    def test_matches_per_cutoff_rebuild(self, corpus, capsys):
+        races, pedigree, store = corpus
+        dates = sorted({r['date'] for r in races})
+        for cutoff in (dates[0], dates[len(dates) // 3], dates[-2], dates[-1], '2030-01-01'):
+            expected = build_sire_stats([r for r in races if r['date'] <= cutoff], pedigree)
+            got = store.stats_as_of(cutoff)
+            assert _strip_meta(got) == _strip_meta(expected)
+            assert got['meta']['cutoff'] == cutoff
+
+    def test_cutoff_past_store_end(self, corpus, capsys):
+        races, _, store = corpus
+        last = max(r['date'] for r in races)
+        assert store.meta['last_date'] == last
+        capsys.readouterr()
+        got = store.stats_as_of(last)
+        assert got['meta']['stale_days'] == 0 and '[WARN]' not in capsys.readouterr().out
+
+        got = store.stats_as_of('2030-01-01')
+        assert got['meta']['stale_days'] == store.stale_days('2030-01-01') > 0
+        assert got['meta']['store_last_date'] == last
+        assert '[WARN]' in capsys.readouterr().out
+        with pytest.raises(ValueError, match='rebuild'):
+            store.stats_as_of('2030-01-01', strict=True)
+
+    def test_before_first_date_is_empty(self, corpus):
+        _, _, store = corpus
+        got = store.stats_as_of('2000-01-01')
+        assert got['sire'] == {} and got['dam'] == {} and got['bms'] == {}
+        assert got['meta']['total_races'] == 0
+
+
+class TestCountsAsOf:
+    def test_inclusive_vs_strict(self, corpus):
+        races, pedigree, store = corpus
+        date = sorted({r['date'] for r in races})[5]
+        sid = pedigree[races[0]['entries'][0]['ketto_num']]['sire']
+        incl = store.counts_as_of('sire', sid, date, inclusive=True)
+        strict = store.counts_as_of('sire', sid, date, inclusive=False)
+        ran_today = sum(
+            1 for r in races if r['date'] == date for e in r['entries']
+            if e['finish_position'] and e['ketto_num'] in pedigree
+            and pedigree[e['ketto_num']]['sire'] == sid)
+        assert incl['total_runs'] - (strict or {}).get('total_runs', 0) == ran_today
+
+    def test_unknown_entity(self, corpus):
+        _, _, store = corpus
+        assert store.counts_as_of('sire', 'NOPE', '2024-12-31') is None
+
+
+class TestPitTimelines:
+    def test_last_point_matches_place_counts(self, corpus):
+        races, pedigree, store = corpus
+        sire_tl, dam_tl, bms_tl = store.pit_timelines()
+        assert set(sire_tl) == set(store.kinds['sire']['ids'])
+        for sid, tl in sire_tl.items():
+            assert tl['dates'] == sorted(tl['dates'])
+            place = sum(
+                1 for r in races for e in r['entries']
+                if e['finish_position'] and e['ketto_num'] in pedigree
+                and pedigree[e['ketto_num']]['sire'] == sid
+                and e['finish_position'] <= (3 if r['num_runners'] >= 8 else 2))
+            assert tl['top3'][-1] == place
+            assert tl['total'] == sorted(tl['total'])
+
+    def test_matches_experiment_builder(self, corpus, monkeypatch):
+        """experiment.build_pit_sire_timeline() (レースJSON走査版) と完全一致"""
+        experiment = pytest.importorskip("ml.experiment")
+        races, pedigree, store = corpus
+        by_id = {r['race_id']: r for r in races}
+        date_index = {}
+        for r in races:
+            date_index.setdefault(r['date'], []).append(r['race_id'])
+        monkeypatch.setattr(experiment, 'load_race_json', lambda rid, date: by_id[rid])
+        expected = experiment.build_pit_sire_timeline(date_index, pedigree)
+        assert store.pit_timelines() == expected
+        assert experiment.build_pit_sire_timeline({}, pedigree, sire_store=store) == expected
+
+
+class TestPersistence:
+    def test_save_load_roundtrip(self, corpus, tmp_path):
+        _, _, store = corpus
+        path = tmp_path / 'sire_stats_timeline.npz'
+        store.save(path)
+        loaded = SireStatsStore.load(path)
+        assert loaded.stats_as_of('2024-03-01') == store.stats_as_of('2024-03-01')
+        assert loaded.meta == store.meta
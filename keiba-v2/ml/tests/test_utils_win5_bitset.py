@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""ml/utils/win5_bitset.py ユニットテスト"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import numpy as np
+import pytest
+
+from ml.utils.win5_bitset import (
+    build_win5_matrix, evaluate_masks, rank_prefix_masks,
+    search_leg_widths, selection_masks, summarize_evaluation, umaban_mask,
+)
+
+
+def _week(date, winners, payout, prefix='R'):
+    return {
+        'date': date,
+        'payout': payout,
+        'races': [{'race_id': f'{prefix}{date}_{i}', 'winner': w}
+                  for i, w in enumerate(winners)],
+    }
+
+
+def _preds(weeks, order):
+    """全レースで同じ順位 (order = 馬番リスト) の予測"""
+    idx = {}
+    for wk in weeks:
+        for r in wk['races']:
+            idx[r['race_id']] = {'order': list(order)}
+    return idx
+
+
+def _legacy_sim(weeks, pred_index, select_fn):
+    """win5_strategy_search の旧 Python ループ実装 (比較用)"""
+    out = []
+    for week in weeks:
+        sels = []
+        for race in week['races']:
+            pred = pred_index.get(race['race_id'])
+            sel = select_fn(pred) if pred else []
+            if not sel:
+                sels = None
+                break
+            sels.append(set(sel))
+        if sels is None:
+            continue
+        tickets = int(np.prod([len(s) for s in sels]))
+        hit = all(r['winner'] in sels[i] for i, r in enumerate(week['races']))
+        out.append((week['date'], tickets, hit, week['payout'] if hit else 0))
+    return out
+
+
+class TestUmabanMask:
+    def test_basic(self):
+        assert umaban_mask([1, 3]) == (1 << 1) | (1 << 3)
+
+    def test_empty_and_none(self):
+        assert umaban_mask([]) == 0
+        assert umaban_mask(None) == 0
+
+    def test_duplicates_and_out_of_range(self):
+        assert umaban_mask([2, 2, 0, -1, 99]) == 1 << 2
+
+
+class TestEvaluateMasks:
+    def setup_method(self):
+        self.weeks = [
+            _week('20250105', [1, 2, 3, 1, 2], 100000),
+            _week('20250112', [4, 1, 1, 1, 1], 500000),
+        ]
+        self.matrix = build_win5_matrix(self.weeks)
+
+    def test_hit_and_tickets(self):
+        preds = _preds(self.weeks, [1, 2, 3, 4, 5])
+        top3 = selection_masks(self.matrix, preds, lambda p: p['order'][:3])
+        ev = evaluate_masks(self.matrix, top3)
+        assert ev['tickets'].tolist() == [[243, 243]]
+        assert ev['hit'].tolist() == [[True, False]]
+        assert ev['payout'].tolist() == [[100000, 0]]
+        assert ev['covered'][0, 1].tolist() == [False, True, True, True, True]
+
+    def test_missing_pred_invalidates_week(self):
+        preds = _preds(self.weeks, [1, 2])
+        del preds['R20250112_3']
+        masks = selection_masks(self.matrix, preds, lambda p: p['order'])
+        ev = evaluate_masks(self.matrix, masks)
+        assert ev['valid'].tolist() == [[True, False]]
+        assert ev['tickets'][0, 1] == 0
+
+    def test_unknown_winner_not_played(self):
+        weeks = [_week('20250105', [1, 0, 1, 1, 1], 0)]
+        matrix = build_win5_matrix(weeks)
+        masks = selection_masks(matrix, _preds(weeks, [1]), lambda p: p['order'])
+        ev = evaluate_masks(matrix, masks)
+        assert not ev['valid'][0, 0]
+
+    def test_summary(self):
+        preds = _preds(self.weeks, [1, 2, 3, 4, 5])
+        masks = np.stack([
+            selection_masks(self.matrix, preds, lambda p: p['order'][:1]),
+            selection_masks(self.matrix, preds, lambda p: p['order'][:4]),
+        ])
+        summ = summarize_evaluation(evaluate_masks(self.matrix, masks))
+        assert summ['played'].tolist() == [2, 2]
+        assert summ['hits'].tolist() == [0, 2]
+        assert summ['total_cost'].tolist() == [200, 2 * 1024 * 100]
+        assert summ['total_payout'].tolist() == [0, 600000]
+        assert summ['roi'][1] == pytest.approx(600000 / 204800)
+
+    def test_matches_legacy_loop(self):
+        rng = np.random.default_rng(0)
+        weeks = [_week(f'2025{i:04d}', rng.integers(1, 17, 5).tolist(),
+                       int(rng.integers(0, 10**7)))
+                 for i in range(60)]
+        preds = {}
+        for wk in weeks:
+            for r in wk['races']:
+                if rng.random() < 0.05:
+                    continue
+                preds[r['race_id']] = {'order': rng.permutation(16).tolist()}
+        preds = {k: {'order': [u + 1 for u in v['order']]} for k, v in preds.items()}
+        matrix = build_win5_matrix(weeks)
+        for n in (1, 3, 6):
+            fn = lambda p, n=n: p['order'][:n]
+            ev = evaluate_masks(matrix, selection_masks(matrix, preds, fn))
+            got = [(matrix.dates[w], int(ev['tickets'][0, w]), bool(ev['hit'][0, w]),
+                    int(ev['payout'][0, w]))
+                   for w in np.flatnonzero(ev['valid'][0])]
+            assert got == _legacy_sim(weeks, preds, fn)
+
+
+class TestRankPrefixMasks:
+    def test_prefix_accumulates(self):
+        weeks = [_week('20250105', [1, 1, 1, 1, 1], 0)]
+        matrix = build_win5_matrix(weeks)
+        prefix = rank_prefix_masks(matrix, _preds(weeks, [5, 2]), lambda p: p['order'], 3)
+        assert prefix.shape == (1, 5, 3)
+        assert prefix[0, 0].tolist() == [1 << 5, (1 << 5) | (1 << 2), (1 << 5) | (1 << 2)]
+
+
+class TestSearchLegWidths:
+    def setup_method(self):
+        # 勝ち馬の順位: R1=1位, R2=2位, R3=1位, R4=3位, R5=1位
+        order = [1, 2, 3, 4, 5, 6]
+        self.weeks = [_week('20250105', [1, 2, 1, 3, 1], 1_000_000)]
+        self.matrix = build_win5_matrix(self.weeks)
+        self.prefix = rank_prefix_masks(
+            self.matrix, _preds(self.weeks, order), lambda p: p['order'], 4)
+
+    def test_budget_and_hit(self):
+        found = search_leg_widths(self.matrix, self.prefix, max_avg_tickets=6)
+        assert found
+        assert found[0]['widths'] == (1, 2, 1, 3, 1)
+        assert found[0]['avg_tickets'] == 6
+        assert found[0]['total_payout'] == 1_000_000
+        assert all(r['avg_tickets'] <= 6 for r in found)
+
+    def test_budget_too_tight(self):
+        assert search_leg_widths(self.matrix, self.prefix, max_avg_tickets=5) == []
+
+    def test_leg_class(self):
+        # 自信度クラス: R1/R3/R5 = 0, R2/R4 = 1
+        leg_class = np.array([[0, 1, 0, 1, 0]])
+        found = search_leg_widths(self.matrix, self.prefix, max_avg_tickets=9,
+                                  leg_class=leg_class)
+        assert found[0]['widths'] == (1, 3)
+        assert found[0]['avg_tickets'] == 9
+
+
+# ---------------------------------------------------------------------------
+# win5_strategy_search.simulate — 移行前の実装とのパリティ
+# ---------------------------------------------------------------------------
+
+def _legacy_strategy_search_simulate(weeks, pred_index, strategies):
+    """移行前の win5_strategy_search.simulate (集計部分のみ)"""
+    results = {}
+    for sname, select_fn in strategies.items():
+        week_results = []
+        for week in weeks:
+            race_sels = []
+            skip = False
+            for race in week['races']:
+                pred = pred_index.get(race['race_id'])
+                if not pred:
+                    race_sels.append([])
+                    continue
+                sel = select_fn(pred)
+                if sel is None:
+                    skip = True
+                    break
+                race_sels.append(list(set(sel)))
+            if skip or len(race_sels) < 5 or any(len(s) == 0 for s in race_sels):
+                continue
+            tickets = 1
+            for s in race_sels:
+                tickets *= len(s)
+            hit = all(
+                race['winner'] in race_sels[i]
+                for i, race in enumerate(week['races'])
+                if race['winner'] > 0
+            ) and all(r['winner'] > 0 for r in week['races'])
+            week_results.append({
+                'date': week['date'], 'tickets': tickets, 'cost': tickets * 100,
+                'hit': hit, 'payout': week['payout'] if hit else 0,
+                'covered': [race['winner'] in race_sels[i]
+                            for i, race in enumerate(week['races'])],
+            })
+        if not week_results:
+            continue
+        hits = [r for r in week_results if r['hit']]
+        total_cost = sum(r['cost'] for r in week_results)
+        results[sname] = {
+            'played': len(week_results),
+            'hits': len(hits),
+            'total_cost': total_cost,
+            'total_payout': sum(r['payout'] for r in hits),
+            'hit_dates': [r['date'] for r in hits],
+            'median_tickets': float(np.median([r['tickets'] for r in week_results])),
+            'avg_covered': float(np.mean([sum(r['covered']) for r in week_results])),
+        }
+    return results
+
+
+def test_strategy_search_simulate_matches_legacy():
+    from ml.win5_strategy_search import simulate
+
+    rng = np.random.default_rng(1)
+    weeks = []
+    for i in range(80):
+        winners = rng.integers(1, 17, 5).tolist()
+        if rng.random() < 0.05:
+            winners[int(rng.integers(0, 5))] = 0         # 勝ち馬不明
+        weeks.append(_week(f'2024{i:04d}', winners, int(rng.integers(0, 10**7))))
+    preds = {}
+    for wk in weeks:
+        for r in wk['races']:
+            if rng.random() < 0.03:
+                continue
+            preds[r['race_id']] = {'order': (rng.permutation(16) + 1).tolist(),
+                                   'conf': float(rng.random())}
+
+    strategies = {
+        'top1': lambda p: p['order'][:1],
+        'top3': lambda p: p['order'][:3],
+        'dup': lambda p: p['order'][:2] + p['order'][:1],           # 重複は除く
+        'skip_low': lambda p: None if p['conf'] < 0.1 else p['order'][:2],
+        'empty_low': lambda p: [] if p['conf'] < 0.1 else p['order'][:4],
+        'never': lambda p: None,
+    }
+    got = simulate(weeks, preds, strategies)
+    want = _legacy_strategy_search_simulate(weeks, preds, strategies)
+    assert set(got) == set(want) and 'never' not in got
+    for name, w in want.items():
+        g = got[name]
+        for k, v in w.items():
+            assert g[k] == pytest.approx(v) if isinstance(v, float) else g[k] == v, (name, k)
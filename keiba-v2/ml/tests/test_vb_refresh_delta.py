@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""vb_refresh の差分駆動テスト
+
+検証:
+  - races_to_fetch: 最終スナップショット時刻が進んだ/不明なレースだけ取得
+  - odds_fingerprint: 同値なら同じ、 1頭でも変われば異なる
+  - predictions.json が外部で書き換えられたら state を捨てて全レース再計算
+  - main 2 回目: 変化なしなら refresh_race_vb も書き込みも走らない / 1 レース変化でそのレースだけ
+"""
+import json
+import sys
+from datetime import datetime
+
+import pytest
+
+import core.odds_db as odds_db
+from ml import vb_refresh as vr
+
+DATE = "2026-05-31"
+R1, R2 = "2026053105020101", "2026053105020102"
+
+
+def test_races_to_fetch_by_snapshot_time():
+    prev = {R1: {"win": "05311000", "place": "05311000"},
+            R2: {"win": "05311000", "place": "05311000"}}
+    times = {R1: {"win": "05311000", "place": "05311000"},
+             R2: {"win": "05311001", "place": "05311000"}}
+    assert vr.races_to_fetch([R1, R2], times, prev) == [R2]
+    assert vr.races_to_fetch([R1], {R1: {"win": None, "place": None}}, prev) == [R1]
+    assert vr.races_to_fetch([R1], times, {}) == [R1]
+
+
+def test_odds_fingerprint_value_sensitive():
+    a = vr.odds_fingerprint({1: {"odds": 3.5}, 2: {"odds": 8.0}}, {1: {"odds_low": 1.2,
+                                                                     "odds_high": 1.5}})
+    b = vr.odds_fingerprint({2: {"odds": 8.0}, 1: {"odds": 3.5}}, {1: {"odds_low": 1.2,
+                                                                     "odds_high": 1.5}})
+    c = vr.odds_fingerprint({1: {"odds": 3.6}, 2: {"odds": 8.0}}, {1: {"odds_low": 1.2,
+                                                                     "odds_high": 1.5}})
+    assert a == b != c
+
+
+def _entry(umaban, odds):
+    return {"umaban": umaban, "horse_name": f"H{umaban}", "odds": odds, "rank_p": umaban,
+            "rank_w": umaban, "pred_proba_w_cal": 0.3, "pred_proba_p_raw": 0.5}
+
+
+@pytest.fixture
+def day(tmp_path, monkeypatch):
+    monkeypatch.setattr(vr.config, "races_dir", lambda: tmp_path)
+    day_dir = tmp_path / "2026" / "05" / "31"
+    day_dir.mkdir(parents=True)
+    preds = {"races": [{"race_id": R1, "entries": [_entry(1, 3.0), _entry(2, 5.0)]},
+                       {"race_id": R2, "entries": [_entry(1, 2.0), _entry(2, 9.0)]}],
+             "summary": {}}
+    (day_dir / "predictions.json").write_text(json.dumps(preds), encoding="utf-8")
+
+    db = {"times": {R1: {"win": "05311000", "place": "05311000"},
+                    R2: {"win": "05311000", "place": "05311000"}},
+          "win": {R1: {1: {"odds": 3.2}, 2: {"odds": 4.8}}, R2: {1: {"odds": 2.1}}},
+          "fetched": []}
+    monkeypatch.setattr(odds_db, "is_db_available", lambda: True)
+    monkeypatch.setattr(odds_db, "batch_get_latest_odds_times",
+                        lambda codes: {rc: dict(db["times"][rc]) for rc in codes})
+
+    def _win(codes):
+        db["fetched"].append(sorted(codes))
+        return {rc: db["win"][rc] for rc in codes}
+    monkeypatch.setattr(odds_db, "batch_get_pre_race_odds", _win)
+    monkeypatch.setattr(odds_db, "batch_get_place_odds", lambda codes: {})
+    monkeypatch.setattr(vr, "apply_bet_engine", lambda data, budget: {})
+    monkeypatch.setattr(vr, "save_bets", lambda date, data: None)
+    refreshed = []
+    orig = vr.refresh_race_vb
+    monkeypatch.setattr(vr, "refresh_race_vb",
+                        lambda race, o, p: refreshed.append(race["race_id"]) or orig(race, o, p))
+    monkeypatch.setattr(sys, "argv", ["vb_refresh", "--date", DATE])
+    return day_dir, db, refreshed
+
+
+def test_delta_main_skips_unchanged_and_refreshes_changed(day):
+    day_dir, db, refreshed = day
+    pred_path = day_dir / "predictions.json"
+
+    vr.main()                                           # 初回 = 全レース
+    assert sorted(refreshed) == [R1, R2]
+    first = json.loads(pred_path.read_text(encoding="utf-8"))
+    assert first["races"][0]["entries"][0]["odds"] == 3.2
+    assert first["vb_refreshed_at"]
+
+    refreshed.clear()
+    db["fetched"].clear()
+    mtime = pred_path.stat().st_mtime_ns
+    vr.main()                                           # 変化なし
+    assert refreshed == [] and db["fetched"] == []
+    assert pred_path.stat().st_mtime_ns == mtime        # 書き込みなし
+
+    db["times"][R2] = {"win": "05311001", "place": "05311001"}
+    db["win"][R2] = {1: {"odds": 2.4}}
+    vr.main()                                           # R2 だけ変化
+    assert db["fetched"] == [[R2]]
+    assert refreshed == [R2]
+    out = json.loads(pred_path.read_text(encoding="utf-8"))
+    assert out["races"][1]["entries"][0]["odds"] == 2.4
+    assert out["races"][0]["entries"][0]["odds"] == 3.2
+
+
+def test_delta_main_full_recompute_when_predictions_rewritten(day):
+    day_dir, db, refreshed = day
+    vr.main()
+    refreshed.clear()
+    pred_path = day_dir / "predictions.json"
+    data = json.loads(pred_path.read_text(encoding="utf-8"))
+    data["model_version"] = "new"
+    pred_path.write_text(json.dumps(data), encoding="utf-8")   # predict が再出力した想定
+    vr.main()
+    assert sorted(refreshed) == [R1, R2]
+
+
+def test_heartbeat_updates_timestamp_when_stale(day):
+    day_dir, db, refreshed = day
+    vr.main()
+    pred_path = day_dir / "predictions.json"
+    data = json.loads(pred_path.read_text(encoding="utf-8"))
+    data["vb_refreshed_at"] = "2026-05-31T09:00:00"
+    vr.write_text_atomic(pred_path, json.dumps(data))
+    state = json.loads((day_dir / vr.REFRESH_STATE_NAME).read_text(encoding="utf-8"))
+    vr.save_refresh_state(day_dir, pred_path, state)     # 自分の書き込みとして署名
+    refreshed.clear()
+    vr.main()
+    assert refreshed == []
+    out = json.loads(pred_path.read_text(encoding="utf-8"))
+    assert datetime.fromisoformat(out["vb_refreshed_at"]) > datetime(2026, 5, 31, 9, 0)
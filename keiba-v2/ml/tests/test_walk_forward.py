@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""ml/experiment_walk_forward (全期間データセット 1 回構築 → ローリング窓並列学習) のテスト
+
+検証:
+  - make_folds の rolling / expanding / step 指定の期間、 年またぎ、 test 窓の重なり判定
+  - 並列 (スレッド) 実行と逐次実行で fold ごとの指標が一致
+  - 空期間の fold は skipped、 レポート JSON に内部用 DataFrame が混ざらない
+  - 血統特徴量は fold ごとに test 開始前日時点の統計で差し替え (test 期間のリークなし)
+  - 再利用 pickle は span / 構築オプションを照合
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+pytest.importorskip("lightgbm")
+
+from ml import experiment_walk_forward as wf
+
+FEATS = ['f0', 'f1', 'f2', 'f3']
+
+
+def test_make_folds_rolling_and_expanding():
+    folds = wf.make_folds(202401, 3, train_months=24, val_months=2, test_months=1)
+    assert [f.test for f in folds] == [(202401, 202401), (202402, 202402), (202403, 202403)]
+    assert folds[0].val == (202311, 202312) and folds[0].train == (202111, 202310)
+    assert folds[2].train == (202201, 202312)
+    assert not wf.folds_overlap(folds)
+
+    exp = wf.make_folds(202411, 3, train_months=12, test_months=3, expanding=True)
+    assert [f.test for f in exp] == [(202411, 202501), (202502, 202504), (202505, 202507)]
+    assert {f.train[0] for f in exp} == {202310} and exp[2].train[1] == 202503
+    assert wf.folds_overlap(wf.make_folds(202401, 3, test_months=3, step_months=1))
+    assert wf.make_folds(202401, 2)[0].to_dict()['test'] == '2024-01 ~ 2024-01'
+
+
+def _synthetic(n_months=10, races_per_month=25, field=10, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for m in range(n_months):
+        ym = wf._ym_add(202301, m)
+        for r in range(races_per_month):
+            x = rng.normal(size=(field, len(FEATS)))
+            strength = x[:, 0] + 0.5 * x[:, 1] + rng.normal(scale=0.7, size=field)
+            order = np.argsort(-strength).argsort() + 1
+            odds = np.round(np.exp(1 + 0.6 * rng.normal(size=field) - 0.5 * x[:, 0]) + 1.2, 1)
+            for i in range(field):
+                rows.append({
+                    'race_id': f"{ym}{r:04d}", 'date': f"{ym // 100}-{ym % 100:02d}-{r % 28 + 1:02d}",
+                    **{f: x[i, j] for j, f in enumerate(FEATS)},
+                    'is_win': int(order[i] == 1), 'is_top3': int(order[i] <= 3),
+                    'odds': float(odds[i]), 'target_margin': float(order[i] - 1) * 0.2,
+                })
+    df = pd.DataFrame(rows)
+    df['odds_rank'] = df.groupby('race_id')['odds'].rank(method='min')
+    return df
+
+
+def _run(df, folds, parallel):
+    params = {k: {'objective': 'binary', 'metric': 'auc', 'num_leaves': 7, 'learning_rate': 0.1,
+                  'verbose': -1, 'seed': 1, 'deterministic': True} for k in ('p', 'w')}
+    params['ar'] = {'objective': 'huber', 'metric': 'mae', 'num_leaves': 7, 'learning_rate': 0.1,
+                    'verbose': -1, 'seed': 1, 'deterministic': True}
+    return wf.run_folds(folds, df, parallel=parallel,
+                        features={k: FEATS for k in wf.MODELS}, params=params,
+                        threads=1, num_boost_round=30, bootstrap_n=50)
+
+
+def test_parallel_matches_serial_and_report(tmp_path):
+    df = _synthetic()
+    folds = wf.make_folds(202307, 4, train_months=4, val_months=1, test_months=1)
+    folds.append(wf.Fold(4, (202201, 202202), (202203, 202203), (202204, 202204)))  # データ無し
+    serial = _run(df, folds, parallel=1)
+    par = _run(df, folds, parallel=3)
+
+    def strip(rs):
+        return [{k: v for k, v in r.items() if k not in ('_test', 'elapsed_sec')} for r in rs]
+    assert strip(serial) == strip(par)
+    assert serial[4]['skipped'] and all('skipped' not in r for r in serial[:4])
+    assert serial[0]['p']['metrics']['auc'] > 0.6
+    vb = serial[0]['p']['roi']['vb']
+    assert [c['min_gap'] for c in vb] == wf.VB_GAPS and 'place_roi_ci_low' in vb[0]
+    assert 'win_roi_ci_high' in serial[0]['w']['roi']['top1']
+
+    summary = wf.summarize(serial, wf.MODELS, pooled=True, bootstrap_n=50)
+    assert summary['n_trained'] == 4 and summary['p']['auc']['n'] == 4
+    assert summary['ar']['mae']['n'] == 4
+    pooled = summary['p']['pooled_roi']['top1']
+    assert pooled['count'] == sum(int((r['_test']['pred_rank_p'] == 1).sum()) for r in serial[:4])
+
+    path = wf.save_report(serial, summary, {'windows': 5}, out_dir=tmp_path)
+    report = json.loads(path.read_text(encoding='utf-8'))
+    assert len(report['folds']) == 5 and '_test' not in report['folds'][0]
+
+
+class _FakeSireStore:
+    """stats_as_of(cutoff) の cutoff 月を sire_top3_rate に入れて返すだけのストア"""
+
+    def __init__(self):
+        self.cutoffs = []
+
+    def stats_as_of(self, cutoff):
+        self.cutoffs.append(cutoff)
+        rate = int(cutoff[:4] + cutoff[5:7]) / 1e6
+        return {'sire': {'S1': {'top3_rate': rate}}, 'dam': {}, 'bms': {}}
+
+
+def test_pedigree_recomputed_per_fold():
+    df = _synthetic(n_months=6)
+    df['ketto_num'] = np.where(np.arange(len(df)) % 2 == 0, 'H1', 'H2')
+    df['sire_top3_rate'] = 9.9                                # 全期間統計 (リークあり) の値
+    folds = wf.make_folds(202305, 2, train_months=3, val_months=1, test_months=1)
+    assert [wf.fold_sire_cutoff(f) for f in folds] == ['2023-04-30', '2023-05-31']
+    assert wf.fold_sire_cutoff(wf.make_folds(202401, 1)[0]) == '2023-12-31'
+
+    store = _FakeSireStore()
+    ped = wf.make_fold_pedigree(store, {'H1': {'sire': 'S1'}}, df['ketto_num'])
+    frame = ped(folds[1])
+    assert store.cutoffs == ['2023-05-31']
+    assert frame.loc['H1', 'sire_top3_rate'] == 202305 / 1e6
+    assert np.isnan(frame.loc['H2', 'sire_top3_rate'])
+
+    part = wf._with_pedigree(df, frame)
+    assert set(part.loc[part['ketto_num'] == 'H1', 'sire_top3_rate']) == {202305 / 1e6}
+    assert part.loc[part['ketto_num'] == 'H2', 'sire_top3_rate'].isna().all()
+    assert (df['sire_top3_rate'] == 9.9).all()                # 元の df は書き換えない
+
+    params = {'p': {'objective': 'binary', 'metric': 'auc', 'num_leaves': 7,
+                    'learning_rate': 0.1, 'verbose': -1, 'seed': 1}}
+    res = wf.run_folds(folds, df, features={'p': FEATS + ['sire_top3_rate']}, params=params,
+                       models=('p',), threads=1, num_boost_round=10, bootstrap_n=10,
+                       pedigree=ped)
+    assert [r['sire_cutoff'] for r in res] == ['2023-04-30', '2023-05-31']
+
+
+def test_check_dataset_span_and_options():
+    df = _synthetic(n_months=1, races_per_month=1)
+    opts = wf.dataset_options((202301, 202312), sire_cutoff='2022-12-31', with_margin=False)
+    assert wf.check_dataset(df, opts) == ['構築条件の記録なし (旧形式の pickle)']
+
+    df.attrs['walk_forward'] = opts
+    assert wf.check_dataset(df, opts) == []
+    assert wf.check_dataset(df, dict(opts, span=[202302, 202310])) == []   # 内側の span は可
+    probs = wf.check_dataset(df, dict(opts, span=[202212, 202312]))
+    assert len(probs) == 1 and probs[0].startswith('span 2023-01 ~ 2023-12')
+    probs = wf.check_dataset(df, dict(opts, use_db_odds=False, sire_cutoff=None))
+    assert [p.split(':')[0] for p in probs] == ['use_db_odds', 'sire_cutoff']
+    probs = wf.check_dataset(df, dict(opts, with_margin=True))
+    assert probs == ['target_margin なし (AR 学習に必要)']
@@ -10,4 +10,6 @@ Modules:
     roi             — calc_roi/bootstrap_ci/sharpe/sortino/max_drawdown/brier/ece
     backtest_cache  — load_backtest_cache/flatten_to_df/cache_to_predictions
     race_io         — iter_date_dirs/iter_predictions/load_race_results
+    win5_bitset     — WIN5 馬番ビットマスク評価/レッグ幅探索
+    lgb_dataset_cache — ビン化済み LightGBM Dataset の共有/ディスクキャッシュ
 """
@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""LightGBM ビン化済み Dataset の共有キャッシュ
+
+train_model / train_regression_model / optuna objective は、 これまでモデルごとに
+lgb.Dataset(X_train, ...) を pandas から構築しており、 同じ特徴量行列が
+P (is_top3) / W (is_win) / AR (target_margin) で毎回ビン化されていた。
+
+ここでは「特徴量リスト + データ指紋 + Dataset パラメータ」をキーにして、
+ラベル無しのビン化済み Dataset (base) を 1 回だけ構築し、 モデルごとの
+学習/検証セットは base.subset(rows) にラベル・重みを差し替えて派生させる。
+cache_dir を指定すると base を LightGBM バイナリ (save_binary) で保存し、
+次回以降の実行ではビン境界の探索を丸ごと省略する (ディスク上は max_disk_bytes まで、
+古いものから削除)。
+
+注意:
+    - Dataset パラメータはモデルごとの学習パラメータから取る (dataset_params_of)。
+      ビン化設定に加え feature_pre_filter (既定 True) と、 それが True のときは
+      min_data_in_leaf (min_child_samples 等の別名も) もキーに入る。 pre-filter は
+      サポートの少ない特徴量 (低頻度フラグ等) を feature_fraction の抽選対象から
+      外すので、 ここを揃えないと直接構築と予測が一致しない。
+      P/W/AR でこれらが同じなら base を共有し、 違えば別の base になる。
+    - subset は行位置を昇順に並べ替えるが、 ラベル・重みは
+      rows の並び順で渡してよい (派生時に昇順へ並べ替える)。
+    - 検証セットは学習側 base を reference にしてビン化し、 同じく
+      (学習キー, 検証データ指紋) で 1 回だけ構築する。
+
+提供:
+    DatasetCache(cache_dir=None, bin_params=None, max_entries=None,
+                 max_disk_bytes=DISK_CACHE_MAX_BYTES, verbose=False)
+        .train_set(X, label, weight=None, rows=None, params=None) -> lgb.Dataset
+        .valid_set(X_val, label, train_set, weight=None, rows=None) -> lgb.Dataset
+        .stats() -> {'built', 'loaded', 'hits', 'derived', 'pruned'}
+    dataset_params_of(params) -> dict
+        — 学習パラメータのうち Dataset 構築に効くもの (LightGBM 既定値で補完)
+    frame_fingerprint(X) -> str
+        — 列名/dtype/値からの blake2b 指紋 (index は含めない)
+
+Usage:
+    cache = DatasetCache(config.ml_dir() / "cache" / "lgb_datasets")
+    dtr = cache.train_set(df_train[feats], df_train['is_top3'], params=params)
+    dvl = cache.valid_set(df_val[feats], df_val['is_top3'], dtr)
+    model = lgb.train(params, dtr, valid_sets=[dvl])
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# Dataset 構築時に効くパラメータ (学習パラメータから拾ってキーに含める)
+BIN_PARAM_KEYS = (
+    'max_bin', 'min_data_in_bin', 'bin_construct_sample_cnt',
+    'use_missing', 'zero_as_missing', 'linear_tree',
+)
+# min_data_in_leaf の別名 (feature_pre_filter=True のとき Dataset 側で使われる)
+MIN_DATA_IN_LEAF_ALIASES = (
+    'min_data_in_leaf', 'min_child_samples', 'min_data_per_leaf',
+    'min_data', 'min_samples_leaf',
+)
+LGB_DEFAULT_MIN_DATA_IN_LEAF = 20
+
+BASE_PARAMS = {'verbose': -1}
+
+DISK_CACHE_MAX_BYTES = 8 * 1024 ** 3     # ml/cache/lgb_datasets の上限 (古い .bin から削除)
+
+
+def frame_fingerprint(X: pd.DataFrame) -> str:
+    """DataFrame の列名・dtype・値から指紋を作る (index は無視)
+
+    数値列は生バイト、 それ以外は pd.util.hash_pandas_object で列ごとに
+    ハッシュするので、 全体を 1 つの ndarray にコピーしない。
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps([str(c) for c in X.columns]).encode('utf-8'))
+    h.update(str(len(X)).encode('ascii'))
+    for col in X.columns:
+        s = X[col]
+        h.update(str(s.dtype).encode('ascii'))
+        values = s.to_numpy()
+        if values.dtype.kind in 'biufcmM':
+            h.update(np.ascontiguousarray(values).tobytes())
+        else:
+            h.update(pd.util.hash_pandas_object(s, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def bin_params_of(params: Optional[dict]) -> dict:
+    """学習パラメータのうちビン境界に効くものだけを取り出す"""
+    if not params:
+        return {}
+    return {k: params[k] for k in BIN_PARAM_KEYS if k in params}
+
+
+def dataset_params_of(params: Optional[dict]) -> dict:
+    """学習パラメータのうち Dataset 構築に効くもの (lgb.train が Dataset に渡すのと同じ値)
+
+    feature_pre_filter は LightGBM 既定の True で補完し、 True のときだけ
+    min_data_in_leaf (別名を正規化、 既定 20) を含める。
+    """
+    params = params or {}
+    out = bin_params_of(params)
+    pre_filter = bool(params.get('feature_pre_filter', True))
+    out['feature_pre_filter'] = pre_filter
+    if pre_filter:
+        out['min_data_in_leaf'] = next(
+            (params[k] for k in MIN_DATA_IN_LEAF_ALIASES if k in params),
+            LGB_DEFAULT_MIN_DATA_IN_LEAF)
+    return out
+
+
+class DatasetCache:
+    """ビン化済み base Dataset のキャッシュと、 ラベル差し替えによる派生
+
+    base はプロセス内 dict に保持し、 cache_dir があればバイナリでも保存する。
+    max_entries を指定するとメモリ上の base 数を LRU で制限する (optuna のように
+    trial ごとに特徴量セットが変わる場合用。 追い出した base もディスクからは再読込できる)。
+    ディスク側は .bin の合計が max_disk_bytes を超えたら最終使用 (mtime) の古い順に消す
+    (読込時に mtime を更新する。 None で無制限)。
+    bin_params は全呼び出しに上書きで効く Dataset パラメータ (通常は不要)。
+    派生 Dataset (subset) は毎回新しく作るので、 呼び出し側で自由に
+    lgb.train に渡してよい (base 自体のラベル・重みは書き換えない)。
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None,
+                 bin_params: Optional[dict] = None, max_entries: Optional[int] = None,
+                 max_disk_bytes: Optional[int] = DISK_CACHE_MAX_BYTES,
+                 verbose: bool = False):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.bin_params = dict(bin_params or {})
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.verbose = verbose
+        self._bases: OrderedDict = OrderedDict()
+        self._keys: Dict[int, str] = {}     # id(base) → key (base は _bases が保持)
+        self._lock = threading.Lock()
+        self._stats = {'built': 0, 'loaded': 0, 'hits': 0, 'derived': 0, 'pruned': 0}
+
+    # ------------------------------------------------------------------
+    # キー
+    # ------------------------------------------------------------------
+
+    def dataset_params(self, params: Optional[dict] = None) -> dict:
+        """base の構築パラメータ (学習パラメータ由来 + bin_params)"""
+        return {**BASE_PARAMS, **dataset_params_of(params), **self.bin_params}
+
+    def key(self, X: pd.DataFrame, params: Optional[dict] = None) -> str:
+        """学習側 base のキー (特徴量リスト + データ + Dataset パラメータ)"""
+        h = hashlib.blake2b(digest_size=16)
+        h.update(frame_fingerprint(X).encode('ascii'))
+        h.update(json.dumps(self.dataset_params(params), sort_keys=True,
+                            default=str).encode('utf-8'))
+        return h.hexdigest()
+
+    # ------------------------------------------------------------------
+    # base 構築
+    # ------------------------------------------------------------------
+
+    def _log(self, msg: str):
+        if self.verbose:
+            print(f"  [DatasetCache] {msg}")
+
+    def _base(self, key: str, X: pd.DataFrame, ds_params: dict, reference=None):
+        import lightgbm as lgb
+
+        with self._lock:
+            ds = self._bases.get(key)
+            if ds is not None:
+                self._bases.move_to_end(key)
+                self._stats['hits'] += 1
+                return ds
+
+            path = self.cache_dir / f"{key}.bin" if self.cache_dir else None
+            if path is not None and path.exists():
+                ds = lgb.Dataset(str(path), reference=reference,
+                                 params=dict(ds_params)).construct()
+                if ds.num_data() == len(X) and ds.num_feature() == X.shape[1]:
+                    self._stats['loaded'] += 1
+                    self._log(f"loaded {path.name} ({len(X):,} rows)")
+                    os.utime(path)          # LRU 削除用に最終使用時刻を更新
+                else:
+                    ds = None
+            if ds is None:
+                # ラベルはダミー (subset の構築にラベルが必須なため)。 派生側で差し替える
+                ds = lgb.Dataset(X, label=np.zeros(len(X)), reference=reference,
+                                 params=dict(ds_params)).construct()
+                self._stats['built'] += 1
+                self._log(f"binned {len(X):,} rows x {X.shape[1]} features")
+                if path is not None:
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    tmp = path.with_name(path.name + '.tmp')
+                    ds.save_binary(str(tmp))
+                    os.replace(tmp, path)
+                    self._prune_disk(keep=path)
+            self._bases[key] = ds
+            self._keys[id(ds)] = key
+            while self.max_entries and len(self._bases) > self.max_entries:
+                _, old = self._bases.popitem(last=False)
+                self._keys.pop(id(old), None)
+            return ds
+
+    def _prune_disk(self, keep: Path):
+        """cache_dir の .bin 合計を max_disk_bytes 以下に (最終使用の古い順に削除)"""
+        if not self.max_disk_bytes:
+            return
+        files = []
+        for p in self.cache_dir.glob('*.bin'):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime_ns, st.st_size, p))
+        total = sum(size for _, size, _ in files)
+        for _, size, p in sorted(files, key=lambda t: t[0]):
+            if total <= self.max_disk_bytes:
+                break
+            if p == keep:
+                continue
+            try:
+                p.unlink()
+            except OSError:
+                continue
+            total -= size
+            self._stats['pruned'] += 1
+            self._log(f"pruned {p.name}")
+
+    def _derive(self, base, label, weight, rows):
+        y = np.asarray(label, dtype=np.float64)
+        w = None if weight is None else np.asarray(weight, dtype=np.float64)
+        if rows is None:
+            rows = np.arange(base.num_data())
+        else:
+            rows = np.asarray(rows)
+            if rows.dtype == bool:
+                rows = np.flatnonzero(rows)
+            order = np.argsort(rows, kind='stable')
+            rows, y = rows[order], y[order]
+            w = None if w is None else w[order]
+        ds = base.subset(rows).construct()
+        ds.set_label(y)
+        if w is not None:
+            ds.set_weight(w)
+        self._stats['derived'] += 1
+        return ds
+
+    # ------------------------------------------------------------------
+    # 公開 API
+    # ------------------------------------------------------------------
+
+    def train_set(self, X: pd.DataFrame, label, weight=None, rows=None,
+                  params: Optional[dict] = None):
+        """学習セット: X 全体でビン化した base から rows の行を取り出す
+
+        Args:
+            X:      特徴量行列 (ビン化の単位。 モデル間で同じ列・行なら共有される)
+            label:  rows の行に対応するラベル (rows=None なら X 全行)
+            weight: label と同じ長さの重み (None で等重み)
+            rows:   X 上の行位置 (int 配列 or bool マスク)。 None で全行
+            params: この Dataset で lgb.train する学習パラメータ
+                    (Dataset に効くものだけ拾う。 None なら LightGBM 既定)
+        """
+        ds_params = self.dataset_params(params)
+        return self._derive(self._base(self.key(X, params), X, ds_params),
+                            label, weight, rows)
+
+    def valid_set(self, X_val: pd.DataFrame, label, train_set,
+                  weight=None, rows=None):
+        """検証セット: train_set の base を reference にビン化し、 同様に派生させる
+
+        train_set は train_set() が返した Dataset (その base のビン境界を使う)。
+        """
+        ref = train_set.reference
+        ref_key = self._keys.get(id(ref))
+        if ref_key is None:
+            raise ValueError("train_set は DatasetCache.train_set() の戻り値を渡すこと")
+        h = hashlib.blake2b(digest_size=16)
+        h.update(ref_key.encode('ascii'))
+        h.update(frame_fingerprint(X_val).encode('ascii'))
+        return self._derive(self._base(h.hexdigest(), X_val, dict(ref.params),
+                                       reference=ref),
+                            label, weight, rows)
+
+    def stats(self) -> dict:
+        return dict(self._stats, cached=len(self._bases))
+
+    def clear(self):
+        """メモリ上の base を解放 (ディスク側は残す)"""
+        with self._lock:
+            self._bases.clear()
+            self._keys.clear()
@@ -0,0 +1,347 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""特徴量パイプラインのステージ別プロファイラ
+
+compute_features_for_race / predict_race は 1 頭ごとに 15 前後の抽出器を呼ぶが、
+build_dataset / predict.py が出すのは「1000 races ...」程度の粗い進捗だけで、
+どの抽出器が遅いのか・キャッシュが効いているのかが分からなかった。
+
+無効時 (既定) は wrap() が関数をそのまま返し stage() は共有の nullcontext を返すので、
+計測コードを残したままでもホットパスのコストはほぼゼロ。
+有効化は環境変数 KEIBA_PROFILE=1 か、 各 CLI の --profile (→ enable())。
+
+集計するもの:
+  - stages   — ステージ名ごとの累積時間 / 呼出回数 (入れ子は子の時間も含む)
+  - folded   — "親;子" スタック単位の自己時間 (flamegraph.pl / speedscope 用 collapsed 形式)
+  - caches   — 索引ヒット率 (kb_ext / history / ck_training / db_odds など)
+  - counters — 任意の件数カウンタ
+  - latency  — レース単位レイテンシの p50 / p90 / p99
+
+単一スレッド前提 (experiment / batch_predict / predict はいずれも逐次処理)。
+
+提供:
+    PROFILE_ENV                  — 有効化の環境変数名
+    Profiler                     — 計測器本体
+    PROFILER                     — プロセス共通インスタンス
+    enable()                     — --profile 用 (PROFILER を有効化して返す)
+    percentile(sorted_vals, q)   — nearest-rank パーセンタイル
+    FEATURE_STAGES               — 特徴量抽出器の関数名 → ステージ名
+    wrap_stage_functions(ns)     — ns ({関数名: 関数}) の抽出器を包んだ名前空間
+    StageFunctions(*fns)         — モジュールで 1 回作る抽出器表 (有効/無効の切替時だけ包み直す)
+    finish(label, out=None)      — 有効時のみサマリ表示 + JSON/.folded 出力 → パス
+
+Usage:
+    from ml.utils.profiler import PROFILER
+
+    past = PROFILER.wrap("past", compute_past_features)   # 無効時は素の関数
+    _STAGE_FX = profiler.StageFunctions(compute_past_features, ...)   # モジュールレベル
+    fx = _STAGE_FX.get()                                   # fx.compute_past_features(...)
+
+    @PROFILER.race("predict_race")
+    def predict_race(...): ...
+
+    PROFILER.hit("kb_ext", kb_ext is not None)
+
+    KEIBA_PROFILE=1 python -m ml.batch_predict --from 2026-01-01 --to 2026-01-31
+    python -m ml.experiment --profile ...
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Mapping, Optional
+
+PROFILE_ENV = "KEIBA_PROFILE"
+
+_NULL = nullcontext()
+
+
+def _env_enabled() -> bool:
+    return os.environ.get(PROFILE_ENV, "").strip().lower() not in ("", "0", "false", "no")
+
+
+def percentile(sorted_vals: list, q: float) -> float:
+    """nearest-rank パーセンタイル (sorted_vals は昇順済み, q は 0-100)"""
+    if not sorted_vals:
+        return 0.0
+    k = max(0, min(len(sorted_vals) - 1, int(-(-q * len(sorted_vals) // 100)) - 1))
+    return sorted_vals[k]
+
+
+class _Stage:
+    __slots__ = ("_prof", "_name")
+
+    def __init__(self, prof: "Profiler", name: str):
+        self._prof = prof
+        self._name = name
+
+    def __enter__(self):
+        self._prof._enter(self._name)
+        return self
+
+    def __exit__(self, *exc):
+        self._prof._exit()
+        return False
+
+
+class Profiler:
+    """ステージ計時 + キャッシュヒット + レースレイテンシの集計器"""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self) -> None:
+        self._stages: dict[str, list] = {}          # name → [calls, total_s]
+        self._folded: dict[str, float] = defaultdict(float)   # "a;b" → 自己時間 s
+        self._stack: list[list] = []                # [name, t0, child_s]
+        self._caches: dict[str, list] = {}          # name → [hits, misses]
+        self._counters: dict[str, int] = defaultdict(int)
+        self._latency: dict[str, list] = defaultdict(list)    # kind → [s, ...]
+        self._t_start = time.perf_counter()
+
+    # ---- ステージ ----------------------------------------------------------
+
+    def _enter(self, name: str) -> None:
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def _exit(self) -> float:
+        name, t0, child = self._stack.pop()
+        el = time.perf_counter() - t0
+        st = self._stages.get(name)
+        if st is None:
+            st = self._stages[name] = [0, 0.0]
+        st[0] += 1
+        st[1] += el
+        path = ";".join([f[0] for f in self._stack] + [name])
+        self._folded[path] += el - child
+        if self._stack:
+            self._stack[-1][2] += el
+        return el
+
+    def stage(self, name: str):
+        """with PROFILER.stage("load_race_json"): ... (無効時は nullcontext)"""
+        if not self.enabled:
+            return _NULL
+        return _Stage(self, name)
+
+    def wrap(self, name: str, fn: Callable) -> Callable:
+        """fn を計時ラッパーで包む。 無効時は fn をそのまま返す (呼出コストゼロ)。"""
+        if not self.enabled:
+            return fn
+
+        @functools.wraps(fn)
+        def _timed(*args, **kwargs):
+            self._enter(name)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._exit()
+        return _timed
+
+    def race(self, kind: str) -> Callable:
+        """レース単位関数用デコレータ: ルートステージ + レイテンシ記録。
+
+        有効/無効は呼出時に判定する (import 後に --profile で enable() されるため)。
+        """
+        def deco(fn):
+            @functools.wraps(fn)
+            def _timed(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                self._enter(kind)
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self._latency[kind].append(self._exit())
+            return _timed
+        return deco
+
+    # ---- カウンタ ----------------------------------------------------------
+
+    def hit(self, name: str, hit: bool) -> None:
+        """索引/キャッシュのヒット・ミスを 1 件記録"""
+        if not self.enabled:
+            return
+        c = self._caches.get(name)
+        if c is None:
+            c = self._caches[name] = [0, 0]
+        c[0 if hit else 1] += 1
+
+    def count(self, name: str, n: int = 1) -> None:
+        if self.enabled:
+            self._counters[name] += n
+
+    # ---- レポート ----------------------------------------------------------
+
+    def report(self) -> dict:
+        wall = time.perf_counter() - self._t_start
+        stages = {}
+        for name, (calls, total) in sorted(self._stages.items(),
+                                           key=lambda kv: -kv[1][1]):
+            stages[name] = {
+                "calls": calls,
+                "total_s": round(total, 6),
+                "mean_us": round(total / calls * 1e6, 3) if calls else 0.0,
+                "share": round(total / wall, 4) if wall > 0 else 0.0,
+            }
+        caches = {}
+        for name, (h, m) in sorted(self._caches.items()):
+            caches[name] = {"hits": h, "misses": m,
+                            "hit_rate": round(h / (h + m), 4) if h + m else None}
+        latency = {}
+        for kind, vals in sorted(self._latency.items()):
+            sv = sorted(vals)
+            latency[kind] = {
+                "n": len(sv),
+                "mean_ms": round(sum(sv) / len(sv) * 1e3, 3),
+                "p50_ms": round(percentile(sv, 50) * 1e3, 3),
+                "p90_ms": round(percentile(sv, 90) * 1e3, 3),
+                "p99_ms": round(percentile(sv, 99) * 1e3, 3),
+                "max_ms": round(sv[-1] * 1e3, 3),
+            }
+        return {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "argv": sys.argv,
+            "wall_s": round(wall, 3),
+            "stages": stages,
+            "caches": caches,
+            "counters": dict(sorted(self._counters.items())),
+            "race_latency": latency,
+            "folded_us": {p: int(round(s * 1e6))
+                          for p, s in sorted(self._folded.items())},
+        }
+
+    def folded_lines(self) -> list[str]:
+        """collapsed-stack 形式 ("a;b <自己時間 us>")。 flamegraph.pl にそのまま渡せる。"""
+        return [f"{p} {us}" for p, us in self.report()["folded_us"].items() if us > 0]
+
+    def print_summary(self, top: int = 20) -> None:
+        rep = self.report()
+        print(f"\n[Profile] wall={rep['wall_s']:.1f}s")
+        print(f"  {'stage':28s} {'calls':>10s} {'total_s':>10s} {'mean_us':>10s} {'share':>6s}")
+        for name, st in list(rep["stages"].items())[:top]:
+            print(f"  {name:28s} {st['calls']:>10,} {st['total_s']:>10.2f} "
+                  f"{st['mean_us']:>10.1f} {st['share']:>6.1%}")
+        for name, c in rep["caches"].items():
+            rate = f"{c['hit_rate']:.1%}" if c["hit_rate"] is not None else "-"
+            print(f"  [cache] {name:20s} hit={rate:>6s} ({c['hits']:,}/{c['hits'] + c['misses']:,})")
+        for kind, lat in rep["race_latency"].items():
+            print(f"  [race] {kind:21s} n={lat['n']:,} p50={lat['p50_ms']:.1f}ms "
+                  f"p90={lat['p90_ms']:.1f}ms p99={lat['p99_ms']:.1f}ms")
+
+    def dump(self, path: Path) -> Path:
+        """JSON レポートと同名 .folded を書き出す"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.report(), ensure_ascii=False, indent=2),
+                        encoding="utf-8")
+        path.with_suffix(".folded").write_text(
+            "\n".join(self.folded_lines()) + "\n", encoding="utf-8")
+        return path
+
+
+PROFILER = Profiler(enabled=_env_enabled())
+
+
+# compute_features_for_race (experiment) / predict_race (predict) 共通の抽出器一覧
+FEATURE_STAGES = {
+    'extract_base_features': 'base',
+    'compute_past_features': 'past',
+    'get_trainer_features': 'trainer',
+    'get_jockey_features': 'jockey',
+    'compute_running_style_features': 'running_style',
+    'compute_rotation_features': 'rotation',
+    'compute_pace_features': 'pace',
+    'compute_training_features': 'training',
+    'compute_speed_features': 'speed',
+    'compute_comment_features': 'comment',
+    'compute_slow_start_features': 'slow_start',
+    'get_pedigree_features': 'pedigree',
+    'build_sire_index': 'build_sire_index',
+    'get_baba_features': 'baba',
+    'compute_jrdb_features': 'jrdb',
+    'compute_race_bias_features': 'race_bias',
+    'compute_horse_bias_features': 'horse_bias',
+    'compute_career_features': 'career',
+}
+
+
+def wrap_stage_functions(namespace: Mapping[str, Callable],
+                         stages: Mapping[str, str] = FEATURE_STAGES) -> SimpleNamespace:
+    """namespace にある抽出器を PROFILER.wrap で包み、 属性アクセスできる名前空間で返す。
+
+    stages に載っていて namespace に無い名前は含めない (experiment は career を使わない等)。
+    無効時は素の関数がそのまま入る。
+    """
+    return SimpleNamespace(**{
+        name: PROFILER.wrap(stage, namespace[name])
+        for name, stage in stages.items() if name in namespace
+    })
+
+
+class StageFunctions:
+    """抽出器表。 モジュールレベルで明示した関数から 1 回作り、 レースごとには包み直さない。
+
+    get() は PROFILER の有効/無効 (enable() / KEIBA_PROFILE) が前回と変わったときだけ
+    wrap_stage_functions で包み直す。 source + overrides ({抽出器名: source の属性名}) を渡すと
+    その抽出器を source のメソッドに差し替えた表を返す (experiment の feature_engine)。
+    overrides は呼び出し側で固定の対応表とし、 差し替え表は直近の source 1 つ分だけ保持する。
+    """
+
+    def __init__(self, *fns: Callable, stages: Mapping[str, str] = FEATURE_STAGES):
+        unknown = [fn.__name__ for fn in fns if fn.__name__ not in stages]
+        if unknown:
+            raise ValueError(f"FEATURE_STAGES に無い抽出器: {unknown}")
+        self._funcs = {fn.__name__: fn for fn in fns}
+        self._stages = stages
+        self._enabled: Optional[bool] = None
+        self._base: Optional[SimpleNamespace] = None
+        self._source: object = None
+        self._sourced: Optional[SimpleNamespace] = None
+
+    def get(self, source: object = None,
+            overrides: Optional[Mapping[str, str]] = None) -> SimpleNamespace:
+        if self._enabled != PROFILER.enabled:
+            self._enabled = PROFILER.enabled
+            self._base = wrap_stage_functions(self._funcs, self._stages)
+            self._source = self._sourced = None
+        if source is None or not overrides:
+            return self._base
+        if self._source is not source:
+            funcs = {**self._funcs,
+                     **{name: getattr(source, attr) for name, attr in overrides.items()}}
+            self._source = source
+            self._sourced = wrap_stage_functions(funcs, self._stages)
+        return self._sourced
+
+
+def enable() -> Profiler:
+    """--profile 指定時に呼ぶ。 計測開始時刻もここでリセットする。"""
+    if not PROFILER.enabled:
+        PROFILER.enabled = True
+        PROFILER.reset()
+    return PROFILER
+
+
+def finish(label: str, out: Optional[Path] = None) -> Optional[Path]:
+    """有効時のみサマリを表示してレポートを保存。 既定は ml_dir()/profile/{label}_{ts}.json"""
+    if not PROFILER.enabled:
+        return None
+    if out is None:
+        from core import config
+        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        out = config.ml_dir() / "profile" / f"{label}_{ts}.json"
+    PROFILER.print_summary()
+    path = PROFILER.dump(out)
+    print(f"  Profile saved: {path} (+ {path.with_suffix('.folded').name})")
+    return path
@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""race_*.json の decode-once 共有コーパス
+
+1 回の experiment で同じ race_{id}.json が build_pace_index → 血統タイムライン →
+_build_close_timeline → build_dataset → add_margin_target_to_df →
+build_course_timeline / compute_closing_probas と最大 5 回 open + json.load されていた。
+RaceCorpus はファイルパス単位の LRU キャッシュで 1 プロセス 1 回の decode に抑える。
+
+内部表現 (コンパクト形式):
+  - ヘッダ   — entries 以外のキー (entries の位置にはプレースホルダ)
+  - entries  — (キー列タプル, 値タプル) の列。 キー列は同一スキーマ間で共有 (intern)
+  - 短い文字列値 (騎手コード・馬名など) は sys.intern して重複を畳む
+get() は毎回 新しい race dict / entry dict を組み立てて返し、 ネストした dict/list
+(pace, lap_times など) もコピーするので、 返り値をどう書き換えてもキャッシュに漏れない
+(コピーはネスト値を持つ行だけ。 スカラーだけの entry はタプルから dict を作るだけ)。
+
+キャッシュ上限は既定 RACE_CACHE_SIZE レース (推論・web など長寿命プロセス向けの小さめの値)。
+学習 (experiment / walk_forward / closing) は main() で use_training_cache() を呼び
+TRAINING_RACE_CACHE_SIZE まで広げる (全期間 ~1GB 級)。 環境変数 KEIBA_RACE_CACHE_SIZE は
+どちらよりも優先 (0 でキャッシュ無効)。 キーはフルパスなので KEIBA_DATA_ROOT を
+切り替えても混ざらない。 ヒット時にファイルの (mtime_ns, size) を照合し、
+変わっていれば読み直す。
+
+提供:
+    RaceCorpus                — 本体 (corpus(race_id, date) で load_race_json 互換)
+    shared_corpus()           — プロセス共通インスタンス (load_race_json の委譲先)
+    use_training_cache()      — 学習 CLI 用: 共通インスタンスの上限を学習用に広げる
+    RACE_CACHE_ENV / RACE_CACHE_SIZE / TRAINING_RACE_CACHE_SIZE
+
+Usage:
+    from ml.utils.race_corpus import shared_corpus
+
+    corpus = shared_corpus()
+    race = corpus(race_id, "2025-01-05")
+    add_margin_target_to_df(df, date_index, corpus)     # load_race_fn として渡せる
+    for path in corpus.race_files():
+        race = corpus.load_path(path)
+    print(corpus.stats())
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+_REPO_ROOT = Path(__file__).resolve().parents[3]
+if str(_REPO_ROOT / "keiba-v2") not in sys.path:
+    sys.path.insert(0, str(_REPO_ROOT / "keiba-v2"))
+
+RACE_CACHE_ENV = "KEIBA_RACE_CACHE_SIZE"
+RACE_CACHE_SIZE = 2000           # 既定 (推論・web 等): 数開催日分
+TRAINING_RACE_CACHE_SIZE = 60000  # 学習時: 約 17 年分の JRA 全レース
+
+_INTERN_MAXLEN = 32
+_ENTRIES_SLOT = None             # ヘッダ内 entries 位置のプレースホルダ
+
+
+def _env_cache_size(default: int = RACE_CACHE_SIZE) -> int:
+    v = os.environ.get(RACE_CACHE_ENV, "").strip()
+    try:
+        return max(0, int(v)) if v else default
+    except ValueError:
+        return default
+
+
+def _iv(v):
+    return sys.intern(v) if type(v) is str and len(v) <= _INTERN_MAXLEN else v
+
+
+_NESTED = (dict, list)
+
+
+def _thaw(v):
+    """ネストした dict/list を再帰コピー (スカラーはそのまま)"""
+    t = type(v)
+    if t is dict:
+        return {k: _thaw(x) for k, x in v.items()}
+    if t is list:
+        return [_thaw(x) for x in v]
+    return v
+
+
+class RaceCorpus:
+    """race JSON の LRU decode キャッシュ (単一スレッド前提)"""
+
+    def __init__(self, max_races: Optional[int] = None, root: Optional[Path] = None):
+        self.max_races = _env_cache_size() if max_races is None else max(0, int(max_races))
+        self._root = Path(root) if root else None
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._schemas: dict = {}
+        self.hits = 0
+        self.decodes = 0
+        self.evictions = 0
+        self.reloads = 0
+
+    # ---- パス ---------------------------------------------------------------
+
+    def root(self) -> Path:
+        if self._root is not None:
+            return self._root
+        from core import config
+        return config.races_dir()
+
+    def path_for(self, race_id: str, date: str) -> Path:
+        """'YYYY-MM-DD' → races/YYYY/MM/DD/race_{id}.json"""
+        parts = date.split('-')
+        return self.root() / parts[0] / parts[1] / parts[2] / f"race_{race_id}.json"
+
+    def race_files(self) -> List[Path]:
+        """races 配下の全 race_{数字}.json (パス順)"""
+        return sorted(self.root().glob("**/race_[0-9]*.json"))
+
+    # ---- 読み込み -----------------------------------------------------------
+
+    def get(self, race_id: str, date: str) -> dict:
+        """load_race_json と同じ dict を返す (ファイルが無ければ FileNotFoundError)"""
+        return self.load_path(self.path_for(race_id, date))
+
+    __call__ = get
+
+    def load_path(self, path: Path) -> dict:
+        key = str(path)
+        cached = self._cache.get(key)
+        if cached is not None:
+            stamp, packed = cached
+            st = os.stat(path)           # 消えていれば FileNotFoundError (load_race_json と同じ)
+            if (st.st_mtime_ns, st.st_size) == stamp:
+                self.hits += 1
+                self._cache.move_to_end(key)
+                return self._unpack(packed)
+            del self._cache[key]
+            self.reloads += 1
+        with open(path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            race = json.loads(f.read())
+        self.decodes += 1
+        packed = self._pack(race)
+        if self.max_races:
+            self._cache[key] = ((st.st_mtime_ns, st.st_size), packed)
+            self._evict()
+        return self._unpack(packed)
+
+    def _evict(self) -> None:
+        while len(self._cache) > self.max_races:
+            self._cache.popitem(last=False)
+            self.evictions += 1
+
+    def iter_races(self, date_index: dict) -> Iterator[Tuple[str, str, dict]]:
+        """date_index 順に (date_str, race_id, race) を yield (読めないレースは飛ばす)"""
+        from ml.experiment import _iter_date_index
+        for date_str, race_id in _iter_date_index(date_index):
+            try:
+                race = self.get(race_id, date_str)
+            except Exception:
+                continue
+            yield date_str, race_id, race
+
+    # ---- コンパクト表現 -----------------------------------------------------
+
+    def _schema(self, keys: tuple) -> tuple:
+        s = self._schemas.get(keys)
+        if s is None:
+            s = self._schemas[keys] = tuple(sys.intern(k) for k in keys)
+        return s
+
+    def _pack(self, race) -> tuple:
+        if not isinstance(race, dict) or not isinstance(race.get('entries'), list):
+            return (race, None)
+        header = {k: (_ENTRIES_SLOT if k == 'entries' else _iv(v)) for k, v in race.items()}
+        rows = []
+        for e in race['entries']:
+            if isinstance(e, dict):
+                vals = tuple(_iv(v) for v in e.values())
+                rows.append((self._schema(tuple(e)), vals, any(type(v) in _NESTED for v in vals)))
+            else:
+                rows.append((None, e, True))
+        return (header, tuple(rows))
+
+    @staticmethod
+    def _unpack(packed: tuple):
+        header, rows = packed
+        if rows is None:
+            return _thaw(header)
+        race = {k: _thaw(v) for k, v in header.items()}
+        race['entries'] = [
+            dict(zip(keys, map(_thaw, vals) if nested else vals))
+            if keys is not None else _thaw(vals)
+            for keys, vals, nested in rows
+        ]
+        return race
+
+    # ---- 管理 ---------------------------------------------------------------
+
+    def clear(self) -> None:
+        self._cache.clear()
+        self._schemas.clear()
+
+    def resize(self, max_races: int) -> None:
+        """上限を変更 (縮めた場合は古いものから追い出す)"""
+        self.max_races = max(0, int(max_races))
+        self._evict()
+
+    def stats(self) -> dict:
+        total = self.hits + self.decodes
+        return {
+            'cached': len(self._cache),
+            'max_races': self.max_races,
+            'hits': self.hits,
+            'decodes': self.decodes,
+            'evictions': self.evictions,
+            'reloads': self.reloads,
+            'hit_rate': round(self.hits / total, 4) if total else None,
+        }
+
+
+_SHARED: Optional[RaceCorpus] = None
+
+
+def shared_corpus() -> RaceCorpus:
+    """プロセス共通の RaceCorpus (初回呼出時に生成)"""
+    global _SHARED
+    if _SHARED is None:
+        _SHARED = RaceCorpus()
+    return _SHARED
+
+
+def use_training_cache() -> RaceCorpus:
+    """学習 CLI の main() 用: 共通コーパスの上限を TRAINING_RACE_CACHE_SIZE に広げる。
+
+    KEIBA_RACE_CACHE_SIZE が設定されていればそちらを優先する。
+    """
+    corpus = shared_corpus()
+    corpus.resize(_env_cache_size(TRAINING_RACE_CACHE_SIZE))
+    return corpus
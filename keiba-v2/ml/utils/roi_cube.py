@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""閾値グリッド ROI キューブ
+
+experiment.py の calc_gap_margin_grid / calc_gap_ard_grid / calc_value_bet_analysis /
+calc_ard_threshold_analysis はセルごとにテスト DF 全体のブールマスクを作り直して
+filter → sum していた (セル数 × 行数)。 本モジュールは 1 次元ごとに閾値を 1 回だけ
+ソートして各行を「満たす最も厳しい閾値」のビンに落とし、 ビン別の重み付きヒストグラム
+(np.bincount) を軸ごとの累積和で閾値セルへ展開する。 コストは 行数 + セル数 で、
+閾値を細かくしても行走査は増えない。
+
+閾値セルの意味 (既存関数と同じ):
+  op=">="  → x >= t の行を含む
+  op="<="  → x <= t の行を含む
+  t=None   → その軸は無制限 (NaN 行も含む)。 それ以外の閾値に NaN 行は入らない
+
+Bootstrap CI はレース単位リサンプリング (utils.roi.bootstrap_roi_ci と同じ考え方)。
+母集団は base mask を通った行を持つレースで、 全セル共通の再標本を使う。
+1 反復 = レース重みの bincount 3 回なので、 セル数に依らず O(行数)。
+
+提供:
+    Axis                          — 閾値軸 (列名, 閾値リスト, op, 出力キー)
+    threshold_cube(xs, axes, weights) — 重み付き件数の N 次元累積キューブ (ndarray)
+    roi_cube(df, axes, ...)       — count / win・place の的中数と ROI をセル別 dict で返す
+"""
+
+from __future__ import annotations
+
+import warnings
+from dataclasses import dataclass
+from itertools import product
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+
+@dataclass(frozen=True)
+class Axis:
+    """閾値軸。 key は出力 dict のキー名 (既定は col)。"""
+    col: str
+    thresholds: Sequence[Optional[float]]
+    op: str = ">="
+    key: Optional[str] = None
+
+    def __post_init__(self):
+        if self.op not in (">=", "<="):
+            raise ValueError(f"op は '>=' か '<=': {self.op!r}")
+        if not self.thresholds:
+            raise ValueError(f"閾値が空: {self.col}")
+
+    @property
+    def name(self) -> str:
+        return self.key or self.col
+
+
+# ---------------------------------------------------------------------------
+# ビン割り当て + 累積
+# ---------------------------------------------------------------------------
+
+def _axis_bins(x: np.ndarray, axis: Axis):
+    """各行を 0..m のビンへ。 戻り値 (bins, order) — order は閾値の昇順並べ替え。
+
+    ">=": bin = 満たす (昇順) 閾値の個数。 セル a (昇順) は bin > a の行の和
+    "<=": bin = 満たす最初の (昇順) 閾値位置。 セル a は bin <= a の行の和 (bin=m は全不通過)
+    """
+    lo = axis.op == ">="
+    fill = -np.inf if lo else np.inf
+    t = np.array([fill if v is None else float(v) for v in axis.thresholds], dtype=np.float64)
+    order = np.argsort(t, kind="stable")
+    ts = t[order]
+    x = np.where(np.isnan(x), fill, x)
+    if lo:
+        bins = np.searchsorted(ts, x, side="right")
+    else:
+        bins = np.searchsorted(ts, x, side="left")
+    return bins, order
+
+
+def _expand(hist: np.ndarray, dim: int, axis: Axis, order: np.ndarray) -> np.ndarray:
+    """dim 軸のビン別ヒストグラム (m+1) → 閾値セル (m, 元の閾値順)"""
+    if axis.op == ">=":
+        suffix = np.flip(np.cumsum(np.flip(hist, dim), axis=dim), dim)
+        cells = np.take(suffix, np.arange(1, hist.shape[dim]), axis=dim)
+    else:
+        cells = np.take(np.cumsum(hist, axis=dim), np.arange(hist.shape[dim] - 1), axis=dim)
+    return np.take(cells, np.argsort(order), axis=dim)
+
+
+class _Binned:
+    """行 → 平坦化ビン番号 (Bootstrap の反復でも使い回す)"""
+
+    def __init__(self, xs: Sequence[np.ndarray], axes: Sequence[Axis]):
+        binned = [_axis_bins(np.asarray(x, dtype=np.float64), ax) for x, ax in zip(xs, axes)]
+        self.axes = list(axes)
+        self.orders = [o for _, o in binned]
+        self.shape = tuple(len(ax.thresholds) + 1 for ax in axes)
+        self.flat = np.ravel_multi_index([b for b, _ in binned], self.shape)
+        self.size = int(np.prod(self.shape))
+
+    def cube(self, w: np.ndarray) -> np.ndarray:
+        hist = np.bincount(self.flat, weights=w, minlength=self.size).reshape(self.shape)
+        for dim, (ax, order) in enumerate(zip(self.axes, self.orders)):
+            hist = _expand(hist, dim, ax, order)
+        return hist
+
+
+def threshold_cube(
+    xs: Sequence[np.ndarray],
+    axes: Sequence[Axis],
+    weights: Dict[str, np.ndarray],
+) -> Dict[str, np.ndarray]:
+    """重みごとの閾値キューブ {name: ndarray(shape=各軸の閾値数)} を返す。
+
+    xs[j] は axes[j] の値 (float 配列, 全て同じ長さ)。 weights の各配列も同じ長さ。
+    """
+    b = _Binned(xs, axes)
+    return {name: b.cube(np.asarray(w, dtype=np.float64)) for name, w in weights.items()}
+
+
+# ---------------------------------------------------------------------------
+# ROI キューブ (DataFrame)
+# ---------------------------------------------------------------------------
+
+def _scalar(v):
+    """np.arange 等で作った閾値を JSON 化できる素の数値に"""
+    return v.item() if isinstance(v, np.generic) else v
+
+
+def roi_cube(
+    df: "pd.DataFrame",
+    axes: Sequence[Axis],
+    *,
+    mask: Optional[np.ndarray] = None,
+    place_odds: Optional[np.ndarray] = None,
+    stake: int = 100,
+    keep_empty: bool = False,
+    bootstrap_n: int = 0,
+    ci_level: float = 0.95,
+    seed: int = 42,
+    race_col: str = "race_id",
+    extra: Optional[Dict[str, np.ndarray]] = None,
+) -> List[dict]:
+    """閾値セルごとの {軸キー..., count, win_hits, win_roi, place_hits, place_roi} を返す。
+
+    Args:
+        mask: 全セル共通の前提条件 (例: pred_rank_p <= 3)
+        place_odds: 行ごとの複勝払戻倍率 (is_top3 の行だけ使う)。 None なら複勝 ROI は 0
+        keep_empty: False なら count=0 のセルを出力しない (既存グリッドと同じ)
+        bootstrap_n: >0 でレース単位 Bootstrap の win/place ROI CI を付与
+        extra: df に無い派生列 {col: 配列} (例: gap = odds_rank - pred_rank_p)。 Axis.col で参照
+    Returns:
+        セル dict のリスト。 並びは axes[0] の閾値順 → axes[1] ... (既存の二重ループと同順)
+    """
+    n = len(df)
+    sel = np.ones(n, dtype=bool) if mask is None else np.asarray(mask, dtype=bool)
+    extra = extra or {}
+    xs = [np.asarray(extra[ax.col], dtype=np.float64)[sel] if ax.col in extra
+          else df[ax.col].to_numpy(dtype=np.float64, na_value=np.nan)[sel] for ax in axes]
+    is_win = df["is_win"].to_numpy(dtype=np.float64, na_value=0.0)[sel] == 1
+    is_top3 = df["is_top3"].to_numpy(dtype=np.float64, na_value=0.0)[sel] == 1
+    odds = df["odds"].to_numpy(dtype=np.float64, na_value=0.0)[sel]
+    p_odds = (np.zeros(int(sel.sum())) if place_odds is None
+              else np.nan_to_num(np.asarray(place_odds, dtype=np.float64)[sel]))
+
+    weights = {
+        "count": np.ones(len(odds)),
+        "win_hits": is_win.astype(np.float64),
+        "win_ret": np.where(is_win, odds, 0.0),
+        "place_hits": is_top3.astype(np.float64),
+        "place_ret": np.where(is_top3, p_odds, 0.0),
+    }
+    binned = _Binned(xs, axes)
+    cube = {name: binned.cube(w) for name, w in weights.items()}
+
+    ci = None
+    if bootstrap_n > 0 and len(odds):
+        codes, _ = pd.factorize(df[race_col].to_numpy()[sel])
+        ci = _bootstrap(binned, codes, weights, bootstrap_n, ci_level, seed)
+
+    results = []
+    for idx in product(*(range(len(ax.thresholds)) for ax in axes)):
+        count = int(cube["count"][idx])
+        if count == 0 and not keep_empty:
+            continue
+        rec = {ax.name: _scalar(ax.thresholds[i]) for ax, i in zip(axes, idx)}
+        total_bet = count * stake
+        rec.update({
+            "count": count,
+            "win_hits": int(cube["win_hits"][idx]),
+            "win_roi": round(float(cube["win_ret"][idx]) * stake / total_bet * 100, 1) if total_bet else 0,
+            "place_hits": int(cube["place_hits"][idx]),
+            "place_roi": round(float(cube["place_ret"][idx]) * stake / total_bet * 100, 1) if total_bet else 0,
+        })
+        if ci is not None:
+            for key, arr in ci.items():
+                v = arr[idx]
+                rec[key] = round(float(v), 1) if np.isfinite(v) else 0
+        results.append(rec)
+    return results
+
+
+def _bootstrap(binned: _Binned, codes: np.ndarray, weights: Dict[str, np.ndarray],
+               n_boot: int, ci_level: float, seed: int) -> Dict[str, np.ndarray]:
+    """レース重みで count / win_ret / place_ret キューブを n_boot 回作り ROI の分位点を返す"""
+    rng = np.random.default_rng(seed)
+    alpha = (1 - ci_level) / 2
+    n_races = int(codes.max()) + 1
+    boot = {"win_roi": [], "place_roi": []}
+    for _ in range(n_boot):
+        w = np.bincount(rng.integers(0, n_races, n_races), minlength=n_races)[codes]
+        count = binned.cube(weights["count"] * w)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for name, ret in (("win_roi", "win_ret"), ("place_roi", "place_ret")):
+                boot[name].append(np.where(count > 0,
+                                           binned.cube(weights[ret] * w) / count * 100, np.nan))
+    out = {}
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)     # 全反復 0 件のセル
+        for name, reps in boot.items():
+            arr = np.array(reps)
+            out[f"{name}_ci_low"] = np.nanpercentile(arr, alpha * 100, axis=0)
+            out[f"{name}_ci_high"] = np.nanpercentile(arr, (1 - alpha) * 100, axis=0)
+    return out
@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""WIN5 ビットセット評価エンジン
+
+win5_simulator / win5_variable / win5_combo_sim / win5_hybrid_combo /
+win5_adaptive_wps / win5_strategy_search で個別に書かれていた
+「週ループ → 各レッグの勝ち馬が選択集合に入っているか → 点数 = 積」
+の判定を共通化するためのエンジン。
+
+移行範囲:
+    現在このエンジンで評価しているのは win5_strategy_search (simulate /
+    search_widths) のみ。 他の評価器は週の扱いが微妙に異なるため
+    (win5_variable は勝ち馬不明の週も購入扱い・条件外の週を skipped として
+    数える、 win5_simulator は予算ティアごとの集計表を持つ 等)、
+    旧ループのまま残している。 移行する場合は
+    tests/test_utils_win5_bitset.py のパリティテストに倣って旧実装と突き合わせること。
+
+各週の5レッグを「馬番ビットマスク」(bit i = 馬番 i) で表現し、
+戦略 × 週 × レッグ の uint64 配列に対して numpy の配列演算で
+的中/点数/払戻を一括評価する。
+
+提供:
+    Win5Matrix (dataclass)       — 週ごとの勝ち馬マスク・払戻
+    build_win5_matrix(weeks)     — {'date','races':[{'winner'}],'payout'} → Win5Matrix
+    umaban_mask(umabans)         — 馬番リスト → ビットマスク
+    selection_masks(...)         — select_fn を全週に適用して (W, 5) マスク化
+    rank_prefix_masks(...)       — 順位上位 1..K 頭の累積マスク (W, 5, K)
+    evaluate_masks(...)          — (S, W, 5) マスク → 的中/点数/払戻 配列
+    summarize_evaluation(...)    — 戦略ごとの played/hits/cost/payout/ROI
+    search_leg_widths(...)       — 平均点数上限付きのレッグ幅 全探索
+"""
+
+from __future__ import annotations
+
+import itertools
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+N_LEGS = 5
+TICKET_PRICE = 100
+MAX_UMABAN = 63  # uint64 に収まる馬番上限
+
+
+# ===========================================================================
+# Dataclasses
+# ===========================================================================
+
+@dataclass
+class Win5Matrix:
+    """全週分の WIN5 結果をビットマスク化したもの"""
+    dates: List[str]           # YYYYMMDD × W
+    race_ids: List[List[str]]  # W × 5
+    winner_bits: np.ndarray    # (W, 5) uint64 — 勝ち馬のビット (不明=0)
+    payouts: np.ndarray        # (W,) int64 — 払戻金 (的中なし=0)
+
+    @property
+    def n_weeks(self) -> int:
+        return len(self.dates)
+
+
+# ===========================================================================
+# Encoding
+# ===========================================================================
+
+def umaban_mask(umabans: Optional[Iterable[int]]) -> int:
+    """馬番の集合をビットマスクへ。 None/空 → 0 (選択なし)"""
+    mask = 0
+    if not umabans:
+        return mask
+    for u in umabans:
+        u = int(u)
+        if 0 < u <= MAX_UMABAN:
+            mask |= 1 << u
+    return mask
+
+
+def build_win5_matrix(weeks: Sequence[dict]) -> Win5Matrix:
+    """週リスト → Win5Matrix
+
+    weeks は win5_strategy_search.load_win5_schedule() 形式:
+        {'date': 'YYYYMMDD', 'payout': int,
+         'races': [{'race_id': str, 'winner': int} × 5]}
+    """
+    n = len(weeks)
+    winner_bits = np.zeros((n, N_LEGS), dtype=np.uint64)
+    payouts = np.zeros(n, dtype=np.int64)
+    dates: List[str] = []
+    race_ids: List[List[str]] = []
+    for w, week in enumerate(weeks):
+        dates.append(week['date'])
+        races = week['races'][:N_LEGS]
+        race_ids.append([r['race_id'] for r in races])
+        for leg, race in enumerate(races):
+            winner_bits[w, leg] = umaban_mask([race.get('winner', 0)])
+        payouts[w] = int(week.get('payout', 0) or 0)
+    return Win5Matrix(dates=dates, race_ids=race_ids,
+                      winner_bits=winner_bits, payouts=payouts)
+
+
+def selection_masks(
+    matrix: Win5Matrix,
+    pred_index: dict,
+    select_fn: Callable[[dict], Optional[list]],
+) -> np.ndarray:
+    """select_fn(pred) → 馬番リスト を全週・全レッグに適用して (W, 5) マスクを返す。
+
+    予測なし / select_fn が None / 空リスト のレッグは 0 (= その週は不成立)。
+    """
+    masks = np.zeros((matrix.n_weeks, N_LEGS), dtype=np.uint64)
+    for w, rids in enumerate(matrix.race_ids):
+        for leg, rid in enumerate(rids):
+            pred = pred_index.get(rid)
+            if not pred:
+                continue
+            masks[w, leg] = umaban_mask(select_fn(pred))
+    return masks
+
+
+def rank_prefix_masks(
+    matrix: Win5Matrix,
+    pred_index: dict,
+    order_fn: Callable[[dict], List[int]],
+    max_width: int,
+) -> np.ndarray:
+    """order_fn(pred) → 順位順の馬番リスト から、上位 1..max_width 頭の
+    累積マスク (W, 5, max_width) を作る。 [..., k] = 上位 k+1 頭。
+
+    出走頭数が k+1 未満なら全頭のマスクのまま (点数は実頭数で数える)。
+    """
+    prefix = np.zeros((matrix.n_weeks, N_LEGS, max_width), dtype=np.uint64)
+    for w, rids in enumerate(matrix.race_ids):
+        for leg, rid in enumerate(rids):
+            pred = pred_index.get(rid)
+            if not pred:
+                continue
+            mask = 0
+            order = order_fn(pred) or []
+            for k in range(max_width):
+                if k < len(order):
+                    mask |= umaban_mask([order[k]])
+                prefix[w, leg, k] = mask
+    return prefix
+
+
+# ===========================================================================
+# Evaluation
+# ===========================================================================
+
+def evaluate_masks(matrix: Win5Matrix, masks: np.ndarray,
+                   require_winners: bool = True) -> Dict[str, np.ndarray]:
+    """(S, W, 5) または (W, 5) の選択マスクを一括評価する。
+
+    Args:
+        require_winners: True なら勝ち馬不明 (0) のレッグがある週は評価対象外。
+            False なら購入扱い (不的中) にする (旧 win5_strategy_search と同じ)。
+
+    Returns (S, W) 配列の dict:
+        valid    — 5レッグ全てに1頭以上選択があり、勝ち馬が全て確定している週
+                   (require_winners=False なら勝ち馬の確定は問わない)
+        tickets  — 点数 (5レッグの選択頭数の積)
+        covered  — (S, W, 5) 各レッグで勝ち馬をカバーしたか
+        hit      — valid かつ 5レッグ全カバー
+        payout   — 的中時の払戻 (100円あたり)
+    """
+    masks = np.asarray(masks, dtype=np.uint64)
+    if masks.ndim == 2:
+        masks = masks[np.newaxis]
+    counts = np.bitwise_count(masks).astype(np.int64)
+    tickets = counts.prod(axis=2)
+    winners_known = (matrix.winner_bits != 0).all(axis=1)
+    valid = (counts > 0).all(axis=2)
+    if require_winners:
+        valid &= winners_known[np.newaxis, :]
+    covered = (masks & matrix.winner_bits[np.newaxis]) != 0
+    hit = valid & covered.all(axis=2)
+    payout = np.where(hit, matrix.payouts[np.newaxis, :], 0)
+    return {
+        'valid': valid,
+        'tickets': np.where(valid, tickets, 0),
+        'covered': covered,
+        'hit': hit,
+        'payout': payout,
+    }
+
+
+def summarize_evaluation(ev: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """evaluate_masks の結果を戦略ごと (S,) に集計する。"""
+    valid = ev['valid']
+    played = valid.sum(axis=1)
+    hits = ev['hit'].sum(axis=1)
+    total_tickets = ev['tickets'].sum(axis=1)
+    cost = total_tickets * TICKET_PRICE
+    payout = ev['payout'].sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg_tickets = np.where(played > 0, total_tickets / np.maximum(played, 1), 0.0)
+        roi = np.where(cost > 0, payout / np.maximum(cost, 1), 0.0)
+        hit_rate = np.where(played > 0, hits / np.maximum(played, 1), 0.0)
+    return {
+        'played': played,
+        'hits': hits,
+        'hit_rate': hit_rate,
+        'avg_tickets': avg_tickets,
+        'total_cost': cost,
+        'total_payout': payout,
+        'roi': roi,
+    }
+
+
+# ===========================================================================
+# Budget-constrained width search
+# ===========================================================================
+
+def search_leg_widths(
+    matrix: Win5Matrix,
+    prefix: np.ndarray,
+    max_avg_tickets: float = 200,
+    leg_class: Optional[np.ndarray] = None,
+    n_classes: Optional[int] = None,
+    min_hits: int = 1,
+    chunk_size: int = 1024,
+) -> List[dict]:
+    """レッグ幅 (上位何頭を買うか) の組合せを全探索する。
+
+    Args:
+        prefix: rank_prefix_masks() の出力 (W, 5, K)。 幅は 1..K。
+        max_avg_tickets: 成立週の平均点数の上限 (週2万円 = 200点)。
+        leg_class: (W, 5) int — 各レッグのクラス (自信度ティア等)。
+            None ならレッグ位置 (0..4) をクラスとし、「R1は2頭・R2は3頭…」
+            の位置別幅を探索する。
+        n_classes: クラス数。 None なら leg_class.max()+1。
+        min_hits: 結果に含める最小的中数。
+
+    Returns:
+        ROI 降順の候補リスト。 各要素は
+        {'widths': tuple, 'played', 'hits', 'avg_tickets',
+         'total_cost', 'total_payout', 'roi'}
+    """
+    n_weeks, n_legs, max_width = prefix.shape
+    if leg_class is None:
+        leg_class = np.broadcast_to(np.arange(n_legs), (n_weeks, n_legs))
+    leg_class = np.asarray(leg_class, dtype=np.int64)
+    if n_classes is None:
+        n_classes = int(leg_class.max()) + 1 if leg_class.size else 0
+
+    # 幅 k+1 で買ったときのレッグ頭数 / カバー判定 (W, 5, K)
+    counts = np.bitwise_count(prefix).astype(np.int64)
+    covered = (prefix & matrix.winner_bits[:, :, np.newaxis]) != 0
+    winners_known = (matrix.winner_bits != 0).all(axis=1)
+    week_idx = np.arange(n_weeks)[:, np.newaxis]
+    leg_idx = np.arange(n_legs)[np.newaxis, :]
+
+    combos = np.array(
+        list(itertools.product(range(max_width), repeat=n_classes)), dtype=np.int64,
+    ).reshape(-1, n_classes)
+
+    results: List[dict] = []
+    for start in range(0, len(combos), chunk_size):
+        chunk = combos[start:start + chunk_size]          # (C, n_classes)
+        width_idx = chunk[:, leg_class]                    # (C, W, 5)
+        legs_n = counts[week_idx, leg_idx, width_idx]      # (C, W, 5)
+        legs_cov = covered[week_idx, leg_idx, width_idx]   # (C, W, 5)
+
+        valid = (legs_n > 0).all(axis=2) & winners_known[np.newaxis, :]
+        tickets = np.where(valid, legs_n.prod(axis=2), 0)
+        hit = valid & legs_cov.all(axis=2)
+
+        played = valid.sum(axis=1)
+        hits = hit.sum(axis=1)
+        total_tickets = tickets.sum(axis=1)
+        payout = np.where(hit, matrix.payouts[np.newaxis, :], 0).sum(axis=1)
+        avg = total_tickets / np.maximum(played, 1)
+
+        ok = (played > 0) & (avg <= max_avg_tickets) & (hits >= min_hits)
+        for i in np.flatnonzero(ok):
+            cost = int(total_tickets[i]) * TICKET_PRICE
+            results.append({
+                'widths': tuple(int(k) + 1 for k in chunk[i]),
+                'played': int(played[i]),
+                'hits': int(hits[i]),
+                'avg_tickets': float(avg[i]),
+                'total_cost': cost,
+                'total_payout': int(payout[i]),
+                'roi': payout[i] / cost if cost > 0 else 0.0,
+            })
+
+    results.sort(key=lambda r: (-r['roi'], r['avg_tickets']))
+    return results
@@ -6,18 +6,31 @@ VBリフレッシュ: 実行時オッズでValueBet/買い目を再計算
 races/YYYY/MM/DD/predictions.json のML予測結果を維持しつつ、
 最新のmykeibadbオッズでVB gap/EV/is_value_bet/買い目を再計算する。
 
+差分駆動 (発走直前に毎分回す前提):
+  1. 各レースの時系列オッズ最終スナップショット時刻だけを GROUP BY で取得 (軽量)
+  2. 前回リフレッシュ (vb_refresh_state.json) から時刻が進んだレースだけオッズ本体を取得
+  3. オッズ値の指紋が前回と同じレースは再計算しない
+  4. 変化したレースだけ refresh_race_vb → 買い目/Selective 再生成 → predictions.json を
+     tmp + os.replace で原子的に書き換え (読み手が半端なファイルを見ない)
+  変化ゼロなら書き込まない。 ただし scheduler のオッズ鮮度ガード (vb_refreshed_at) を
+  止めないよう、 HEARTBEAT_MIN を超えたら vb_refreshed_at だけ更新する。
+  predictions.json が他プロセス (predict 等) に書き換えられていたら全レース再計算。
+
 Usage:
     python -m ml.vb_refresh --date 2026-02-28
     python -m ml.vb_refresh --today
+    python -m ml.vb_refresh --today --full     # 差分検出を無視して全レース再計算
 """
 
 import argparse
+import hashlib
 import json
+import os
 import sys
 import time
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, Iterable, List, Optional
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
@@ -44,6 +57,76 @@ def load_predictions(date: str) -> dict:
     return data
 
 
+REFRESH_STATE_NAME = "vb_refresh_state.json"
+HEARTBEAT_MIN = 5     # 変化ゼロでも vb_refreshed_at を更新する間隔 (< scheduler ODDS_STALE_MIN)
+
+
+def _day_dir(date: str) -> Path:
+    date_parts = date.split('-')
+    return config.races_dir() / date_parts[0] / date_parts[1] / date_parts[2]
+
+
+def write_text_atomic(path: Path, text: str) -> None:
+    """同一ディレクトリの tmp に書いて os.replace (読み手は旧/新どちらかの完全な版を見る)"""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(text, encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def odds_fingerprint(db_odds: Dict[int, dict], db_place_odds: Dict[int, dict]) -> str:
+    """1レースの単勝/複勝オッズ値の指紋 (値が同じなら再計算不要)"""
+    win = sorted((int(u), v.get('odds')) for u, v in db_odds.items())
+    place = sorted((int(u), v.get('odds_low'), v.get('odds_high'))
+                   for u, v in db_place_odds.items())
+    raw = json.dumps([win, place], separators=(',', ':'))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _file_sig(path: Path) -> Optional[list]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def load_refresh_state(day_dir: Path, pred_path: Path) -> dict:
+    """前回リフレッシュの per-race 状態。 predictions.json が他で書き換えられていたら空
+
+    Returns:
+        {'predictions_sig': [mtime_ns, size], 'races': {race_id: {'win', 'place', 'fingerprint'}}}
+    """
+    path = day_dir / REFRESH_STATE_NAME
+    try:
+        with open(path, encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {'predictions_sig': None, 'races': {}}
+    if state.get('predictions_sig') != _file_sig(pred_path):
+        return {'predictions_sig': None, 'races': {}}
+    state.setdefault('races', {})
+    return state
+
+
+def save_refresh_state(day_dir: Path, pred_path: Path, state: dict) -> None:
+    state['predictions_sig'] = _file_sig(pred_path)
+    write_text_atomic(day_dir / REFRESH_STATE_NAME,
+                      json.dumps(state, ensure_ascii=False, separators=(',', ':')))
+
+
+def races_to_fetch(race_ids: Iterable[str], latest_times: Dict[str, dict],
+                   prev: Dict[str, dict]) -> List[str]:
+    """最終スナップショット時刻が前回から進んだ (or 不明な) レースだけ返す"""
+    out = []
+    for rid in race_ids:
+        t = latest_times.get(rid) or {}
+        p = prev.get(rid)
+        if (p is None or t.get('win') is None or t.get('place') is None
+                or t.get('win') != p.get('win') or t.get('place') != p.get('place')):
+            out.append(rid)
+    return out
+
+
 def refresh_race_vb(race: dict, db_odds: Dict[int, dict],
                     db_place_odds: Dict[int, dict]) -> int:
     """1レースのVB関連フィールドを最新オッズで更新
@@ -144,6 +227,8 @@ def main():
     parser = argparse.ArgumentParser(description='VB Refresh - 最新オッズでVB/買い目再計算')
     parser.add_argument('--date', help='対象日 (YYYY-MM-DD)')
     parser.add_argument('--today', action='store_true', help='今日の日付を使用')
+    parser.add_argument('--full', action='store_true',
+                        help='差分検出を無視して全レースを再取得・再計算')
     args = parser.parse_args()
 
     if args.today:
@@ -154,7 +239,7 @@ def main():
     t0 = time.time()
 
     print(f"\n{'='*60}")
-    print(f"  VB Refresh - 最新オッズで再計算")
+    print("  VB Refresh - 最新オッズで再計算")
     print(f"{'='*60}\n")
 
     # predictions読み込み
@@ -170,38 +255,61 @@ def main():
         print(f"No races in predictions.json for {date}")
         return
 
+    day_dir = _day_dir(date)
+    out_path = day_dir / "predictions.json"
+    refresh_state = load_refresh_state(day_dir, out_path)
+    full = args.full or not refresh_state['races']
+    prev = {} if full else dict(refresh_state['races'])   # 前回分 (下で上書きするので複製)
+
     print(f"[Load] {len(races)} races for {date}")
     print(f"  Model: v{predictions_data.get('model_version', '?')}")
     print(f"  Original odds: {predictions_data.get('odds_source', '?')}")
+    print(f"  Mode: {'full' if full else 'delta'}")
     prev_predict_only = predictions_data.get('predict_only', False)
     if prev_predict_only:
-        print(f"  Status: predict_only (VB未計算)")
+        print("  Status: predict_only (VB未計算)")
 
-    # 最新DBオッズ取得
+    # 最新DBオッズ取得 (スナップショット時刻が進んだレースだけ)
+    race_codes = [r['race_id'] for r in races]
+    latest_times: Dict[str, dict] = {}
+    fetch_ids = race_codes if full else []
     db_odds_index = {}
     db_place_odds_index = {}
     try:
-        from core.odds_db import batch_get_pre_race_odds, batch_get_place_odds, is_db_available
+        from core.odds_db import (batch_get_pre_race_odds, batch_get_place_odds,
+                                  batch_get_latest_odds_times, is_db_available)
         if is_db_available():
-            race_codes = [r['race_id'] for r in races]
-            db_odds_index = batch_get_pre_race_odds(race_codes)
-            db_place_odds_index = batch_get_place_odds(race_codes)
-            print(f"[DB Odds] Win: {len(db_odds_index)}/{len(races)}, "
-                  f"Place: {len(db_place_odds_index)}/{len(races)} races")
+            latest_times = batch_get_latest_odds_times(race_codes)
+            if not full:
+                fetch_ids = races_to_fetch(race_codes, latest_times, prev)
+            if fetch_ids:
+                db_odds_index = batch_get_pre_race_odds(fetch_ids)
+                db_place_odds_index = batch_get_place_odds(fetch_ids)
+            print(f"[DB Odds] fetch {len(fetch_ids)}/{len(races)} races "
+                  f"(Win: {len(db_odds_index)}, Place: {len(db_place_odds_index)})")
         else:
             print("[DB Odds] mykeibadb not available, keeping existing odds")
     except Exception as e:
         print(f"[DB Odds] Error: {e}, keeping existing odds")
 
-    # VBリフレッシュ
-    print(f"\n[VB Refresh] Recalculating VB/EV with latest odds...")
-    total_vb = 0
+    # VBリフレッシュ (オッズ値が変わったレースだけ)
+    print("\n[VB Refresh] Recalculating VB/EV with latest odds...")
+    fetched = set(fetch_ids)
+    changed = []
     for race in races:
         race_id = race.get('race_id', '')
+        if race_id not in fetched:
+            continue
         db_odds = db_odds_index.get(race_id, {})
         db_place_odds = db_place_odds_index.get(race_id, {})
+        fp = odds_fingerprint(db_odds, db_place_odds)
+        t = latest_times.get(race_id) or {}
+        refresh_state['races'][race_id] = {'win': t.get('win'), 'place': t.get('place'),
+                                           'fingerprint': fp}
+        if not full and (prev.get(race_id) or {}).get('fingerprint') == fp:
+            continue
         vb = refresh_race_vb(race, db_odds, db_place_odds)
-        total_vb += vb
+        changed.append(race_id)
 
         venue = race.get('venue_name', '?')
         rn = race.get('race_number', '?')
@@ -210,9 +318,29 @@ def main():
         top1_name = top1['horse_name'] if top1 else '?'
         vb_marker = f' [VB={vb}]' if vb > 0 else ''
         print(f"  {venue}{rn}R: Top1={top1_name}{vb_marker}")
+    print(f"[Delta] changed {len(changed)}/{len(races)} races")
+
+    total_vb = sum(1 for p in races for e in p.get('entries', [])
+                   if e.get('is_value_bet'))
+
+    if not changed:
+        # 書き込み不要。 vb_refreshed_at が古くなりすぎる時だけ鮮度を更新 (scheduler 鮮度ガード用)
+        last = predictions_data.get('vb_refreshed_at')
+        try:
+            age_min = (datetime.now() - datetime.fromisoformat(last)).total_seconds() / 60.0
+        except (TypeError, ValueError):
+            age_min = float('inf')
+        if age_min >= HEARTBEAT_MIN:
+            predictions_data['vb_refreshed_at'] = datetime.now().isoformat(timespec='seconds')
+            write_text_atomic(out_path, json.dumps(predictions_data, ensure_ascii=False, indent=2))
+            print("[Heartbeat] vb_refreshed_at 更新のみ")
+        save_refresh_state(day_dir, out_path, refresh_state)
+        print(f"\n[Summary] 変化なし → 再計算スキップ ({time.time() - t0:.1f}s)")
+        print(f"{'='*60}\n")
+        return
 
     # 買い目推奨再生成 → bets.json に出力
-    print(f"\n[BetEngine] Generating recommendations...")
+    print("\n[BetEngine] Generating recommendations...")
     bets_data = apply_bet_engine(predictions_data, budget=30000)
     save_bets(date, bets_data)
 
@@ -231,18 +359,18 @@ def main():
     # vega-niigata1000: 千直レースに rule_engine v0_2 オーバーレイ再適用
     # (vb_refresh は dict を維持するので既存 overlay は通常残るが、
     #  上流で overlay 無しの predictions.json が書かれた場合の fallback として実行)
+    # 差分モードでは千直レースのオッズが変わった時だけ (history_cache ロードが重いため)
     try:
         from analysis.niigata1000.predict_overlay import overlay_niigata_rules, is_niigata_1000m_race
+        changed_set = set(changed)
         choku_races = [r for r in races if is_niigata_1000m_race(r)]
-        if choku_races:
+        if choku_races and (full or any(r.get('race_id') in changed_set for r in choku_races)):
             from analysis.niigata1000 import features as _n1k_features
-            date_parts_nk = date.split('-')
-            races_dir = config.races_dir() / date_parts_nk[0] / date_parts_nk[1] / date_parts_nk[2]
             original_races = []
             for r in choku_races:
                 rid = r.get('race_id')
                 if rid:
-                    rpath = races_dir / f"race_{rid}.json"
+                    rpath = day_dir / f"race_{rid}.json"
                     if rpath.exists():
                         with rpath.open(encoding='utf-8') as f:
                             original_races.append(json.load(f))
@@ -263,12 +391,10 @@ def main():
     except Exception as _e:
         print(f"  WARN niigata1000 overlay failed: {_e}")
 
-    # 保存（日別アーカイブのみ）
+    # 保存（日別アーカイブのみ、 原子的置換）
     out_json = json.dumps(predictions_data, ensure_ascii=False, indent=2)
-
-    date_parts = date.split('-')
-    out_path = config.races_dir() / date_parts[0] / date_parts[1] / date_parts[2] / "predictions.json"
-    out_path.write_text(out_json, encoding='utf-8')
+    write_text_atomic(out_path, out_json)
+    save_refresh_state(day_dir, out_path, refresh_state)
 
     # Selective 候補生成 (Session 122 Phase 4.1 → Session 123 Phase 1.5 で v2.0 拡張)
     # v1.0: 重賞 rank_p==1 (BT ROI 203%)
@@ -277,7 +403,6 @@ def main():
         from ml.strategies.selective import extract_selective_bets, write_selective_bets
         selective_bets = extract_selective_bets(predictions_data)
         if selective_bets:
-            day_dir = config.races_dir() / date_parts[0] / date_parts[1] / date_parts[2]
             sel_path = write_selective_bets(day_dir, selective_bets)
             n_grade = sum(1 for b in selective_bets if b.source == "grade_top_p")
             n_emerging = sum(1 for b in selective_bets if b.source == "emerging_w_not_top2")
@@ -289,14 +414,14 @@ def main():
                 print(f"  {src_tag} {b.venue_name or '?'} {b.race_number}R {b.grade}: "
                       f"{b.umaban}番 {b.horse_name} odds={b.odds:.1f}  {ev_str}")
         else:
-            print(f"\n[Selective] 対象なし")
+            print("\n[Selective] 対象なし")
     except Exception as _e:
         print(f"  WARN selective generation failed: {_e}")
 
     elapsed = time.time() - t0
 
-    print(f"\n[Summary]")
-    print(f"  Races:      {len(races)}")
+    print("\n[Summary]")
+    print(f"  Races:      {len(races)} (changed {len(changed)})")
     print(f"  Value Bets: {total_vb}")
     print(f"  Output:     {out_path}")
     print(f"  Elapsed:    {elapsed:.1f}s")
@@ -20,6 +20,10 @@ if sys.platform == 'win32':
 
 from core.config import data_root, ml_dir
 from core import db
+from ml.utils.win5_bitset import (
+    build_win5_matrix, evaluate_masks, rank_prefix_masks, search_leg_widths,
+    selection_masks, summarize_evaluation,
+)
 
 
 # ============================================================
@@ -279,76 +283,65 @@ def build_strategies():
 # Simulation
 # ============================================================
 def simulate(weeks, pred_index, strategies):
-    results = {}
-
-    for sname, select_fn in strategies.items():
-        week_results = []
-        for week in weeks:
-            race_sels = []
-            skip = False
-            for race in week['races']:
-                pred = pred_index.get(race['race_id'])
-                if not pred:
-                    race_sels.append([])
-                    continue
-                sel = select_fn(pred)
-                if sel is None:
-                    skip = True
-                    break
-                # Deduplicate
-                sel = list(set(sel))
-                race_sels.append(sel)
-
-            if skip or len(race_sels) < 5 or any(len(s) == 0 for s in race_sels):
-                continue
-
-            tickets = 1
-            for s in race_sels:
-                tickets *= len(s)
-
-            hit = all(
-                race['winner'] in race_sels[i]
-                for i, race in enumerate(week['races'])
-                if race['winner'] > 0
-            ) and all(r['winner'] > 0 for r in week['races'])
-
-            week_results.append({
-                'date': week['date'],
-                'tickets': tickets,
-                'cost': tickets * 100,
-                'hit': hit,
-                'payout': week['payout'] if hit else 0,
-                'covered': [race['winner'] in race_sels[i] for i, race in enumerate(week['races'])],
-            })
+    """全戦略を WIN5 ビットセットエンジンで一括評価する。"""
+    matrix = build_win5_matrix(weeks)
+    names = list(strategies.keys())
+    if not names:
+        return {}
+    masks = np.stack([
+        selection_masks(matrix, pred_index, strategies[sname]) for sname in names
+    ])
+    # 勝ち馬不明の週も購入扱い (不的中) — 移行前の集計と同じ
+    ev = evaluate_masks(matrix, masks, require_winners=False)
+    summary = summarize_evaluation(ev)
 
-        if not week_results:
+    results = {}
+    for s, sname in enumerate(names):
+        played_idx = np.flatnonzero(ev['valid'][s])
+        if len(played_idx) == 0:
             continue
-
-        played = len(week_results)
-        hits = [r for r in week_results if r['hit']]
-        total_cost = sum(r['cost'] for r in week_results)
-        total_payout = sum(r['payout'] for r in hits)
-        ticket_counts = [r['tickets'] for r in week_results]
+        hit_idx = np.flatnonzero(ev['hit'][s])
+        tickets = ev['tickets'][s]
+
+        week_results = [{
+            'date': matrix.dates[w],
+            'tickets': int(tickets[w]),
+            'cost': int(tickets[w]) * 100,
+            'hit': bool(ev['hit'][s, w]),
+            'payout': int(ev['payout'][s, w]),
+            'covered': [bool(c) for c in ev['covered'][s, w]],
+        } for w in played_idx]
 
         results[sname] = {
-            'played': played,
-            'hits': len(hits),
-            'hit_rate': len(hits) / played if played else 0,
-            'avg_tickets': np.mean(ticket_counts),
-            'median_tickets': np.median(ticket_counts),
-            'total_cost': total_cost,
-            'total_payout': total_payout,
-            'roi': total_payout / total_cost if total_cost > 0 else 0,
-            'hit_dates': [r['date'] for r in hits],
-            'hit_payouts': [r['payout'] for r in hits],
-            'hit_tickets': [r['tickets'] for r in hits],
-            'avg_covered': np.mean([sum(r['covered']) for r in week_results]),
+            'played': int(summary['played'][s]),
+            'hits': int(summary['hits'][s]),
+            'hit_rate': float(summary['hit_rate'][s]),
+            'avg_tickets': float(summary['avg_tickets'][s]),
+            'median_tickets': float(np.median(tickets[played_idx])),
+            'total_cost': int(summary['total_cost'][s]),
+            'total_payout': int(summary['total_payout'][s]),
+            'roi': float(summary['roi'][s]),
+            'hit_dates': [matrix.dates[w] for w in hit_idx],
+            'hit_payouts': [int(ev['payout'][s, w]) for w in hit_idx],
+            'hit_tickets': [int(tickets[w]) for w in hit_idx],
+            'avg_covered': float(ev['covered'][s, played_idx].sum(axis=1).mean()),
             'weekly': week_results,
         }
 
     return results
 
 
+def search_widths(weeks, pred_index, rank_key='rank_p', max_width=6, max_avg_tickets=200):
+    """rank_key 上位のレッグ別幅 (R1..R5) を平均点数上限内で全探索"""
+    matrix = build_win5_matrix(weeks)
+    prefix = rank_prefix_masks(
+        matrix, pred_index,
+        lambda pred: [e['umaban'] for e in get_sorted(pred['entries'], rank_key)],
+        max_width,
+    )
+    return search_leg_widths(matrix, prefix, max_avg_tickets=max_avg_tickets)
+
+
 # ============================================================
 # Report
 # ============================================================
@@ -437,11 +430,26 @@ def main():
 
     print_report(results)
 
+    print(f"\n{'='*90}")
+    print("  レッグ別幅 全探索 (avg<=200点, ROI上位15)")
+    print(f"{'='*90}")
+    width_results = {}
+    for rank_key in ['rank_p', 'rank_w', 'wp_sum']:
+        found = search_widths(matched, pred_index, rank_key=rank_key)
+        width_results[rank_key] = found[:50]
+        print(f"\n  [{rank_key}] {len(found)} combos")
+        for r in found[:15]:
+            print(f"    {'-'.join(str(w) for w in r['widths']):<12} "
+                  f"play={r['played']:>4} hit={r['hits']:>3} avg={r['avg_tickets']:>6.0f} "
+                  f"cost={r['total_cost']:>10,} payout={r['total_payout']:>10,} "
+                  f"ROI={r['roi']:>5.1%}")
+
     # Save
     out = {}
     for n, s in results.items():
         out[n] = {k: (float(v) if isinstance(v, (np.floating, np.integer)) else v)
                   for k, v in s.items() if k != 'weekly'}
+    out['_width_search'] = width_results
     save_path = ml_dir() / "win5_strategy_search_results.json"
     with open(str(save_path), 'w', encoding='utf-8') as f:
         json.dump(out, f, ensure_ascii=False, indent=2)